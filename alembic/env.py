@@ -20,6 +20,10 @@ from app.models.configuracao_models import *
 from app.models.conta_mae_models import *
 from app.models.email_monitor_models import *
 from app.models.openai_account_creation_models import *
+from app.models.dashboard_models import *
+from app.models.notificacao_models import *
+from app.models.broadcast_models import *
+from app.models.webhook_models import *
 
 from logging.config import fileConfig
 
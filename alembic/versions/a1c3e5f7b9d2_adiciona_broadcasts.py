@@ -0,0 +1,69 @@
+"""adiciona broadcasts e status por destinatario
+
+Revision ID: a1c3e5f7b9d2
+Revises: f6c8e1a3b5d7
+Create Date: 2026-10-17 04:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a1c3e5f7b9d2"
+down_revision: Union[str, Sequence[str], None] = "f6c8e1a3b5d7"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "broadcast",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("mensagem", sa.Text(), nullable=False),
+        sa.Column("parse_mode", sa.String(length=20), nullable=True),
+        sa.Column("reply_markup", sa.JSON(), nullable=True),
+        sa.Column("filtro", sa.JSON(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDENTE", "EM_ANDAMENTO", "PAUSADO", "CANCELADO", "CONCLUIDO", name="statusbroadcast"),
+            nullable=False,
+        ),
+        sa.Column("total_destinatarios", sa.Integer(), nullable=False),
+        sa.Column("enviados", sa.Integer(), nullable=False),
+        sa.Column("falhas", sa.Integer(), nullable=False),
+        sa.Column("tempo_execucao_segundos", sa.Float(), nullable=False),
+        sa.Column("criado_por_admin_id", sa.UUID(), nullable=True),
+        sa.Column("criado_em", sa.DateTime(), nullable=False),
+        sa.Column("iniciado_em", sa.DateTime(), nullable=True),
+        sa.Column("atualizado_em", sa.DateTime(), nullable=False),
+        sa.Column("concluido_em", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["criado_por_admin_id"], ["usuario.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_broadcast_status"), "broadcast", ["status"], unique=False)
+
+    op.create_table(
+        "broadcast_destinatario",
+        sa.Column("broadcast_id", sa.UUID(), nullable=False),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDENTE", "ENVIADO", "FALHOU", name="statusbroadcastdestinatario"),
+            nullable=False,
+        ),
+        sa.Column("erro", sa.Text(), nullable=True),
+        sa.Column("enviado_em", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["broadcast_id"], ["broadcast.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("broadcast_id", "telegram_id"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("broadcast_destinatario")
+    op.drop_index(op.f("ix_broadcast_status"), table_name="broadcast")
+    op.drop_table("broadcast")
+    op.execute("DROP TYPE IF EXISTS statusbroadcastdestinatario")
+    op.execute("DROP TYPE IF EXISTS statusbroadcast")
@@ -0,0 +1,63 @@
+"""adiciona contadores de disponibilidade por produto
+
+Revision ID: a3d5e7f9b1c2
+Revises: 6b4a2d1c9e7f
+Create Date: 2026-10-17 00:00:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "a3d5e7f9b1c2"
+down_revision = "6b4a2d1c9e7f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "produto_disponibilidade",
+        sa.Column("produto_id", sa.Uuid(), nullable=False),
+        sa.Column("slots_livres_estoque", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("slots_livres_conta_mae", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("menor_expiracao_conta_mae", sa.Date(), nullable=True),
+        sa.Column("atualizado_em", sa.DateTime(), nullable=False, server_default=sa.text("now()")),
+        sa.ForeignKeyConstraint(["produto_id"], ["produto.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("produto_id"),
+    )
+
+    # Preenche os contadores a partir do estado atual do estoque/contas-mãe.
+    op.execute(
+        """
+        INSERT INTO produto_disponibilidade (
+            produto_id, slots_livres_estoque, slots_livres_conta_mae, menor_expiracao_conta_mae, atualizado_em
+        )
+        SELECT
+            p.id,
+            COALESCE(e.slots_livres, 0),
+            COALESCE(c.slots_livres, 0),
+            c.menor_expiracao,
+            now()
+        FROM produto p
+        LEFT JOIN (
+            SELECT produto_id, SUM(max_slots - slots_ocupados) AS slots_livres
+            FROM estoqueconta
+            WHERE is_ativo AND NOT requer_atencao AND slots_ocupados < max_slots
+            GROUP BY produto_id
+        ) e ON e.produto_id = p.id
+        LEFT JOIN (
+            SELECT produto_id, SUM(max_slots - slots_ocupados) AS slots_livres, MIN(data_expiracao) AS menor_expiracao
+            FROM contamae
+            WHERE is_ativo
+              AND slots_ocupados < max_slots
+              AND (data_expiracao IS NULL OR data_expiracao >= CURRENT_DATE)
+            GROUP BY produto_id
+        ) c ON c.produto_id = p.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("produto_disponibilidade")
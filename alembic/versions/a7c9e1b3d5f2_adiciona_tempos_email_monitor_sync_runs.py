@@ -0,0 +1,29 @@
+"""adiciona tempos de fila e duração em email_monitor_sync_runs
+
+Revision ID: a7c9e1b3d5f2
+Revises: f1a3c5e7b9d0
+Create Date: 2026-10-17 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a7c9e1b3d5f2"
+down_revision: Union[str, Sequence[str], None] = "f1a3c5e7b9d0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Sincronização em paralelo: espera por um worker e duração de cada conta.
+    op.add_column("email_monitor_sync_runs", sa.Column("queued_ms", sa.Integer(), nullable=True))
+    op.add_column("email_monitor_sync_runs", sa.Column("duration_ms", sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("email_monitor_sync_runs", "duration_ms")
+    op.drop_column("email_monitor_sync_runs", "queued_ms")
@@ -0,0 +1,65 @@
+"""adiciona fila de eventos do webhook de pagamento
+
+Revision ID: b3d5f7a9c1e4
+Revises: a1c3e5f7b9d2
+Create Date: 2026-10-17 05:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b3d5f7a9c1e4"
+down_revision: Union[str, Sequence[str], None] = "a1c3e5f7b9d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "webhook_evento_pagamento",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("gateway", sa.String(length=30), nullable=False),
+        sa.Column("payment_id", sa.String(length=80), nullable=False),
+        sa.Column("acao", sa.String(length=60), nullable=False),
+        sa.Column("payload", sa.JSON(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDENTE", "PROCESSADO", "FALHOU", name="statuswebhookevento"),
+            nullable=False,
+        ),
+        sa.Column("status_gateway", sa.String(length=30), nullable=True),
+        sa.Column("resultado", sa.String(length=60), nullable=True),
+        sa.Column("tentativas", sa.Integer(), nullable=False),
+        sa.Column("recebimentos", sa.Integer(), nullable=False),
+        sa.Column("proxima_tentativa_em", sa.DateTime(), nullable=False),
+        sa.Column("ultimo_erro", sa.Text(), nullable=True),
+        sa.Column("recebido_em", sa.DateTime(), nullable=False),
+        sa.Column("ultimo_recebimento_em", sa.DateTime(), nullable=False),
+        sa.Column("processado_em", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("gateway", "payment_id", "acao", name="uq_webhook_evento_pagamento"),
+    )
+    op.create_index(
+        op.f("ix_webhook_evento_pagamento_processado_em"),
+        "webhook_evento_pagamento",
+        ["processado_em"],
+        unique=False,
+    )
+    op.create_index(
+        "ix_webhook_evento_pagamento_pendentes",
+        "webhook_evento_pagamento",
+        ["proxima_tentativa_em"],
+        unique=False,
+        postgresql_where=sa.text("status = 'PENDENTE'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_webhook_evento_pagamento_pendentes", table_name="webhook_evento_pagamento")
+    op.drop_index(op.f("ix_webhook_evento_pagamento_processado_em"), table_name="webhook_evento_pagamento")
+    op.drop_table("webhook_evento_pagamento")
+    op.execute("DROP TYPE IF EXISTS statuswebhookevento")
@@ -0,0 +1,36 @@
+"""adiciona chaves de idempotencia para compras
+
+Revision ID: b6e1f3a8c2d4
+Revises: a3d5e7f9b1c2
+Create Date: 2026-10-17 00:10:00.000000
+"""
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = "b6e1f3a8c2d4"
+down_revision = "a3d5e7f9b1c2"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "compra_idempotencia",
+        sa.Column("chave", sa.String(length=255), nullable=False),
+        sa.Column("telegram_id", sa.BigInteger(), nullable=False),
+        sa.Column("hash_requisicao", sa.String(length=64), nullable=False),
+        sa.Column("pedido_id", sa.Uuid(), nullable=True),
+        sa.Column("resposta_criptografada", sa.Text(), nullable=True),
+        sa.Column("criado_em", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["pedido_id"], ["pedido.id"], ondelete="SET NULL"),
+        sa.PrimaryKeyConstraint("chave"),
+    )
+    op.create_index("ix_compra_idempotencia_criado_em", "compra_idempotencia", ["criado_em"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_compra_idempotencia_criado_em", table_name="compra_idempotencia")
+    op.drop_table("compra_idempotencia")
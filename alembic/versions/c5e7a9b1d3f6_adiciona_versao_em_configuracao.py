@@ -0,0 +1,27 @@
+"""adiciona versao em configuracao
+
+Revision ID: c5e7a9b1d3f6
+Revises: b3d5f7a9c1e4
+Create Date: 2026-10-17 06:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c5e7a9b1d3f6"
+down_revision: Union[str, Sequence[str], None] = "b3d5f7a9c1e4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("configuracao", sa.Column("versao", sa.Integer(), nullable=False, server_default="1"))
+    op.alter_column("configuracao", "versao", server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column("configuracao", "versao")
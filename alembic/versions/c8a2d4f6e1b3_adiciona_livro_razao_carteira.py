@@ -0,0 +1,69 @@
+"""adiciona livro-razao da carteira
+
+Revision ID: c8a2d4f6e1b3
+Revises: b6e1f3a8c2d4
+Create Date: 2026-10-17 00:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "c8a2d4f6e1b3"
+down_revision: Union[str, Sequence[str], None] = "b6e1f3a8c2d4"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "movimentacao_carteira",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column(
+            "tipo",
+            sa.Enum(
+                "SALDO_INICIAL",
+                "COMPRA",
+                "RECARGA",
+                "BONUS_CASHBACK",
+                "GIFT_CARD",
+                "REEMBOLSO",
+                "AJUSTE_ADMIN",
+                name="tipomovimentacaocarteira",
+            ),
+            nullable=False,
+        ),
+        sa.Column("valor", sa.Numeric(10, 2), nullable=False),
+        sa.Column("saldo_resultante", sa.Numeric(10, 2), nullable=False),
+        sa.Column("referencia_id", sa.UUID(), nullable=True),
+        sa.Column("descricao", sa.String(length=240), nullable=True),
+        sa.Column("criado_em", sa.DateTime(), nullable=False),
+        sa.Column("usuario_id", sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(["usuario_id"], ["usuario.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index("ix_movimentacao_carteira_usuario_id", "movimentacao_carteira", ["usuario_id"])
+    op.create_index("ix_movimentacao_carteira_referencia_id", "movimentacao_carteira", ["referencia_id"])
+    op.create_index("ix_movimentacao_carteira_criado_em", "movimentacao_carteira", ["criado_em"])
+
+    # Abre o livro-razão com o saldo atual de cada usuário.
+    op.execute(
+        """
+        INSERT INTO movimentacao_carteira (id, usuario_id, tipo, valor, saldo_resultante, descricao, criado_em)
+        SELECT gen_random_uuid(), id, 'SALDO_INICIAL', saldo_carteira, saldo_carteira,
+               'Saldo existente na criação do livro-razão', now()
+        FROM usuario
+        WHERE saldo_carteira <> 0
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_movimentacao_carteira_criado_em", table_name="movimentacao_carteira")
+    op.drop_index("ix_movimentacao_carteira_referencia_id", table_name="movimentacao_carteira")
+    op.drop_index("ix_movimentacao_carteira_usuario_id", table_name="movimentacao_carteira")
+    op.drop_table("movimentacao_carteira")
+    op.execute("DROP TYPE IF EXISTS tipomovimentacaocarteira")
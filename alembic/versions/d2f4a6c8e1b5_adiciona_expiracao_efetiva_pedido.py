@@ -0,0 +1,35 @@
+"""adiciona expiracao efetiva materializada no pedido
+
+Revision ID: d2f4a6c8e1b5
+Revises: c8a2d4f6e1b3
+Create Date: 2026-10-17 01:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d2f4a6c8e1b5"
+down_revision: Union[str, Sequence[str], None] = "c8a2d4f6e1b3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # As colunas nascem vazias; o preenchimento das linhas existentes é feito
+    # em lotes por POST /admin/pedidos/expiracao/recalcular (ou pela task
+    # `recalcular_expiracao_pedidos`), sem travar a tabela na migração.
+    op.add_column("pedido", sa.Column("data_expiracao_efetiva", sa.Date(), nullable=True))
+    op.add_column("pedido", sa.Column("origem_expiracao", sa.String(length=20), nullable=True))
+    op.create_index(
+        op.f("ix_pedido_data_expiracao_efetiva"), "pedido", ["data_expiracao_efetiva"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_pedido_data_expiracao_efetiva"), table_name="pedido")
+    op.drop_column("pedido", "origem_expiracao")
+    op.drop_column("pedido", "data_expiracao_efetiva")
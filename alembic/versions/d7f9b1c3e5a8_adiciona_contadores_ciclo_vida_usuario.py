@@ -0,0 +1,64 @@
+"""adiciona contadores de ciclo de vida ao usuario
+
+Revision ID: d7f9b1c3e5a8
+Revises: c5e7a9b1d3f6
+Create Date: 2026-10-17 07:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d7f9b1c3e5a8"
+down_revision: Union[str, Sequence[str], None] = "c5e7a9b1d3f6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("usuario", sa.Column("total_recargas_pagas", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("usuario", sa.Column("total_pedidos", sa.Integer(), nullable=False, server_default="0"))
+    op.add_column("usuario", sa.Column("primeira_recarga_paga_em", sa.DateTime(), nullable=True))
+    op.add_column("usuario", sa.Column("primeiro_pedido_em", sa.DateTime(), nullable=True))
+
+    # Backfill a partir do histórico (depois, POST /admin/usuarios/contadores/recalcular).
+    op.execute(
+        """
+        UPDATE usuario u
+        SET total_recargas_pagas = r.total,
+            primeira_recarga_paga_em = r.primeira_em
+        FROM (
+            SELECT usuario_id, count(*) AS total, min(coalesce(pago_em, criado_em)) AS primeira_em
+            FROM recargasaldo
+            WHERE status_pagamento = 'PAGO'
+            GROUP BY usuario_id
+        ) r
+        WHERE r.usuario_id = u.id
+        """
+    )
+    op.execute(
+        """
+        UPDATE usuario u
+        SET total_pedidos = p.total,
+            primeiro_pedido_em = p.primeiro_em
+        FROM (
+            SELECT usuario_id, count(*) AS total, min(criado_em) AS primeiro_em
+            FROM pedido
+            GROUP BY usuario_id
+        ) p
+        WHERE p.usuario_id = u.id
+        """
+    )
+
+    op.alter_column("usuario", "total_recargas_pagas", server_default=None)
+    op.alter_column("usuario", "total_pedidos", server_default=None)
+
+
+def downgrade() -> None:
+    op.drop_column("usuario", "primeiro_pedido_em")
+    op.drop_column("usuario", "primeira_recarga_paga_em")
+    op.drop_column("usuario", "total_pedidos")
+    op.drop_column("usuario", "total_recargas_pagas")
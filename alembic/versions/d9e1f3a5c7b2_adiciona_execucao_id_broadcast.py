@@ -0,0 +1,26 @@
+"""adiciona execucao_id em broadcast
+
+Revision ID: d9e1f3a5c7b2
+Revises: a7c9e1b3d5f2
+Create Date: 2026-10-17 23:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "d9e1f3a5c7b2"
+down_revision: Union[str, Sequence[str], None] = "a7c9e1b3d5f2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("broadcast", sa.Column("execucao_id", sa.UUID(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("broadcast", "execucao_id")
@@ -0,0 +1,94 @@
+"""adiciona agregados de vendas e usuarios do dashboard
+
+Revision ID: e4b6d8f1a3c5
+Revises: d2f4a6c8e1b5
+Create Date: 2026-10-17 02:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e4b6d8f1a3c5"
+down_revision: Union[str, Sequence[str], None] = "d2f4a6c8e1b5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "venda_agregada_hora",
+        sa.Column("hora", sa.DateTime(), nullable=False),
+        sa.Column("produto_id", sa.UUID(), nullable=False),
+        sa.Column("pedidos", sa.Integer(), nullable=False),
+        sa.Column("receita", sa.Numeric(12, 2), nullable=False),
+        sa.ForeignKeyConstraint(["produto_id"], ["produto.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("hora", "produto_id"),
+    )
+    op.create_table(
+        "venda_agregada_dia",
+        sa.Column("dia", sa.Date(), nullable=False),
+        sa.Column("produto_id", sa.UUID(), nullable=False),
+        sa.Column("pedidos", sa.Integer(), nullable=False),
+        sa.Column("receita", sa.Numeric(12, 2), nullable=False),
+        sa.ForeignKeyConstraint(["produto_id"], ["produto.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("dia", "produto_id"),
+    )
+    op.create_table(
+        "usuario_agregado_hora",
+        sa.Column("hora", sa.DateTime(), nullable=False),
+        sa.Column("novos_usuarios", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("hora"),
+    )
+    op.create_table(
+        "usuario_agregado_dia",
+        sa.Column("dia", sa.Date(), nullable=False),
+        sa.Column("novos_usuarios", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("dia"),
+    )
+
+    # Backfill inicial: histórico diário completo e a última semana por hora.
+    op.execute(
+        """
+        INSERT INTO venda_agregada_dia (dia, produto_id, pedidos, receita)
+        SELECT DATE(criado_em), produto_id, COUNT(*), COALESCE(SUM(valor_pago), 0)
+        FROM pedido
+        GROUP BY DATE(criado_em), produto_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO venda_agregada_hora (hora, produto_id, pedidos, receita)
+        SELECT date_trunc('hour', criado_em), produto_id, COUNT(*), COALESCE(SUM(valor_pago), 0)
+        FROM pedido
+        WHERE criado_em >= date_trunc('hour', timezone('utc', now())) - interval '168 hours'
+        GROUP BY date_trunc('hour', criado_em), produto_id
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO usuario_agregado_dia (dia, novos_usuarios)
+        SELECT DATE(criado_em), COUNT(*)
+        FROM usuario
+        GROUP BY DATE(criado_em)
+        """
+    )
+    op.execute(
+        """
+        INSERT INTO usuario_agregado_hora (hora, novos_usuarios)
+        SELECT date_trunc('hour', criado_em), COUNT(*)
+        FROM usuario
+        WHERE criado_em >= date_trunc('hour', timezone('utc', now())) - interval '168 hours'
+        GROUP BY date_trunc('hour', criado_em)
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("usuario_agregado_dia")
+    op.drop_table("usuario_agregado_hora")
+    op.drop_table("venda_agregada_dia")
+    op.drop_table("venda_agregada_hora")
@@ -0,0 +1,38 @@
+"""adiciona deltas dos agregados do dashboard
+
+Revision ID: e5c7a9d1f3b4
+Revises: d9e1f3a5c7b2
+Create Date: 2026-10-18 00:30:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e5c7a9d1f3b4"
+down_revision: Union[str, Sequence[str], None] = "d9e1f3a5c7b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "dashboard_agregado_delta",
+        sa.Column("id", sa.BigInteger(), autoincrement=True, nullable=False),
+        sa.Column("hora", sa.DateTime(), nullable=False),
+        sa.Column("produto_id", sa.UUID(), nullable=True),
+        sa.Column("pedidos", sa.Integer(), nullable=False),
+        sa.Column("receita", sa.Numeric(12, 2), nullable=False),
+        sa.Column("novos_usuarios", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["produto_id"], ["produto.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_dashboard_agregado_delta_hora"), "dashboard_agregado_delta", ["hora"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_dashboard_agregado_delta_hora"), table_name="dashboard_agregado_delta")
+    op.drop_table("dashboard_agregado_delta")
@@ -0,0 +1,57 @@
+"""adiciona lotes de geracao de giftcards
+
+Revision ID: e9b1d3f5a7c0
+Revises: d7f9b1c3e5a8
+Create Date: 2026-10-17 08:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "e9b1d3f5a7c0"
+down_revision: Union[str, Sequence[str], None] = "d7f9b1c3e5a8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "giftcard_lote",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("valor", sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column("quantidade_solicitada", sa.Integer(), nullable=False),
+        sa.Column("quantidade_gerada", sa.Integer(), nullable=False),
+        sa.Column("colisoes", sa.Integer(), nullable=False),
+        sa.Column(
+            "status",
+            sa.Enum("PENDENTE", "EM_ANDAMENTO", "CONCLUIDO", "FALHOU", name="statusgiftcardlote"),
+            nullable=False,
+        ),
+        sa.Column("erro", sa.String(), nullable=True),
+        sa.Column("criado_por_admin_id", sa.UUID(), nullable=False),
+        sa.Column("criado_em", sa.DateTime(), nullable=False),
+        sa.Column("iniciado_em", sa.DateTime(), nullable=True),
+        sa.Column("atualizado_em", sa.DateTime(), nullable=False),
+        sa.Column("concluido_em", sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(["criado_por_admin_id"], ["usuario.id"]),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(op.f("ix_giftcard_lote_status"), "giftcard_lote", ["status"], unique=False)
+
+    op.add_column("giftcard", sa.Column("lote_id", sa.UUID(), nullable=True))
+    op.create_foreign_key("giftcard_lote_id_fkey", "giftcard", "giftcard_lote", ["lote_id"], ["id"])
+    op.create_index(op.f("ix_giftcard_lote_id"), "giftcard", ["lote_id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_giftcard_lote_id"), table_name="giftcard")
+    op.drop_constraint("giftcard_lote_id_fkey", "giftcard", type_="foreignkey")
+    op.drop_column("giftcard", "lote_id")
+
+    op.drop_index(op.f("ix_giftcard_lote_status"), table_name="giftcard_lote")
+    op.drop_table("giftcard_lote")
+    op.execute("DROP TYPE IF EXISTS statusgiftcardlote")
@@ -0,0 +1,27 @@
+"""adiciona indice em giftcard.criado_em
+
+Revision ID: f1a3c5e7b9d0
+Revises: e9b1d3f5a7c0
+Create Date: 2026-10-17 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f1a3c5e7b9d0"
+down_revision: Union[str, Sequence[str], None] = "e9b1d3f5a7c0"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Sincronização incremental do filtro de códigos (criados desde a última leitura).
+    op.create_index(op.f("ix_giftcard_criado_em"), "giftcard", ["criado_em"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_giftcard_criado_em"), table_name="giftcard")
@@ -0,0 +1,57 @@
+"""adiciona outbox de notificacoes do telegram
+
+Revision ID: f6c8e1a3b5d7
+Revises: e4b6d8f1a3c5
+Create Date: 2026-10-17 03:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "f6c8e1a3b5d7"
+down_revision: Union[str, Sequence[str], None] = "e4b6d8f1a3c5"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "notificacao_telegram",
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.Column("chat_id", sa.BigInteger(), nullable=False),
+        sa.Column("texto_criptografado", sa.Text(), nullable=False),
+        sa.Column("parse_mode", sa.String(length=20), nullable=True),
+        sa.Column("reply_markup", sa.JSON(), nullable=True),
+        sa.Column(
+            "status",
+            sa.Enum("PENDENTE", "ENVIADA", "FALHOU", name="statusnotificacaotelegram"),
+            nullable=False,
+        ),
+        sa.Column("tentativas", sa.Integer(), nullable=False),
+        sa.Column("proxima_tentativa_em", sa.DateTime(), nullable=False),
+        sa.Column("ultimo_erro", sa.Text(), nullable=True),
+        sa.Column("criado_em", sa.DateTime(), nullable=False),
+        sa.Column("enviado_em", sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint("id"),
+    )
+    op.create_index(
+        op.f("ix_notificacao_telegram_criado_em"), "notificacao_telegram", ["criado_em"], unique=False
+    )
+    op.create_index(
+        "ix_notificacao_telegram_pendentes",
+        "notificacao_telegram",
+        ["proxima_tentativa_em"],
+        unique=False,
+        postgresql_where=sa.text("status = 'PENDENTE'"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_notificacao_telegram_pendentes", table_name="notificacao_telegram")
+    op.drop_index(op.f("ix_notificacao_telegram_criado_em"), table_name="notificacao_telegram")
+    op.drop_table("notificacao_telegram")
+    op.execute("DROP TYPE IF EXISTS statusnotificacaotelegram")
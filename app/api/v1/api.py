@@ -1,8 +1,12 @@
 from fastapi import APIRouter, Depends
+from fastapi.routing import APIRoute
 
 from app.api.v1.deps import get_bot_api_key
+from app.core.config import settings
 from app.api.v1.endpoints import (
     auth,
+    bot_async,
+    broadcasts,
     compras,
     configuracoes,
     contas_mae,
@@ -14,6 +18,7 @@ from app.api.v1.endpoints import (
     pedidos,
     produtos,
     recargas,
+    sistema,
     sugestoes,
     tickets,
     usuarios,
@@ -39,14 +44,41 @@ api_router.include_router(tickets.admin_router, prefix="/admin/tickets", tags=["
 api_router.include_router(giftcards.admin_router, prefix="/admin/giftcards", tags=["Admin - GiftCards"])
 api_router.include_router(sugestoes.admin_router, prefix="/admin/sugestoes", tags=["Admin - Sugestões"])
 api_router.include_router(dashboard.router, prefix="/admin/dashboard", tags=["Admin - Dashboard"])
+api_router.include_router(broadcasts.router, prefix="/admin/broadcasts", tags=["Admin - Broadcasts"])
 api_router.include_router(pedidos.router, prefix="/admin/pedidos", tags=["Admin - Pedidos"])
 api_router.include_router(usuarios.admin_router, prefix="/admin/usuarios", tags=["Admin - Usuários"])
 api_router.include_router(recargas.admin_router, prefix="/admin/recargas", tags=["Admin - Recargas"])
 api_router.include_router(configuracoes.router, prefix="/admin/configuracoes", tags=["Admin - Configurações"])
 api_router.include_router(contas_mae.router, prefix="/admin/contas-mae", tags=["Admin - Contas Mãe"])
 api_router.include_router(email_monitor.router, prefix="/admin/email-monitor", tags=["Admin - Email Monitor"])
+api_router.include_router(sistema.router, prefix="/admin/sistema", tags=["Admin - Sistema"])
 api_router.include_router(
     openai_account_creation.router,
     prefix="/admin/openai-account-creation",
     tags=["Admin - Criação OpenAI"],
 )
+
+
+def _usar_rotas_bot_async() -> None:
+    """
+    Troca as rotas quentes do bot pelas versões assíncronas, na mesma
+    posição da lista (a ordem decide qual rota casa primeiro).
+    """
+    total_antes = len(api_router.routes)
+    api_router.include_router(bot_async.router, dependencies=bot_deps)
+    rotas_async = api_router.routes[total_antes:]
+    del api_router.routes[total_antes:]
+
+    por_chave = {(rota.path, frozenset(rota.methods)): rota for rota in rotas_async}
+    for indice, rota in enumerate(api_router.routes):
+        if isinstance(rota, APIRoute):
+            substituta = por_chave.pop((rota.path, frozenset(rota.methods)), None)
+            if substituta is not None:
+                substituta.tags = rota.tags
+                api_router.routes[indice] = substituta
+    if por_chave:
+        raise RuntimeError(f"Rotas assíncronas sem equivalente síncrono: {sorted(chave[0] for chave in por_chave)}")
+
+
+if settings.DB_MODO_BOT == "async":
+    _usar_rotas_bot_async()
@@ -49,12 +49,15 @@ def get_current_admin_user(
 # 1. Define o esquema: procurar por um cabeçalho chamado 'X-API-Key'
 api_key_header_scheme = APIKeyHeader(name="X-API-Key")
 
-def get_bot_api_key(
+async def get_bot_api_key(
     api_key: str = Depends(api_key_header_scheme)
 ):
     """
     Dependência para proteger rotas do bot.
     Verifica se o cabeçalho X-API-Key corresponde à chave no .env
+
+    É `async` (não faz I/O) para não ocupar o threadpool a cada requisição
+    do bot, o que anularia o ganho das rotas assíncronas.
     """
 
     # 2. Compara as chaves de forma segura
@@ -0,0 +1,88 @@
+import uuid
+from typing import List, Optional
+
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, Request
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.api.v1.endpoints import compras, giftcards, produtos, recargas, usuarios
+from app.db.database import get_async_session
+from app.schemas.compra_schemas import CompraCreateRequest, CompraCreateResponse
+from app.schemas.giftcard_schemas import GiftCardResgatarRequest, GiftCardResgatarResponse
+from app.schemas.produto_schemas import ProdutoRead
+from app.schemas.recarga_schemas import RecargaStatusResponse
+from app.schemas.usuario_schemas import UsuarioPerfilRead
+from app.services.catalogo_cache_service import catalogo_cache
+
+# ===============================================================
+# Rotas quentes do bot no modo assíncrono (DB_MODO_BOT="async")
+# ===============================================================
+# Mesmos caminhos das versões síncronas, que são substituídas no api.py.
+# A lógica continua nas rotas originais: `run_sync` as executa com uma
+# Session síncrona cujo I/O corre no asyncpg, então uma requisição
+# esperando o banco não ocupa uma thread do threadpool. Esse código roda
+# na thread do event loop: o I/O que não é do asyncpg (Celery, Redis,
+# cargas de cache pelo psycopg2) tem de passar por executar_bloqueante
+# (app/core/concorrencia.py), que o leva para uma thread.
+router = APIRouter()
+
+
+async def _executar(session: AsyncSession, rota, **kwargs):
+    return await session.run_sync(lambda sync_session: rota(session=sync_session, **kwargs))
+
+
+@router.get(
+    "/produtos/",
+    response_model=List[ProdutoRead],
+    responses={304: {"description": "Catálogo não modificado desde o ETag informado."}},
+)
+async def get_produtos_ativos(request: Request, session: AsyncSession = Depends(get_async_session)):
+    """
+    Endpoint para o bot listar todos os produtos ATIVOS em ordem alfabética.
+    Servido do cache em memória, com ETag/If-None-Match (304).
+    """
+    entrada = await catalogo_cache.obter_async(lambda: session.run_sync(produtos._listar_produtos_ativos))
+    return produtos._responder_catalogo(request, entrada)
+
+
+@router.post("/compras/", response_model=CompraCreateResponse)
+async def create_compra_com_saldo(
+    *,
+    background_tasks: BackgroundTasks,
+    session: AsyncSession = Depends(get_async_session),
+    compra_in: CompraCreateRequest,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
+):
+    """
+    [BOT] Endpoint principal de compra.
+
+    Com o header `Idempotency-Key`, retentativas da mesma compra devolvem a
+    resposta original sem debitar o saldo nem alocar outro slot.
+    """
+    return await _executar(
+        session,
+        compras.create_compra_com_saldo,
+        background_tasks=background_tasks,
+        compra_in=compra_in,
+        idempotency_key=idempotency_key,
+    )
+
+
+@router.get("/usuarios/perfil", response_model=UsuarioPerfilRead)
+async def get_usuario_perfil(*, session: AsyncSession = Depends(get_async_session), telegram_id: int):
+    return await _executar(session, usuarios.get_usuario_perfil, telegram_id=telegram_id)
+
+
+@router.get("/recargas/{recarga_id}", response_model=RecargaStatusResponse)
+async def get_status_recarga(*, session: AsyncSession = Depends(get_async_session), recarga_id: uuid.UUID):
+    """
+    [BOT] Consulta o status de uma recarga e expira se passou do prazo.
+    """
+    return await _executar(session, recargas.get_status_recarga, recarga_id=recarga_id)
+
+
+@router.post("/giftcards/resgatar", response_model=GiftCardResgatarResponse)
+async def resgatar_gift_card(*, session: AsyncSession = Depends(get_async_session), resgate_in: GiftCardResgatarRequest):
+    """
+    [BOT] Resgata um código de Gift Card e adiciona o saldo à carteira.
+    """
+    return await _executar(session, giftcards.resgatar_gift_card, resgate_in=resgate_in)
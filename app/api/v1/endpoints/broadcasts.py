@@ -0,0 +1,176 @@
+import uuid
+import datetime
+from typing import List, Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from sqlmodel import Session, select
+
+from app.db.database import get_session
+from app.models.base import StatusBroadcast
+from app.models.broadcast_models import Broadcast
+from app.models.usuario_models import Usuario
+from app.schemas.broadcast_schemas import (
+    BroadcastAudienciaResponse,
+    BroadcastCreate,
+    BroadcastFiltro,
+    BroadcastRead,
+)
+from app.api.v1.deps import get_current_admin_user # O "Cadeado" do Admin
+from app.services.broadcast_service import (
+    contar_publico,
+    enqueue_broadcast,
+    heartbeat_expirado,
+    montar_broadcast_read,
+)
+
+# Roteador para Broadcasts (só admin)
+router = APIRouter(dependencies=[Depends(get_current_admin_user)])
+
+
+def _get_broadcast_or_404(session: Session, broadcast_id: uuid.UUID) -> Broadcast:
+    broadcast = session.get(Broadcast, broadcast_id, with_for_update=True)
+    if not broadcast:
+        raise HTTPException(status_code=404, detail="Broadcast não encontrado.")
+    return broadcast
+
+
+@router.post("/audiencia", response_model=BroadcastAudienciaResponse)
+def preview_audiencia(
+    *,
+    session: Session = Depends(get_session),
+    filtro: BroadcastFiltro,
+):
+    """
+    [ADMIN] Quantos usuários receberiam um broadcast com este filtro.
+    """
+    return BroadcastAudienciaResponse(total_destinatarios=contar_publico(session, filtro))
+
+
+@router.post("/", response_model=BroadcastRead, status_code=status.HTTP_201_CREATED)
+def create_broadcast(
+    *,
+    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    broadcast_in: BroadcastCreate,
+    current_admin: Usuario = Depends(get_current_admin_user),
+):
+    """
+    [ADMIN] Cria um broadcast e agenda o envio em segundo plano.
+    O público é calculado quando o envio começa.
+    """
+    broadcast = Broadcast(
+        mensagem=broadcast_in.mensagem,
+        parse_mode=broadcast_in.parse_mode,
+        reply_markup=broadcast_in.reply_markup,
+        filtro=broadcast_in.filtro.model_dump(mode="json", exclude_none=True),
+        total_destinatarios=contar_publico(session, broadcast_in.filtro),
+        criado_por_admin_id=current_admin.id if current_admin else None,
+    )
+    session.add(broadcast)
+    session.commit()
+    session.refresh(broadcast)
+
+    enqueue_broadcast(broadcast.id, background_tasks=background_tasks)
+    return montar_broadcast_read(broadcast)
+
+
+@router.get("/", response_model=List[BroadcastRead])
+def list_broadcasts(
+    *,
+    session: Session = Depends(get_session),
+    status_broadcast: Optional[StatusBroadcast] = None,
+    limit: int = 50,
+):
+    """
+    [ADMIN] Lista os broadcasts mais recentes com o progresso de cada um.
+    """
+    stmt = select(Broadcast).order_by(Broadcast.criado_em.desc()).limit(min(max(limit, 1), 200))
+    if status_broadcast is not None:
+        stmt = stmt.where(Broadcast.status == status_broadcast)
+    return [montar_broadcast_read(broadcast) for broadcast in session.exec(stmt).all()]
+
+
+@router.get("/{broadcast_id}", response_model=BroadcastRead)
+def get_broadcast(
+    *,
+    session: Session = Depends(get_session),
+    broadcast_id: uuid.UUID,
+):
+    """
+    [ADMIN] Progresso de um broadcast: contadores, percentual e vazão.
+    """
+    broadcast = session.get(Broadcast, broadcast_id)
+    if not broadcast:
+        raise HTTPException(status_code=404, detail="Broadcast não encontrado.")
+    return montar_broadcast_read(broadcast)
+
+
+@router.post("/{broadcast_id}/pausar", response_model=BroadcastRead)
+def pausar_broadcast(
+    *,
+    session: Session = Depends(get_session),
+    broadcast_id: uuid.UUID,
+):
+    """
+    [ADMIN] Pausa o envio. O executor para ao terminar a página atual.
+    """
+    broadcast = _get_broadcast_or_404(session, broadcast_id)
+    if broadcast.status not in (StatusBroadcast.PENDENTE, StatusBroadcast.EM_ANDAMENTO):
+        raise HTTPException(status_code=400, detail=f"Broadcast {broadcast.status.value} não pode ser pausado.")
+
+    broadcast.status = StatusBroadcast.PAUSADO
+    session.add(broadcast)
+    session.commit()
+    session.refresh(broadcast)
+    return montar_broadcast_read(broadcast)
+
+
+@router.post("/{broadcast_id}/retomar", response_model=BroadcastRead)
+def retomar_broadcast(
+    *,
+    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    broadcast_id: uuid.UUID,
+):
+    """
+    [ADMIN] Retoma um broadcast pausado (ou cujo executor parou de dar
+    sinal de vida) a partir dos destinatários ainda pendentes.
+    """
+    broadcast = _get_broadcast_or_404(session, broadcast_id)
+    travado = broadcast.status == StatusBroadcast.EM_ANDAMENTO and heartbeat_expirado(broadcast)
+    if broadcast.status != StatusBroadcast.PAUSADO and not travado:
+        raise HTTPException(status_code=400, detail=f"Broadcast {broadcast.status.value} não pode ser retomado.")
+
+    # Sem dono até a próxima reivindicação: um executor antigo que ainda
+    # esteja vivo para no próximo batimento em vez de disputar o envio.
+    broadcast.status = StatusBroadcast.PENDENTE
+    broadcast.execucao_id = None
+    broadcast.atualizado_em = datetime.datetime.utcnow()
+    session.add(broadcast)
+    session.commit()
+    session.refresh(broadcast)
+
+    enqueue_broadcast(broadcast.id, background_tasks=background_tasks)
+    return montar_broadcast_read(broadcast)
+
+
+@router.post("/{broadcast_id}/cancelar", response_model=BroadcastRead)
+def cancelar_broadcast(
+    *,
+    session: Session = Depends(get_session),
+    broadcast_id: uuid.UUID,
+):
+    """
+    [ADMIN] Cancela o broadcast. Quem ainda não recebeu fica como pendente.
+    """
+    broadcast = _get_broadcast_or_404(session, broadcast_id)
+    if broadcast.status in (StatusBroadcast.CANCELADO, StatusBroadcast.CONCLUIDO):
+        raise HTTPException(status_code=400, detail=f"Broadcast {broadcast.status.value} não pode ser cancelado.")
+
+    agora = datetime.datetime.utcnow()
+    broadcast.status = StatusBroadcast.CANCELADO
+    broadcast.concluido_em = agora
+    broadcast.atualizado_em = agora
+    session.add(broadcast)
+    session.commit()
+    session.refresh(broadcast)
+    return montar_broadcast_read(broadcast)
@@ -1,6 +1,7 @@
 import uuid
 import datetime
-from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from typing import Optional
+from fastapi import APIRouter, BackgroundTasks, Depends, Header, HTTPException, status
 from sqlmodel import Session, select
 from sqlalchemy.exc import NoResultFound 
 
@@ -9,16 +10,30 @@ from app.models.usuario_models import Usuario
 from app.models.produto_models import Produto, EstoqueConta
 from app.models.conta_mae_models import ContaMae, ContaMaeConvite
 from app.models.pedido_models import Pedido
-from app.models.base import TipoEntregaProduto, StatusEntregaPedido
-from app.schemas.compra_schemas import CompraCreateRequest, CompraCreateResponse
+from app.models.base import TipoEntregaProduto, StatusEntregaPedido, TipoMovimentacaoCarteira
+from app.schemas.compra_schemas import (
+    CompraCreateRequest,
+    CompraCreateResponse,
+    CompraLoteCreateRequest,
+    CompraLoteCreateResponse,
+    CompraLoteItem,
+)
 from app.api.v1.deps import get_current_admin_user 
 from app.services import security 
+from app.services.carteira_service import SaldoInsuficienteError, debitar
 from app.services.disponibilidade_service import (
     inativar_conta_estoque_se_lotada,
     inativar_conta_mae_se_lotada,
     inativar_produto_sem_contas_disponiveis,
+    registrar_variacao_disponibilidade,
+    slots_livres_conta,
 )
 from app.services.conta_mae_invite_service import create_invite_job_for_convite, enqueue_invite_job
+from app.services.compra_idempotencia_service import (
+    reservar_chave_idempotencia,
+    salvar_resposta_idempotencia,
+)
+from app.services.usuario_contadores_service import registrar_pedidos
 
 router = APIRouter()
 
@@ -27,14 +42,25 @@ def create_compra_com_saldo(
     *,
     background_tasks: BackgroundTasks,
     session: Session = Depends(get_session),
-    compra_in: CompraCreateRequest
+    compra_in: CompraCreateRequest,
+    idempotency_key: Optional[str] = Header(default=None, alias="Idempotency-Key"),
 ):
     """
     [BOT] Endpoint principal de compra.
     AGORA COM LÓGICA SEPARADA PARA ENTREGA MANUAL (VIA ADMIN).
+
+    Com o header `Idempotency-Key`, retentativas da mesma compra devolvem a
+    resposta original sem debitar o saldo nem alocar outro slot.
     """
     
     try:
+        # --- 0. Idempotência (retentativas do bot) ---
+        if idempotency_key is not None:
+            resposta_armazenada = reservar_chave_idempotencia(session, idempotency_key, compra_in)
+            if resposta_armazenada:
+                session.rollback()
+                return resposta_armazenada
+
         # --- 1. Obter o Comprador e o Produto ---
         usuario = session.exec(
             select(Usuario).where(Usuario.telegram_id == compra_in.telegram_id)
@@ -46,18 +72,24 @@ def create_compra_com_saldo(
         if not produto or not produto.is_ativo:
             raise HTTPException(status_code=404, detail="Produto não encontrado ou inativo.")
             
-        # --- 2. Validar Saldo ---
-        if usuario.saldo_carteira < produto.preco:
+        # --- 2/3. Débito atômico (só debita se o saldo cobrir o preço) ---
+        valor_pago = produto.preco
+        pedido_id = uuid.uuid4()
+        try:
+            novo_saldo = debitar(
+                session,
+                usuario.id,
+                valor_pago,
+                TipoMovimentacaoCarteira.COMPRA,
+                referencia_id=pedido_id,
+                descricao=f"Compra: {produto.nome}"[:240],
+            )
+        except SaldoInsuficienteError as exc:
             raise HTTPException(
                 status_code=status.HTTP_402_PAYMENT_REQUIRED, 
-                detail=f"Saldo insuficiente. Saldo atual: {usuario.saldo_carteira}, Preço: {produto.preco}"
+                detail=f"Saldo insuficiente. Saldo atual: {exc.saldo_atual}, Preço: {produto.preco}"
             )
 
-        # --- 3. EXECUTAR TRANSAÇÃO (Débito) ---
-        valor_pago = produto.preco
-        usuario.saldo_carteira = usuario.saldo_carteira - valor_pago
-        session.add(usuario)
-
         # Variáveis que vamos preencher
         conta_para_alocar_id = None
         conta_mae_para_alocar_id = None
@@ -93,9 +125,11 @@ def create_compra_com_saldo(
                     raise HTTPException(status_code=404, detail="Estoque esgotado para este produto.")
                 
                 # Aloca o slot e o ID
+                slots_livres_antes = slots_livres_conta(conta_alocada)
                 conta_alocada.slots_ocupados += 1
                 inativar_conta_estoque_se_lotada(conta_alocada)
                 session.add(conta_alocada)
+                registrar_variacao_disponibilidade(session, conta_alocada, slots_livres_antes)
                 inativar_produto_sem_contas_disponiveis(session, produto)
                 conta_para_alocar_id = conta_alocada.id # Salva o ID
                 
@@ -161,9 +195,11 @@ def create_compra_com_saldo(
                     )
 
                 conta_mae_para_alocar_id = conta_mae.id
+                slots_livres_antes = slots_livres_conta(conta_mae)
                 conta_mae.slots_ocupados += 1
                 inativar_conta_mae_se_lotada(conta_mae)
                 session.add(conta_mae)
+                registrar_variacao_disponibilidade(session, conta_mae, slots_livres_antes)
                 inativar_produto_sem_contas_disponiveis(session, produto)
                 login_entrega = None
                 senha_entrega = None
@@ -198,6 +234,7 @@ def create_compra_com_saldo(
         
         # --- 5. Criar o "Recibo" (Pedido) ---
         novo_pedido = Pedido(
+            id=pedido_id,
             usuario_id=usuario.id,
             produto_id=produto.id,
             estoque_conta_id=conta_para_alocar_id,
@@ -208,6 +245,7 @@ def create_compra_com_saldo(
         )
         session.add(novo_pedido)
         session.flush()
+        registrar_pedidos(session, usuario.id, 1, novo_pedido.criado_em)
 
         invite_job_id = None
         if (
@@ -226,21 +264,11 @@ def create_compra_com_saldo(
             invite_job_id = invite_job.id
         
         # --- 6. Commit e Retorno ---
-        session.commit()
-        
-        session.refresh(novo_pedido)
-        session.refresh(usuario)
-        if invite_job_id:
-            try:
-                enqueue_invite_job(invite_job_id, background_tasks=background_tasks)
-            except Exception as exc:
-                print(f"AVISO: falha ao enfileirar job de convite {invite_job_id}: {exc}")
-        
-        return CompraCreateResponse(
+        resposta = CompraCreateResponse(
             pedido_id=novo_pedido.id,
             data_compra=novo_pedido.criado_em,
             valor_pago=novo_pedido.valor_pago,
-            novo_saldo=usuario.saldo_carteira,
+            novo_saldo=novo_saldo,
             produto_nome=produto.nome,
             login=login_entrega, # Será None se for manual
             senha=senha_entrega, # Será None se for manual
@@ -249,6 +277,18 @@ def create_compra_com_saldo(
             
             mensagem_entrega=mensagem_entrega
         )
+        if idempotency_key is not None:
+            salvar_resposta_idempotencia(session, idempotency_key, resposta)
+
+        session.commit()
+
+        if invite_job_id:
+            try:
+                enqueue_invite_job(invite_job_id, background_tasks=background_tasks)
+            except Exception as exc:
+                print(f"AVISO: falha ao enfileirar job de convite {invite_job_id}: {exc}")
+
+        return resposta
 
     except HTTPException as http_exc:
         session.rollback()
@@ -257,3 +297,245 @@ def create_compra_com_saldo(
         session.rollback()
         print(f"ERRO INESPERADO NA COMPRA: {e}")
         raise HTTPException(status_code=500, detail=f"Erro interno: {e}")
+
+
+def _distribuir_slots(contas: list, quantidade: int) -> list:
+    """
+    Distribui as unidades pelas contas travadas, na ordem da busca,
+    preenchendo cada conta antes de passar à próxima (mesmo efeito de N
+    compras unitárias seguidas). Retorna uma conta por unidade.
+    """
+    alocacoes = []
+    for conta in contas:
+        livres = conta.max_slots - conta.slots_ocupados
+        while livres > 0 and len(alocacoes) < quantidade:
+            alocacoes.append(conta)
+            livres -= 1
+        if len(alocacoes) >= quantidade:
+            break
+    return alocacoes
+
+
+def _ocupar_slots(session: Session, alocacoes: list, inativar_se_lotada) -> None:
+    contas_por_id = {}
+    unidades_por_conta: dict[uuid.UUID, int] = {}
+    for conta in alocacoes:
+        contas_por_id[conta.id] = conta
+        unidades_por_conta[conta.id] = unidades_por_conta.get(conta.id, 0) + 1
+
+    for conta_id, unidades in unidades_por_conta.items():
+        conta = contas_por_id[conta_id]
+        slots_livres_antes = slots_livres_conta(conta)
+        conta.slots_ocupados += unidades
+        inativar_se_lotada(conta)
+        session.add(conta)
+        registrar_variacao_disponibilidade(session, conta, slots_livres_antes)
+
+
+@router.post("/lote", response_model=CompraLoteCreateResponse)
+def create_compra_lote_com_saldo(
+    *,
+    background_tasks: BackgroundTasks,
+    session: Session = Depends(get_session),
+    compra_in: CompraLoteCreateRequest
+):
+    """
+    [BOT] Compra de N unidades do mesmo produto numa única transação.
+    Os slots são reservados numa única busca travada; se não houver N slots
+    disponíveis, nada é debitado nem alocado.
+    """
+    quantidade = compra_in.quantidade
+
+    try:
+        # --- 1. Comprador e Produto ---
+        usuario = session.exec(
+            select(Usuario).where(Usuario.telegram_id == compra_in.telegram_id)
+        ).first()
+        if not usuario:
+            raise HTTPException(status_code=404, detail="Usuário não encontrado.")
+
+        produto = session.get(Produto, compra_in.produto_id)
+        if not produto or not produto.is_ativo:
+            raise HTTPException(status_code=404, detail="Produto não encontrado ou inativo.")
+
+        emails_cliente: list[Optional[str]] = [None] * quantidade
+        if produto.tipo_entrega == TipoEntregaProduto.SOLICITA_EMAIL:
+            emails_informados = [email.strip() for email in (compra_in.emails_cliente or []) if email and email.strip()]
+            if len(emails_informados) != quantidade:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Este produto requer um email de cliente para cada unidade comprada."
+                )
+            emails_cliente = emails_informados
+
+        # --- 2. Débito único e atômico do total ---
+        valor_unitario = produto.preco
+        valor_total = valor_unitario * quantidade
+        try:
+            novo_saldo = debitar(
+                session,
+                usuario.id,
+                valor_total,
+                TipoMovimentacaoCarteira.COMPRA,
+                descricao=f"Compra em lote: {quantidade}x {produto.nome}"[:240],
+            )
+        except SaldoInsuficienteError as exc:
+            raise HTTPException(
+                status_code=status.HTTP_402_PAYMENT_REQUIRED,
+                detail=f"Saldo insuficiente. Saldo atual: {exc.saldo_atual}, Total: {valor_total}"
+            )
+
+        # --- 3. Reservar os N slots ---
+        # Cada conta retornada tem ao menos 1 slot livre, então N contas bastam.
+        alocacoes: list = []
+        status_entrega_pedido = StatusEntregaPedido.ENTREGUE
+        match produto.tipo_entrega:
+            case TipoEntregaProduto.AUTOMATICA:
+                contas = session.exec(
+                    select(EstoqueConta)
+                    .where(EstoqueConta.produto_id == produto.id)
+                    .where(EstoqueConta.is_ativo == True)
+                    .where(EstoqueConta.requer_atencao == False)
+                    .where(EstoqueConta.slots_ocupados < EstoqueConta.max_slots)
+                    .order_by(
+                        EstoqueConta.data_expiracao.asc().nulls_last(),
+                        EstoqueConta.slots_ocupados,
+                    )
+                    .limit(quantidade)
+                    .with_for_update(skip_locked=True)
+                ).all()
+                alocacoes = _distribuir_slots(contas, quantidade)
+                if len(alocacoes) < quantidade:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"Estoque insuficiente para este produto. Disponível agora: {len(alocacoes)}."
+                    )
+                _ocupar_slots(session, alocacoes, inativar_conta_estoque_se_lotada)
+
+            case TipoEntregaProduto.SOLICITA_EMAIL:
+                today = datetime.date.today()
+                contas = session.exec(
+                    select(ContaMae)
+                    .where(ContaMae.produto_id == produto.id)
+                    .where(ContaMae.is_ativo == True)
+                    .where(ContaMae.slots_ocupados < ContaMae.max_slots)
+                    .where(
+                        (ContaMae.data_expiracao == None) | (ContaMae.data_expiracao >= today)
+                    )
+                    .order_by(
+                        ContaMae.data_expiracao.desc().nulls_last(),
+                        ContaMae.criado_em.asc(),
+                    )
+                    .limit(quantidade)
+                    .with_for_update(skip_locked=True)
+                ).all()
+                alocacoes = _distribuir_slots(contas, quantidade)
+                if len(alocacoes) < quantidade:
+                    raise HTTPException(
+                        status_code=404,
+                        detail=f"Slots insuficientes nas contas mãe deste produto. Disponível agora: {len(alocacoes)}."
+                    )
+                _ocupar_slots(session, alocacoes, inativar_conta_mae_se_lotada)
+
+            case TipoEntregaProduto.MANUAL_ADMIN:
+                alocacoes = [None] * quantidade
+                status_entrega_pedido = StatusEntregaPedido.PENDENTE
+
+        inativar_produto_sem_contas_disponiveis(session, produto)
+
+        # --- 4. Pedidos e convites (um INSERT em lote por tabela no flush), depois os jobs ---
+        agora = datetime.datetime.utcnow()
+        usa_automacao_convite = produto.uses_openai_invite_automation()
+        pedidos: list[Pedido] = []
+        itens: list[CompraLoteItem] = []
+        convites: list[ContaMaeConvite] = []
+        senhas_por_conta: dict[uuid.UUID, Optional[str]] = {}
+
+        for conta, email_cliente in zip(alocacoes, emails_cliente):
+            pedido = Pedido(
+                id=uuid.uuid4(),
+                usuario_id=usuario.id,
+                produto_id=produto.id,
+                estoque_conta_id=conta.id if isinstance(conta, EstoqueConta) else None,
+                conta_mae_id=conta.id if isinstance(conta, ContaMae) else None,
+                valor_pago=valor_unitario,
+                email_cliente=email_cliente,
+                status_entrega=status_entrega_pedido,
+                criado_em=agora,
+            )
+            pedidos.append(pedido)
+
+            item = CompraLoteItem(pedido_id=pedido.id, email_cliente=email_cliente)
+            if isinstance(conta, EstoqueConta):
+                if conta.id not in senhas_por_conta:
+                    senhas_por_conta[conta.id] = security.decrypt_data(conta.senha)
+                if not senhas_por_conta[conta.id]:
+                    raise HTTPException(status_code=500, detail="Erro interno ao obter credenciais.")
+                item.login = conta.login
+                item.senha = senhas_por_conta[conta.id]
+                item.instrucoes_conta = conta.instrucoes_especificas
+            elif isinstance(conta, ContaMae) and usa_automacao_convite:
+                convite = ContaMaeConvite(
+                    id=uuid.uuid4(),
+                    conta_mae_id=conta.id,
+                    pedido_id=pedido.id,
+                    email_cliente=email_cliente,
+                    criado_em=agora,
+                )
+                convites.append(convite)
+            itens.append(item)
+
+        session.add_all(pedidos)
+        session.add_all(convites)
+        session.flush()
+        # Os jobs saem do mesmo construtor da compra unitária.
+        invite_jobs = [create_invite_job_for_convite(session, convite) for convite in convites]
+        registrar_pedidos(session, usuario.id, len(pedidos), agora)
+
+        match produto.tipo_entrega:
+            case TipoEntregaProduto.AUTOMATICA:
+                mensagem_entrega = produto.instrucoes_pos_compra or "Aqui estão suas credenciais:"
+            case TipoEntregaProduto.SOLICITA_EMAIL:
+                instrucao_customizada = produto.instrucoes_pos_compra or "A entrega é manual e pode levar alguns minutos."
+                if usa_automacao_convite:
+                    mensagem_entrega = f"Os convites serão enviados para os emails informados.\n\n**Instruções:**\n{instrucao_customizada}"
+                else:
+                    mensagem_entrega = f"Os emails informados foram registrados para a entrega.\n\n**Instruções:**\n{instrucao_customizada}"
+            case _:
+                mensagem_entrega = (
+                    "✅ Pedidos recebidos!\n\n"
+                    "O administrador já foi notificado e está "
+                    "preparando suas contas. Você receberá as credenciais "
+                    "aqui no bot assim que estiverem prontas."
+                )
+
+        resposta = CompraLoteCreateResponse(
+            data_compra=agora,
+            quantidade=quantidade,
+            valor_unitario=valor_unitario,
+            valor_total=valor_total,
+            novo_saldo=novo_saldo,
+            produto_nome=produto.nome,
+            tipo_entrega=produto.tipo_entrega,
+            mensagem_entrega=mensagem_entrega,
+            itens=itens,
+        )
+
+        # --- 5. Commit e enfileiramento ---
+        session.commit()
+
+        for invite_job in invite_jobs:
+            try:
+                enqueue_invite_job(invite_job.id, background_tasks=background_tasks)
+            except Exception as exc:
+                print(f"AVISO: falha ao enfileirar job de convite {invite_job.id}: {exc}")
+
+        return resposta
+
+    except HTTPException as http_exc:
+        session.rollback()
+        raise http_exc
+    except Exception as e:
+        session.rollback()
+        print(f"ERRO INESPERADO NA COMPRA EM LOTE: {e}")
+        raise HTTPException(status_code=500, detail=f"Erro interno: {e}")
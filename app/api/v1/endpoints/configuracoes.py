@@ -8,8 +8,14 @@ from app.models.usuario_models import Usuario
 from app.schemas.configuracao_schemas import (
     ConfiguracaoBotManutencaoUpdateRequest,
     ConfiguracaoBotStatusRead,
+    ConfiguracaoCacheStats,
 )
 from app.services.affiliate_service import _get_configuracao
+from app.services.configuracao_cache_service import (
+    configuracao_cache,
+    marcar_configuracao_alterada,
+    obter_configuracao,
+)
 
 router = APIRouter(dependencies=[Depends(get_current_admin_user)])
 bot_router = APIRouter(dependencies=[Depends(get_bot_api_key)])
@@ -28,8 +34,9 @@ def update_config(*, session: Session = Depends(get_session), config_in: Configu
     if not db_config:
         raise HTTPException(status_code=404, detail="Configuração não encontrada")
 
-    update_data = config_in.model_dump(exclude_unset=True)
+    update_data = config_in.model_dump(exclude_unset=True, exclude={"id", "versao"})
     db_config.sqlmodel_update(update_data)
+    marcar_configuracao_alterada(session, db_config)
 
     session.add(db_config)
     session.commit()
@@ -37,9 +44,17 @@ def update_config(*, session: Session = Depends(get_session), config_in: Configu
     return db_config
 
 
+@router.get("/cache/estatisticas", response_model=ConfiguracaoCacheStats)
+def get_estatisticas_cache_configuracao():
+    """[ADMIN] Contadores de hit/miss do cache da configuração."""
+    return configuracao_cache.estatisticas()
+
+
 @bot_router.get("/status-bot", response_model=ConfiguracaoBotStatusRead)
-def get_bot_status(*, session: Session = Depends(get_session)):
-    config = _get_configuracao(session)
+def get_bot_status():
+    # Consultado pelo bot a todo momento: vem do cache (atraso máximo de
+    # CONFIGURACAO_CACHE_REVALIDAR_SECONDS entre processos).
+    config = obter_configuracao()
     return ConfiguracaoBotStatusRead(modo_manutencao=config.modo_manutencao)
 
 
@@ -55,6 +70,7 @@ def update_bot_maintenance_mode(
 
     config = _get_configuracao(session)
     config.modo_manutencao = payload.ativo
+    marcar_configuracao_alterada(session, config)
     session.add(config)
     session.commit()
     session.refresh(config)
@@ -39,7 +39,9 @@ from app.services.conta_mae_invite_service import (
 )
 from app.services.disponibilidade_service import (
     inativar_conta_mae_se_lotada,
+    registrar_variacao_disponibilidade,
     sincronizar_status_produto_por_disponibilidade,
+    slots_livres_conta,
 )
 
 
@@ -327,6 +329,7 @@ def create_conta_mae(
         session_storage_path=conta_in.session_storage_path,
     )
     session.add(conta)
+    registrar_variacao_disponibilidade(session, conta, 0)
     sincronizar_status_produto_por_disponibilidade(session, produto)
     session.commit()
     session.refresh(conta)
@@ -475,9 +478,11 @@ def update_conta_mae(
     if "senha" in update_data:
         update_data["senha"] = security.encrypt_data(update_data["senha"])
 
+    slots_livres_antes = slots_livres_conta(conta)
     conta.sqlmodel_update(update_data)
     inativar_conta_mae_se_lotada(conta)
     session.add(conta)
+    registrar_variacao_disponibilidade(session, conta, slots_livres_antes)
     produto = session.get(Produto, conta.produto_id)
     if produto:
         sincronizar_status_produto_por_disponibilidade(session, produto)
@@ -514,7 +519,9 @@ def delete_conta_mae(
         raise HTTPException(status_code=404, detail="Conta mãe não encontrada")
 
     try:
+        slots_livres_antes = slots_livres_conta(conta)
         session.delete(conta)
+        registrar_variacao_disponibilidade(session, conta, slots_livres_antes, removida=True)
         session.commit()
     except Exception as exc:
         session.rollback()
@@ -553,9 +560,11 @@ def add_convite_conta_mae(
 
     produto = _get_conta_mae_produto_or_404(session, conta)
     convite = ContaMaeConvite(conta_mae_id=conta_mae_id, email_cliente=email_cliente)
+    slots_livres_antes = slots_livres_conta(conta)
     conta.slots_ocupados += 1
     inativar_conta_mae_se_lotada(conta)
     session.add(conta)
+    registrar_variacao_disponibilidade(session, conta, slots_livres_antes)
     sincronizar_status_produto_por_disponibilidade(session, produto)
     session.add(convite)
     session.flush()
@@ -592,6 +601,7 @@ def delete_convite_conta_mae(
         raise HTTPException(status_code=404, detail="Convite não encontrado para esta conta mãe")
 
     conta_estava_lotada = conta.slots_ocupados >= conta.max_slots
+    slots_livres_antes = slots_livres_conta(conta)
     conta.slots_ocupados = max(conta.slots_ocupados - 1, 0)
 
     if conta_estava_lotada and (conta.data_expiracao is None or conta.data_expiracao >= datetime.date.today()):
@@ -601,6 +611,7 @@ def delete_convite_conta_mae(
         session.delete(convite.invite_job)
     session.delete(convite)
     session.add(conta)
+    registrar_variacao_disponibilidade(session, conta, slots_livres_antes)
     produto = session.get(Produto, conta.produto_id)
     if produto:
         sincronizar_status_produto_por_disponibilidade(session, produto)
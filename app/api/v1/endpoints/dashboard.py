@@ -6,15 +6,18 @@ from sqlmodel import Session, select
 from sqlalchemy import func # Importamos 'func' para usar 'func.count' e 'func.sum'
 from typing import List
 
-from app.db.database import get_session
+from app.db.database import get_read_session, get_session, get_worker_session
 from app.core.runtime import API_STARTED_AT
+from app.core.http_client import metricas_upstreams
 from app.models.usuario_models import Usuario
 from app.models.pedido_models import Pedido
 from app.models.produto_models import Produto, EstoqueConta
 from app.models.conta_mae_models import ContaMae
 from app.models.suporte_models import TicketSuporte
+from app.models.dashboard_models import UsuarioAgregadoHora, VendaAgregadaDia, VendaAgregadaHora
 from app.models.base import StatusEntregaPedido, TipoStatusTicket
 from app.schemas.dashboard_schemas import (
+    DashboardAgregadosReconstrucaoResponse,
     DashboardAnalitico,
     DashboardDistributionPoint,
     DashboardExpiringPedido,
@@ -28,11 +31,12 @@ from app.schemas.dashboard_schemas import (
     DashboardRevenueSeriesPoint,
     DashboardSystemStatus,
     DashboardTopProduto,
+    DashboardUpstreamHttp,
     DashboardEstoqueBaixo,
     DashboardRecentPedido
 )
 from app.api.v1.deps import get_current_admin_user # O "Cadeado" do Admin
-from app.services.pedido_expiracao_service import resolver_data_expiracao_pedido
+from app.services.dashboard_agregado_service import reconstruir_agregados_dashboard, truncar_hora
 
 # Roteador para o Dashboard (só admin)
 router = APIRouter(dependencies=[Depends(get_current_admin_user)])
@@ -49,6 +53,21 @@ def _delta_percent(current: Decimal | int, previous: Decimal | int) -> float | N
     return round(float((Decimal(current) - Decimal(previous)) / Decimal(previous) * Decimal("100")), 1)
 
 
+def _somar_vendas_hora(
+    session: Session,
+    desde: datetime.datetime,
+    ate: datetime.datetime | None = None,
+) -> tuple[Decimal, int]:
+    stmt = select(
+        func.sum(VendaAgregadaHora.receita),
+        func.sum(VendaAgregadaHora.pedidos),
+    ).where(VendaAgregadaHora.hora >= desde)
+    if ate is not None:
+        stmt = stmt.where(VendaAgregadaHora.hora < ate)
+    receita, pedidos = session.exec(stmt).one()
+    return _decimal_or_zero(receita), int(pedidos or 0)
+
+
 def _format_uptime(seconds: int) -> str:
     days, remainder = divmod(seconds, 86400)
     hours, remainder = divmod(remainder, 3600)
@@ -93,7 +112,7 @@ def get_dashboard_system_status(
 @router.get("/overview", response_model=DashboardOverview)
 def get_dashboard_overview(
     *,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     period_days: int = 7,
 ):
     """
@@ -103,30 +122,15 @@ def get_dashboard_overview(
         period_days = 7
 
     now = datetime.datetime.utcnow()
-    current_24h_start = now - datetime.timedelta(hours=24)
-    previous_24h_start = now - datetime.timedelta(hours=48)
 
-    current_revenue = _decimal_or_zero(
-        session.exec(select(func.sum(Pedido.valor_pago)).where(Pedido.criado_em >= current_24h_start)).first()
-    )
-    previous_revenue = _decimal_or_zero(
-        session.exec(
-            select(func.sum(Pedido.valor_pago)).where(
-                Pedido.criado_em >= previous_24h_start,
-                Pedido.criado_em < current_24h_start,
-            )
-        ).first()
-    )
+    # Receita/vendas de 24h saem das últimas 24 horas fechadas em
+    # `venda_agregada_hora` (a hora corrente inclusa), nunca da tabela de pedidos.
+    hora_atual = truncar_hora(now)
+    current_24h_start = hora_atual - datetime.timedelta(hours=23)
+    previous_24h_start = current_24h_start - datetime.timedelta(hours=24)
 
-    current_orders = session.exec(
-        select(func.count(Pedido.id)).where(Pedido.criado_em >= current_24h_start)
-    ).first() or 0
-    previous_orders = session.exec(
-        select(func.count(Pedido.id)).where(
-            Pedido.criado_em >= previous_24h_start,
-            Pedido.criado_em < current_24h_start,
-        )
-    ).first() or 0
+    current_revenue, current_orders = _somar_vendas_hora(session, current_24h_start)
+    previous_revenue, previous_orders = _somar_vendas_hora(session, previous_24h_start, current_24h_start)
 
     active_stock_accounts = session.exec(
         select(func.count(EstoqueConta.id)).where(EstoqueConta.is_ativo == True)
@@ -139,32 +143,22 @@ def get_dashboard_overview(
     ).first() or 0
 
     today = datetime.date.today()
-    delivered_orders = session.exec(
-        select(Pedido).where(Pedido.status_entrega == StatusEntregaPedido.ENTREGUE)
-    ).all()
-    vencendo_hoje = 0
-    for pedido in delivered_orders:
-        data_expiracao, _ = resolver_data_expiracao_pedido(
-            session=session,
-            pedido_id=pedido.id,
-            email_cliente=pedido.email_cliente,
-            estoque_conta_id=pedido.estoque_conta_id,
-            conta_mae_id=pedido.conta_mae_id,
-        )
-        if data_expiracao and data_expiracao == today:
-            vencendo_hoje += 1
+    vencendo_hoje = session.exec(
+        select(func.count(Pedido.id))
+        .where(Pedido.data_expiracao_efetiva == today)
+        .where(Pedido.status_entrega == StatusEntregaPedido.ENTREGUE)
+    ).first() or 0
 
     period_start_date = today - datetime.timedelta(days=period_days - 1)
-    period_start_datetime = datetime.datetime.combine(period_start_date, datetime.time.min)
     revenue_rows = session.exec(
         select(
-            func.date(Pedido.criado_em).label("dia"),
-            func.sum(Pedido.valor_pago).label("revenue"),
-            func.count(Pedido.id).label("orders"),
+            VendaAgregadaDia.dia.label("dia"),
+            func.sum(VendaAgregadaDia.receita).label("revenue"),
+            func.sum(VendaAgregadaDia.pedidos).label("orders"),
         )
-        .where(Pedido.criado_em >= period_start_datetime)
-        .group_by(func.date(Pedido.criado_em))
-        .order_by(func.date(Pedido.criado_em))
+        .where(VendaAgregadaDia.dia >= period_start_date)
+        .group_by(VendaAgregadaDia.dia)
+        .order_by(VendaAgregadaDia.dia)
     ).all()
     revenue_by_day = {
         row.dia: {
@@ -186,17 +180,17 @@ def get_dashboard_overview(
             )
         )
 
-    hourly_start = now.replace(minute=0, second=0, microsecond=0) - datetime.timedelta(hours=23)
+    hourly_start = current_24h_start
     hourly_rows = session.exec(
         select(
-            func.date_trunc("hour", Pedido.criado_em).label("hour_start"),
-            func.count(Pedido.id).label("orders"),
+            VendaAgregadaHora.hora.label("hour_start"),
+            func.sum(VendaAgregadaHora.pedidos).label("orders"),
         )
-        .where(Pedido.criado_em >= hourly_start)
-        .group_by(func.date_trunc("hour", Pedido.criado_em))
-        .order_by(func.date_trunc("hour", Pedido.criado_em))
+        .where(VendaAgregadaHora.hora >= hourly_start)
+        .group_by(VendaAgregadaHora.hora)
+        .order_by(VendaAgregadaHora.hora)
     ).all()
-    orders_by_hour = {row.hour_start.replace(tzinfo=None): int(row.orders or 0) for row in hourly_rows}
+    orders_by_hour = {row.hour_start: int(row.orders or 0) for row in hourly_rows}
     hourly_activity: list[DashboardHourlyActivityPoint] = []
     for offset in range(24):
         hour_start = hourly_start + datetime.timedelta(hours=offset)
@@ -254,38 +248,51 @@ def get_dashboard_overview(
         system_status=_get_system_status(session),
     )
 
+@router.get("/integracoes", response_model=List[DashboardUpstreamHttp])
+def get_integracoes_http():
+    """
+    [ADMIN] Latência, erros e estado do disjuntor de cada integração HTTP
+    (Telegram, Mercado Pago, etc.) vistos por este processo.
+    """
+    return metricas_upstreams()
+
+@router.post("/agregados/reconstruir", response_model=DashboardAgregadosReconstrucaoResponse)
+def reconstruir_agregados(
+    *,
+    session: Session = Depends(get_worker_session),
+    dias: int | None = None,
+):
+    """
+    [ADMIN] Backfill e compactação dos agregados de vendas/usuários.
+    Sem `dias`, reconstrói todo o histórico.
+    """
+    resultado = reconstruir_agregados_dashboard(session, dias=dias)
+    print(
+        f"Agregados do dashboard reconstruídos: {resultado['dias_reconstruidos']} dia(s), "
+        f"{resultado['linhas_compactadas']} linha(s) compactada(s)."
+    )
+    return resultado
+
 @router.get("/kpis", response_model=DashboardKPIs)
 def get_dashboard_kpis(
     *,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """
     [ADMIN] Retorna os principais Indicadores de Performance (KPIs).
     """
     
-    # 1. Define o período de tempo (últimas 24 horas)
-    time_24h_ago = datetime.datetime.utcnow() - datetime.timedelta(days=1)
+    # 1. Define o período de tempo (últimas 24 horas, da hora corrente para trás)
+    time_24h_ago = truncar_hora(datetime.datetime.utcnow()) - datetime.timedelta(hours=23)
     
-    # 2. Query: Faturamento 24h
-    q_faturamento = select(func.sum(Pedido.valor_pago)).where(
-        Pedido.criado_em >= time_24h_ago
-    )
-    # --- CORREÇÃO APLICADA AQUI ---
-    faturamento_24h = session.exec(q_faturamento).first() or Decimal("0.0")
-
-    # 3. Query: Vendas 24h
-    q_vendas = select(func.count(Pedido.id)).where(
-        Pedido.criado_em >= time_24h_ago
-    )
-    # --- CORREÇÃO APLICADA AQUI ---
-    vendas_24h = session.exec(q_vendas).first() or 0
+    # 2 e 3. Faturamento e vendas 24h (agregados por hora)
+    faturamento_24h, vendas_24h = _somar_vendas_hora(session, time_24h_ago)
     
-    # 4. Query: Novos Usuários 24h
-    q_novos_usuarios = select(func.count(Usuario.id)).where(
-        Usuario.criado_em >= time_24h_ago
+    # 4. Query: Novos Usuários 24h (agregados por hora)
+    q_novos_usuarios = select(func.sum(UsuarioAgregadoHora.novos_usuarios)).where(
+        UsuarioAgregadoHora.hora >= time_24h_ago
     )
-    # --- CORREÇÃO APLICADA AQUI ---
-    novos_usuarios_24h = session.exec(q_novos_usuarios).first() or 0
+    novos_usuarios_24h = int(session.exec(q_novos_usuarios).first() or 0)
 
     # 5. Query: Tickets Abertos
     q_tickets_abertos = select(func.count(TicketSuporte.id)).where(
@@ -304,7 +311,7 @@ def get_dashboard_kpis(
 @router.get("/top-produtos", response_model=List[DashboardTopProduto])
 def get_top_produtos(
     *,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """
     [ADMIN] Retorna os 5 produtos mais vendidos por faturamento.
@@ -312,12 +319,12 @@ def get_top_produtos(
     stmt = (
         select(
             Produto.nome.label("produto_nome"),
-            func.count(Pedido.id).label("total_vendas"),
-            func.sum(Pedido.valor_pago).label("faturamento_total")
+            func.sum(VendaAgregadaDia.pedidos).label("total_vendas"),
+            func.sum(VendaAgregadaDia.receita).label("faturamento_total")
         )
-        .join(Produto, Pedido.produto_id == Produto.id)
+        .join(Produto, VendaAgregadaDia.produto_id == Produto.id)
         .group_by(Produto.nome)
-        .order_by(func.sum(Pedido.valor_pago).desc())
+        .order_by(func.sum(VendaAgregadaDia.receita).desc())
         .limit(5)
     )
     
@@ -329,7 +336,7 @@ def get_top_produtos(
 @router.get("/estoque-baixo", response_model=List[DashboardEstoqueBaixo])
 def get_estoque_baixo(
     *,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     limite: int = 5 # Opcional: ?limite=5
 ):
     """
@@ -359,7 +366,7 @@ def get_estoque_baixo(
 @router.get("/recentes-pedidos", response_model=List[DashboardRecentPedido])
 def get_recentes_pedidos(
     *,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """
     [ADMIN] Retorna os 5 últimos pedidos realizados.
@@ -386,7 +393,7 @@ def get_recentes_pedidos(
 @router.get("/analitico", response_model=DashboardAnalitico)
 def get_dashboard_analitico(
     *,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     janela_dias: int = 7,
     limite: int = 20,
 ):
@@ -404,12 +411,31 @@ def get_dashboard_analitico(
 
     today = datetime.date.today()
 
-    produtos = session.exec(select(Produto)).all()
-    estoque = session.exec(select(EstoqueConta)).all()
-    contas_mae = session.exec(select(ContaMae)).all()
-
-    estoque_ativo = [conta for conta in estoque if conta.is_ativo]
-    contas_mae_ativas = [conta for conta in contas_mae if conta.is_ativo]
+    produtos_row = session.exec(
+        select(
+            func.count(Produto.id).filter(Produto.is_ativo == True),
+            func.count(Produto.id).filter(Produto.is_ativo == False),
+        )
+    ).one()
+    slots_livres_estoque = func.greatest(EstoqueConta.max_slots - EstoqueConta.slots_ocupados, 0)
+    estoque_row = session.exec(
+        select(
+            func.count(EstoqueConta.id).filter(EstoqueConta.is_ativo == True),
+            func.count(EstoqueConta.id).filter(EstoqueConta.is_ativo == False),
+            func.count(EstoqueConta.id).filter(EstoqueConta.is_ativo == True, EstoqueConta.requer_atencao == True),
+            func.coalesce(func.sum(slots_livres_estoque).filter(EstoqueConta.is_ativo == True), 0),
+            func.coalesce(func.sum(EstoqueConta.slots_ocupados).filter(EstoqueConta.is_ativo == True), 0),
+        )
+    ).one()
+    slots_livres_conta_mae = func.greatest(ContaMae.max_slots - ContaMae.slots_ocupados, 0)
+    contas_mae_row = session.exec(
+        select(
+            func.count(ContaMae.id).filter(ContaMae.is_ativo == True),
+            func.count(ContaMae.id).filter(ContaMae.is_ativo == False),
+            func.coalesce(func.sum(slots_livres_conta_mae).filter(ContaMae.is_ativo == True), 0),
+            func.coalesce(func.sum(ContaMae.slots_ocupados).filter(ContaMae.is_ativo == True), 0),
+        )
+    ).one()
 
     pedidos_pendentes = session.exec(
         select(func.count(Pedido.id)).where(Pedido.status_entrega == StatusEntregaPedido.PENDENTE)
@@ -419,21 +445,38 @@ def get_dashboard_analitico(
     ).first() or 0
 
     health = DashboardOperationalHealth(
-        produtos_ativos=sum(1 for produto in produtos if produto.is_ativo),
-        produtos_inativos=sum(1 for produto in produtos if not produto.is_ativo),
-        estoque_ativo=len(estoque_ativo),
-        estoque_inativo=sum(1 for conta in estoque if not conta.is_ativo),
-        estoque_requer_atencao=sum(1 for conta in estoque if conta.is_ativo and conta.requer_atencao),
-        estoque_slots_livres=sum(max(conta.max_slots - conta.slots_ocupados, 0) for conta in estoque_ativo),
-        estoque_slots_ocupados=sum(conta.slots_ocupados for conta in estoque_ativo),
-        contas_mae_ativas=len(contas_mae_ativas),
-        contas_mae_inativas=sum(1 for conta in contas_mae if not conta.is_ativo),
-        contas_mae_slots_livres=sum(max(conta.max_slots - conta.slots_ocupados, 0) for conta in contas_mae_ativas),
-        contas_mae_slots_ocupados=sum(conta.slots_ocupados for conta in contas_mae_ativas),
+        produtos_ativos=int(produtos_row[0]),
+        produtos_inativos=int(produtos_row[1]),
+        estoque_ativo=int(estoque_row[0]),
+        estoque_inativo=int(estoque_row[1]),
+        estoque_requer_atencao=int(estoque_row[2]),
+        estoque_slots_livres=int(estoque_row[3]),
+        estoque_slots_ocupados=int(estoque_row[4]),
+        contas_mae_ativas=int(contas_mae_row[0]),
+        contas_mae_inativas=int(contas_mae_row[1]),
+        contas_mae_slots_livres=int(contas_mae_row[2]),
+        contas_mae_slots_ocupados=int(contas_mae_row[3]),
         pedidos_pendentes=int(pedidos_pendentes),
         pedidos_com_ticket_aberto=int(pedidos_com_ticket_aberto),
     )
 
+    # Contagens e listas saem da expiração materializada no pedido:
+    # cada faixa vira um range scan em `ix_pedido_data_expiracao_efetiva`.
+    data_expiracao = Pedido.data_expiracao_efetiva
+
+    def _contar(*filtros) -> int:
+        return int(
+            session.exec(
+                select(func.count(Pedido.id))
+                .where(*filtros)
+                .where(Pedido.status_entrega == StatusEntregaPedido.ENTREGUE)
+            ).first() or 0
+        )
+
+    vencendo_hoje = _contar(data_expiracao == today)
+    vencendo_7d = _contar(data_expiracao.between(today, today + datetime.timedelta(days=7)))
+    expirados = _contar(data_expiracao < today)
+
     stmt_pedidos = (
         select(
             Pedido,
@@ -449,57 +492,43 @@ def get_dashboard_analitico(
         .join(EstoqueConta, Pedido.estoque_conta_id == EstoqueConta.id, isouter=True)
         .join(ContaMae, Pedido.conta_mae_id == ContaMae.id, isouter=True)
         .where(Pedido.status_entrega == StatusEntregaPedido.ENTREGUE)
-        .order_by(Pedido.criado_em.desc())
     )
 
-    vencendo_hoje = 0
-    vencendo_7d = 0
-    expirados = 0
-    proximos_vencimentos: list[DashboardExpiringPedido] = []
-    expirados_recentes: list[DashboardExpiringPedido] = []
-
-    for pedido, produto_nome, usuario_nome, usuario_tid, estoque_login, instrucoes_especificas, conta_mae_login in session.exec(stmt_pedidos).all():
-        data_expiracao, origem_expiracao = resolver_data_expiracao_pedido(
-            session=session,
-            pedido_id=pedido.id,
-            email_cliente=pedido.email_cliente,
-            estoque_conta_id=pedido.estoque_conta_id,
-            conta_mae_id=pedido.conta_mae_id,
-        )
-        if not data_expiracao:
-            continue
-
-        dias_restantes = (data_expiracao - today).days
-        if dias_restantes == 0:
-            vencendo_hoje += 1
-        if 0 <= dias_restantes <= 7:
-            vencendo_7d += 1
-        if dias_restantes < 0:
-            expirados += 1
-
-        if dias_restantes > janela_dias:
-            continue
-
-        item = DashboardExpiringPedido(
-            pedido_id=pedido.id,
-            produto_nome=produto_nome,
-            usuario_nome_completo=usuario_nome,
-            usuario_telegram_id=usuario_tid,
-            conta_login=conta_mae_login or estoque_login,
-            tipo_conta="conta_mae" if conta_mae_login else ("estoque" if estoque_login else None),
-            email_cliente=pedido.email_cliente,
-            entrega_info=instrucoes_especificas or pedido.email_cliente,
-            data_expiracao=data_expiracao,
-            dias_restantes=dias_restantes,
-            origem_expiracao=origem_expiracao,
-        )
-        if dias_restantes < 0:
-            expirados_recentes.append(item)
-        else:
-            proximos_vencimentos.append(item)
+    def _montar_itens(stmt) -> list[DashboardExpiringPedido]:
+        itens: list[DashboardExpiringPedido] = []
+        for (
+            pedido, produto_nome, usuario_nome, usuario_tid,
+            estoque_login, instrucoes_especificas, conta_mae_login,
+        ) in session.exec(stmt).all():
+            itens.append(
+                DashboardExpiringPedido(
+                    pedido_id=pedido.id,
+                    produto_nome=produto_nome,
+                    usuario_nome_completo=usuario_nome,
+                    usuario_telegram_id=usuario_tid,
+                    conta_login=conta_mae_login or estoque_login,
+                    tipo_conta="conta_mae" if conta_mae_login else ("estoque" if estoque_login else None),
+                    email_cliente=pedido.email_cliente,
+                    entrega_info=instrucoes_especificas or pedido.email_cliente,
+                    data_expiracao=pedido.data_expiracao_efetiva,
+                    dias_restantes=(pedido.data_expiracao_efetiva - today).days,
+                    origem_expiracao=pedido.origem_expiracao,
+                )
+            )
+        return itens
 
-    proximos_vencimentos.sort(key=lambda item: (item.dias_restantes, item.produto_nome, item.usuario_nome_completo))
-    expirados_recentes.sort(key=lambda item: (item.dias_restantes, item.produto_nome, item.usuario_nome_completo), reverse=True)
+    proximos_vencimentos = _montar_itens(
+        stmt_pedidos
+        .where(data_expiracao.between(today, today + datetime.timedelta(days=janela_dias)))
+        .order_by(data_expiracao.asc(), Produto.nome.asc(), Usuario.nome_completo.asc())
+        .limit(limite)
+    )
+    expirados_recentes = _montar_itens(
+        stmt_pedidos
+        .where(data_expiracao < today)
+        .order_by(data_expiracao.desc(), Produto.nome.desc(), Usuario.nome_completo.desc())
+        .limit(limite)
+    )
 
     return DashboardAnalitico(
         vencendo_hoje=vencendo_hoje,
@@ -508,6 +537,6 @@ def get_dashboard_analitico(
         pedidos_pendentes=int(pedidos_pendentes),
         pedidos_com_ticket_aberto=int(pedidos_com_ticket_aberto),
         health=health,
-        proximos_vencimentos=proximos_vencimentos[:limite],
-        expirados_recentes=expirados_recentes[:limite],
+        proximos_vencimentos=proximos_vencimentos,
+        expirados_recentes=expirados_recentes,
     )
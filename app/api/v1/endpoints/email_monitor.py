@@ -8,7 +8,7 @@ from sqlalchemy import func
 from sqlmodel import Session, select
 
 from app.api.v1.deps import get_current_admin_user
-from app.db.database import get_session
+from app.db.database import get_read_session, get_session
 from app.models.email_monitor_models import (
     AuditLog,
     EmailMonitorAccount,
@@ -48,6 +48,7 @@ from app.services.email_monitor_service import (
     delete_account_permanently,
     enqueue_email_monitor_outlook_otp_fetch,
     log_audit,
+    mark_rules_changed,
     normalize_folder_list,
     normalize_rule_keywords,
     reclassify_messages_for_accounts,
@@ -374,6 +375,8 @@ def sync_single_account(
         relevant_messages=sync_run.relevant_messages,
         started_at=sync_run.started_at,
         finished_at=sync_run.finished_at,
+        queued_ms=sync_run.queued_ms,
+        duration_ms=sync_run.duration_ms,
         error_message=sync_run.error_message,
     )
 
@@ -439,6 +442,8 @@ def sync_all_accounts(
                 relevant_messages=sync_run.relevant_messages,
                 started_at=sync_run.started_at,
                 finished_at=sync_run.finished_at,
+                queued_ms=sync_run.queued_ms,
+                duration_ms=sync_run.duration_ms,
                 error_message=sync_run.error_message,
             )
         )
@@ -510,6 +515,7 @@ def create_rule(
     )
     session.add(rule)
     session.flush()
+    mark_rules_changed(session)
     reclassification = reclassify_messages_for_accounts(
         session,
         None if rule.account_id is None else {rule.account_id},
@@ -579,6 +585,7 @@ def update_rule(
             setattr(rule, field_name, value)
     session.add(rule)
     session.flush()
+    mark_rules_changed(session)
     reclassification_scope = (
         None
         if previous_account_id is None or rule.account_id is None
@@ -625,7 +632,7 @@ def update_rule(
 @router.get("/messages", response_model=EmailMonitorMessagesPage)
 def list_messages(
     *,
-    session: Session = Depends(get_session),
+    session: Session = Depends(get_read_session),
     account_id: Optional[uuid.UUID] = None,
     sender: Optional[str] = None,
     category: Optional[str] = None,
@@ -851,7 +858,7 @@ def acknowledge_alert(
 
 
 @router.get("/audit", response_model=list[EmailMonitorAuditLogRead])
-def list_audit_logs(*, session: Session = Depends(get_session), limit: int = Query(default=50, ge=1, le=200)):
+def list_audit_logs(*, session: Session = Depends(get_read_session), limit: int = Query(default=50, ge=1, le=200)):
     logs = session.exec(
         select(AuditLog)
         .where(AuditLog.event_type.ilike("email_monitor.%") | (AuditLog.event_type == "admin.login"))
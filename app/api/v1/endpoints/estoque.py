@@ -17,7 +17,9 @@ from app.api.v1.deps import get_current_admin_user # Nosso "Cadeado"
 from app.services import security # Nosso service de Criptografia
 from app.services.disponibilidade_service import (
     inativar_conta_estoque_se_lotada,
+    registrar_variacao_disponibilidade,
     sincronizar_status_produto_por_disponibilidade,
+    slots_livres_conta,
 )
 
 # Roteador de Admin para o Estoque
@@ -58,6 +60,7 @@ def create_conta_estoque(
     )
     
     session.add(estoque)
+    registrar_variacao_disponibilidade(session, estoque, 0)
     sincronizar_status_produto_por_disponibilidade(session, produto)
     session.commit()
     session.refresh(estoque)
@@ -150,10 +153,12 @@ def update_conta_estoque(
         update_data["senha"] = security.encrypt_data(nova_senha)
         
     # Atualiza o objeto do model
+    slots_livres_antes = slots_livres_conta(conta)
     conta.sqlmodel_update(update_data)
     inativar_conta_estoque_se_lotada(conta)
     
     session.add(conta)
+    registrar_variacao_disponibilidade(session, conta, slots_livres_antes)
     produto = session.get(Produto, conta.produto_id)
     if produto:
         sincronizar_status_produto_por_disponibilidade(session, produto)
@@ -186,7 +191,9 @@ def delete_conta_estoque(
         
     # 3. Se encontrada, deleta a conta
     try:
+        slots_livres_antes = slots_livres_conta(conta)
         session.delete(conta)
+        registrar_variacao_disponibilidade(session, conta, slots_livres_antes, removida=True)
         session.commit()
     except Exception as e:
         # Caso ocorra um erro de banco (ex: restrição de chave estrangeira)
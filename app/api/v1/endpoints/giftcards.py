@@ -1,23 +1,48 @@
 import uuid
 import datetime
-import secrets
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from sqlmodel import Session, select
-from typing import List
+from typing import List, Optional
+
+from app.core.config import settings
 
 from app.db.database import get_session
+from app.models.base import TipoMovimentacaoCarteira
 from app.models.usuario_models import Usuario
-from app.models.suporte_models import GiftCard
+from app.models.base import StatusGiftCardLote
+from app.models.suporte_models import GiftCard, GiftCardLote
 from app.schemas.giftcard_schemas import (
     GiftCardCreateRequest,
     GiftCardCreateResponse,
     GiftCardAdminRead,
+    GiftCardLoteCreateRequest,
+    GiftCardLoteRead,
     GiftCardResgatarRequest,
-    GiftCardResgatarResponse
+    GiftCardResgatarResponse,
+    GiftCardResgateStats
 )
 from app.api.v1.deps import get_current_admin_user # O "Cadeado" do Admin
+from app.services.carteira_service import creditar
+from app.services.giftcard_protecao_service import (
+    filtro_giftcards,
+    limitador_resgate,
+    marcar_giftcard_removido,
+    marcar_giftcards_criados,
+)
+from app.services.giftcard_service import (
+    GeracaoGiftCardError,
+    enqueue_lote_giftcards,
+    exportar_csv_lote,
+    inserir_codigos_unicos,
+    lote_parado,
+    montar_lote_read,
+)
 from app.api.v1.endpoints.recargas import get_or_create_usuario # Reutilizamos a função!
 
+# Códigos que passaram pelo filtro mas não existiam no banco.
+_falsos_positivos_filtro = 0
+
 # Roteador para o Bot (resgate de gift cards)
 router = APIRouter()
 # Roteador para o Admin (criação de gift cards)
@@ -55,21 +80,27 @@ def create_gift_cards(
         )
         session.add(novo_giftcard)
         codigos_gerados.append(novo_giftcard.codigo)
+        marcar_giftcards_criados(session, [novo_giftcard.codigo])
         
     else:
-        # 2. Caso: Gerar Múltiplos Códigos Aleatórios
-        for _ in range(giftcard_in.quantidade):
-            # Gera um código aleatório seguro (ex: ABC-123-XYZ)
-            codigo = f"{secrets.token_hex(3).upper()}-{secrets.token_hex(3).upper()}"
-            
-            # (Numa app de produção, teríamos um loop while para garantir que o código é 100% único)
-            novo_giftcard = GiftCard(
-                codigo=codigo,
-                valor=giftcard_in.valor,
-                criado_por_admin_id=current_admin.id
+        # 2. Caso: Gerar Múltiplos Códigos Aleatórios (únicos garantidos pelo banco)
+        if giftcard_in.quantidade < 1:
+            raise HTTPException(status_code=400, detail="A quantidade deve ser maior que zero.")
+        if giftcard_in.quantidade > settings.GIFTCARD_CRIACAO_SINCRONA_MAX:
+            raise HTTPException(
+                status_code=400,
+                detail=(
+                    f"Para mais de {settings.GIFTCARD_CRIACAO_SINCRONA_MAX} códigos, "
+                    "use a geração em lote (/admin/giftcards/lotes)."
+                ),
+            )
+        try:
+            codigos_gerados, _ = inserir_codigos_unicos(
+                session, giftcard_in.quantidade, giftcard_in.valor, current_admin.id
             )
-            session.add(novo_giftcard)
-            codigos_gerados.append(novo_giftcard.codigo)
+        except GeracaoGiftCardError as e:
+            session.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
 
     session.commit()
     
@@ -79,6 +110,106 @@ def create_gift_cards(
         quantidade=len(codigos_gerados)
     )
 
+@admin_router.post("/lotes", response_model=GiftCardLoteRead, status_code=status.HTTP_202_ACCEPTED)
+def create_lote_gift_cards(
+    *,
+    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    current_admin: Usuario = Depends(get_current_admin_user),
+    lote_in: GiftCardLoteCreateRequest
+):
+    """
+    [ADMIN] Agenda a geração em massa de gift cards (ex: 50 mil códigos de
+    uma promoção). Acompanhe em /lotes/{id} e baixe o CSV ao concluir.
+    """
+    lote = GiftCardLote(
+        valor=lote_in.valor,
+        quantidade_solicitada=lote_in.quantidade,
+        criado_por_admin_id=current_admin.id,
+    )
+    session.add(lote)
+    session.commit()
+    session.refresh(lote)
+
+    enqueue_lote_giftcards(lote.id, background_tasks=background_tasks)
+    return montar_lote_read(lote)
+
+@admin_router.get("/lotes", response_model=List[GiftCardLoteRead])
+def list_lotes_gift_cards(
+    *,
+    session: Session = Depends(get_session),
+    status_lote: Optional[StatusGiftCardLote] = None,
+    limit: int = 50
+):
+    """
+    [ADMIN] Lista os lotes mais recentes com o progresso de cada um.
+    """
+    stmt = select(GiftCardLote).order_by(GiftCardLote.criado_em.desc()).limit(min(max(limit, 1), 200))
+    if status_lote is not None:
+        stmt = stmt.where(GiftCardLote.status == status_lote)
+    return [montar_lote_read(lote) for lote in session.exec(stmt).all()]
+
+@admin_router.get("/lotes/{lote_id}", response_model=GiftCardLoteRead)
+def get_lote_gift_cards(
+    *,
+    session: Session = Depends(get_session),
+    lote_id: uuid.UUID
+):
+    """
+    [ADMIN] Progresso de um lote: gerados, colisões e vazão.
+    """
+    lote = session.get(GiftCardLote, lote_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote de Gift Cards não encontrado.")
+    return montar_lote_read(lote)
+
+@admin_router.post("/lotes/{lote_id}/retomar", response_model=GiftCardLoteRead)
+def retomar_lote_gift_cards(
+    *,
+    session: Session = Depends(get_session),
+    background_tasks: BackgroundTasks,
+    lote_id: uuid.UUID
+):
+    """
+    [ADMIN] Retoma um lote que falhou (ou que ficou parado na fila ou no
+    executor) a partir dos códigos que ainda faltam.
+    """
+    lote = session.get(GiftCardLote, lote_id, with_for_update=True)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote de Gift Cards não encontrado.")
+    if lote.status != StatusGiftCardLote.FALHOU and not lote_parado(lote):
+        raise HTTPException(status_code=400, detail=f"Lote {lote.status.value} não pode ser retomado.")
+
+    lote.status = StatusGiftCardLote.PENDENTE
+    lote.atualizado_em = datetime.datetime.utcnow()
+    session.add(lote)
+    session.commit()
+    session.refresh(lote)
+
+    enqueue_lote_giftcards(lote.id, background_tasks=background_tasks)
+    return montar_lote_read(lote)
+
+@admin_router.get("/lotes/{lote_id}/csv")
+def exportar_lote_gift_cards(
+    *,
+    session: Session = Depends(get_session),
+    lote_id: uuid.UUID
+):
+    """
+    [ADMIN] Baixa os códigos do lote em CSV (enviado em streaming).
+    """
+    lote = session.get(GiftCardLote, lote_id)
+    if not lote:
+        raise HTTPException(status_code=404, detail="Lote de Gift Cards não encontrado.")
+    if lote.status != StatusGiftCardLote.CONCLUIDO:
+        raise HTTPException(status_code=409, detail=f"Lote {lote.status.value}: aguarde a conclusão para exportar.")
+
+    return StreamingResponse(
+        exportar_csv_lote(lote.id),
+        media_type="text/csv",
+        headers={"Content-Disposition": f'attachment; filename="giftcards-{lote.id}.csv"'},
+    )
+
 @admin_router.get("/", response_model=List[GiftCardAdminRead])
 def get_lista_gift_cards(
     *,
@@ -106,6 +237,18 @@ def get_lista_gift_cards(
         
     return lista_resposta
 
+@admin_router.get("/resgate/estatisticas", response_model=GiftCardResgateStats)
+def get_estatisticas_resgate():
+    """
+    [ADMIN] Contadores da proteção do resgate: códigos recusados pelo filtro
+    sem ir ao banco e tentativas bloqueadas pelo limite por usuário.
+    """
+    return GiftCardResgateStats(
+        filtro=filtro_giftcards.estatisticas(),
+        limitador=limitador_resgate.estatisticas(),
+        falsos_positivos=_falsos_positivos_filtro,
+    )
+
 @admin_router.delete("/{gift_card_id}", status_code=status.HTTP_204_NO_CONTENT)
 def delete_gift_card(
     *,
@@ -133,6 +276,7 @@ def delete_gift_card(
     # 3. Se existe, deleta
     try:
         session.delete(db_gift_card)
+        marcar_giftcard_removido(session)
         session.commit()
     except Exception as e:
         # Em caso de erro de banco de dados (ex: restrições de FK)
@@ -166,6 +310,22 @@ def resgatar_gift_card(
     # o usuário já deve existir (pois tentou /start no bot).
     # Vamos simplificar e exigir que o usuário exista.
     
+    global _falsos_positivos_filtro
+
+    # 0. Limite de tentativas por usuário e filtro de códigos inexistentes,
+    # ambos antes de qualquer consulta ao banco.
+    espera = limitador_resgate.permitir(resgate_in.telegram_id)
+    if espera > 0:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Muitas tentativas de resgate. Aguarde alguns segundos e tente novamente.",
+            headers={"Retry-After": str(max(1, round(espera)))},
+        )
+
+    codigo_normalizado = resgate_in.codigo.upper().strip()
+    if not filtro_giftcards.pode_existir(codigo_normalizado):
+        raise HTTPException(status_code=404, detail="Código de Gift Card não encontrado.")
+
     # 1. Encontra o usuário
     usuario = session.exec(
         select(Usuario).where(Usuario.telegram_id == resgate_in.telegram_id)
@@ -181,8 +341,6 @@ def resgatar_gift_card(
     # Isso impede que o mesmo usuário clique "Resgatar" duas vezes
     # muito rápido e resgate o código duas vezes (race condition).
     
-    codigo_normalizado = resgate_in.codigo.upper().strip()
-    
     gift_card = session.exec(
         select(GiftCard)
         .where(GiftCard.codigo == codigo_normalizado)
@@ -191,6 +349,7 @@ def resgatar_gift_card(
     
     # 3. Validações
     if not gift_card:
+        _falsos_positivos_filtro += 1
         raise HTTPException(status_code=404, detail="Código de Gift Card não encontrado.")
         
     if gift_card.is_utilizado:
@@ -204,17 +363,22 @@ def resgatar_gift_card(
         gift_card.utilizado_por_usuario_id = usuario.id
         session.add(gift_card)
         
-        # b. Adiciona o saldo à carteira do usuário
-        usuario.saldo_carteira += gift_card.valor
-        session.add(usuario)
+        # b. Adiciona o saldo à carteira do usuário (UPDATE atômico + livro-razão)
+        novo_saldo = creditar(
+            session,
+            usuario.id,
+            gift_card.valor,
+            TipoMovimentacaoCarteira.GIFT_CARD,
+            referencia_id=gift_card.id,
+            descricao=f"Gift Card {gift_card.codigo}",
+        )
         
         # c. Salva tudo
         session.commit()
-        session.refresh(usuario) # Pega o novo saldo
         
         return GiftCardResgatarResponse(
             valor_resgatado=gift_card.valor,
-            novo_saldo_total=usuario.saldo_carteira
+            novo_saldo_total=novo_saldo
         )
 
     except Exception as e:
@@ -4,7 +4,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
 from typing import List
 
-from app.db.database import get_session
+from app.db.database import get_read_session, get_session
 from app.models.usuario_models import Usuario
 from app.models.pedido_models import Pedido
 from app.models.produto_models import Produto, EstoqueConta
@@ -16,7 +16,8 @@ from app.schemas.pedido_schemas import (
     PedidoAdminDetails,
     PedidoAdminConta,
     PedidoAdminContaMae,
-    PedidoAdminEntregaRequest
+    PedidoAdminEntregaRequest,
+    PedidoExpiracaoRecalculoResponse,
 )
 from app.api.v1.deps import get_current_admin_user
 from app.services import security
@@ -24,8 +25,12 @@ from app.services.notification_service import send_telegram_message, escape_mark
 from app.services.disponibilidade_service import (
     inativar_conta_estoque_se_lotada,
     inativar_produto_sem_contas_disponiveis,
+    registrar_variacao_disponibilidade,
+)
+from app.services.pedido_expiracao_service import (
+    recalcular_expiracao_pedidos_em_lotes,
+    resolver_data_expiracao_pedido,
 )
-from app.services.pedido_expiracao_service import resolver_data_expiracao_pedido
 
 # Roteador de Admin para Pedidos
 router = APIRouter(dependencies=[Depends(get_current_admin_user)])
@@ -33,7 +38,7 @@ router = APIRouter(dependencies=[Depends(get_current_admin_user)])
 @router.get("/", response_model=List[PedidoAdminList])
 def get_admin_pedidos(
     *,
-    session: Session = Depends(get_session)
+    session: Session = Depends(get_read_session)
 ):
     """
     [ADMIN] Lista todos os pedidos realizados, ordenados do mais recente.
@@ -57,13 +62,7 @@ def get_admin_pedidos(
     pedidos: list[PedidoAdminList] = []
 
     for pedido, produto_nome, usuario_nome, usuario_tid, instrucoes_especificas in resultados:
-        data_expiracao, origem_expiracao = resolver_data_expiracao_pedido(
-            session=session,
-            pedido_id=pedido.id,
-            email_cliente=pedido.email_cliente,
-            estoque_conta_id=pedido.estoque_conta_id,
-            conta_mae_id=pedido.conta_mae_id,
-        )
+        data_expiracao = pedido.data_expiracao_efetiva
         dias_restantes = (data_expiracao - today).days if data_expiracao else None
 
         pedidos.append(
@@ -79,13 +78,34 @@ def get_admin_pedidos(
                 entrega_info=instrucoes_especificas or pedido.email_cliente,
                 data_expiracao=data_expiracao,
                 dias_restantes=dias_restantes,
-                origem_expiracao=origem_expiracao,
+                origem_expiracao=pedido.origem_expiracao,
             )
         )
 
     return pedidos
 
 
+@router.post("/expiracao/recalcular", response_model=PedidoExpiracaoRecalculoResponse)
+def recalcular_expiracao_pedidos(
+    *,
+    session: Session = Depends(get_session),
+    tamanho_lote: int = 1000,
+):
+    """
+    [ADMIN] Backfill/reparo de `data_expiracao_efetiva` em todos os pedidos,
+    em lotes confirmados separadamente.
+    """
+    if tamanho_lote < 1 or tamanho_lote > 10000:
+        raise HTTPException(status_code=400, detail="O tamanho do lote deve estar entre 1 e 10000.")
+
+    resultado = recalcular_expiracao_pedidos_em_lotes(session, tamanho_lote=tamanho_lote)
+    print(
+        f"Expiração efetiva recalculada: {resultado['processados']} pedido(s) em "
+        f"{resultado['lotes']} lote(s), {resultado['atualizados']} atualizado(s)."
+    )
+    return resultado
+
+
 @router.get("/{pedido_id}/detalhes", response_model=PedidoAdminDetails)
 def get_pedido_detalhes(
     *,
@@ -136,9 +156,6 @@ def get_pedido_detalhes(
     data_expiracao, origem_expiracao = resolver_data_expiracao_pedido(
         session=session,
         pedido_id=pedido.id,
-        email_cliente=pedido.email_cliente,
-        estoque_conta_id=pedido.estoque_conta_id,
-        conta_mae_id=pedido.conta_mae_id,
     )
     dias_restantes = (data_expiracao - today).days if data_expiracao else None
     
@@ -283,6 +300,7 @@ def entregar_pedido_manual(
         inativar_conta_estoque_se_lotada(nova_conta)
         session.add(nova_conta)
         session.flush() # Força o DB a gerar o ID da nova_conta
+        registrar_variacao_disponibilidade(session, nova_conta, 0)
         inativar_produto_sem_contas_disponiveis(session, produto)
 
         # 5. Atualiza o Pedido
@@ -1,6 +1,6 @@
 import uuid
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
 from sqlmodel import Session, select, desc
 from typing import List
 
@@ -12,31 +12,57 @@ from app.schemas.produto_schemas import (
     ProdutoRead, 
     ProdutoCreate, 
     ProdutoUpdate, 
-    ProdutoAdminRead
+    ProdutoAdminRead,
+    ProdutoCatalogoCacheStats,
+    ProdutoDisponibilidadeReconciliacaoResponse,
 )
 from app.api.v1.deps import get_current_admin_user
+from app.services.catalogo_cache_service import catalogo_cache, marcar_catalogo_alterado
+from app.services.disponibilidade_service import reconciliar_disponibilidade
 
 # ===============================================================
 # Roteador PÚBLICO (para o Bot)
 # ===============================================================
 router = APIRouter()
 
-@router.get(
-    "/",
-    response_model=List[ProdutoRead]
-)
-def get_produtos_ativos(session: Session = Depends(get_session)):
-    """
-    Endpoint para o bot listar todos os produtos ATIVOS em ordem alfabética.
-    """
+def _etag_corresponde(if_none_match: str | None, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidatos = [valor.strip() for valor in if_none_match.split(",")]
+    return "*" in candidatos or any(
+        candidato.removeprefix("W/") == etag for candidato in candidatos
+    )
+
+
+def _listar_produtos_ativos(session: Session) -> list:
     statement = (
         select(Produto)
         .where(Produto.is_ativo == True)
         .order_by(Produto.nome)
     )
     produtos = session.exec(statement).all()
+    return [ProdutoRead.model_validate(produto).model_dump(mode="json") for produto in produtos]
+
+
+def _responder_catalogo(request: Request, entrada) -> Response:
+    headers = {"ETag": entrada.etag, "Cache-Control": "no-cache"}
+    if _etag_corresponde(request.headers.get("if-none-match"), entrada.etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(content=entrada.corpo, media_type="application/json", headers=headers)
 
-    return produtos
+
+@router.get(
+    "/",
+    response_model=List[ProdutoRead],
+    responses={304: {"description": "Catálogo não modificado desde o ETag informado."}},
+)
+def get_produtos_ativos(request: Request, session: Session = Depends(get_session)):
+    """
+    Endpoint para o bot listar todos os produtos ATIVOS em ordem alfabética.
+    Servido do cache em memória, com ETag/If-None-Match (304).
+    """
+    entrada = catalogo_cache.obter(lambda: _listar_produtos_ativos(session))
+    return _responder_catalogo(request, entrada)
 
 # ===============================================================
 # Roteador de ADMIN (para o Painel React)
@@ -44,6 +70,38 @@ def get_produtos_ativos(session: Session = Depends(get_session)):
 admin_router = APIRouter()
 
 
+@admin_router.post(
+    "/disponibilidade/reconciliar",
+    response_model=ProdutoDisponibilidadeReconciliacaoResponse,
+    dependencies=[Depends(get_current_admin_user)]
+)
+def reconciliar_contadores_disponibilidade(session: Session = Depends(get_session)):
+    """
+    [ADMIN] Recalcula os contadores de disponibilidade de todos os produtos
+    a partir do estoque/contas-mãe e relata onde o valor mantido divergia.
+    """
+    resultado = reconciliar_disponibilidade(session)
+    session.commit()
+    if resultado["produtos_com_divergencia"]:
+        print(
+            f"AVISO: {resultado['produtos_com_divergencia']} produto(s) com contador de "
+            "disponibilidade divergente foram corrigidos."
+        )
+    return resultado
+
+
+@admin_router.get(
+    "/cache/estatisticas",
+    response_model=ProdutoCatalogoCacheStats,
+    dependencies=[Depends(get_current_admin_user)]
+)
+def get_estatisticas_cache_catalogo():
+    """
+    [ADMIN] Contadores de hit/miss do cache do catálogo do bot.
+    """
+    return catalogo_cache.estatisticas()
+
+
 def _validate_invite_provider(
     *,
     tipo_entrega: TipoEntregaProduto,
@@ -75,6 +133,7 @@ def create_produto(
     )
     produto = Produto.model_validate(produto_in)
     session.add(produto)
+    marcar_catalogo_alterado(session)
     session.commit()
     session.refresh(produto)
     return produto
@@ -122,6 +181,7 @@ def update_produto(
     produto.sqlmodel_update(update_data)
     
     session.add(produto)
+    marcar_catalogo_alterado(session)
     session.commit()
     session.refresh(produto)
     return produto
@@ -159,5 +219,6 @@ def delete_produto(
         )
     
     session.delete(produto)
+    marcar_catalogo_alterado(session)
     session.commit()
     return None
@@ -1,33 +1,39 @@
 import uuid
 import datetime
 
-import mercadopago
 from app.core.config import settings
-# SDK do Mercado Pago
-sdk = mercadopago.SDK(settings.MERCADOPAGO_ACCESS_TOKEN)
+# SDK do Mercado Pago (sobre o cliente HTTP compartilhado)
+from app.services.mercadopago_service import sdk
 
 from fastapi import APIRouter, Depends, HTTPException, status, Request
+from fastapi.concurrency import run_in_threadpool
 from sqlmodel import Session, select
-from typing import List
+from typing import List, Optional
 from app.models.base import TipoStatusPagamento
 from .usuarios import get_or_create_usuario
 from app.api.v1.deps import get_current_admin_user
 from app.schemas.usuario_schemas import RecargaAdminRead
-from app.services.affiliate_service import processar_gatilho_afiliado
-from app.models.configuracao_models import TipoGatilhoAfiliado
 
-from app.db.database import get_session, engine
+from app.db.database import get_session
 from app.models.usuario_models import Usuario, RecargaSaldo
+from app.models.webhook_models import WebhookEventoPagamento
 from app.schemas.recarga_schemas import (
     RecargaCreateRequest, 
     RecargaCreateResponse,
     RecargaStatusResponse,
+    RecargaReconciliacaoResponse,
+    WebhookEventoRead,
+    WebhookFilaStatus,
     WebhookRecargaRequest,
     WebhookRecargaResponse
 )
-from app.models.base import TipoStatusPagamento # Importa nosso ENUM
-from app.services.notification_service import send_telegram_message, escape_markdown_v2
-from decimal import Decimal
+from app.models.base import StatusWebhookEvento, TipoStatusPagamento # Importa nosso ENUM
+from app.services import recarga_reconciliacao_service
+from app.services.recarga_webhook_service import (
+    registrar_evento_webhook,
+    reprocessar_evento,
+    status_fila_webhooks,
+)
 
 # Roteador para Recargas
 router = APIRouter()
@@ -144,21 +150,6 @@ def create_pedido_de_recarga(
         nome_completo=recarga_in.nome_completo
     )
 
-    # Expira recargas pendentes antigas do usuario
-    expiracao_limite = datetime.datetime.utcnow() - datetime.timedelta(
-        minutes=settings.RECARGA_EXPIRACAO_MINUTOS
-    )
-    recargas_expiradas = session.exec(
-        select(RecargaSaldo).where(
-            RecargaSaldo.usuario_id == usuario.id,
-            RecargaSaldo.status_pagamento == TipoStatusPagamento.PENDENTE,
-            RecargaSaldo.criado_em <= expiracao_limite
-        )
-    ).all()
-    for recarga in recargas_expiradas:
-        recarga.status_pagamento = TipoStatusPagamento.FALHOU
-        session.add(recarga)
-
     # Aplica o bônus de cashback pendente, se houver
     bonus_percent_aplicado = None
     if usuario.pending_cashback_percent:
@@ -242,10 +233,11 @@ def create_pedido_de_recarga(
 async def webhook_confirmacao_recarga_mp(
     *,
     request: Request,
-    session: Session = Depends(get_session)
 ):
     """
     [WEBHOOK] Endpoint para o MERCADO PAGO confirmar um PIX.
+    Só grava o evento (deduplicado por pagamento + ação) e responde;
+    a consulta ao gateway e o crédito ficam com o `recarga_webhook_service`.
     """
     
     data = await request.json()
@@ -254,122 +246,90 @@ async def webhook_confirmacao_recarga_mp(
     if data.get("type") != "payment" or data.get("action") != "payment.updated":
         print("Webhook ignorado (não é uma atualização de pagamento)")
         return {"status": "ignorado"}
-        
-    telegram_id_para_notificar = None
-    mensagem_para_notificar = ""
 
     try:
         gateway_id_real = str(data["data"]["id"])
-        print(f"A processar atualização para o payment_id: {gateway_id_real}")
+    except (KeyError, TypeError):
+        print("Webhook ignorado (sem data.id)")
+        return {"status": "ignorado"}
 
-        payment_info = sdk.payment().get(gateway_id_real)
-        if payment_info["status"] != 200:
-            print(f"Erro: Não foi possível buscar dados do payment_id {gateway_id_real} no MP")
-            raise HTTPException(status_code=404, detail="Pagamento não encontrado no gateway.")
+    try:
+        await run_in_threadpool(registrar_evento_webhook, gateway_id_real, data["action"], data)
+    except Exception as e:
+        # Sem o evento gravado, devolvemos erro para o Mercado Pago reenviar.
+        print(f"ERRO CRÍTICO ao registrar webhook do payment_id {gateway_id_real}: {e}")
+        raise HTTPException(status_code=500, detail="Falha ao registrar o evento.")
 
-        payment_status = payment_info["response"]["status"]
-        
-        if payment_status == "approved":
-            
-            # --- TRANSAÇÃO DO BANCO ---
-            # Envolvemos a lógica de banco em um 'with' separado
-            # para garantir que ela seja concluída (commit) antes da notificação.
-            
-            with Session(engine) as session_tx:
-                recarga = session_tx.exec(
-                    select(RecargaSaldo).where(
-                        RecargaSaldo.gateway_id == gateway_id_real
-                    )
-                ).first()
-                
-                if not recarga:
-                    print(f"Erro: Pagamento {gateway_id_real} aprovado, mas não encontrado no nosso banco.")
-                    return {"status": "recarga_nao_encontrada"}
-                
-                if recarga.status_pagamento == TipoStatusPagamento.PAGO:
-                    print(f"Aviso: Recarga {recarga.id} já estava paga.")
-                    return {"status": "ja_pago"}
-
-                recarga.status_pagamento = TipoStatusPagamento.PAGO
-                recarga.pago_em = datetime.datetime.utcnow()
-                session_tx.add(recarga)
-                
-                usuario = session_tx.get(Usuario, recarga.usuario_id)
-                if not usuario:
-                    print(f"ERRO CRÍTICO: Usuário {recarga.usuario_id} não encontrado para creditar o saldo.")
-                    session_tx.rollback()
-                    return {"status": "usuario_nao_encontrado"}
-
-                # Calcula o valor a ser creditado (incluindo bônus, se houver)
-                valor_creditado = recarga.valor_solicitado
-                valor_bonus = Decimal("0.0")
-                
-                # Verifica se esta recarga tinha um bônus
-                if recarga.bonus_cashback_percent:
-                    bonus_pc = Decimal(recarga.bonus_cashback_percent)
-                    valor_bonus = (valor_creditado * (bonus_pc / 100)).quantize(Decimal("0.01"))
-                    print(f"CASHBACK: Creditando bônus de R$ {valor_bonus} ({bonus_pc}%)")
-                
-                # Soma o valor + bônus
-                novo_saldo = usuario.saldo_carteira + valor_creditado + valor_bonus
-                
-                usuario.saldo_carteira = novo_saldo
-                session_tx.add(usuario)
-                
-                # --- Prepara os dados para a notificação ---
-                # Nós preparamos as variáveis ANTES do commit
-                telegram_id_para_notificar = usuario.telegram_id
-                valor_f = escape_markdown_v2(f"{valor_creditado:.2f}")
-                saldo_f = escape_markdown_v2(f"{novo_saldo:.2f}")
-                
-                mensagem_para_notificar = (
-                    f"✅ *Pagamento Aprovado*\n\n"
-                    f"O seu PIX no valor de *R$ {valor_f}* foi confirmado\\!\n\n"
-                )
-                
-                if valor_bonus > 0:
-                    bonus_f = escape_markdown_v2(f"{valor_bonus:.2f}")
-                    mensagem_para_notificar += (
-                        f"🎉 *Bônus de Indicação:* + R$ {bonus_f}\n"
-                    )
-                
-                mensagem_para_notificar += (
-                    f"O seu novo saldo é: *R$ {saldo_f}*"
-                )
-
-                processar_gatilho_afiliado(
-                    db=session_tx,
-                    usuario_indicado=usuario,
-                    valor_evento=recarga.valor_solicitado,
-                    gatilho=TipoGatilhoAfiliado.primeira_recarga
-                )
-                
-                # --- Commit da transação ---
-                session_tx.commit()
-                print(f"SUCESSO: Saldo de {valor_creditado} creditado ao usuário {usuario.id}")
-            
-            # --- FIM DA TRANSAÇÃO DO BANCO ---
-
-            # --- ENVIO DA NOTIFICAÇÃO ---
-            # Esta parte agora está FORA do 'try/except' principal.
-            # Se a notificação falhar, ela não causará um ROLLBACK.
-            if telegram_id_para_notificar and mensagem_para_notificar:
-                try:
-                    send_telegram_message(
-                        telegram_id=telegram_id_para_notificar,
-                        message_text=mensagem_para_notificar
-                    )
-                except Exception as e_notify:
-                    print(f"ERRO (NÃO-CRÍTICO): Falha ao enviar notificação de recarga para {telegram_id_para_notificar}: {e_notify}")
-            
-            return {"status": "pagamento_creditado_sucesso"}
-        
-        else:
-            print(f"Pagamento {gateway_id_real} não está 'approved'. Status: {payment_status}")
-            return {"status": f"pagamento_{payment_status}"}
+    return {"status": "recebido"}
 
-    except Exception as e:
-        # Este 'except' agora só pega erros ANTES do commit
-        print(f"ERRO CRÍTICO no processamento do webhook: {e}")
-        # session.rollback() # O 'with Session' já faz o rollback automático
-        return {"status": "erro_interno"}
+
+# --- FILA DE EVENTOS DO WEBHOOK (ADMIN) ---
+
+@admin_router.get("/webhooks/fila", response_model=WebhookFilaStatus)
+def get_status_fila_webhooks(
+    *,
+    session: Session = Depends(get_session)
+):
+    """
+    [ADMIN] Profundidade e atraso da fila de eventos do Mercado Pago.
+    """
+    return WebhookFilaStatus(**status_fila_webhooks(session))
+
+
+@admin_router.get("/webhooks/eventos", response_model=List[WebhookEventoRead])
+def get_eventos_webhook(
+    *,
+    session: Session = Depends(get_session),
+    status_evento: Optional[StatusWebhookEvento] = None,
+    limit: int = 50,
+):
+    """
+    [ADMIN] Últimos eventos recebidos (filtrável por status).
+    """
+    stmt = (
+        select(WebhookEventoPagamento)
+        .order_by(WebhookEventoPagamento.ultimo_recebimento_em.desc())
+        .limit(min(max(limit, 1), 200))
+    )
+    if status_evento is not None:
+        stmt = stmt.where(WebhookEventoPagamento.status == status_evento)
+    return session.exec(stmt).all()
+
+
+@admin_router.post("/webhooks/eventos/{evento_id}/reprocessar", response_model=WebhookEventoRead)
+def reprocessar_evento_webhook(
+    *,
+    session: Session = Depends(get_session),
+    evento_id: uuid.UUID,
+):
+    """
+    [ADMIN] Devolve um evento que falhou para a fila.
+    """
+    evento = session.get(WebhookEventoPagamento, evento_id)
+    if not evento:
+        raise HTTPException(status_code=404, detail="Evento não encontrado.")
+    if evento.status != StatusWebhookEvento.FALHOU:
+        raise HTTPException(status_code=400, detail="Só eventos com falha podem ser reprocessados.")
+    return reprocessar_evento(session, evento)
+
+
+# --- RECONCILIAÇÃO COM O GATEWAY (ADMIN) ---
+
+@admin_router.post("/reconciliar", response_model=RecargaReconciliacaoResponse)
+def reconciliar_recargas(
+    *,
+    session: Session = Depends(get_session),
+):
+    """
+    [ADMIN] Roda agora a reconciliação das recargas pendentes com o gateway
+    (credita aprovadas cujo webhook se perdeu e expira as vencidas).
+    """
+    return recarga_reconciliacao_service.reconciliar_recargas_pendentes(session)
+
+
+@admin_router.get("/reconciliacao", response_model=Optional[RecargaReconciliacaoResponse])
+def get_ultima_reconciliacao():
+    """
+    [ADMIN] Contagens e latência da última reconciliação deste processo.
+    """
+    return recarga_reconciliacao_service.ultima_reconciliacao
@@ -0,0 +1,29 @@
+from fastapi import APIRouter, Depends
+
+from app.api.v1.deps import get_current_admin_user
+from app.core.config import settings
+from app.db.database import guarda_replica, monitores
+from app.schemas.sistema_schemas import BancoEstatisticasResponse
+
+router = APIRouter(dependencies=[Depends(get_current_admin_user)])
+
+
+@router.get("/banco/estatisticas", response_model=BancoEstatisticasResponse)
+def get_estatisticas_banco(reiniciar_pico: bool = False):
+    """
+    [ADMIN] Ocupação do pool e consultas lentas de cada engine deste
+    processo e, com réplica configurada, o atraso dela e quantas leituras
+    do painel foram para a réplica ou voltaram ao primário. Com
+    `reiniciar_pico=true`, o pico passa a contar a partir de agora (útil
+    para medir uma janela de carga).
+    """
+    engines = [monitor.estatisticas() for monitor in monitores.values()]
+    if reiniciar_pico:
+        for monitor in monitores.values():
+            monitor.reiniciar_pico()
+    return BancoEstatisticasResponse(
+        papel_processo=settings.DB_PAPEL,
+        modo_bot=settings.DB_MODO_BOT,
+        engines=engines,
+        replica=guarda_replica.estatisticas() if settings.DATABASE_REPLICA_URL else None,
+    )
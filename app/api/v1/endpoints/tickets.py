@@ -21,6 +21,7 @@ from app.schemas.estoque_schemas import EstoqueAdminReadDetails as SchemaEstoque
 from app.models.base import TipoStatusTicket
 from app.api.v1.deps import get_current_admin_user # O nosso "Cadeado"
 from app.services import security # Para descriptografar
+from app.services.disponibilidade_service import registrar_variacao_disponibilidade, slots_livres_conta
 #from app.worker.celery_app import celery_app # Para chamar a tarefa
 
 # Roteador para o Bot (criação de tickets)
@@ -73,8 +74,10 @@ def create_ticket_suporte(
             if not conta_problematica:
                 raise HTTPException(status_code=500, detail="Conta de estoque associada ao pedido não foi encontrada.")
             
+            slots_livres_antes = slots_livres_conta(conta_problematica)
             conta_problematica.requer_atencao = True
             session.add(conta_problematica)
+            registrar_variacao_disponibilidade(session, conta_problematica, slots_livres_antes)
         
         # 6. Criar o Ticket
         novo_ticket = TicketSuporte.model_validate(
@@ -10,8 +10,8 @@ from sqlmodel import Session, select
 
 from app.api.v1.deps import get_bot_api_key, get_current_admin_user
 from app.core.config import settings
-from app.db.database import get_session
-from app.models.base import InviteProviderProduto, StatusEntregaPedido, TipoStatusPagamento
+from app.db.database import get_read_session, get_session, get_worker_session
+from app.models.base import InviteProviderProduto, StatusEntregaPedido, TipoMovimentacaoCarteira, TipoStatusPagamento
 from app.models.conta_mae_models import (
     ContaMae,
     ContaMaeConvite,
@@ -38,6 +38,8 @@ from app.schemas.usuario_schemas import (
     UsuarioSaldoAjusteRequest,
     UsuarioSaldoAjusteResponse,
     UsuarioSaldoHistoricoRead,
+    UsuarioCarteiraReconstrucaoResponse,
+    UsuarioContadoresRecalculoResponse,
 )
 from app.schemas.conta_mae_schemas import ContaMaeInviteJobRead, ContaMaeSessionCleanupResponse
 from app.services.conta_mae_invite_service import (
@@ -46,7 +48,14 @@ from app.services.conta_mae_invite_service import (
     job_to_schema_payload,
     retry_invite_job,
 )
-from app.services.pedido_expiracao_service import resolver_data_expiracao_pedido
+from app.services.carteira_service import (
+    SaldoInsuficienteError,
+    creditar,
+    debitar,
+    definir_saldo,
+    reconstruir_saldos,
+)
+from app.services.usuario_contadores_service import recalcular_contadores_usuarios
 from app.services.conta_mae_member_removal_service import (
     create_member_removal_job_for_convite,
     enqueue_member_removal_job,
@@ -145,7 +154,7 @@ def get_or_create_usuario(session: Session, telegram_id: int, nome_completo: str
 
 
 @admin_router.get("/", response_model=list[UsuarioAdminRead])
-def get_admin_usuarios(*, session: Session = Depends(get_session)):
+def get_admin_usuarios(*, session: Session = Depends(get_read_session)):
     stmt = (
         select(
             Usuario.id,
@@ -175,6 +184,35 @@ def get_admin_usuarios(*, session: Session = Depends(get_session)):
     ]
 
 
+@admin_router.post("/carteira/reconstruir-saldos", response_model=UsuarioCarteiraReconstrucaoResponse)
+def reconstruir_saldos_carteira(
+    *,
+    corrigir: bool = True,
+    session: Session = Depends(get_worker_session),
+):
+    """
+    [ADMIN] Recalcula os saldos a partir do livro-razão (movimentacao_carteira).
+    Com `corrigir=false` apenas relata as divergências.
+    """
+    resultado = reconstruir_saldos(session, corrigir=corrigir)
+    if corrigir:
+        session.commit()
+    else:
+        session.rollback()
+    return resultado
+
+
+@admin_router.post("/contadores/recalcular", response_model=UsuarioContadoresRecalculoResponse)
+def recalcular_contadores(*, session: Session = Depends(get_worker_session)):
+    """
+    [ADMIN] Recalcula os contadores de recargas pagas e pedidos (e as datas
+    do primeiro evento) de todos os usuários a partir do histórico.
+    """
+    resultado = recalcular_contadores_usuarios(session)
+    session.commit()
+    return resultado
+
+
 @admin_router.post("/{usuario_id}/ajuste-saldo", response_model=UsuarioSaldoAjusteResponse)
 def ajustar_saldo_usuario(
     *,
@@ -188,27 +226,51 @@ def ajustar_saldo_usuario(
         raise HTTPException(status_code=404, detail="Usuário não encontrado.")
 
     valor_ajuste = ajuste.valor.quantize(TWO_DECIMAL_PLACES, rounding=ROUND_HALF_UP)
-    saldo_anterior = Decimal(usuario.saldo_carteira).quantize(TWO_DECIMAL_PLACES, rounding=ROUND_HALF_UP)
 
     if ajuste.operacao in ("ADICIONAR", "REMOVER") and valor_ajuste <= 0:
         raise HTTPException(status_code=400, detail="O valor do ajuste precisa ser maior que zero para adicionar ou remover saldo.")
     if ajuste.operacao == "DEFINIR" and valor_ajuste < 0:
         raise HTTPException(status_code=400, detail="Não é permitido definir saldo negativo.")
 
+    motivo = ajuste.motivo.strip() if ajuste.motivo and ajuste.motivo.strip() else None
+    historico_id = uuid.uuid4()
+    descricao_movimentacao = f"Ajuste admin ({ajuste.operacao}){f': {motivo}' if motivo else ''}"[:240]
+
     if ajuste.operacao == "ADICIONAR":
-        saldo_atual = saldo_anterior + valor_ajuste
+        saldo_atual = creditar(
+            session,
+            usuario.id,
+            valor_ajuste,
+            TipoMovimentacaoCarteira.AJUSTE_ADMIN,
+            referencia_id=historico_id,
+            descricao=descricao_movimentacao,
+        )
+        saldo_anterior = saldo_atual - valor_ajuste
     elif ajuste.operacao == "REMOVER":
-        if valor_ajuste > saldo_anterior:
-            raise HTTPException(status_code=400, detail=f"Saldo insuficiente para remoção. Saldo atual: R$ {saldo_anterior:.2f}")
-        saldo_atual = saldo_anterior - valor_ajuste
+        try:
+            saldo_atual = debitar(
+                session,
+                usuario.id,
+                valor_ajuste,
+                TipoMovimentacaoCarteira.AJUSTE_ADMIN,
+                referencia_id=historico_id,
+                descricao=descricao_movimentacao,
+            )
+        except SaldoInsuficienteError as exc:
+            raise HTTPException(status_code=400, detail=f"Saldo insuficiente para remoção. Saldo atual: R$ {exc.saldo_atual:.2f}")
+        saldo_anterior = saldo_atual + valor_ajuste
     else:
-        saldo_atual = valor_ajuste
-
-    saldo_atual = saldo_atual.quantize(TWO_DECIMAL_PLACES, rounding=ROUND_HALF_UP)
-    usuario.saldo_carteira = saldo_atual
-    motivo = ajuste.motivo.strip() if ajuste.motivo and ajuste.motivo.strip() else None
+        saldo_anterior, saldo_atual = definir_saldo(
+            session,
+            usuario.id,
+            valor_ajuste,
+            TipoMovimentacaoCarteira.AJUSTE_ADMIN,
+            referencia_id=historico_id,
+            descricao=descricao_movimentacao,
+        )
 
     historico = AjusteSaldoUsuario(
+        id=historico_id,
         operacao=ajuste.operacao,
         valor=valor_ajuste,
         saldo_anterior=saldo_anterior,
@@ -217,7 +279,6 @@ def ajustar_saldo_usuario(
         usuario_id=usuario.id,
         admin_id=current_admin.id,
     )
-    session.add(usuario)
     session.add(historico)
     session.commit()
 
@@ -358,9 +419,8 @@ def get_meus_pedidos(*, session: Session = Depends(get_session), telegram_id: in
             Produto.nome,
             Pedido.valor_pago,
             Pedido.criado_em,
-            Pedido.email_cliente,
-            Pedido.estoque_conta_id,
-            Pedido.conta_mae_id,
+            Pedido.data_expiracao_efetiva,
+            Pedido.origem_expiracao,
         )
         .join(Produto, Produto.id == Pedido.produto_id)
         .where(Pedido.usuario_id == usuario.id)
@@ -372,15 +432,7 @@ def get_meus_pedidos(*, session: Session = Depends(get_session), telegram_id: in
     today = datetime.date.today()
     lista_pedidos: list[UsuarioPedidoRead] = []
 
-    for (pid, pnome, vpago, data, email_cliente, estoque_conta_id, conta_mae_id) in resultados:
-        data_expiracao, origem_expiracao = resolver_data_expiracao_pedido(
-            session=session,
-            pedido_id=pid,
-            email_cliente=email_cliente,
-            estoque_conta_id=estoque_conta_id,
-            conta_mae_id=conta_mae_id,
-        )
-
+    for (pid, pnome, vpago, data, data_expiracao, origem_expiracao) in resultados:
         dias_restantes = None
         conta_expirada = False
         if data_expiracao:
@@ -416,34 +468,24 @@ def get_expiracoes_pendentes(*, session: Session = Depends(get_session), limite:
             Pedido.id,
             Usuario.telegram_id,
             Produto.nome,
-            Pedido.email_cliente,
-            Pedido.estoque_conta_id,
-            Pedido.conta_mae_id,
+            Pedido.data_expiracao_efetiva,
+            Pedido.origem_expiracao,
         )
         .join(Usuario, Usuario.id == Pedido.usuario_id)
         .join(Produto, Produto.id == Pedido.produto_id)
+        .where(Pedido.data_expiracao_efetiva == today)
         .where(Pedido.status_entrega == StatusEntregaPedido.ENTREGUE)
+        .where(
+            (Pedido.ultima_data_expiracao_notificada == None)
+            | (Pedido.ultima_data_expiracao_notificada != today)
+        )
         .order_by(Pedido.criado_em.desc())
         .limit(limite)
     )
 
     resultados = session.exec(stmt).all()
     pendentes: list[UsuarioExpiracaoPendenteRead] = []
-    for (pedido_id, telegram_id, produto_nome, email_cliente, estoque_conta_id, conta_mae_id) in resultados:
-        data_expiracao, origem_expiracao = resolver_data_expiracao_pedido(
-            session=session,
-            pedido_id=pedido_id,
-            email_cliente=email_cliente,
-            estoque_conta_id=estoque_conta_id,
-            conta_mae_id=conta_mae_id,
-        )
-        if not data_expiracao or data_expiracao != today:
-            continue
-
-        pedido = session.get(Pedido, pedido_id)
-        if not pedido or pedido.ultima_data_expiracao_notificada == today:
-            continue
-
+    for (pedido_id, telegram_id, produto_nome, data_expiracao, origem_expiracao) in resultados:
         pendentes.append(
             UsuarioExpiracaoPendenteRead(
                 pedido_id=pedido_id,
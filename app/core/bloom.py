@@ -0,0 +1,48 @@
+import hashlib
+import math
+import threading
+from typing import Iterable
+
+
+class FiltroBloom:
+    """
+    Filtro de Bloom: responde "com certeza não existe" ou "talvez exista".
+    Não remove itens; quem usa reconstrói o filtro quando as remoções
+    acumuladas deixam de ser desprezíveis.
+    """
+
+    def __init__(self, capacidade: int, taxa_falso_positivo: float = 0.001):
+        capacidade = max(capacidade, 1)
+        self.capacidade = capacidade
+        self.taxa_falso_positivo = taxa_falso_positivo
+        self.num_bits = max(64, int(-capacidade * math.log(taxa_falso_positivo) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacidade * math.log(2)))
+        self.itens = 0
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self._lock = threading.Lock()
+
+    def _posicoes(self, item: str) -> list[int]:
+        # Hashing duplo (Kirsch-Mitzenmacher): k posições a partir de dois hashes de 64 bits.
+        digest = hashlib.blake2b(item.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def adicionar(self, item: str) -> None:
+        posicoes = self._posicoes(item)
+        with self._lock:
+            for posicao in posicoes:
+                self._bits[posicao >> 3] |= 1 << (posicao & 7)
+            self.itens += 1
+
+    def adicionar_varios(self, itens: Iterable[str]) -> None:
+        for item in itens:
+            self.adicionar(item)
+
+    def __contains__(self, item: str) -> bool:
+        bits = self._bits
+        return all(bits[posicao >> 3] & (1 << (posicao & 7)) for posicao in self._posicoes(item))
+
+    @property
+    def cheio(self) -> bool:
+        return self.itens > self.capacidade
@@ -0,0 +1,77 @@
+import threading
+from typing import Optional
+
+from app.core.concorrencia import executar_bloqueante
+from app.core.config import settings
+
+
+class BackendVersaoLocal:
+    """
+    Carimbos de versão mantidos no próprio processo. Cada worker do uvicorn
+    só enxerga as invalidações feitas por ele mesmo.
+    """
+
+    nome = "local"
+    bloqueante = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versoes: dict[str, int] = {}
+
+    def versao_atual(self, chave: str) -> int:
+        return self._versoes.get(chave, 0)
+
+    def incrementar(self, chave: str) -> int:
+        with self._lock:
+            self._versoes[chave] = self._versoes.get(chave, 0) + 1
+            return self._versoes[chave]
+
+
+class BackendVersaoRedis:
+    """
+    Carimbos de versão guardados no Redis (INCR/GET), compartilhados por
+    todos os workers. Requer o pacote `redis`. As chamadas passam por
+    `executar_bloqueante`: nas rotas assíncronas vão para uma thread.
+    """
+
+    nome = "redis"
+    bloqueante = True
+    PREFIXO = "bot-vendas:cache-versao:"
+
+    def __init__(self, url: str):
+        import redis
+
+        self._cliente = redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1)
+
+    def versao_atual(self, chave: str) -> int:
+        valor = executar_bloqueante(self._cliente.get, self.PREFIXO + chave)
+        return int(valor) if valor is not None else 0
+
+    def incrementar(self, chave: str) -> int:
+        return int(executar_bloqueante(self._cliente.incr, self.PREFIXO + chave))
+
+
+_backend: Optional[object] = None
+_backend_lock = threading.Lock()
+
+
+def _criar_backend():
+    if (settings.CACHE_BACKEND or "local").strip().lower() == "redis":
+        url = settings.CACHE_REDIS_URL or settings.CELERY_BROKER_URL
+        if url and url.startswith(("redis://", "rediss://")):
+            try:
+                return BackendVersaoRedis(url)
+            except ImportError:
+                print("AVISO: CACHE_BACKEND=redis, mas o pacote 'redis' não está instalado. Usando backend local.")
+        else:
+            print("AVISO: CACHE_BACKEND=redis sem CACHE_REDIS_URL válida. Usando backend local.")
+    return BackendVersaoLocal()
+
+
+def get_backend_versao():
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = _criar_backend()
+    return _backend
@@ -0,0 +1,23 @@
+import asyncio
+from typing import Callable, TypeVar
+
+from sqlalchemy.util.concurrency import await_only, in_greenlet
+
+T = TypeVar("T")
+
+
+def executar_bloqueante(funcao: Callable[..., T], *args, **kwargs) -> T:
+    """
+    Chama `funcao` (I/O bloqueante: Redis, Celery, psycopg2) sem travar o
+    event loop. Dentro de `AsyncSession.run_sync` ou de um commit assíncrono
+    o código síncrono roda num greenlet na thread do loop; nesse caso a
+    chamada vai para uma thread e só o greenlet espera por ela. Em qualquer
+    outro contexto (rotas síncronas, workers) a chamada é direta.
+
+    Não segure um threading.Lock ao chamar isto dentro do greenlet: outra
+    requisição no mesmo loop que tente pegar o lock trava a thread do loop.
+    Leve o trecho inteiro com o lock para a thread.
+    """
+    if in_greenlet():
+        return await_only(asyncio.to_thread(funcao, *args, **kwargs))
+    return funcao(*args, **kwargs)
@@ -10,6 +10,36 @@ class Settings(BaseSettings):
     JWT_SECRET_KEY: str
     AES_ENCRYPTION_KEY: str
     CELERY_BROKER_URL: str | None = None
+    # Modo de sessão das rotas quentes do bot (produtos, compra, perfil,
+    # status da recarga e resgate de gift card): "sync" (threadpool +
+    # psycopg2) ou "async" (event loop + asyncpg).
+    DB_MODO_BOT: str = "sync"
+    DB_ASYNC_POOL_SIZE: int = 20
+    DB_ASYNC_MAX_OVERFLOW: int = 10
+    # Perfil da engine pelo papel do processo: "api", "worker" (Celery) ou
+    # "scheduler". Os padrões de cada papel ficam em app/db/perfis.py; as
+    # variáveis DB_POOL_*/DB_*_TIMEOUT_MS, se definidas, sobrescrevem os do
+    # papel deste processo.
+    DB_PAPEL: str = "api"
+    DB_POOL_SIZE: int | None = None
+    DB_MAX_OVERFLOW: int | None = None
+    DB_POOL_TIMEOUT_SECONDS: float | None = None
+    DB_POOL_RECYCLE_SECONDS: int | None = None
+    DB_POOL_PRE_PING: bool | None = None
+    DB_STATEMENT_TIMEOUT_MS: int | None = None
+    DB_LOCK_TIMEOUT_MS: int | None = None
+    DB_APPLICATION_NAME: str = "bot-vendas"
+    # SQL no log: só as consultas acima de DB_SLOW_QUERY_MS, amostradas.
+    # DB_ECHO liga o echo do SQLAlchemy (todas as queries), só para debug.
+    DB_ECHO: bool = False
+    DB_SLOW_QUERY_MS: int = 500
+    DB_SLOW_QUERY_AMOSTRAGEM: float = 1.0
+    # Réplica de leitura para os dashboards e listagens do painel admin.
+    # Acima do atraso máximo (medido a cada DB_REPLICA_VERIFICAR_SECONDS)
+    # as leituras voltam ao primário.
+    DATABASE_REPLICA_URL: str | None = None
+    DB_REPLICA_LAG_MAXIMO_SECONDS: float = 10
+    DB_REPLICA_VERIFICAR_SECONDS: float = 5
 
     BOT_API_KEY: str
     MERCADOPAGO_ACCESS_TOKEN: str
@@ -21,7 +51,25 @@ class Settings(BaseSettings):
     EMAIL_MONITOR_IMAP_TIMEOUT_SECONDS: int = 20
     EMAIL_MONITOR_MAX_BODY_CHARS: int = 20000
     EMAIL_MONITOR_SYNC_BATCH_SIZE: int = 100
+    # Mensagens por UID FETCH (o lote seguinte já vai pedido enquanto o
+    # atual é gravado).
+    EMAIL_MONITOR_FETCH_CHUNK_SIZE: int = 25
     EMAIL_MONITOR_WEBHOOK_TIMEOUT_SECONDS: int = 5
+    # Regras compiladas por conta: invalidadas pelo carimbo de versão do
+    # CACHE_BACKEND ao criar/editar regras; o TTL cobre outros processos.
+    EMAIL_MONITOR_RULES_CACHE_TTL_SECONDS: int = 300
+    # Ciclo do scheduler: contas em paralelo, com limite por servidor IMAP
+    # e prazo total (o que não começar até lá fica para o próximo ciclo).
+    EMAIL_MONITOR_SYNC_CONCURRENCY: int = 4
+    EMAIL_MONITOR_SYNC_MAX_PER_HOST: int = 2
+    EMAIL_MONITOR_SYNC_CYCLE_DEADLINE_SECONDS: int = 240
+    # Modo push: uma conexão por pasta em IMAP IDLE dispara a sincronização
+    # incremental assim que o servidor avisa de mensagem nova. Servidores
+    # sem IDLE (e pastas com a conexão caída) seguem no polling acima.
+    IMAP_IDLE_ENABLED: bool = True
+    IMAP_IDLE_RENEW_SECONDS: int = 1500
+    IMAP_IDLE_SUPERVISOR_INTERVAL_SECONDS: int = 30
+    IMAP_IDLE_BACKOFF_MAX_SECONDS: int = 300
     OPENAI_INVITE_AUTOMATION_ENABLED: bool = True
     OPENAI_INVITE_BASE_URL: str = "https://chatgpt.com"
     OPENAI_INVITE_MEMBERS_URL: str = "https://chatgpt.com/admin"
@@ -54,8 +102,82 @@ class Settings(BaseSettings):
     OPENAI_WORKSPACE_MEMBER_WARNING_DAYS: int = 30
     OPENAI_WORKSPACE_MEMBER_GRACE_DAYS: int = 5
 
+    # Cliente HTTP de saída compartilhado (app/core/http_client.py).
+    HTTP_TIMEOUT_CONEXAO_SECONDS: float = 5.0
+    HTTP_TIMEOUT_LEITURA_SECONDS: float = 20.0
+    HTTP_POOL_HOSTS: int = 10
+    HTTP_POOL_MAXSIZE: int = 20
+    HTTP_MAX_TENTATIVAS: int = 3
+    HTTP_BACKOFF_BASE_SECONDS: float = 0.3
+    HTTP_BACKOFF_MAX_SECONDS: float = 5.0
+    HTTP_CIRCUITO_LIMITE_FALHAS: int = 5
+    HTTP_CIRCUITO_RESET_SECONDS: float = 30.0
+
     RECARGA_EXPIRACAO_MINUTOS: int = 30
 
+    # Processador dos eventos do webhook do Mercado Pago (fila no banco).
+    WEBHOOK_MP_PROCESSADOR_ENABLED: bool = True
+    WEBHOOK_MP_LOTE: int = 50
+    WEBHOOK_MP_CONCORRENCIA: int = 4
+    WEBHOOK_MP_MAX_TENTATIVAS: int = 10
+
+    # Reconciliação das recargas pendentes com o gateway ("mercadopago" ou
+    # "stub", que responde "pending" para tudo; útil em desenvolvimento).
+    RECARGA_RECONCILIACAO_ENABLED: bool = True
+    RECARGA_RECONCILIACAO_GATEWAY: str = "mercadopago"
+    RECARGA_RECONCILIACAO_INTERVALO_SECONDS: int = 300
+    RECARGA_RECONCILIACAO_LOTE: int = 100
+    RECARGA_RECONCILIACAO_CONCORRENCIA: int = 8
+
+    # Consolidação das variações dos agregados do dashboard (o checkout só
+    # as grava; o dashboard reflete as vendas com este atraso).
+    DASHBOARD_AGREGADOS_CONSOLIDADOR_ENABLED: bool = True
+    DASHBOARD_AGREGADOS_CONSOLIDAR_SECONDS: int = 10
+    DASHBOARD_AGREGADOS_CONSOLIDAR_LOTE: int = 5000
+
+    # Despachante do outbox do Telegram. Rode-o em um único processo (a API
+    # por padrão, ou `python -m app.services.telegram_outbox_service` com
+    # TELEGRAM_DISPATCHER_ENABLED=false na API) para os limites valerem.
+    TELEGRAM_DISPATCHER_ENABLED: bool = True
+    TELEGRAM_RATE_GLOBAL_POR_SEGUNDO: float = 25.0
+    TELEGRAM_RATE_POR_CHAT_POR_SEGUNDO: float = 1.0
+    TELEGRAM_OUTBOX_LOTE: int = 50
+    TELEGRAM_OUTBOX_MAX_TENTATIVAS: int = 8
+    TELEGRAM_HTTP_TIMEOUT_SECONDS: int = 10
+
+    # Broadcasts: o executor divide o limite global acima com o despachante
+    # do mesmo processo. Num worker Celery separado, reduza a taxa global lá
+    # para que a soma dos processos fique abaixo do limite do bot.
+    BROADCAST_CONCORRENCIA: int = 20
+    BROADCAST_TAMANHO_PAGINA: int = 500
+    BROADCAST_MAX_TENTATIVAS: int = 3
+    BROADCAST_HEARTBEAT_EXPIRA_SECONDS: int = 300
+
+    # Carimbos de versão dos caches em memória: "local" (por processo) ou
+    # "redis" (compartilhado entre workers; usa CACHE_REDIS_URL ou o broker).
+    CACHE_BACKEND: str = "local"
+    CACHE_REDIS_URL: str | None = None
+    CATALOGO_CACHE_ENABLED: bool = True
+    CATALOGO_CACHE_TTL_SECONDS: int = 300
+    # Configuração do sistema em memória. Além do carimbo do backend, a cópia
+    # é conferida contra a coluna `versao` no banco a cada N segundos: é o
+    # atraso máximo para outro processo enxergar o modo manutenção.
+    CONFIGURACAO_CACHE_ENABLED: bool = True
+    CONFIGURACAO_CACHE_REVALIDAR_SECONDS: int = 5
+
+    # Gift cards: acima deste número o POST /admin/giftcards/ recusa e o
+    # admin deve usar os lotes (geração em segundo plano + CSV).
+    GIFTCARD_CRIACAO_SINCRONA_MAX: int = 1000
+    GIFTCARD_LOTE_BLOCO: int = 5000
+    GIFTCARD_LOTE_MAX_RODADAS_COLISAO: int = 10
+    # Resgate: filtro de Bloom dos códigos existentes (recusa códigos
+    # inexistentes sem ir ao banco) e limite de tentativas por telegram_id.
+    GIFTCARD_FILTRO_ENABLED: bool = True
+    GIFTCARD_FILTRO_TAXA_FALSO_POSITIVO: float = 0.001
+    GIFTCARD_FILTRO_SINCRONIZAR_SECONDS: int = 10
+    GIFTCARD_RESGATE_TENTATIVAS_POR_MINUTO: float = 6
+    GIFTCARD_RESGATE_RAJADA: int = 5
+
     model_config = SettingsConfigDict(env_file=".env")
 
 
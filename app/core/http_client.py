@@ -0,0 +1,322 @@
+import asyncio
+import random
+import threading
+import time
+from collections import deque
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from app.core.config import settings
+
+# Chamadas HTTP de saída (Telegram, Mercado Pago, Asaas, webhooks do
+# monitor de e-mail) passam por aqui: conexões keep-alive por host,
+# timeouts padrão, retentativas com jitter e um disjuntor por upstream.
+
+METODOS_IDEMPOTENTES = frozenset({"GET", "HEAD", "OPTIONS", "PUT", "DELETE"})
+STATUS_RETENTAVEIS = frozenset({429, 502, 503, 504})
+AMOSTRAS_LATENCIA = 512
+
+
+class CircuitoAbertoError(Exception):
+    """O upstream falhou demais recentemente; a chamada nem foi feita."""
+
+    def __init__(self, upstream: str, segundos_restantes: float):
+        super().__init__(f"Circuito aberto para '{upstream}' (tenta de novo em {segundos_restantes:.0f}s).")
+        self.upstream = upstream
+        self.segundos_restantes = segundos_restantes
+
+
+class Disjuntor:
+    """
+    Disjuntor por upstream: abre após `limite_falhas` falhas seguidas,
+    rejeita chamadas por `segundos_reset` e então deixa uma chamada de
+    teste passar (meio-aberto); sucesso fecha, falha reabre.
+    """
+
+    FECHADO = "FECHADO"
+    ABERTO = "ABERTO"
+    MEIO_ABERTO = "MEIO_ABERTO"
+
+    def __init__(self, upstream: str, limite_falhas: int, segundos_reset: float, relogio=time.monotonic):
+        self.upstream = upstream
+        self.limite_falhas = limite_falhas
+        self.segundos_reset = segundos_reset
+        self.relogio = relogio
+        self.estado = self.FECHADO
+        self.falhas_seguidas = 0
+        self.aberto_em = 0.0
+        self._teste_em_andamento = False
+        self._lock = threading.Lock()
+
+    def permitir(self) -> None:
+        with self._lock:
+            if self.estado == self.FECHADO:
+                return
+            restante = self.aberto_em + self.segundos_reset - self.relogio()
+            if self.estado == self.ABERTO and restante <= 0:
+                self.estado = self.MEIO_ABERTO
+                self._teste_em_andamento = False
+            if self.estado == self.MEIO_ABERTO and not self._teste_em_andamento:
+                self._teste_em_andamento = True
+                return
+            raise CircuitoAbertoError(self.upstream, max(restante, 0.0))
+
+    def registrar_sucesso(self) -> None:
+        with self._lock:
+            self.estado = self.FECHADO
+            self.falhas_seguidas = 0
+            self._teste_em_andamento = False
+
+    def registrar_falha(self) -> None:
+        with self._lock:
+            self.falhas_seguidas += 1
+            if self.estado == self.MEIO_ABERTO or self.falhas_seguidas >= self.limite_falhas:
+                if self.estado != self.ABERTO:
+                    print(f"HTTP_CLIENT: circuito ABERTO para '{self.upstream}' após {self.falhas_seguidas} falha(s).")
+                self.estado = self.ABERTO
+                self.aberto_em = self.relogio()
+                self._teste_em_andamento = False
+
+
+class MetricasUpstream:
+    def __init__(self):
+        self.chamadas = 0
+        self.erros = 0
+        self.retentativas = 0
+        self.rejeitadas_circuito = 0
+        self.latencias_ms: deque[float] = deque(maxlen=AMOSTRAS_LATENCIA)
+        self._lock = threading.Lock()
+
+    def registrar(self, latencia_ms: float, erro: bool) -> None:
+        with self._lock:
+            self.chamadas += 1
+            self.erros += int(erro)
+            self.latencias_ms.append(latencia_ms)
+
+    def percentil(self, p: float) -> Optional[float]:
+        amostras = sorted(self.latencias_ms)
+        if not amostras:
+            return None
+        return round(amostras[min(len(amostras) - 1, int(len(amostras) * p))], 1)
+
+
+class _Upstream:
+    def __init__(self, nome: str):
+        self.nome = nome
+        self.disjuntor = Disjuntor(
+            nome,
+            limite_falhas=settings.HTTP_CIRCUITO_LIMITE_FALHAS,
+            segundos_reset=settings.HTTP_CIRCUITO_RESET_SECONDS,
+        )
+        self.metricas = MetricasUpstream()
+
+
+_upstreams: dict[str, _Upstream] = {}
+_upstreams_lock = threading.Lock()
+
+
+def _upstream(nome: str) -> _Upstream:
+    upstream = _upstreams.get(nome)
+    if upstream is None:
+        with _upstreams_lock:
+            upstream = _upstreams.setdefault(nome, _Upstream(nome))
+    return upstream
+
+
+def metricas_upstreams() -> list[dict]:
+    """
+    Fotografia das métricas de cada upstream chamado por este processo.
+    """
+    resultado = []
+    for nome, upstream in sorted(_upstreams.items()):
+        metricas = upstream.metricas
+        resultado.append(
+            {
+                "upstream": nome,
+                "estado_circuito": upstream.disjuntor.estado,
+                "chamadas": metricas.chamadas,
+                "erros": metricas.erros,
+                "retentativas": metricas.retentativas,
+                "rejeitadas_circuito": metricas.rejeitadas_circuito,
+                "latencia_p50_ms": metricas.percentil(0.5),
+                "latencia_p95_ms": metricas.percentil(0.95),
+            }
+        )
+    return resultado
+
+
+def _timeout_padrao():
+    return (settings.HTTP_TIMEOUT_CONEXAO_SECONDS, settings.HTTP_TIMEOUT_LEITURA_SECONDS)
+
+
+def _espera_backoff(tentativa: int, retry_after: Optional[str] = None) -> float:
+    if retry_after:
+        try:
+            return min(float(retry_after), settings.HTTP_BACKOFF_MAX_SECONDS)
+        except ValueError:
+            pass
+    teto = min(settings.HTTP_BACKOFF_MAX_SECONDS, settings.HTTP_BACKOFF_BASE_SECONDS * (2 ** tentativa))
+    return random.uniform(0, teto)  # "full jitter"
+
+
+class _PoliticaChamada:
+    """
+    Decide upstream, tentativas e se uma resposta/erro deve ser repetida.
+    Compartilhada pelas faces síncrona e assíncrona.
+    """
+
+    def __init__(self, method: str, url: str, upstream: Optional[str], tentativas: Optional[int], idempotente: Optional[bool], headers):
+        self.upstream = _upstream(upstream or urlsplit(url).hostname or "desconhecido")
+        if idempotente is None:
+            cabecalhos = {chave.lower() for chave in (headers or {})}
+            idempotente = method.upper() in METODOS_IDEMPOTENTES or "x-idempotency-key" in cabecalhos
+        self.tentativas = max(1, tentativas if tentativas is not None else (settings.HTTP_MAX_TENTATIVAS if idempotente else 1))
+
+    def antes(self) -> float:
+        try:
+            self.upstream.disjuntor.permitir()
+        except CircuitoAbertoError:
+            with self.upstream.metricas._lock:
+                self.upstream.metricas.rejeitadas_circuito += 1
+            raise
+        return time.monotonic()
+
+    def depois(self, inicio: float, status_code: Optional[int]) -> bool:
+        """Registra a chamada; retorna True se ela contou como falha do upstream."""
+        falhou = status_code is None or status_code >= 500
+        self.upstream.metricas.registrar((time.monotonic() - inicio) * 1000, falhou or status_code == 429)
+        if falhou:
+            self.upstream.disjuntor.registrar_falha()
+        else:
+            self.upstream.disjuntor.registrar_sucesso()
+        return falhou
+
+    def repetir(self, tentativa: int, status_code: Optional[int]) -> bool:
+        if tentativa + 1 >= self.tentativas:
+            return False
+        if status_code is not None and status_code not in STATUS_RETENTAVEIS:
+            return False
+        with self.upstream.metricas._lock:
+            self.upstream.metricas.retentativas += 1
+        return True
+
+
+class ClienteHttp:
+    """
+    Face síncrona: um `requests.Session` compartilhado (pool keep-alive por host).
+    Métodos não idempotentes só são repetidos com `idempotente=True` ou
+    cabeçalho X-Idempotency-Key.
+    """
+
+    def __init__(self, session: Optional[requests.Session] = None):
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(
+                pool_connections=settings.HTTP_POOL_HOSTS,
+                pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+            )
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+        self.session = session
+
+    def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        upstream: Optional[str] = None,
+        tentativas: Optional[int] = None,
+        idempotente: Optional[bool] = None,
+        **kwargs,
+    ) -> requests.Response:
+        politica = _PoliticaChamada(method, url, upstream, tentativas, idempotente, kwargs.get("headers"))
+        kwargs.setdefault("timeout", _timeout_padrao())
+        tentativa = 0
+        while True:
+            inicio = politica.antes()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.exceptions.RequestException:
+                politica.depois(inicio, None)
+                if not politica.repetir(tentativa, None):
+                    raise
+                time.sleep(_espera_backoff(tentativa))
+            else:
+                politica.depois(inicio, response.status_code)
+                if not politica.repetir(tentativa, response.status_code):
+                    return response
+                time.sleep(_espera_backoff(tentativa, response.headers.get("Retry-After")))
+            tentativa += 1
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+
+class ClienteHttpAsync:
+    """
+    Face assíncrona sobre `httpx.AsyncClient`. O pool pertence ao event
+    loop em que foi criado, então use como `async with` dentro do loop;
+    disjuntores e métricas são os mesmos da face síncrona.
+    """
+
+    def __init__(
+        self,
+        *,
+        max_conexoes: Optional[int] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        max_conexoes = max_conexoes or settings.HTTP_POOL_MAXSIZE
+        conexao, leitura = _timeout_padrao()
+        self.client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_conexoes, max_keepalive_connections=max_conexoes),
+            timeout=httpx.Timeout(leitura, connect=conexao),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "ClienteHttpAsync":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.client.aclose()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        *,
+        upstream: Optional[str] = None,
+        tentativas: Optional[int] = None,
+        idempotente: Optional[bool] = None,
+        **kwargs,
+    ) -> httpx.Response:
+        politica = _PoliticaChamada(method, url, upstream, tentativas, idempotente, kwargs.get("headers"))
+        tentativa = 0
+        while True:
+            inicio = politica.antes()
+            try:
+                response = await self.client.request(method, url, **kwargs)
+            except httpx.HTTPError:
+                politica.depois(inicio, None)
+                if not politica.repetir(tentativa, None):
+                    raise
+                await asyncio.sleep(_espera_backoff(tentativa))
+            else:
+                politica.depois(inicio, response.status_code)
+                if not politica.repetir(tentativa, response.status_code):
+                    return response
+                await asyncio.sleep(_espera_backoff(tentativa, response.headers.get("Retry-After")))
+            tentativa += 1
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, **kwargs)
+
+
+# Cliente síncrono compartilhado pelo processo.
+http_client = ClienteHttp()
@@ -1,13 +1,54 @@
+import threading
+
 from sqlmodel import create_engine, Session
 from app.core.config import settings
+from app.db.monitoramento import MonitorEngine
+from app.db.perfis import PAPEL_WORKER, argumentos_engine, argumentos_engine_async, montar_perfil
+from app.db.replica import CONSULTA_LAG, GuardaReplica
+
+# Monitores (consultas lentas + ocupação do pool) por engine, para o
+# endpoint de estatísticas do banco.
+monitores: dict[str, MonitorEngine] = {}
+_engines = {}
+_engines_lock = threading.Lock()
+
+
+def _criar_engine(papel: str, url: str, somente_leitura: bool = False):
+    perfil = montar_perfil(papel)
+    # echo só para debug local (DB_ECHO): em produção as consultas lentas
+    # aparecem pelo monitor, amostradas.
+    nova_engine = create_engine(url, echo=settings.DB_ECHO, **argumentos_engine(perfil, somente_leitura))
+    nome = f"{papel}-replica" if somente_leitura else papel
+    monitor = MonitorEngine(nome, settings.DB_SLOW_QUERY_MS, settings.DB_SLOW_QUERY_AMOSTRAGEM)
+    monitor.instrumentar(nova_engine)
+    monitores[nome] = monitor
+    return nova_engine
+
+
+def _engine_em_cache(chave: str, criar):
+    nova_engine = _engines.get(chave)
+    if nova_engine is None:
+        with _engines_lock:
+            nova_engine = _engines.get(chave)
+            if nova_engine is None:
+                nova_engine = _engines[chave] = criar()
+    return nova_engine
+
+
+def get_engine(papel: str | None = None):
+    """
+    Engine do papel pedido (padrão: DB_PAPEL do processo), criada uma vez
+    por processo. Os laços em segundo plano que rodam dentro da API usam a
+    engine "scheduler", com pool e timeouts próprios.
+    """
+    papel = papel or settings.DB_PAPEL
+    return _engine_em_cache(papel, lambda: _criar_engine(papel, settings.DATABASE_URL))
+
 
 # 1. Criar a "Engine" do Banco de Dados
-# Esta é a conexão central com o seu PostgreSQL.
-# Usamos a DATABASE_URL que o 'settings' leu do .env
-#
-# echo=True: Faz o SQLModel logar todas as queries SQL no console.
-# Isso é INCRÍVEL para debug em desenvolvimento.
-engine = create_engine(settings.DATABASE_URL, echo=True)
+# Esta é a conexão central com o seu PostgreSQL, configurada pelo perfil
+# do papel deste processo (app/db/perfis.py).
+engine = get_engine()
 
 
 # 2. Definir a Função de "Gerador de Sessão"
@@ -26,4 +67,96 @@ def get_session():
     #
     # Isso previne vazamento de conexões.
     with Session(engine) as session:
-        yield session
\ No newline at end of file
+        yield session
+
+
+def get_worker_session():
+    """
+    Sessão na engine "worker" (statement_timeout de minutos) para as rotas
+    admin de manutenção que varrem tabelas inteiras, como as reconstruções
+    de saldos, contadores e agregados. Na engine da API elas esbarram nos
+    30 s. A engine só é criada no primeiro uso.
+    """
+    with Session(get_engine(PAPEL_WORKER)) as session:
+        yield session
+
+
+# 3. Engine e sessão ASSÍNCRONAS (rotas quentes do bot, DB_MODO_BOT="async")
+# Criadas sob demanda: com o modo "sync" o asyncpg nem precisa estar instalado.
+_async_engine = None
+
+
+def _url_async(url: str) -> str:
+    """Troca o driver da DATABASE_URL pelo asyncpg (mesmo banco, mesmas credenciais)."""
+    for prefixo in ("postgresql+psycopg2://", "postgresql://", "postgres://"):
+        if url.startswith(prefixo):
+            return "postgresql+asyncpg://" + url[len(prefixo):]
+    return url
+
+
+def get_async_engine():
+    global _async_engine
+    if _async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        perfil = montar_perfil()
+        _async_engine = create_async_engine(
+            _url_async(settings.DATABASE_URL),
+            echo=settings.DB_ECHO,
+            **argumentos_engine_async(perfil),
+        )
+        monitor = MonitorEngine(f"{perfil.papel}-async", settings.DB_SLOW_QUERY_MS, settings.DB_SLOW_QUERY_AMOSTRAGEM)
+        monitor.instrumentar(_async_engine.sync_engine)
+        monitores[monitor.papel] = monitor
+    return _async_engine
+
+
+async def get_async_session():
+    """
+    Versão assíncrona do get_session. `session.run_sync(fn)` entrega a `fn`
+    uma Session síncrona comum cujo I/O corre no asyncpg sem bloquear o
+    event loop, então os serviços síncronos podem ser reaproveitados.
+    """
+    from sqlmodel.ext.asyncio.session import AsyncSession
+
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        yield session
+
+
+# 4. Réplica de leitura (painel admin)
+# Com DATABASE_REPLICA_URL definida, as rotas de leitura pesada do painel
+# usam get_read_session: réplica enquanto o atraso estiver abaixo de
+# DB_REPLICA_LAG_MAXIMO_SECONDS, primário caso contrário.
+def get_replica_engine():
+    return _engine_em_cache(
+        f"{settings.DB_PAPEL}-replica",
+        lambda: _criar_engine(settings.DB_PAPEL, settings.DATABASE_REPLICA_URL, somente_leitura=True),
+    )
+
+
+def _medir_lag_replica():
+    with get_replica_engine().connect() as conexao:
+        return conexao.execute(CONSULTA_LAG).scalar()
+
+
+guarda_replica = GuardaReplica(
+    _medir_lag_replica,
+    lag_maximo=settings.DB_REPLICA_LAG_MAXIMO_SECONDS,
+    verificar_a_cada=settings.DB_REPLICA_VERIFICAR_SECONDS,
+)
+
+
+def get_engine_leitura():
+    if settings.DATABASE_REPLICA_URL and guarda_replica.usar_replica():
+        return get_replica_engine()
+    return engine
+
+
+def get_read_session():
+    """
+    Sessão para leituras do painel admin que toleram alguns segundos de
+    atraso (dashboards, listagens). Na réplica as conexões são somente
+    leitura: não use em rotas que gravam.
+    """
+    with Session(get_engine_leitura()) as session:
+        yield session
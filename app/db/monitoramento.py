@@ -0,0 +1,142 @@
+import random
+import threading
+import time
+from typing import Callable
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class MonitorEngine:
+    """
+    Instrumenta uma engine: registra as consultas lentas (em vez do
+    `echo`, que imprimia todas) e acompanha a ocupação do pool.
+
+    Consultas acima de `limite_ms` são sempre contadas; o texto é impresso
+    para uma fração `amostragem` delas, para não inundar o log quando o
+    banco inteiro fica lento. Os parâmetros nunca são impressos.
+    """
+
+    def __init__(
+        self,
+        papel: str,
+        limite_ms: int,
+        amostragem: float = 1.0,
+        sortear: Callable[[], float] = random.random,
+    ):
+        self.papel = papel
+        self.limite_ms = limite_ms
+        self.amostragem = amostragem
+        self._sortear = sortear
+        self._lock = threading.Lock()
+        self._pool = None
+        self.consultas = 0
+        self.lentas = 0
+        self.lentas_registradas = 0
+        self.tempo_total_ms = 0.0
+        self.mais_lenta_ms = 0.0
+        self.checkouts = 0
+        self.em_uso = 0
+        self.pico_em_uso = 0
+        self.conexoes_abertas = 0
+        self.invalidacoes = 0
+
+    def instrumentar(self, engine: Engine) -> None:
+        self._pool = engine.pool
+        event.listen(engine, "before_cursor_execute", self._antes)
+        event.listen(engine, "after_cursor_execute", self._depois)
+        event.listen(engine.pool, "connect", self._conectou)
+        event.listen(engine.pool, "checkout", self._checkout)
+        event.listen(engine.pool, "checkin", self._checkin)
+        event.listen(engine.pool, "invalidate", self._invalidou)
+        # Invalidar fecha a conexão e dispara "close": só estes dois decrementam.
+        event.listen(engine.pool, "close", self._fechou)
+        event.listen(engine.pool, "close_detached", self._fechou_desanexada)
+
+    # --- Consultas ---
+
+    def _antes(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        # Um cursor por vez por conexão; se a consulta falhar, o próximo
+        # `_antes` sobrescreve o início que ficou para trás.
+        conn.info["monitor_inicio"] = time.perf_counter()
+
+    def _depois(self, conn, cursor, statement, parameters, context, executemany) -> None:
+        inicio = conn.info.pop("monitor_inicio", None)
+        if inicio is None:
+            return
+        duracao_ms = (time.perf_counter() - inicio) * 1000
+        registrar = False
+        with self._lock:
+            self.consultas += 1
+            self.tempo_total_ms += duracao_ms
+            if duracao_ms >= self.limite_ms:
+                self.lentas += 1
+                self.mais_lenta_ms = max(self.mais_lenta_ms, duracao_ms)
+                registrar = self._sortear() < self.amostragem
+                if registrar:
+                    self.lentas_registradas += 1
+        if registrar:
+            texto = " ".join(statement.split())
+            print(f"SQL_LENTA [{self.papel}] {duracao_ms:.0f} ms: {texto[:1000]}")
+
+    # --- Pool ---
+
+    def _conectou(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.conexoes_abertas += 1
+
+    def _fechou(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.conexoes_abertas = max(0, self.conexoes_abertas - 1)
+
+    def _fechou_desanexada(self, dbapi_connection) -> None:
+        with self._lock:
+            self.conexoes_abertas = max(0, self.conexoes_abertas - 1)
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.em_uso += 1
+            self.pico_em_uso = max(self.pico_em_uso, self.em_uso)
+
+    def _checkin(self, dbapi_connection, connection_record) -> None:
+        with self._lock:
+            self.em_uso = max(0, self.em_uso - 1)
+
+    def _invalidou(self, dbapi_connection, connection_record, exception) -> None:
+        with self._lock:
+            self.invalidacoes += 1
+
+    def reiniciar_pico(self) -> None:
+        with self._lock:
+            self.pico_em_uso = self.em_uso
+
+    def estatisticas(self) -> dict:
+        pool = self._pool
+        tamanho = pool.size() if pool is not None and hasattr(pool, "size") else 0
+        overflow_maximo = getattr(pool, "_max_overflow", 0) if pool is not None else 0
+        capacidade = tamanho + max(overflow_maximo, 0)
+        return {
+            "papel": self.papel,
+            "pool": {
+                "tamanho": tamanho,
+                "overflow_maximo": overflow_maximo,
+                "capacidade": capacidade,
+                "em_uso": self.em_uso,
+                "ociosas": pool.checkedin() if pool is not None and hasattr(pool, "checkedin") else 0,
+                "pico_em_uso": self.pico_em_uso,
+                "saturacao": round(self.em_uso / capacidade, 4) if capacidade else 0.0,
+                "saturacao_pico": round(self.pico_em_uso / capacidade, 4) if capacidade else 0.0,
+                "checkouts": self.checkouts,
+                "conexoes_abertas": self.conexoes_abertas,
+                "invalidacoes": self.invalidacoes,
+            },
+            "consultas": {
+                "total": self.consultas,
+                "tempo_medio_ms": round(self.tempo_total_ms / self.consultas, 2) if self.consultas else 0.0,
+                "limite_lenta_ms": self.limite_ms,
+                "lentas": self.lentas,
+                "lentas_registradas": self.lentas_registradas,
+                "mais_lenta_ms": round(self.mais_lenta_ms, 1),
+            },
+        }
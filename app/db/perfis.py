@@ -0,0 +1,132 @@
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from app.core.config import settings
+
+
+PAPEL_API = "api"
+PAPEL_WORKER = "worker"
+PAPEL_SCHEDULER = "scheduler"
+
+
+@dataclass(frozen=True)
+class PerfilBanco:
+    """Configuração da engine (pool e timeouts da sessão) para um papel de processo."""
+
+    papel: str
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pool_pre_ping: bool
+    statement_timeout_ms: int
+    lock_timeout_ms: int
+
+    @property
+    def application_name(self) -> str:
+        return f"{settings.DB_APPLICATION_NAME}-{self.papel}"[:63]
+
+
+# API: muitas requisições curtas; falhar rápido é melhor que prender o pool.
+# Worker: tarefas longas (lotes, reconciliações) com poucas conexões.
+# Scheduler: laços em segundo plano (webhooks, reconciliação, outbox),
+# com a concorrência limitada pelas próprias configurações de cada laço.
+PERFIS_PADRAO = {
+    PAPEL_API: PerfilBanco(
+        papel=PAPEL_API,
+        pool_size=10,
+        max_overflow=20,
+        pool_timeout=10,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        statement_timeout_ms=30_000,
+        lock_timeout_ms=5_000,
+    ),
+    PAPEL_WORKER: PerfilBanco(
+        papel=PAPEL_WORKER,
+        pool_size=4,
+        max_overflow=4,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        statement_timeout_ms=300_000,
+        lock_timeout_ms=30_000,
+    ),
+    PAPEL_SCHEDULER: PerfilBanco(
+        papel=PAPEL_SCHEDULER,
+        pool_size=4,
+        max_overflow=8,
+        pool_timeout=30,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        statement_timeout_ms=120_000,
+        lock_timeout_ms=10_000,
+    ),
+}
+
+
+def montar_perfil(papel: Optional[str] = None) -> PerfilBanco:
+    """
+    Perfil do papel pedido (padrão: DB_PAPEL do processo). As variáveis
+    DB_POOL_SIZE, DB_STATEMENT_TIMEOUT_MS etc., quando definidas, valem só
+    para o papel do próprio processo.
+    """
+    papel = papel or settings.DB_PAPEL
+    if papel not in PERFIS_PADRAO:
+        raise ValueError(f"DB_PAPEL inválido: {papel!r} (use {', '.join(PERFIS_PADRAO)}).")
+    perfil = PERFIS_PADRAO[papel]
+    if papel != settings.DB_PAPEL:
+        return perfil
+
+    sobrescritas = {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "statement_timeout_ms": settings.DB_STATEMENT_TIMEOUT_MS,
+        "lock_timeout_ms": settings.DB_LOCK_TIMEOUT_MS,
+    }
+    return replace(perfil, **{campo: valor for campo, valor in sobrescritas.items() if valor is not None})
+
+
+def argumentos_engine(perfil: PerfilBanco, somente_leitura: bool = False) -> dict:
+    """
+    kwargs de create_engine para o psycopg2 (timeouts via `options` da
+    conexão). `somente_leitura` marca as conexões da réplica: qualquer
+    escrita falha em vez de ir parar no banco errado.
+    """
+    opcoes = f"-c statement_timeout={perfil.statement_timeout_ms} -c lock_timeout={perfil.lock_timeout_ms}"
+    application_name = perfil.application_name
+    if somente_leitura:
+        opcoes += " -c default_transaction_read_only=on"
+        application_name = f"{application_name}-replica"[:63]
+    return {
+        "pool_size": perfil.pool_size,
+        "max_overflow": perfil.max_overflow,
+        "pool_timeout": perfil.pool_timeout,
+        "pool_recycle": perfil.pool_recycle,
+        "pool_pre_ping": perfil.pool_pre_ping,
+        "connect_args": {
+            "application_name": application_name,
+            "options": opcoes,
+        },
+    }
+
+
+def argumentos_engine_async(perfil: PerfilBanco) -> dict:
+    """kwargs de create_async_engine para o asyncpg (timeouts via server_settings)."""
+    return {
+        "pool_size": settings.DB_ASYNC_POOL_SIZE,
+        "max_overflow": settings.DB_ASYNC_MAX_OVERFLOW,
+        "pool_timeout": perfil.pool_timeout,
+        "pool_recycle": perfil.pool_recycle,
+        "pool_pre_ping": perfil.pool_pre_ping,
+        "connect_args": {
+            "server_settings": {
+                "application_name": perfil.application_name,
+                "statement_timeout": str(perfil.statement_timeout_ms),
+                "lock_timeout": str(perfil.lock_timeout_ms),
+            },
+        },
+    }
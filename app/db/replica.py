@@ -0,0 +1,95 @@
+import threading
+import time
+from typing import Callable, Optional
+
+from sqlalchemy import text
+
+
+# Atraso de replicação em segundos (0 no primário ou com todo o WAL
+# recebido já aplicado; NULL se a réplica ainda não aplicou nada).
+CONSULTA_LAG = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())
+    END
+    """
+)
+
+
+class GuardaReplica:
+    """
+    Decide se as leituras do painel podem ir para a réplica. O atraso é
+    medido no máximo uma vez a cada `verificar_a_cada` segundos; acima de
+    `lag_maximo` (ou se a medição falhar) as leituras voltam ao primário
+    até a próxima verificação.
+    """
+
+    def __init__(
+        self,
+        medir_lag: Callable[[], Optional[float]],
+        lag_maximo: float,
+        verificar_a_cada: float,
+        relogio: Callable[[], float] = time.monotonic,
+    ):
+        self._medir_lag = medir_lag
+        self.lag_maximo = lag_maximo
+        self.verificar_a_cada = verificar_a_cada
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._verificado_em: Optional[float] = None
+        self.disponivel = False
+        self.ultimo_lag: Optional[float] = None
+        self.verificacoes = 0
+        self.erros = 0
+        self.leituras_replica = 0
+        self.leituras_primario = 0
+
+    def _verificar(self) -> None:
+        self.verificacoes += 1
+        try:
+            lag = self._medir_lag()
+        except Exception as exc:
+            self.erros += 1
+            self.ultimo_lag = None
+            if self.disponivel:
+                print(f"DB_REPLICA: falha ao medir o atraso da réplica, leituras voltam ao primário: {exc}")
+            self.disponivel = False
+            return
+
+        self.ultimo_lag = None if lag is None else float(lag)
+        disponivel = self.ultimo_lag is not None and self.ultimo_lag <= self.lag_maximo
+        if disponivel != self.disponivel:
+            estado = "em dia" if disponivel else "atrasada"
+            print(f"DB_REPLICA: réplica {estado} (atraso={self.ultimo_lag}s, máximo={self.lag_maximo}s).")
+        self.disponivel = disponivel
+
+    def usar_replica(self) -> bool:
+        agora = self._relogio()
+        if self._verificado_em is None or agora - self._verificado_em >= self.verificar_a_cada:
+            # Só uma requisição mede; as demais seguem com o último resultado.
+            if self._lock.acquire(blocking=self._verificado_em is None):
+                try:
+                    if self._verificado_em is None or agora - self._verificado_em >= self.verificar_a_cada:
+                        self._verificar()
+                        self._verificado_em = self._relogio()
+                finally:
+                    self._lock.release()
+
+        if self.disponivel:
+            self.leituras_replica += 1
+            return True
+        self.leituras_primario += 1
+        return False
+
+    def estatisticas(self) -> dict:
+        return {
+            "disponivel": self.disponivel,
+            "ultimo_lag_segundos": self.ultimo_lag,
+            "lag_maximo_segundos": self.lag_maximo,
+            "verificacoes": self.verificacoes,
+            "erros": self.erros,
+            "leituras_replica": self.leituras_replica,
+            "leituras_primario": self.leituras_primario,
+        }
@@ -7,7 +7,9 @@ from fastapi.middleware.cors import CORSMiddleware
 from app.api.v1.api import api_router as api_router_v1
 from app.core.config import settings
 from app.models.base import *
+from app.models.broadcast_models import Broadcast, BroadcastDestinatario
 from app.models.conta_mae_models import ContaMae, ContaMaeConvite, ContaMaeInviteJob, ContaMaeMemberRemovalJob
+from app.models.dashboard_models import UsuarioAgregadoDia, UsuarioAgregadoHora, VendaAgregadaDia, VendaAgregadaHora
 from app.models.email_monitor_models import (
     AuditLog,
     EmailMonitorAccount,
@@ -18,13 +20,21 @@ from app.models.email_monitor_models import (
     EmailMonitorRule,
     EmailMonitorSyncRun,
 )
+from app.models.notificacao_models import NotificacaoTelegram
 from app.models.openai_account_creation_models import OpenAIAccountCreationJob, OpenAIAccountCreationRequest
-from app.models.pedido_models import Pedido
-from app.models.produto_models import EstoqueConta, Produto
+from app.models.pedido_models import CompraIdempotencia, Pedido
+from app.models.produto_models import EstoqueConta, Produto, ProdutoDisponibilidade
 from app.models.suporte_models import GiftCard, TicketSuporte
-from app.models.usuario_models import AjusteSaldoUsuario, RecargaSaldo, SugestaoStreaming, Usuario
+from app.models.usuario_models import AjusteSaldoUsuario, MovimentacaoCarteira, RecargaSaldo, SugestaoStreaming, Usuario
+from app.models.webhook_models import WebhookEventoPagamento
 from app.schemas.auth_schemas import AdminProfileRead
-from app.schemas.compra_schemas import CompraCreateRequest, CompraCreateResponse
+from app.schemas.compra_schemas import (
+    CompraCreateRequest,
+    CompraCreateResponse,
+    CompraLoteCreateRequest,
+    CompraLoteCreateResponse,
+    CompraLoteItem,
+)
 from app.schemas.conta_mae_schemas import (
     ContaMaeAdminDetails,
     ContaMaeAdminRead,
@@ -59,22 +69,38 @@ from app.schemas.openai_account_creation_schemas import (
     OpenAIAccountCreationOTPSubmitRequest,
     OpenAIAccountCreationRetryResponse,
 )
-from app.schemas.pedido_schemas import PedidoAdminConta, PedidoAdminDetails, PedidoAdminList, PedidoAdminContaMae
-from app.schemas.produto_schemas import ProdutoAdminRead, ProdutoCreate, ProdutoRead, ProdutoUpdate
+from app.schemas.pedido_schemas import PedidoAdminConta, PedidoAdminDetails, PedidoAdminList, PedidoAdminContaMae, PedidoExpiracaoRecalculoResponse
+from app.schemas.produto_schemas import (
+    ProdutoAdminRead,
+    ProdutoCatalogoCacheStats,
+    ProdutoCreate,
+    ProdutoDisponibilidadeDivergencia,
+    ProdutoDisponibilidadeReconciliacaoResponse,
+    ProdutoRead,
+    ProdutoUpdate,
+)
+from app.services.email_monitor_idle_service import start_idle_supervisor
 from app.services.email_monitor_service import start_scheduler
+from app.services.recarga_reconciliacao_service import start_scheduler as start_recarga_reconciliacao
+from app.services.dashboard_agregado_service import start_consolidador as start_dashboard_consolidador
+from app.services.recarga_webhook_service import start_processador as start_webhook_mp_processor
+from app.services.telegram_outbox_service import start_dispatcher as start_telegram_dispatcher
 
 print("Reconstruindo modelos e schemas SQLModel...")
 Usuario.model_rebuild()
 RecargaSaldo.model_rebuild()
 AjusteSaldoUsuario.model_rebuild()
+MovimentacaoCarteira.model_rebuild()
 SugestaoStreaming.model_rebuild()
 Produto.model_rebuild()
 EstoqueConta.model_rebuild()
+ProdutoDisponibilidade.model_rebuild()
 ContaMae.model_rebuild()
 ContaMaeConvite.model_rebuild()
 ContaMaeInviteJob.model_rebuild()
 ContaMaeMemberRemovalJob.model_rebuild()
 Pedido.model_rebuild()
+CompraIdempotencia.model_rebuild()
 TicketSuporte.model_rebuild()
 GiftCard.model_rebuild()
 AuditLog.model_rebuild()
@@ -87,17 +113,32 @@ EmailMonitorAlertEvent.model_rebuild()
 EmailMonitorSyncRun.model_rebuild()
 OpenAIAccountCreationRequest.model_rebuild()
 OpenAIAccountCreationJob.model_rebuild()
+NotificacaoTelegram.model_rebuild()
+VendaAgregadaHora.model_rebuild()
+VendaAgregadaDia.model_rebuild()
+UsuarioAgregadoHora.model_rebuild()
+UsuarioAgregadoDia.model_rebuild()
+Broadcast.model_rebuild()
+BroadcastDestinatario.model_rebuild()
+WebhookEventoPagamento.model_rebuild()
 
 ProdutoRead.model_rebuild()
 ProdutoCreate.model_rebuild()
 ProdutoUpdate.model_rebuild()
 ProdutoAdminRead.model_rebuild()
+ProdutoCatalogoCacheStats.model_rebuild()
+ProdutoDisponibilidadeDivergencia.model_rebuild()
+ProdutoDisponibilidadeReconciliacaoResponse.model_rebuild()
 CompraCreateRequest.model_rebuild()
 CompraCreateResponse.model_rebuild()
+CompraLoteCreateRequest.model_rebuild()
+CompraLoteItem.model_rebuild()
+CompraLoteCreateResponse.model_rebuild()
 PedidoAdminConta.model_rebuild()
 PedidoAdminContaMae.model_rebuild()
 PedidoAdminList.model_rebuild()
 PedidoAdminDetails.model_rebuild()
+PedidoExpiracaoRecalculoResponse.model_rebuild()
 ContaMaeCreate.model_rebuild()
 ContaMaeUpdate.model_rebuild()
 ContaMaeAdminRead.model_rebuild()
@@ -131,20 +172,46 @@ print("Modelos e schemas reconstruídos com sucesso.")
 
 _scheduler_stop_event = threading.Event()
 _scheduler_thread = None
+_email_idle_thread = None
+_telegram_dispatcher_thread = None
+_webhook_mp_thread = None
+_recarga_reconciliacao_thread = None
+_dashboard_consolidador_thread = None
 
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    global _scheduler_thread
+    global _scheduler_thread, _email_idle_thread, _telegram_dispatcher_thread, _webhook_mp_thread, _recarga_reconciliacao_thread
+    global _dashboard_consolidador_thread
+    _scheduler_stop_event.clear()
     if settings.IMAP_SYNC_WORKER_ENABLED:
-        _scheduler_stop_event.clear()
         _scheduler_thread = start_scheduler(_scheduler_stop_event)
+        if settings.IMAP_IDLE_ENABLED:
+            _email_idle_thread = start_idle_supervisor(_scheduler_stop_event)
+    if settings.TELEGRAM_DISPATCHER_ENABLED:
+        _telegram_dispatcher_thread = start_telegram_dispatcher(_scheduler_stop_event)
+    if settings.WEBHOOK_MP_PROCESSADOR_ENABLED:
+        _webhook_mp_thread = start_webhook_mp_processor(_scheduler_stop_event)
+    if settings.RECARGA_RECONCILIACAO_ENABLED:
+        _recarga_reconciliacao_thread = start_recarga_reconciliacao(_scheduler_stop_event)
+    if settings.DASHBOARD_AGREGADOS_CONSOLIDADOR_ENABLED:
+        _dashboard_consolidador_thread = start_dashboard_consolidador(_scheduler_stop_event)
     try:
         yield
     finally:
         _scheduler_stop_event.set()
         if _scheduler_thread is not None:
             _scheduler_thread.join(timeout=2)
+        if _email_idle_thread is not None:
+            _email_idle_thread.join(timeout=2)
+        if _telegram_dispatcher_thread is not None:
+            _telegram_dispatcher_thread.join(timeout=2)
+        if _webhook_mp_thread is not None:
+            _webhook_mp_thread.join(timeout=2)
+        if _recarga_reconciliacao_thread is not None:
+            _recarga_reconciliacao_thread.join(timeout=2)
+        if _dashboard_consolidador_thread is not None:
+            _dashboard_consolidador_thread.join(timeout=2)
 
 
 app = FastAPI(
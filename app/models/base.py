@@ -46,3 +46,40 @@ class TipoOperacaoAjusteSaldo(str, enum.Enum):
     ADICIONAR = "ADICIONAR"
     REMOVER = "REMOVER"
     DEFINIR = "DEFINIR"
+
+class TipoMovimentacaoCarteira(str, enum.Enum):
+    SALDO_INICIAL = "SALDO_INICIAL"
+    COMPRA = "COMPRA"
+    RECARGA = "RECARGA"
+    BONUS_CASHBACK = "BONUS_CASHBACK"
+    GIFT_CARD = "GIFT_CARD"
+    REEMBOLSO = "REEMBOLSO"
+    AJUSTE_ADMIN = "AJUSTE_ADMIN"
+
+class StatusNotificacaoTelegram(str, enum.Enum):
+    PENDENTE = "PENDENTE"
+    ENVIADA = "ENVIADA"
+    FALHOU = "FALHOU"
+
+class StatusBroadcast(str, enum.Enum):
+    PENDENTE = "PENDENTE"
+    EM_ANDAMENTO = "EM_ANDAMENTO"
+    PAUSADO = "PAUSADO"
+    CANCELADO = "CANCELADO"
+    CONCLUIDO = "CONCLUIDO"
+
+class StatusBroadcastDestinatario(str, enum.Enum):
+    PENDENTE = "PENDENTE"
+    ENVIADO = "ENVIADO"
+    FALHOU = "FALHOU"
+
+class StatusWebhookEvento(str, enum.Enum):
+    PENDENTE = "PENDENTE"
+    PROCESSADO = "PROCESSADO"
+    FALHOU = "FALHOU"
+
+class StatusGiftCardLote(str, enum.Enum):
+    PENDENTE = "PENDENTE"
+    EM_ANDAMENTO = "EM_ANDAMENTO"
+    CONCLUIDO = "CONCLUIDO"
+    FALHOU = "FALHOU"
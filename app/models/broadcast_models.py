@@ -0,0 +1,54 @@
+import uuid
+import datetime
+from typing import Optional
+from sqlmodel import Field, SQLModel
+import sqlalchemy as sa
+from app.models.base import StatusBroadcast, StatusBroadcastDestinatario
+
+
+# --- Tabela: broadcast ---
+class Broadcast(SQLModel, table=True):
+    """
+    Campanha de mensagem em massa. O público (`filtro`) é materializado em
+    `broadcast_destinatario` quando o envio começa; os contadores são
+    atualizados a cada página enviada pelo `broadcast_service`.
+    """
+    __tablename__ = "broadcast"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    mensagem: str = Field(sa_column=sa.Column(sa.Text(), nullable=False))
+    parse_mode: Optional[str] = Field(default=None, max_length=20, nullable=True)
+    reply_markup: Optional[dict] = Field(default=None, sa_column=sa.Column(sa.JSON(), nullable=True))
+    filtro: dict = Field(default_factory=dict, sa_column=sa.Column(sa.JSON(), nullable=False))
+    status: StatusBroadcast = Field(default=StatusBroadcast.PENDENTE, nullable=False, index=True)
+
+    total_destinatarios: int = Field(default=0, nullable=False)
+    enviados: int = Field(default=0, nullable=False)
+    falhas: int = Field(default=0, nullable=False)
+    # Segundos efetivamente enviando (pausas não contam), para a vazão.
+    tempo_execucao_segundos: float = Field(default=0.0, nullable=False)
+
+    criado_por_admin_id: Optional[uuid.UUID] = Field(default=None, foreign_key="usuario.id", nullable=True)
+    criado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
+    iniciado_em: Optional[datetime.datetime] = Field(default=None, nullable=True)
+    # Batimento do executor; parado há muito tempo em EM_ANDAMENTO = executor morreu.
+    atualizado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
+    concluido_em: Optional[datetime.datetime] = Field(default=None, nullable=True)
+    # Executor dono do envio, trocado a cada reivindicação. Um executor
+    # que perdeu o broadcast (retomado por outro) para ao notar a troca.
+    execucao_id: Optional[uuid.UUID] = Field(default=None, nullable=True)
+
+
+# --- Tabela: broadcast_destinatario ---
+class BroadcastDestinatario(SQLModel, table=True):
+    """
+    Status de entrega por destinatário. A PK (broadcast_id, telegram_id)
+    serve de cursor (keyset) para o executor e impede envios duplicados.
+    """
+    __tablename__ = "broadcast_destinatario"
+
+    broadcast_id: uuid.UUID = Field(foreign_key="broadcast.id", primary_key=True, ondelete="CASCADE")
+    telegram_id: int = Field(sa_column=sa.Column(sa.BigInteger(), primary_key=True))
+    status: StatusBroadcastDestinatario = Field(default=StatusBroadcastDestinatario.PENDENTE, nullable=False)
+    erro: Optional[str] = Field(default=None, sa_column=sa.Column(sa.Text(), nullable=True))
+    enviado_em: Optional[datetime.datetime] = Field(default=None, nullable=True)
@@ -36,4 +36,8 @@ class Configuracao(SQLModel, table=True):
     # Se tipo=giftcard, isso é o valor em R$ (ex: 5.00 para R$5)
     afiliado_valor_premio: Decimal = Field(
         default=0, max_digits=10, decimal_places=2
-    )
\ No newline at end of file
+    )
+
+    # Incrementada a cada alteração; o cache em memória compara este valor
+    # para saber se a cópia que tem ainda é a atual.
+    versao: int = Field(default=1, nullable=False)
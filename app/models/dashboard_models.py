@@ -0,0 +1,74 @@
+import uuid
+import datetime
+from decimal import Decimal
+from typing import Optional
+
+import sqlalchemy as sa
+from sqlmodel import Field, SQLModel
+
+# Tabelas de agregados do dashboard. Cada flush que cria/remove pedidos ou
+# usuários grava as variações em `dashboard_agregado_delta`, que o
+# consolidador soma nos agregados periodicamente (ver
+# `dashboard_agregado_service`); o job de backfill/compactação as
+# reconstrói. Horários em UTC, como `Pedido.criado_em`/`Usuario.criado_em`.
+
+
+# --- Tabela: venda_agregada_hora ---
+class VendaAgregadaHora(SQLModel, table=True):
+    """
+    Vendas por hora e produto. Guarda só a janela recente; o histórico fica
+    em `VendaAgregadaDia` (a compactação apaga as horas antigas).
+    """
+    __tablename__ = "venda_agregada_hora"
+
+    hora: datetime.datetime = Field(primary_key=True)
+    produto_id: uuid.UUID = Field(foreign_key="produto.id", primary_key=True, ondelete="CASCADE")
+    pedidos: int = Field(default=0, nullable=False)
+    receita: Decimal = Field(default=Decimal("0.00"), max_digits=12, decimal_places=2, nullable=False)
+
+
+# --- Tabela: venda_agregada_dia ---
+class VendaAgregadaDia(SQLModel, table=True):
+    """
+    Vendas por dia e produto (histórico completo).
+    """
+    __tablename__ = "venda_agregada_dia"
+
+    dia: datetime.date = Field(primary_key=True)
+    produto_id: uuid.UUID = Field(foreign_key="produto.id", primary_key=True, ondelete="CASCADE")
+    pedidos: int = Field(default=0, nullable=False)
+    receita: Decimal = Field(default=Decimal("0.00"), max_digits=12, decimal_places=2, nullable=False)
+
+
+# --- Tabela: usuario_agregado_hora ---
+class UsuarioAgregadoHora(SQLModel, table=True):
+    __tablename__ = "usuario_agregado_hora"
+
+    hora: datetime.datetime = Field(primary_key=True)
+    novos_usuarios: int = Field(default=0, nullable=False)
+
+
+# --- Tabela: usuario_agregado_dia ---
+class UsuarioAgregadoDia(SQLModel, table=True):
+    __tablename__ = "usuario_agregado_dia"
+
+    dia: datetime.date = Field(primary_key=True)
+    novos_usuarios: int = Field(default=0, nullable=False)
+
+
+# --- Tabela: dashboard_agregado_delta ---
+class DashboardAgregadoDelta(SQLModel, table=True):
+    """
+    Variações dos agregados ainda não consolidadas. O checkout só insere
+    aqui (sem disputar as linhas quentes dos agregados); o consolidador
+    apaga as variações e soma nos agregados por hora e por dia.
+    `produto_id` nulo = variação de novos usuários.
+    """
+    __tablename__ = "dashboard_agregado_delta"
+
+    id: Optional[int] = Field(default=None, sa_column=sa.Column(sa.BigInteger(), primary_key=True, autoincrement=True))
+    hora: datetime.datetime = Field(nullable=False, index=True)
+    produto_id: Optional[uuid.UUID] = Field(default=None, foreign_key="produto.id", nullable=True, ondelete="CASCADE")
+    pedidos: int = Field(default=0, nullable=False)
+    receita: Decimal = Field(default=Decimal("0.00"), max_digits=12, decimal_places=2, nullable=False)
+    novos_usuarios: int = Field(default=0, nullable=False)
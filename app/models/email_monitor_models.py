@@ -248,6 +248,8 @@ class EmailMonitorSyncRun(SQLModel, table=True):
     messages_scanned: int = Field(default=0, nullable=False)
     messages_saved: int = Field(default=0, nullable=False)
     relevant_messages: int = Field(default=0, nullable=False)
+    queued_ms: Optional[int] = Field(default=None)
+    duration_ms: Optional[int] = Field(default=None)
     error_message: Optional[str] = Field(default=None, max_length=500)
 
     account: EmailMonitorAccount = Relationship(back_populates="sync_runs")
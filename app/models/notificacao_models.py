@@ -0,0 +1,35 @@
+import uuid
+import datetime
+from typing import Optional
+from sqlmodel import Field, SQLModel
+import sqlalchemy as sa
+from app.models.base import StatusNotificacaoTelegram
+
+
+# --- Tabela: notificacao_telegram ---
+class NotificacaoTelegram(SQLModel, table=True):
+    """
+    Outbox de mensagens do Telegram. `send_telegram_message` só grava aqui;
+    o despachante (`telegram_outbox_service`) envia respeitando os limites
+    da API. O texto é criptografado porque pode conter credenciais.
+    """
+    __tablename__ = "notificacao_telegram"
+    __table_args__ = (
+        sa.Index(
+            "ix_notificacao_telegram_pendentes",
+            "proxima_tentativa_em",
+            postgresql_where=sa.text("status = 'PENDENTE'"),
+        ),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    chat_id: int = Field(sa_column=sa.Column(sa.BigInteger(), nullable=False))
+    texto_criptografado: str = Field(sa_column=sa.Column(sa.Text(), nullable=False))
+    parse_mode: Optional[str] = Field(default=None, max_length=20, nullable=True)
+    reply_markup: Optional[dict] = Field(default=None, sa_column=sa.Column(sa.JSON(), nullable=True))
+    status: StatusNotificacaoTelegram = Field(default=StatusNotificacaoTelegram.PENDENTE, nullable=False)
+    tentativas: int = Field(default=0, nullable=False)
+    proxima_tentativa_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
+    ultimo_erro: Optional[str] = Field(default=None, sa_column=sa.Column(sa.Text(), nullable=True))
+    criado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False, index=True)
+    enviado_em: Optional[datetime.datetime] = Field(default=None, nullable=True)
@@ -3,6 +3,7 @@ import datetime
 from decimal import Decimal
 from typing import Optional, TYPE_CHECKING
 from sqlmodel import Field, SQLModel, Relationship
+import sqlalchemy as sa
 from app.models.base import StatusEntregaPedido
 
 # Usamos o TYPE_CHECKING para importar classes
@@ -20,6 +21,10 @@ class Pedido(SQLModel, table=True):
     criado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
     email_cliente: Optional[str] = Field(default=None, nullable=True, index=True)
     ultima_data_expiracao_notificada: Optional[datetime.date] = Field(default=None, nullable=True)
+    # Expiração efetiva materializada (convite -> conta-mãe -> estoque),
+    # mantida por `pedido_expiracao_service` a cada flush que a afete.
+    data_expiracao_efetiva: Optional[datetime.date] = Field(default=None, nullable=True, index=True)
+    origem_expiracao: Optional[str] = Field(default=None, nullable=True, max_length=20)
     status_entrega: StatusEntregaPedido = Field(
         default=StatusEntregaPedido.ENTREGUE, 
         nullable=False
@@ -45,3 +50,21 @@ class Pedido(SQLModel, table=True):
     # --- Relacionamento 1-para-1 ---
     # Um pedido pode ter, no máximo, UM ticket de suporte.
     ticket: Optional["TicketSuporte"] = Relationship(back_populates="pedido")
+
+
+# --- Tabela: compra_idempotencia ---
+class CompraIdempotencia(SQLModel, table=True):
+    """
+    Chaves `Idempotency-Key` enviadas pelo bot em POST /compras/.
+    A linha é gravada na mesma transação da compra, junto com a resposta
+    (criptografada, pois contém credenciais) para ser devolvida em retentativas.
+    """
+    __tablename__ = "compra_idempotencia"
+
+    chave: str = Field(primary_key=True, max_length=255)
+    telegram_id: int = Field(sa_column=sa.Column(sa.BigInteger(), nullable=False))
+    hash_requisicao: str = Field(max_length=64, nullable=False)
+    # O admin pode excluir o pedido; a chave continua valendo até expirar.
+    pedido_id: Optional[uuid.UUID] = Field(default=None, foreign_key="pedido.id", nullable=True, ondelete="SET NULL")
+    resposta_criptografada: Optional[str] = Field(default=None, sa_column=sa.Column(sa.Text(), nullable=True))
+    criado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False, index=True)
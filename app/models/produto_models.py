@@ -59,3 +59,20 @@ class EstoqueConta(SQLModel, table=True):
 
     pedidos: List["Pedido"] = Relationship(back_populates="estoque_conta")
     tickets_problema: List["TicketSuporte"] = Relationship(back_populates="estoque_conta")
+
+
+class ProdutoDisponibilidade(SQLModel, table=True):
+    """
+    Contadores pré-calculados de slots livres por produto.
+    Mantidos a cada alteração de slot em EstoqueConta/ContaMae para que a
+    verificação de disponibilidade seja uma leitura por chave primária.
+    """
+    __tablename__ = "produto_disponibilidade"
+
+    produto_id: uuid.UUID = Field(foreign_key="produto.id", primary_key=True, ondelete="CASCADE")
+    slots_livres_estoque: int = Field(default=0, nullable=False)
+    slots_livres_conta_mae: int = Field(default=0, nullable=False)
+    # Menor data de expiração entre as contas-mãe contadas. Quando passa de hoje,
+    # o contador é recalculado a partir das linhas de origem.
+    menor_expiracao_conta_mae: Optional[datetime.date] = Field(default=None, nullable=True)
+    atualizado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
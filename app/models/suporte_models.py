@@ -7,7 +7,8 @@ from sqlmodel import Field, SQLModel, Relationship
 from app.models.base import (
     TipoStatusTicket, 
     TipoResolucaoTicket, 
-    TipoMotivoTicket
+    TipoMotivoTicket,
+    StatusGiftCardLote,
 )
 
 if TYPE_CHECKING:
@@ -41,11 +42,13 @@ class GiftCard(SQLModel, table=True):
     codigo: str = Field(unique=True, index=True, nullable=False)
     valor: Decimal = Field(max_digits=10, decimal_places=2, nullable=False)
     is_utilizado: bool = Field(default=False, nullable=False)
-    criado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
+    criado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False, index=True)
     utilizado_em: Optional[datetime.datetime] = Field(default=None)
 
     criado_por_admin_id: uuid.UUID = Field(foreign_key="usuario.id", nullable=False)
     utilizado_por_usuario_id: Optional[uuid.UUID] = Field(default=None, foreign_key="usuario.id")
+    # Lote de geração em massa (para exportar em CSV); nulo nos cards avulsos.
+    lote_id: Optional[uuid.UUID] = Field(default=None, foreign_key="giftcard_lote.id", nullable=True, index=True)
 
     # --- Relacionamentos de Usuario (Corrigidos) ---
     criado_por_admin: "Usuario" = Relationship(
@@ -57,3 +60,28 @@ class GiftCard(SQLModel, table=True):
         back_populates="gift_cards_resgatados",
         sa_relationship_kwargs={"foreign_keys": "GiftCard.utilizado_por_usuario_id"}
     )
+
+
+# --- Tabela: giftcard_lote ---
+class GiftCardLote(SQLModel, table=True):
+    """
+    Geração em massa de gift cards. Os códigos são inseridos em blocos pelo
+    `giftcard_service`; `quantidade_gerada` mostra o progresso e permite
+    retomar um lote interrompido.
+    """
+    __tablename__ = "giftcard_lote"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    valor: Decimal = Field(max_digits=10, decimal_places=2, nullable=False)
+    quantidade_solicitada: int = Field(nullable=False)
+    quantidade_gerada: int = Field(default=0, nullable=False)
+    # Códigos descartados por já existirem (no banco ou repetidos no bloco).
+    colisoes: int = Field(default=0, nullable=False)
+    status: StatusGiftCardLote = Field(default=StatusGiftCardLote.PENDENTE, nullable=False, index=True)
+    erro: Optional[str] = Field(default=None, nullable=True)
+
+    criado_por_admin_id: uuid.UUID = Field(foreign_key="usuario.id", nullable=False)
+    criado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
+    iniciado_em: Optional[datetime.datetime] = Field(default=None, nullable=True)
+    atualizado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
+    concluido_em: Optional[datetime.datetime] = Field(default=None, nullable=True)
@@ -5,7 +5,7 @@ from typing import Optional, List, TYPE_CHECKING
 from sqlmodel import Field, SQLModel, Relationship
 import sqlalchemy as sa
 
-from app.models.base import TipoStatusPagamento, TipoOperacaoAjusteSaldo
+from app.models.base import TipoStatusPagamento, TipoOperacaoAjusteSaldo, TipoMovimentacaoCarteira
 
 # Bloco de importação para evitar erros de importação circular
 if TYPE_CHECKING:
@@ -34,6 +34,13 @@ class Usuario(SQLModel, table=True):
     # Prêmio cashback pendente
     pending_cashback_percent: Optional[int] = Field(default=None, nullable=True)
 
+    # Contadores do ciclo de vida (mantidos na mesma transação da recarga/compra;
+    # ver usuario_contadores_service). Pedidos removidos depois não decrementam.
+    total_recargas_pagas: int = Field(default=0, nullable=False)
+    total_pedidos: int = Field(default=0, nullable=False)
+    primeira_recarga_paga_em: Optional[datetime.datetime] = Field(default=None, nullable=True)
+    primeiro_pedido_em: Optional[datetime.datetime] = Field(default=None, nullable=True)
+
     # --- Relacionamentos ---
     recargas: List["RecargaSaldo"] = Relationship(back_populates="usuario")
     pedidos: List["Pedido"] = Relationship(back_populates="usuario")
@@ -112,6 +119,25 @@ class AjusteSaldoUsuario(SQLModel, table=True):
         sa_relationship_kwargs={"foreign_keys": "[AjusteSaldoUsuario.admin_id]"}
     )
 
+# --- Tabela: movimentacao_carteira ---
+class MovimentacaoCarteira(SQLModel, table=True):
+    """
+    Livro-razão da carteira (somente inserção). `valor` é positivo para
+    créditos e negativo para débitos; a soma por usuário é o saldo.
+    """
+    __tablename__ = "movimentacao_carteira"
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    tipo: TipoMovimentacaoCarteira = Field(nullable=False)
+    valor: Decimal = Field(max_digits=10, decimal_places=2, nullable=False)
+    saldo_resultante: Decimal = Field(max_digits=10, decimal_places=2, nullable=False)
+    # Pedido, recarga, gift card ou ajuste que originou a movimentação.
+    referencia_id: Optional[uuid.UUID] = Field(default=None, nullable=True, index=True)
+    descricao: Optional[str] = Field(default=None, max_length=240)
+    criado_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False, index=True)
+
+    usuario_id: uuid.UUID = Field(foreign_key="usuario.id", nullable=False, index=True)
+
 # --- Tabela: sugestoes_streaming ---
 class SugestaoStreaming(SQLModel, table=True):
     id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
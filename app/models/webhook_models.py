@@ -0,0 +1,42 @@
+import uuid
+import datetime
+from typing import Optional
+from sqlmodel import Field, SQLModel
+import sqlalchemy as sa
+from app.models.base import StatusWebhookEvento
+
+
+# --- Tabela: webhook_evento_pagamento ---
+class WebhookEventoPagamento(SQLModel, table=True):
+    """
+    Evento bruto recebido de um gateway de pagamento. O webhook só grava
+    aqui e responde; o processamento (consulta ao gateway, crédito,
+    afiliados) é feito pelo `recarga_webhook_service`. Reentregas do mesmo
+    (gateway, pagamento, ação) caem na mesma linha.
+    """
+    __tablename__ = "webhook_evento_pagamento"
+    __table_args__ = (
+        sa.UniqueConstraint("gateway", "payment_id", "acao", name="uq_webhook_evento_pagamento"),
+        sa.Index(
+            "ix_webhook_evento_pagamento_pendentes",
+            "proxima_tentativa_em",
+            postgresql_where=sa.text("status = 'PENDENTE'"),
+        ),
+    )
+
+    id: uuid.UUID = Field(default_factory=uuid.uuid4, primary_key=True)
+    gateway: str = Field(max_length=30, nullable=False)
+    payment_id: str = Field(max_length=80, nullable=False)
+    acao: str = Field(max_length=60, nullable=False)
+    payload: dict = Field(default_factory=dict, sa_column=sa.Column(sa.JSON(), nullable=False))
+    status: StatusWebhookEvento = Field(default=StatusWebhookEvento.PENDENTE, nullable=False)
+    # Status do pagamento no gateway na última consulta (ex.: "approved").
+    status_gateway: Optional[str] = Field(default=None, max_length=30, nullable=True)
+    resultado: Optional[str] = Field(default=None, max_length=60, nullable=True)
+    tentativas: int = Field(default=0, nullable=False)
+    recebimentos: int = Field(default=1, nullable=False)
+    proxima_tentativa_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
+    ultimo_erro: Optional[str] = Field(default=None, sa_column=sa.Column(sa.Text(), nullable=True))
+    recebido_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
+    ultimo_recebimento_em: datetime.datetime = Field(default_factory=datetime.datetime.utcnow, nullable=False)
+    processado_em: Optional[datetime.datetime] = Field(default=None, nullable=True, index=True)
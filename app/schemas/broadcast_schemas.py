@@ -0,0 +1,48 @@
+import uuid
+import datetime
+from decimal import Decimal
+from typing import Optional
+from pydantic import Field
+from sqlmodel import SQLModel
+from app.models.base import StatusBroadcast
+
+
+# -----------------------------------------------------------------
+# Filtro de público (todos os critérios são combinados com AND)
+# -----------------------------------------------------------------
+class BroadcastFiltro(SQLModel):
+    produto_id: Optional[uuid.UUID] = None  # Só quem já comprou este produto
+    somente_compradores: bool = False       # Só quem tem ao menos um pedido
+    saldo_minimo: Optional[Decimal] = None  # Saldo da carteira >= valor
+    cadastrados_desde: Optional[datetime.datetime] = None
+    cadastrados_ate: Optional[datetime.datetime] = None
+
+
+class BroadcastCreate(SQLModel):
+    mensagem: str = Field(min_length=1, max_length=4096)
+    parse_mode: Optional[str] = None
+    reply_markup: Optional[dict] = None
+    filtro: BroadcastFiltro = Field(default_factory=BroadcastFiltro)
+
+
+class BroadcastRead(SQLModel):
+    id: uuid.UUID
+    mensagem: str
+    parse_mode: Optional[str] = None
+    filtro: dict
+    status: StatusBroadcast
+    total_destinatarios: int
+    enviados: int
+    falhas: int
+    pendentes: int
+    progresso_percentual: float
+    mensagens_por_segundo: Optional[float] = None
+    segundos_restantes_estimados: Optional[float] = None
+    criado_em: datetime.datetime
+    iniciado_em: Optional[datetime.datetime] = None
+    atualizado_em: datetime.datetime
+    concluido_em: Optional[datetime.datetime] = None
+
+
+class BroadcastAudienciaResponse(SQLModel):
+    total_destinatarios: int
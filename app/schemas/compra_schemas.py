@@ -1,9 +1,11 @@
 import uuid
 import datetime
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 from app.models.base import TipoEntregaProduto
-from sqlmodel import SQLModel
+from sqlmodel import Field, SQLModel
+
+COMPRA_LOTE_QUANTIDADE_MAXIMA = 50
 
 # -----------------------------------------------------------------
 # Schema de REQUEST (O que o bot envia para a API)
@@ -28,4 +30,33 @@ class CompraCreateResponse(SQLModel):
     login: Optional[str] = None
     senha: Optional[str] = None
     tipo_entrega: TipoEntregaProduto
-    mensagem_entrega: str
\ No newline at end of file
+    mensagem_entrega: str
+
+# -----------------------------------------------------------------
+# Compra em LOTE (revendedores: N unidades do mesmo produto)
+# -----------------------------------------------------------------
+class CompraLoteCreateRequest(SQLModel):
+    telegram_id: int
+    produto_id: uuid.UUID
+    quantidade: int = Field(ge=1, le=COMPRA_LOTE_QUANTIDADE_MAXIMA)
+    # Produtos SOLICITA_EMAIL: um email por unidade, na mesma ordem dos itens.
+    emails_cliente: Optional[List[str]] = None
+
+class CompraLoteItem(SQLModel):
+    pedido_id: uuid.UUID
+    login: Optional[str] = None
+    senha: Optional[str] = None
+    email_cliente: Optional[str] = None
+    instrucoes_conta: Optional[str] = None
+
+class CompraLoteCreateResponse(SQLModel):
+    data_compra: datetime.datetime
+    quantidade: int
+    valor_unitario: Decimal
+    valor_total: Decimal
+    novo_saldo: Decimal
+
+    produto_nome: str
+    tipo_entrega: TipoEntregaProduto
+    mensagem_entrega: str
+    itens: List[CompraLoteItem]
@@ -1,3 +1,5 @@
+from typing import Optional
+
 from sqlmodel import SQLModel
 
 
@@ -8,3 +10,16 @@ class ConfiguracaoBotStatusRead(SQLModel):
 class ConfiguracaoBotManutencaoUpdateRequest(SQLModel):
     telegram_id: int
     ativo: bool
+
+
+class ConfiguracaoCacheStats(SQLModel):
+    backend: str
+    habilitado: bool
+    versao: Optional[int] = None
+    revalidar_segundos: int
+    hits: int
+    misses: int
+    taxa_acerto: float
+    revalidacoes: int
+    invalidacoes: int
+    erros_backend: int
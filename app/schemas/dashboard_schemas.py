@@ -129,3 +129,19 @@ class DashboardAnalitico(SQLModel):
     health: DashboardOperationalHealth
     proximos_vencimentos: list[DashboardExpiringPedido]
     expirados_recentes: list[DashboardExpiringPedido]
+
+
+class DashboardUpstreamHttp(SQLModel):
+    upstream: str
+    estado_circuito: str
+    chamadas: int
+    erros: int
+    retentativas: int
+    rejeitadas_circuito: int
+    latencia_p50_ms: float | None = None
+    latencia_p95_ms: float | None = None
+
+
+class DashboardAgregadosReconstrucaoResponse(SQLModel):
+    dias_reconstruidos: int
+    linhas_compactadas: int
@@ -286,6 +286,8 @@ class EmailMonitorSyncResult(BaseModel):
     relevant_messages: int
     started_at: datetime.datetime
     finished_at: Optional[datetime.datetime] = None
+    queued_ms: Optional[int] = None
+    duration_ms: Optional[int] = None
     error_message: Optional[str] = None
 
 
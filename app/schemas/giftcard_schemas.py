@@ -2,7 +2,9 @@ import uuid
 import datetime
 from decimal import Decimal
 from typing import Optional
-from sqlmodel import SQLModel
+from sqlmodel import Field, SQLModel
+
+from app.models.base import StatusGiftCardLote
 
 # -----------------------------------------------------------------
 # Schema de ADMIN (O que o Admin envia para CRIAR um gift card)
@@ -44,4 +46,54 @@ class GiftCardResgatarRequest(SQLModel):
 # -----------------------------------------------------------------
 class GiftCardResgatarResponse(SQLModel):
     valor_resgatado: Decimal
-    novo_saldo_total: Decimal
\ No newline at end of file
+    novo_saldo_total: Decimal
+
+# -----------------------------------------------------------------
+# Schemas de ADMIN (geração em massa / lotes)
+# -----------------------------------------------------------------
+class GiftCardLoteCreateRequest(SQLModel):
+    valor: Decimal = Field(gt=0)
+    quantidade: int = Field(ge=1, le=1_000_000)
+
+class GiftCardLoteRead(SQLModel):
+    id: uuid.UUID
+    valor: Decimal
+    quantidade_solicitada: int
+    quantidade_gerada: int
+    colisoes: int
+    status: StatusGiftCardLote
+    erro: Optional[str] = None
+    progresso_percentual: float
+    codigos_por_segundo: Optional[float] = None
+    criado_em: datetime.datetime
+    iniciado_em: Optional[datetime.datetime] = None
+    atualizado_em: datetime.datetime
+    concluido_em: Optional[datetime.datetime] = None
+
+# -----------------------------------------------------------------
+# Schema de ADMIN (proteção do resgate: filtro + limite por usuário)
+# -----------------------------------------------------------------
+class GiftCardFiltroStats(SQLModel):
+    habilitado: bool
+    carregado: bool
+    itens: int
+    capacidade: int
+    tamanho_bytes: int
+    consultas: int
+    rejeitados: int
+    taxa_rejeicao: float
+    sincronizacoes: int
+    reconstrucoes: int
+    remocoes_pendentes: int
+    erros: int
+
+class GiftCardLimitadorStats(SQLModel):
+    tentativas: int
+    bloqueadas: int
+    taxa_bloqueio: float
+    usuarios_monitorados: int
+
+class GiftCardResgateStats(SQLModel):
+    filtro: GiftCardFiltroStats
+    limitador: GiftCardLimitadorStats
+    falsos_positivos: int
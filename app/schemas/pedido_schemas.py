@@ -54,3 +54,12 @@ class PedidoAdminDetails(PedidoAdminList):
     # Herda tudo da lista e adiciona a conta
     conta: Optional[PedidoAdminConta] = None
     conta_mae: Optional[PedidoAdminContaMae] = None
+
+
+# -----------------------------------------------------------------
+# Schema do recálculo em lotes da expiração materializada
+# -----------------------------------------------------------------
+class PedidoExpiracaoRecalculoResponse(SQLModel):
+    processados: int
+    atualizados: int
+    lotes: int
@@ -1,6 +1,6 @@
 import uuid
 from decimal import Decimal
-from typing import Optional
+from typing import List, Optional
 from sqlmodel import SQLModel
 from app.models.base import InviteProviderProduto, TipoEntregaProduto
 import datetime
@@ -47,3 +47,28 @@ class ProdutoAdminRead(ProdutoRead):
     is_ativo: bool
     criado_em: datetime.datetime
     instrucoes_pos_compra: Optional[str] = None
+
+
+class ProdutoDisponibilidadeDivergencia(SQLModel):
+    produto_id: uuid.UUID
+    produto_nome: str
+    slots_livres_estoque_armazenado: int
+    slots_livres_estoque_real: int
+    slots_livres_conta_mae_armazenado: int
+    slots_livres_conta_mae_real: int
+
+class ProdutoDisponibilidadeReconciliacaoResponse(SQLModel):
+    produtos_verificados: int
+    produtos_com_divergencia: int
+    divergencias: List[ProdutoDisponibilidadeDivergencia] = []
+
+class ProdutoCatalogoCacheStats(SQLModel):
+    backend: str
+    habilitado: bool
+    versao: Optional[int] = None
+    etag: Optional[str] = None
+    hits: int
+    misses: int
+    taxa_acerto: float
+    invalidacoes: int
+    erros_backend: int
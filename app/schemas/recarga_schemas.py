@@ -2,7 +2,8 @@ import uuid
 import datetime
 from decimal import Decimal
 from sqlmodel import SQLModel
-from app.models.base import TipoStatusPagamento # Importa nosso ENUM
+from typing import Optional
+from app.models.base import StatusWebhookEvento, TipoStatusPagamento # Importa nosso ENUM
 
 # -----------------------------------------------------------------
 # Schema de REQUEST (O que o bot envia para a API)
@@ -49,3 +50,43 @@ class WebhookRecargaResponse(SQLModel):
     status: str
     recarga_id: uuid.UUID
     novo_saldo_usuario: Decimal
+
+# -----------------------------------------------------------------
+# Schemas da fila de eventos do webhook (Admin)
+# -----------------------------------------------------------------
+class WebhookFilaStatus(SQLModel):
+    pendentes: int
+    prontos: int
+    falhas: int
+    processados_ultima_hora: int
+    reentregas_ultima_hora: int
+    mais_antigo_pendente_em: Optional[datetime.datetime] = None
+    atraso_segundos: float
+
+
+class WebhookEventoRead(SQLModel):
+    id: uuid.UUID
+    gateway: str
+    payment_id: str
+    acao: str
+    status: StatusWebhookEvento
+    status_gateway: Optional[str] = None
+    resultado: Optional[str] = None
+    tentativas: int
+    recebimentos: int
+    ultimo_erro: Optional[str] = None
+    recebido_em: datetime.datetime
+    processado_em: Optional[datetime.datetime] = None
+
+
+class RecargaReconciliacaoResponse(SQLModel):
+    lotes: int
+    verificadas: int
+    aprovadas: int
+    expiradas: int
+    recusadas: int
+    estornadas: int
+    erros_gateway: int
+    tempo_gateway_segundos: float
+    duracao_segundos: float
+    iniciado_em: datetime.datetime
@@ -0,0 +1,49 @@
+from typing import Optional
+
+from sqlmodel import SQLModel
+
+
+class BancoPoolStats(SQLModel):
+    tamanho: int
+    overflow_maximo: int
+    capacidade: int
+    em_uso: int
+    ociosas: int
+    pico_em_uso: int
+    saturacao: float
+    saturacao_pico: float
+    checkouts: int
+    conexoes_abertas: int
+    invalidacoes: int
+
+
+class BancoConsultasStats(SQLModel):
+    total: int
+    tempo_medio_ms: float
+    limite_lenta_ms: int
+    lentas: int
+    lentas_registradas: int
+    mais_lenta_ms: float
+
+
+class BancoEngineStats(SQLModel):
+    papel: str
+    pool: BancoPoolStats
+    consultas: BancoConsultasStats
+
+
+class BancoReplicaStats(SQLModel):
+    disponivel: bool
+    ultimo_lag_segundos: Optional[float] = None
+    lag_maximo_segundos: float
+    verificacoes: int
+    erros: int
+    leituras_replica: int
+    leituras_primario: int
+
+
+class BancoEstatisticasResponse(SQLModel):
+    papel_processo: str
+    modo_bot: str
+    engines: list[BancoEngineStats]
+    replica: Optional[BancoReplicaStats] = None
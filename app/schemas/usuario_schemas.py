@@ -1,7 +1,7 @@
 import uuid
 from decimal import Decimal
 from sqlmodel import SQLModel
-from typing import Optional, Literal
+from typing import List, Optional, Literal
 import datetime
 from app.models.base import TipoStatusPagamento
 
@@ -109,6 +109,21 @@ class UsuarioSaldoAjusteResponse(SQLModel):
     motivo: Optional[str] = None
     ajustado_em: datetime.datetime
 
+class UsuarioCarteiraDivergencia(SQLModel):
+    usuario_id: uuid.UUID
+    saldo_armazenado: Decimal
+    saldo_razao: Decimal
+
+class UsuarioCarteiraReconstrucaoResponse(SQLModel):
+    usuarios_verificados: int
+    usuarios_com_divergencia: int
+    corrigido: bool
+    divergencias: List[UsuarioCarteiraDivergencia] = []
+
+class UsuarioContadoresRecalculoResponse(SQLModel):
+    usuarios_verificados: int
+    usuarios_atualizados: int
+
 class UsuarioSaldoHistoricoRead(SQLModel):
     id: uuid.UUID
     operacao: Literal["ADICIONAR", "REMOVER", "DEFINIR"]
@@ -3,19 +3,21 @@ import secrets
 from decimal import Decimal
 from sqlmodel import Session, select, func
 
-from app.models.usuario_models import Usuario, RecargaSaldo
-from app.models.pedido_models import Pedido
+from app.models.usuario_models import Usuario
 from app.models.produto_models import Produto
 from app.models.suporte_models import GiftCard
 from app.models.configuracao_models import Configuracao, TipoGatilhoAfiliado, TipoPremioAfiliado
-from app.models.base import TipoStatusPagamento
 
+from app.services.catalogo_cache_service import preco_minimo_cache
+from app.services.configuracao_cache_service import obter_configuracao
+from app.services.giftcard_protecao_service import marcar_giftcards_criados
 from app.services.notification_service import send_telegram_message, escape_markdown_v2
 
 def _get_configuracao(db: Session) -> Configuracao:
     """
-    Obtém a configuração do sistema. Cria a linha de configuração
-    padrão se ela não existir.
+    Obtém a configuração do sistema ligada à sessão (para alterá-la).
+    Cria a linha de configuração padrão se ela não existir. Para apenas
+    ler, use `obter_configuracao()`, que vem do cache.
     """
     config = db.exec(select(Configuracao)).first()
     if not config:
@@ -28,14 +30,17 @@ def _get_configuracao(db: Session) -> Configuracao:
 
 def _get_preco_produto_mais_barato(db: Session) -> Decimal:
     """
-    Busca o menor preço entre todos os produtos ativos.
+    Busca o menor preço entre todos os produtos ativos (em cache até a
+    próxima alteração do catálogo).
     """
-    preco_minimo = db.exec(
-        select(func.min(Produto.preco))
-        .where(Produto.is_ativo == True)
-    ).first()
-    
-    return preco_minimo or Decimal("0.0")
+    def carregar() -> Decimal:
+        preco_minimo = db.exec(
+            select(func.min(Produto.preco))
+            .where(Produto.is_ativo == True)
+        ).first()
+        return preco_minimo or Decimal("0.0")
+
+    return preco_minimo_cache.obter(carregar)
 
 def _gerar_premio_giftcard(db: Session, referrer: Usuario, valor_premio: Decimal) -> GiftCard:
     """
@@ -49,6 +54,7 @@ def _gerar_premio_giftcard(db: Session, referrer: Usuario, valor_premio: Decimal
         criado_por_admin_id=referrer.id # O 'criado_por' será o próprio indicador
     )
     db.add(novo_giftcard)
+    marcar_giftcards_criados(db, [codigo])
     db.commit()
     db.refresh(novo_giftcard)
     print(f"AFILIADO: Giftcard de R$ {valor_premio} gerado para {referrer.telegram_id}")
@@ -97,8 +103,8 @@ def processar_gatilho_afiliado(
     """
     print(f"AFILIADO: Processando gatilho '{gatilho.value}' para usuário {usuario_indicado.telegram_id}")
     
-    # 1. Obter a configuração
-    config = _get_configuracao(db)
+    # 1. Obter a configuração (cópia em cache)
+    config = obter_configuracao()
     if not config.afiliado_ativo:
         print("AFILIADO: Sistema inativo. Ignorando.")
         return
@@ -114,26 +120,14 @@ def processar_gatilho_afiliado(
         return
         
     # 4. É a primeira vez que esse gatilho ocorre?
+    # Os contadores do usuário já incluem o evento atual (mesma transação).
     if gatilho == TipoGatilhoAfiliado.primeira_recarga:
-        # Conta quantas recargas PAGAS este usuário já teve
-        recargas_pagas_count = db.exec(
-            select(func.count(RecargaSaldo.id))
-            .where(RecargaSaldo.usuario_id == usuario_indicado.id)
-            .where(RecargaSaldo.status_pagamento == TipoStatusPagamento.PAGO)
-        ).one()
-        # Se ele já tem 1 (a que acabou de ser paga), está ok. Se tiver > 1, não é a primeira.
-        if recargas_pagas_count > 1:
+        if usuario_indicado.total_recargas_pagas > 1:
             print("AFILIADO: Não é a primeira recarga. Ignorando.")
             return
-            
+
     elif gatilho == TipoGatilhoAfiliado.primeira_compra:
-        # Conta quantos pedidos este usuário já teve
-        pedidos_count = db.exec(
-            select(func.count(Pedido.id))
-            .where(Pedido.usuario_id == usuario_indicado.id)
-        ).one()
-        # Se ele já tem 1 (o que acabou de fazer), ok. Se > 1, não é a primeira.
-        if pedidos_count > 1:
+        if usuario_indicado.total_pedidos > 1:
             print("AFILIADO: Não é a primeira compra. Ignorando.")
             return
 
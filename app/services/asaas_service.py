@@ -2,9 +2,8 @@ import datetime
 from decimal import Decimal
 from typing import Any, Dict, Optional
 
-import requests
-
 from app.core.config import settings
+from app.core.http_client import http_client
 
 
 class AsaasGatewayError(Exception):
@@ -48,9 +47,10 @@ class AsaasService:
         return "Erro inesperado ao comunicar com o Asaas."
 
     def _request(self, method: str, path: str, *, expected_status: Optional[int] = None, json: Optional[dict] = None) -> dict:
-        response = requests.request(
+        response = http_client.request(
             method,
             self._build_url(path),
+            upstream="asaas",
             headers=self._headers(),
             json=json,
             timeout=settings.ASAAS_REQUEST_TIMEOUT_SECONDS,
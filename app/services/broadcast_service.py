@@ -0,0 +1,391 @@
+import asyncio
+import datetime
+import random
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Optional
+
+import httpx
+from fastapi import BackgroundTasks
+from sqlalchemy import func, literal, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.http_client import CircuitoAbertoError, ClienteHttpAsync
+from app.db.database import engine
+from app.models.base import StatusBroadcast, StatusBroadcastDestinatario
+from app.models.broadcast_models import Broadcast, BroadcastDestinatario
+from app.models.pedido_models import Pedido
+from app.models.usuario_models import Usuario
+from app.schemas.broadcast_schemas import BroadcastFiltro, BroadcastRead
+from app.services.telegram_outbox_service import (
+    TELEGRAM_API_URL,
+    TokenBucket,
+    ResultadoEnvio,
+    balde_global_telegram,
+    classificar_resposta_telegram,
+)
+
+BACKOFF_BASE_SEGUNDOS = 1.0
+MAX_RETRY_AFTER_SEGUNDOS = 60.0
+
+
+# --- Público ---
+
+def query_publico(filtro: BroadcastFiltro):
+    """
+    SELECT dos `telegram_id` que recebem o broadcast (admins nunca entram).
+    """
+    stmt = select(Usuario.telegram_id).where(Usuario.is_admin == False)
+    if filtro.produto_id is not None:
+        stmt = stmt.where(
+            select(Pedido.id)
+            .where(Pedido.usuario_id == Usuario.id)
+            .where(Pedido.produto_id == filtro.produto_id)
+            .exists()
+        )
+    elif filtro.somente_compradores:
+        stmt = stmt.where(select(Pedido.id).where(Pedido.usuario_id == Usuario.id).exists())
+    if filtro.saldo_minimo is not None:
+        stmt = stmt.where(Usuario.saldo_carteira >= filtro.saldo_minimo)
+    if filtro.cadastrados_desde is not None:
+        stmt = stmt.where(Usuario.criado_em >= filtro.cadastrados_desde)
+    if filtro.cadastrados_ate is not None:
+        stmt = stmt.where(Usuario.criado_em < filtro.cadastrados_ate)
+    return stmt
+
+
+def contar_publico(session: Session, filtro: BroadcastFiltro) -> int:
+    return session.exec(select(func.count()).select_from(query_publico(filtro).subquery())).one()
+
+
+def materializar_destinatarios(session: Session, broadcast: Broadcast) -> int:
+    """
+    Copia o público para `broadcast_destinatario` num único INSERT ... SELECT.
+    O público fica congelado no início do envio.
+    """
+    tabela = BroadcastDestinatario.__table__
+    publico = query_publico(BroadcastFiltro.model_validate(broadcast.filtro or {})).subquery()
+    stmt = (
+        pg_insert(tabela)
+        .from_select(
+            ["broadcast_id", "telegram_id", "status"],
+            select(
+                literal(broadcast.id, type_=tabela.c.broadcast_id.type),
+                publico.c.telegram_id,
+                literal(StatusBroadcastDestinatario.PENDENTE, type_=tabela.c.status.type),
+            ),
+        )
+        .on_conflict_do_nothing()
+    )
+    session.exec(stmt)
+    return session.exec(
+        select(func.count())
+        .select_from(BroadcastDestinatario)
+        .where(BroadcastDestinatario.broadcast_id == broadcast.id)
+    ).one()
+
+
+# --- Progresso ---
+
+def heartbeat_expirado(broadcast: Broadcast, agora: Optional[datetime.datetime] = None) -> bool:
+    agora = agora or datetime.datetime.utcnow()
+    limite = datetime.timedelta(seconds=settings.BROADCAST_HEARTBEAT_EXPIRA_SECONDS)
+    return agora - broadcast.atualizado_em > limite
+
+
+def montar_broadcast_read(broadcast: Broadcast) -> BroadcastRead:
+    processados = broadcast.enviados + broadcast.falhas
+    pendentes = max(broadcast.total_destinatarios - processados, 0)
+    progresso = 100.0 if not broadcast.total_destinatarios else processados * 100 / broadcast.total_destinatarios
+    vazao = None
+    restantes = None
+    if broadcast.tempo_execucao_segundos > 0:
+        vazao = round(processados / broadcast.tempo_execucao_segundos, 2)
+        if vazao > 0 and broadcast.status in (StatusBroadcast.PENDENTE, StatusBroadcast.EM_ANDAMENTO):
+            restantes = round(pendentes / vazao, 1)
+    return BroadcastRead(
+        id=broadcast.id,
+        mensagem=broadcast.mensagem,
+        parse_mode=broadcast.parse_mode,
+        filtro=broadcast.filtro or {},
+        status=broadcast.status,
+        total_destinatarios=broadcast.total_destinatarios,
+        enviados=broadcast.enviados,
+        falhas=broadcast.falhas,
+        pendentes=pendentes,
+        progresso_percentual=round(progresso, 1),
+        mensagens_por_segundo=vazao,
+        segundos_restantes_estimados=restantes,
+        criado_em=broadcast.criado_em,
+        iniciado_em=broadcast.iniciado_em,
+        atualizado_em=broadcast.atualizado_em,
+        concluido_em=broadcast.concluido_em,
+    )
+
+
+# --- Execução ---
+
+class ExecutorBroadcast:
+    """
+    Envia um broadcast página a página: lê os destinatários pendentes por
+    keyset em `telegram_id`, dispara a página em paralelo por um pool de
+    conexões assíncrono (limitado pelo balde global do bot) e grava os
+    resultados em lote. Entre páginas confere o status, então pausar ou
+    cancelar vale a partir da página seguinte.
+
+    Cada reivindicação grava um `execucao_id` novo no broadcast. Se outro
+    executor reivindicar o mesmo broadcast (retomada com o batimento
+    expirado), este percebe a troca na próxima página ou no batimento e para.
+    """
+
+    def __init__(
+        self,
+        broadcast_id: uuid.UUID,
+        *,
+        balde: TokenBucket = balde_global_telegram,
+        concorrencia: int = settings.BROADCAST_CONCORRENCIA,
+        tamanho_pagina: int = settings.BROADCAST_TAMANHO_PAGINA,
+        max_tentativas: int = settings.BROADCAST_MAX_TENTATIVAS,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.broadcast_id = broadcast_id
+        self.balde = balde
+        self.concorrencia = concorrencia
+        self.tamanho_pagina = tamanho_pagina
+        self.max_tentativas = max_tentativas
+        self.transport = transport
+        self.execucao_id: Optional[uuid.UUID] = None
+
+    def _reivindicar(self, session: Session) -> Optional[Broadcast]:
+        """
+        PENDENTE -> EM_ANDAMENTO. Só um executor ganha; na primeira execução
+        o público é materializado na mesma transação.
+        """
+        broadcast = session.exec(
+            select(Broadcast)
+            .where(Broadcast.id == self.broadcast_id)
+            .where(Broadcast.status == StatusBroadcast.PENDENTE)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if not broadcast:
+            return None
+
+        agora = datetime.datetime.utcnow()
+        if broadcast.iniciado_em is None:
+            broadcast.iniciado_em = agora
+            broadcast.total_destinatarios = materializar_destinatarios(session, broadcast)
+        self.execucao_id = uuid.uuid4()
+        broadcast.status = StatusBroadcast.EM_ANDAMENTO
+        broadcast.execucao_id = self.execucao_id
+        broadcast.atualizado_em = agora
+        session.add(broadcast)
+        session.commit()
+        return broadcast
+
+    def _proxima_pagina(self, session: Session, cursor: Optional[int]) -> Optional[list[int]]:
+        """
+        Próxima página de pendentes, ou None se o broadcast saiu de
+        EM_ANDAMENTO ou passou para outro executor.
+        """
+        atual = session.exec(
+            select(Broadcast.status, Broadcast.execucao_id).where(Broadcast.id == self.broadcast_id)
+        ).first()
+        if atual is None or atual.status != StatusBroadcast.EM_ANDAMENTO or atual.execucao_id != self.execucao_id:
+            session.commit()
+            return None
+        stmt = (
+            select(BroadcastDestinatario.telegram_id)
+            .where(BroadcastDestinatario.broadcast_id == self.broadcast_id)
+            .where(BroadcastDestinatario.status == StatusBroadcastDestinatario.PENDENTE)
+            .order_by(BroadcastDestinatario.telegram_id)
+            .limit(self.tamanho_pagina)
+        )
+        if cursor is not None:
+            stmt = stmt.where(BroadcastDestinatario.telegram_id > cursor)
+        telegram_ids = list(session.exec(stmt).all())
+        # Não segura a transação aberta enquanto a página é enviada.
+        session.commit()
+        return telegram_ids
+
+    async def _aguardar_token(self) -> None:
+        while not self.balde.consumir():
+            await asyncio.sleep(max(self.balde.espera(), 0.001))
+
+    async def _enviar(self, client: ClienteHttpAsync, payload: dict) -> ResultadoEnvio:
+        tentativas = 0
+        while True:
+            await self._aguardar_token()
+            try:
+                response = await client.post(
+                    TELEGRAM_API_URL, json=payload, timeout=settings.TELEGRAM_HTTP_TIMEOUT_SECONDS
+                )
+                resultado = classificar_resposta_telegram(response)
+            except (httpx.HTTPError, CircuitoAbertoError) as exc:
+                resultado = ResultadoEnvio(enviada=False, erro=f"Falha de rede: {exc}")
+
+            if resultado.enviada or resultado.permanente:
+                return resultado
+            if resultado.retry_after is not None:
+                # 429 é do bot inteiro: segura o balde global e não conta tentativa.
+                self.balde.bloquear(min(resultado.retry_after, MAX_RETRY_AFTER_SEGUNDOS))
+                continue
+            tentativas += 1
+            if tentativas >= self.max_tentativas:
+                return resultado
+            await asyncio.sleep(random.uniform(0.5, 1.0) * BACKOFF_BASE_SEGUNDOS * (2 ** (tentativas - 1)))
+
+    async def _enviar_pagina(self, client: ClienteHttpAsync, mensagem: dict, telegram_ids: list[int]) -> list:
+        semaforo = asyncio.Semaphore(self.concorrencia)
+
+        async def enviar(telegram_id: int):
+            async with semaforo:
+                return telegram_id, await self._enviar(client, {**mensagem, "chat_id": telegram_id})
+
+        return await asyncio.gather(*(enviar(telegram_id) for telegram_id in telegram_ids))
+
+    def _registrar_pagina(self, session: Session, resultados: list, duracao: float) -> tuple[int, int, bool]:
+        """
+        Grava os resultados da página com um UPDATE por (status, erro) e
+        atualiza contadores e batimento do broadcast na mesma transação.
+        Só destinatários ainda PENDENTES mudam (e entram nos contadores),
+        para não duplicar o que um executor concorrente já gravou. O
+        batimento só é dado se este executor ainda for o dono; o terceiro
+        valor do retorno diz se ainda é.
+        """
+        agora = datetime.datetime.utcnow()
+        grupos: dict[tuple, list[int]] = defaultdict(list)
+        for telegram_id, resultado in resultados:
+            if resultado.enviada:
+                grupos[(StatusBroadcastDestinatario.ENVIADO, None)].append(telegram_id)
+            else:
+                grupos[(StatusBroadcastDestinatario.FALHOU, (resultado.erro or "")[:500])].append(telegram_id)
+
+        enviados = 0
+        falhas = 0
+        for (status, erro), telegram_ids in grupos.items():
+            resultado = session.exec(
+                update(BroadcastDestinatario)
+                .where(BroadcastDestinatario.broadcast_id == self.broadcast_id)
+                .where(BroadcastDestinatario.telegram_id.in_(telegram_ids))
+                .where(BroadcastDestinatario.status == StatusBroadcastDestinatario.PENDENTE)
+                .values(
+                    status=status,
+                    erro=erro,
+                    enviado_em=agora if status == StatusBroadcastDestinatario.ENVIADO else None,
+                )
+            )
+            if status == StatusBroadcastDestinatario.ENVIADO:
+                enviados += resultado.rowcount or 0
+            else:
+                falhas += resultado.rowcount or 0
+
+        session.exec(
+            update(Broadcast)
+            .where(Broadcast.id == self.broadcast_id)
+            .values(
+                enviados=Broadcast.enviados + enviados,
+                falhas=Broadcast.falhas + falhas,
+                tempo_execucao_segundos=Broadcast.tempo_execucao_segundos + duracao,
+            )
+        )
+        batimento = session.exec(
+            update(Broadcast)
+            .where(Broadcast.id == self.broadcast_id)
+            .where(Broadcast.execucao_id == self.execucao_id)
+            .values(atualizado_em=agora)
+        )
+        session.commit()
+        return enviados, falhas, bool(batimento.rowcount)
+
+    def _concluir(self, session: Session) -> bool:
+        agora = datetime.datetime.utcnow()
+        resultado = session.exec(
+            update(Broadcast)
+            .where(Broadcast.id == self.broadcast_id)
+            .where(Broadcast.status == StatusBroadcast.EM_ANDAMENTO)
+            .where(Broadcast.execucao_id == self.execucao_id)
+            .values(status=StatusBroadcast.CONCLUIDO, concluido_em=agora, atualizado_em=agora)
+        )
+        session.commit()
+        return bool(resultado.rowcount)
+
+    async def executar(self) -> dict:
+        enviados = 0
+        falhas = 0
+        with Session(engine) as session:
+            broadcast = self._reivindicar(session)
+            if not broadcast:
+                return {"executado": False, "enviados": 0, "falhas": 0}
+            mensagem = {"text": broadcast.mensagem}
+            if broadcast.parse_mode:
+                mensagem["parse_mode"] = broadcast.parse_mode
+            if broadcast.reply_markup:
+                mensagem["reply_markup"] = broadcast.reply_markup
+
+            async with ClienteHttpAsync(max_conexoes=self.concorrencia, transport=self.transport) as client:
+                cursor = None
+                while True:
+                    telegram_ids = self._proxima_pagina(session, cursor)
+                    if telegram_ids is None:
+                        break
+                    if not telegram_ids:
+                        self._concluir(session)
+                        break
+                    inicio = time.monotonic()
+                    resultados = await self._enviar_pagina(client, mensagem, telegram_ids)
+                    pagina_enviados, pagina_falhas, dono = self._registrar_pagina(
+                        session, resultados, time.monotonic() - inicio
+                    )
+                    enviados += pagina_enviados
+                    falhas += pagina_falhas
+                    if not dono:
+                        print(f"BROADCAST {self.broadcast_id}: assumido por outro executor; parando.")
+                        break
+                    cursor = telegram_ids[-1]
+
+        return {"executado": True, "enviados": enviados, "falhas": falhas}
+
+
+def executar_broadcast(broadcast_id: uuid.UUID, **kwargs) -> dict:
+    """
+    Ponto de entrada síncrono (Celery, BackgroundTasks ou thread).
+    """
+    resultado = asyncio.run(ExecutorBroadcast(broadcast_id, **kwargs).executar())
+    print(
+        f"BROADCAST {broadcast_id}: executado={resultado['executado']} "
+        f"enviados={resultado['enviados']} falhas={resultado['falhas']}"
+    )
+    return resultado
+
+
+def _executar_broadcast_task(broadcast_id: str) -> None:
+    try:
+        executar_broadcast(uuid.UUID(broadcast_id))
+    except Exception as exc:
+        print(f"BROADCAST_ERROR {broadcast_id}: {exc}")
+
+
+def enqueue_broadcast(
+    broadcast_id: uuid.UUID,
+    *,
+    background_tasks: Optional[BackgroundTasks] = None,
+) -> None:
+    if settings.CELERY_BROKER_URL:
+        from app.worker.celery_app import celery_app
+
+        celery_app.send_task("executar_broadcast", args=[str(broadcast_id)])
+        return
+    if background_tasks is not None:
+        background_tasks.add_task(_executar_broadcast_task, str(broadcast_id))
+        return
+
+    threading.Thread(
+        target=_executar_broadcast_task,
+        args=(str(broadcast_id),),
+        daemon=True,
+        name=f"broadcast-{broadcast_id}",
+    ).start()
@@ -0,0 +1,231 @@
+import datetime
+import uuid
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Optional
+
+from sqlalchemy import Numeric, Uuid, func, insert, literal, select, update
+from sqlalchemy.orm import attributes
+from sqlalchemy.orm.util import identity_key
+from sqlmodel import Session
+
+from app.models.base import TipoMovimentacaoCarteira
+from app.models.usuario_models import MovimentacaoCarteira, Usuario
+
+
+TWO_DECIMAL_PLACES = Decimal("0.01")
+
+_usuario = Usuario.__table__
+_movimentacao = MovimentacaoCarteira.__table__
+
+
+class SaldoInsuficienteError(Exception):
+    def __init__(self, saldo_atual: Decimal, valor: Decimal):
+        self.saldo_atual = saldo_atual
+        self.valor = valor
+        super().__init__(f"Saldo insuficiente. Saldo atual: {saldo_atual}, Valor: {valor}")
+
+
+class UsuarioNaoEncontradoError(Exception):
+    pass
+
+
+def _quantizar(valor) -> Decimal:
+    return Decimal(valor).quantize(TWO_DECIMAL_PLACES, rounding=ROUND_HALF_UP)
+
+
+def _sincronizar_instancia(session: Session, usuario_id: uuid.UUID, saldo: Decimal) -> None:
+    """
+    Atualiza o `Usuario` já carregado na sessão (se houver) com o saldo
+    retornado pelo banco, sem marcá-lo como alterado.
+    """
+    usuario = session.identity_map.get(identity_key(Usuario, usuario_id))
+    if usuario is not None:
+        attributes.set_committed_value(usuario, "saldo_carteira", saldo)
+
+
+def _movimentar(
+    session: Session,
+    usuario_id: uuid.UUID,
+    valor: Decimal,
+    tipo: TipoMovimentacaoCarteira,
+    *,
+    referencia_id: Optional[uuid.UUID],
+    descricao: Optional[str],
+    exigir_saldo: bool,
+) -> Optional[Decimal]:
+    """
+    Aplica `valor` (com sinal) ao saldo e grava a movimentação num único
+    comando: WITH (UPDATE ... RETURNING) INSERT ... RETURNING.
+    Retorna o novo saldo, ou None se nenhuma linha foi atualizada.
+    """
+    agora = datetime.datetime.utcnow()
+    stmt_update = (
+        update(_usuario)
+        .where(_usuario.c.id == usuario_id)
+        .values(
+            saldo_carteira=_usuario.c.saldo_carteira + valor,
+            atualizado_em=agora,
+        )
+        .returning(_usuario.c.id, _usuario.c.saldo_carteira)
+    )
+    if exigir_saldo:
+        stmt_update = stmt_update.where(_usuario.c.saldo_carteira >= -valor)
+    saldo_atualizado = stmt_update.cte("saldo_atualizado")
+
+    stmt = (
+        insert(_movimentacao)
+        .from_select(
+            ["id", "usuario_id", "tipo", "valor", "saldo_resultante", "referencia_id", "descricao", "criado_em"],
+            select(
+                literal(uuid.uuid4(), Uuid()),
+                saldo_atualizado.c.id,
+                literal(tipo, _movimentacao.c.tipo.type),
+                literal(valor, Numeric(10, 2)),
+                saldo_atualizado.c.saldo_carteira,
+                literal(referencia_id, Uuid()),
+                literal(descricao, _movimentacao.c.descricao.type),
+                literal(agora, _movimentacao.c.criado_em.type),
+            ),
+        )
+        .add_cte(saldo_atualizado)
+        .returning(_movimentacao.c.saldo_resultante)
+    )
+    novo_saldo = session.exec(stmt).scalar_one_or_none()
+    if novo_saldo is not None:
+        _sincronizar_instancia(session, usuario_id, novo_saldo)
+    return novo_saldo
+
+
+def _saldo_atual(session: Session, usuario_id: uuid.UUID) -> Decimal:
+    saldo = session.exec(select(_usuario.c.saldo_carteira).where(_usuario.c.id == usuario_id)).scalar_one_or_none()
+    if saldo is None:
+        raise UsuarioNaoEncontradoError(f"Usuário {usuario_id} não encontrado.")
+    return saldo
+
+
+def creditar(
+    session: Session,
+    usuario_id: uuid.UUID,
+    valor: Decimal,
+    tipo: TipoMovimentacaoCarteira,
+    *,
+    referencia_id: Optional[uuid.UUID] = None,
+    descricao: Optional[str] = None,
+) -> Decimal:
+    """
+    Credita `valor` na carteira e retorna o novo saldo. Não faz commit.
+    """
+    valor = _quantizar(valor)
+    if valor <= 0:
+        raise ValueError("O valor do crédito precisa ser maior que zero.")
+    novo_saldo = _movimentar(
+        session, usuario_id, valor, tipo,
+        referencia_id=referencia_id, descricao=descricao, exigir_saldo=False,
+    )
+    if novo_saldo is None:
+        raise UsuarioNaoEncontradoError(f"Usuário {usuario_id} não encontrado.")
+    return novo_saldo
+
+
+def debitar(
+    session: Session,
+    usuario_id: uuid.UUID,
+    valor: Decimal,
+    tipo: TipoMovimentacaoCarteira,
+    *,
+    referencia_id: Optional[uuid.UUID] = None,
+    descricao: Optional[str] = None,
+) -> Decimal:
+    """
+    Debita `valor` apenas se o saldo cobrir o débito (UPDATE condicional).
+    Retorna o novo saldo ou levanta SaldoInsuficienteError. Não faz commit.
+    """
+    valor = _quantizar(valor)
+    if valor <= 0:
+        raise ValueError("O valor do débito precisa ser maior que zero.")
+    novo_saldo = _movimentar(
+        session, usuario_id, -valor, tipo,
+        referencia_id=referencia_id, descricao=descricao, exigir_saldo=True,
+    )
+    if novo_saldo is None:
+        raise SaldoInsuficienteError(_saldo_atual(session, usuario_id), valor)
+    return novo_saldo
+
+
+def definir_saldo(
+    session: Session,
+    usuario_id: uuid.UUID,
+    novo_saldo: Decimal,
+    tipo: TipoMovimentacaoCarteira,
+    *,
+    referencia_id: Optional[uuid.UUID] = None,
+    descricao: Optional[str] = None,
+) -> tuple[Decimal, Decimal]:
+    """
+    Define o saldo para um valor absoluto (ajuste administrativo), gravando
+    a diferença no livro-razão. Retorna (saldo_anterior, saldo_atual).
+    """
+    novo_saldo = _quantizar(novo_saldo)
+    if novo_saldo < 0:
+        raise ValueError("Não é permitido definir saldo negativo.")
+    saldo_anterior = session.exec(
+        select(_usuario.c.saldo_carteira).where(_usuario.c.id == usuario_id).with_for_update()
+    ).scalar_one_or_none()
+    if saldo_anterior is None:
+        raise UsuarioNaoEncontradoError(f"Usuário {usuario_id} não encontrado.")
+
+    diferenca = novo_saldo - saldo_anterior
+    if diferenca == 0:
+        return saldo_anterior, saldo_anterior
+    saldo_atual = _movimentar(
+        session, usuario_id, diferenca, tipo,
+        referencia_id=referencia_id, descricao=descricao, exigir_saldo=False,
+    )
+    return saldo_anterior, saldo_atual
+
+
+def reconstruir_saldos(session: Session, *, corrigir: bool = True) -> dict:
+    """
+    Recalcula o saldo de cada usuário somando o livro-razão e relata (e, se
+    `corrigir`, sobrescreve) os saldos divergentes. Não faz commit.
+    """
+    soma_movimentacoes = (
+        select(
+            MovimentacaoCarteira.usuario_id,
+            func.coalesce(func.sum(MovimentacaoCarteira.valor), 0).label("saldo_razao"),
+        )
+        .group_by(MovimentacaoCarteira.usuario_id)
+        .subquery()
+    )
+    saldo_razao = func.coalesce(soma_movimentacoes.c.saldo_razao, 0)
+    linhas = session.exec(
+        select(Usuario.id, Usuario.saldo_carteira, saldo_razao)
+        .outerjoin(soma_movimentacoes, soma_movimentacoes.c.usuario_id == Usuario.id)
+        .where(Usuario.saldo_carteira != saldo_razao)
+        .with_for_update(of=Usuario)
+    ).all()
+
+    divergencias = []
+    for usuario_id, saldo_armazenado, saldo_calculado in linhas:
+        divergencias.append(
+            {
+                "usuario_id": usuario_id,
+                "saldo_armazenado": saldo_armazenado,
+                "saldo_razao": _quantizar(saldo_calculado),
+            }
+        )
+        if corrigir:
+            session.exec(
+                update(_usuario)
+                .where(_usuario.c.id == usuario_id)
+                .values(saldo_carteira=_quantizar(saldo_calculado))
+            )
+            _sincronizar_instancia(session, usuario_id, _quantizar(saldo_calculado))
+
+    usuarios_verificados = session.exec(select(func.count(Usuario.id))).scalar_one()
+    return {
+        "usuarios_verificados": usuarios_verificados,
+        "usuarios_com_divergencia": len(divergencias),
+        "corrigido": corrigir,
+        "divergencias": divergencias,
+    }
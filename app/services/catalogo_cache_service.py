@@ -0,0 +1,206 @@
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as SASession
+
+from app.core.cache import get_backend_versao
+from app.core.config import settings
+
+
+CHAVE_CATALOGO = "catalogo_produtos"
+_SESSION_INFO_CATALOGO_ALTERADO = "catalogo_alterado"
+
+
+@dataclass(frozen=True)
+class CatalogoEntrada:
+    versao: Optional[int]
+    etag: str
+    corpo: bytes
+    carregado_em: float
+
+
+class CatalogoCache:
+    """
+    Cache em memória da lista de produtos ativos do bot.
+
+    A entrada é válida enquanto o carimbo de versão do backend não mudar
+    (e dentro do TTL, como rede de segurança para alterações feitas fora
+    da API). O ETag é derivado do conteúdo.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entrada: Optional[CatalogoEntrada] = None
+        self.hits = 0
+        self.misses = 0
+        self.invalidacoes = 0
+        self.erros_backend = 0
+
+    def _versao_atual(self) -> Optional[int]:
+        try:
+            return get_backend_versao().versao_atual(CHAVE_CATALOGO)
+        except Exception as exc:
+            self.erros_backend += 1
+            print(f"AVISO: falha ao ler versão do catálogo no backend de cache: {exc}")
+            return None
+
+    def _entrada_valida(self, entrada: Optional[CatalogoEntrada], versao: Optional[int]) -> bool:
+        if entrada is None or versao is None or entrada.versao != versao:
+            return False
+        return (time.monotonic() - entrada.carregado_em) < settings.CATALOGO_CACHE_TTL_SECONDS
+
+    def obter(self, carregar: Callable[[], list]) -> CatalogoEntrada:
+        """
+        Retorna o catálogo serializado, chamando `carregar` (que devolve uma
+        lista JSON-serializável) apenas em caso de miss.
+        """
+        if not settings.CATALOGO_CACHE_ENABLED:
+            self.misses += 1
+            return _serializar(None, carregar())
+
+        # A versão é lida ANTES da carga: se houver invalidação durante a
+        # carga, a entrada fica com a versão antiga e é descartada no próximo acesso.
+        versao = self._versao_atual()
+        entrada = self._entrada
+        if self._entrada_valida(entrada, versao):
+            self.hits += 1
+            return entrada
+
+        with self._lock:
+            entrada = self._entrada
+            if self._entrada_valida(entrada, versao):
+                self.hits += 1
+                return entrada
+            self.misses += 1
+            entrada = _serializar(versao, carregar())
+            self._entrada = entrada
+            return entrada
+
+    async def obter_async(self, carregar: Callable[[], Awaitable[list]]) -> CatalogoEntrada:
+        """
+        Igual a `obter`, para rotas assíncronas. Não usa o lock: segurar um
+        threading.Lock durante um `await` travaria o event loop. Misses
+        simultâneos podem carregar em paralelo; vence a última carga.
+        """
+        if not settings.CATALOGO_CACHE_ENABLED:
+            self.misses += 1
+            return _serializar(None, await carregar())
+
+        # Fora do greenlet do SQLAlchemy: o GET no Redis vai para uma thread aqui mesmo.
+        if get_backend_versao().bloqueante:
+            versao = await asyncio.to_thread(self._versao_atual)
+        else:
+            versao = self._versao_atual()
+        entrada = self._entrada
+        if self._entrada_valida(entrada, versao):
+            self.hits += 1
+            return entrada
+
+        self.misses += 1
+        entrada = _serializar(versao, await carregar())
+        self._entrada = entrada
+        return entrada
+
+    def invalidar(self) -> None:
+        self.invalidacoes += 1
+        self._entrada = None
+        try:
+            get_backend_versao().incrementar(CHAVE_CATALOGO)
+        except Exception as exc:
+            self.erros_backend += 1
+            print(f"AVISO: falha ao incrementar versão do catálogo no backend de cache: {exc}")
+
+    def estatisticas(self) -> dict:
+        entrada = self._entrada
+        total = self.hits + self.misses
+        return {
+            "backend": get_backend_versao().nome,
+            "habilitado": settings.CATALOGO_CACHE_ENABLED,
+            "versao": entrada.versao if entrada else None,
+            "etag": entrada.etag if entrada else None,
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": round(self.hits / total, 4) if total else 0.0,
+            "invalidacoes": self.invalidacoes,
+            "erros_backend": self.erros_backend,
+        }
+
+
+def _serializar(versao: Optional[int], dados: list) -> CatalogoEntrada:
+    corpo = json.dumps(dados, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(corpo).hexdigest()[:32] + '"'
+    return CatalogoEntrada(versao=versao, etag=etag, corpo=corpo, carregado_em=time.monotonic())
+
+
+catalogo_cache = CatalogoCache()
+
+
+class PrecoMinimoCache:
+    """
+    Menor preço entre os produtos ativos (regra do valor mínimo dos
+    afiliados). Usa o mesmo carimbo de versão do catálogo, então qualquer
+    alteração de produto que invalida o catálogo também invalida este valor.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entrada: Optional[tuple[int, Decimal, float]] = None
+        self.hits = 0
+        self.misses = 0
+
+    def obter(self, carregar: Callable[[], Decimal]) -> Decimal:
+        try:
+            versao = get_backend_versao().versao_atual(CHAVE_CATALOGO)
+        except Exception as exc:
+            print(f"AVISO: falha ao ler versão do catálogo no backend de cache: {exc}")
+            versao = None
+
+        entrada = self._entrada
+        if (
+            versao is not None
+            and entrada is not None
+            and entrada[0] == versao
+            and (time.monotonic() - entrada[2]) < settings.CATALOGO_CACHE_TTL_SECONDS
+        ):
+            self.hits += 1
+            return entrada[1]
+
+        with self._lock:
+            self.misses += 1
+            valor = carregar()
+            if versao is not None:
+                self._entrada = (versao, valor, time.monotonic())
+            return valor
+
+
+preco_minimo_cache = PrecoMinimoCache()
+
+
+def invalidar_catalogo() -> None:
+    catalogo_cache.invalidar()
+
+
+def marcar_catalogo_alterado(session: SASession) -> None:
+    """
+    Agenda a invalidação do catálogo para depois do commit da sessão,
+    para que nenhum worker recarregue dados ainda não confirmados.
+    """
+    session.info[_SESSION_INFO_CATALOGO_ALTERADO] = True
+
+
+@event.listens_for(SASession, "after_commit")
+def _invalidar_catalogo_apos_commit(session: SASession) -> None:
+    if session.info.pop(_SESSION_INFO_CATALOGO_ALTERADO, False):
+        invalidar_catalogo()
+
+
+@event.listens_for(SASession, "after_rollback")
+def _descartar_marcacao_catalogo(session: SASession) -> None:
+    session.info.pop(_SESSION_INFO_CATALOGO_ALTERADO, None)
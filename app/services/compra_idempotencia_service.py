@@ -0,0 +1,99 @@
+import datetime
+import hashlib
+import json
+from typing import Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import delete
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select
+
+from app.models.pedido_models import CompraIdempotencia
+from app.schemas.compra_schemas import CompraCreateRequest, CompraCreateResponse
+from app.services import security
+
+
+TAMANHO_MAXIMO_CHAVE = 255
+
+
+def calcular_hash_requisicao(compra_in: CompraCreateRequest) -> str:
+    payload = json.dumps(compra_in.model_dump(mode="json"), sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def reservar_chave_idempotencia(
+    session: Session,
+    chave: str,
+    compra_in: CompraCreateRequest,
+) -> Optional[CompraCreateResponse]:
+    """
+    Registra a chave na transação atual antes de qualquer efeito da compra.
+
+    Se outra requisição com a mesma chave ainda estiver em andamento, o INSERT
+    fica bloqueado no índice único até ela terminar: em caso de commit,
+    devolve a resposta armazenada; em caso de rollback, a chave fica com esta
+    requisição, que segue normalmente. Retorna None quando a compra deve ser
+    processada.
+    """
+    chave = (chave or "").strip()
+    if not chave or len(chave) > TAMANHO_MAXIMO_CHAVE:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Idempotency-Key inválida (1 a {TAMANHO_MAXIMO_CHAVE} caracteres).",
+        )
+
+    hash_requisicao = calcular_hash_requisicao(compra_in)
+    result = session.exec(
+        pg_insert(CompraIdempotencia)
+        .values(
+            chave=chave,
+            telegram_id=compra_in.telegram_id,
+            hash_requisicao=hash_requisicao,
+            criado_em=datetime.datetime.utcnow(),
+        )
+        .on_conflict_do_nothing(index_elements=[CompraIdempotencia.chave])
+    )
+    if result.rowcount:
+        return None
+
+    registro = session.exec(
+        select(CompraIdempotencia).where(CompraIdempotencia.chave == chave)
+    ).one()
+    if registro.telegram_id != compra_in.telegram_id or registro.hash_requisicao != hash_requisicao:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Idempotency-Key já utilizada em outra compra.",
+        )
+    if not registro.resposta_criptografada:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Compra com esta Idempotency-Key ainda está em processamento.",
+        )
+
+    resposta_json = security.decrypt_data(registro.resposta_criptografada)
+    if not resposta_json:
+        raise HTTPException(status_code=500, detail="Erro interno ao recuperar a resposta da compra.")
+    return CompraCreateResponse.model_validate_json(resposta_json)
+
+
+def salvar_resposta_idempotencia(
+    session: Session,
+    chave: str,
+    resposta: CompraCreateResponse,
+) -> None:
+    """
+    Guarda a resposta da compra na linha da chave. Deve ser chamada antes do
+    commit da compra para que chave e efeitos sejam persistidos juntos.
+    """
+    registro = session.get(CompraIdempotencia, chave.strip())
+    if not registro:
+        return
+    registro.pedido_id = resposta.pedido_id
+    registro.resposta_criptografada = security.encrypt_data(resposta.model_dump_json())
+    session.add(registro)
+
+
+def limpar_chaves_expiradas(session: Session, *, dias: int = 7) -> int:
+    limite = datetime.datetime.utcnow() - datetime.timedelta(days=dias)
+    result = session.exec(delete(CompraIdempotencia).where(CompraIdempotencia.criado_em < limite))
+    return result.rowcount or 0
@@ -0,0 +1,180 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select
+
+from app.core.cache import get_backend_versao
+from app.core.concorrencia import executar_bloqueante
+from app.core.config import settings
+from app.db.database import engine
+from app.models.configuracao_models import Configuracao
+
+
+CHAVE_CONFIGURACAO = "configuracao"
+_SESSION_INFO_CONFIGURACAO_ALTERADA = "configuracao_alterada"
+
+
+@dataclass
+class ConfiguracaoEntrada:
+    config: Configuracao
+    versao_backend: Optional[int]
+    verificado_em: float
+
+
+def _carregar_configuracao() -> Configuracao:
+    """
+    Lê a linha singleton (criando a padrão se não existir) e devolve uma
+    cópia desligada da sessão.
+    """
+    with Session(engine) as session:
+        config = session.exec(select(Configuracao)).first()
+        if not config:
+            print("CONFIG: Nenhuma configuração encontrada, criando padrão.")
+            config = Configuracao()
+            session.add(config)
+            session.commit()
+            session.refresh(config)
+        return Configuracao.model_validate(config.model_dump())
+
+
+def _versao_no_banco() -> Optional[int]:
+    with Session(engine) as session:
+        return session.exec(select(Configuracao.versao).limit(1)).first()
+
+
+class ConfiguracaoCache:
+    """
+    Cópia em memória da configuração do sistema (linha singleton).
+
+    A cópia vale enquanto o carimbo de versão do backend não mudar. Como o
+    backend local não enxerga invalidações de outros processos, a cada
+    CONFIGURACAO_CACHE_REVALIDAR_SECONDS a coluna `versao` é conferida no
+    banco (uma leitura de um inteiro) e a linha só é recarregada se mudou.
+    O objeto devolvido é compartilhado: trate-o como somente leitura.
+    """
+
+    def __init__(
+        self,
+        carregar: Callable[[], Configuracao] = _carregar_configuracao,
+        versao_no_banco: Callable[[], Optional[int]] = _versao_no_banco,
+        relogio=time.monotonic,
+    ):
+        self._carregar = carregar
+        self._versao_no_banco = versao_no_banco
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._entrada: Optional[ConfiguracaoEntrada] = None
+        self.hits = 0
+        self.misses = 0
+        self.revalidacoes = 0
+        self.invalidacoes = 0
+        self.erros_backend = 0
+
+    def _versao_backend(self) -> Optional[int]:
+        try:
+            return get_backend_versao().versao_atual(CHAVE_CONFIGURACAO)
+        except Exception as exc:
+            self.erros_backend += 1
+            print(f"AVISO: falha ao ler versão da configuração no backend de cache: {exc}")
+            return None
+
+    def _entrada_valida(self, entrada: Optional[ConfiguracaoEntrada], versao_backend: Optional[int]) -> bool:
+        if entrada is None or versao_backend is None or entrada.versao_backend != versao_backend:
+            return False
+        return (self._relogio() - entrada.verificado_em) < settings.CONFIGURACAO_CACHE_REVALIDAR_SECONDS
+
+    def obter(self) -> Configuracao:
+        if not settings.CONFIGURACAO_CACHE_ENABLED:
+            self.misses += 1
+            return executar_bloqueante(self._carregar)
+
+        versao_backend = self._versao_backend()
+        entrada = self._entrada
+        if self._entrada_valida(entrada, versao_backend):
+            self.hits += 1
+            return entrada.config
+
+        # A recarga lê o banco pelo psycopg2 segurando o lock: nas rotas
+        # assíncronas vai inteira para uma thread.
+        return executar_bloqueante(self._recarregar, versao_backend)
+
+    def _recarregar(self, versao_backend: Optional[int]) -> Configuracao:
+        with self._lock:
+            entrada = self._entrada
+            if self._entrada_valida(entrada, versao_backend):
+                self.hits += 1
+                return entrada.config
+
+            # Carimbo igual mas prazo vencido: basta conferir a versão no banco.
+            if entrada is not None and versao_backend is not None and entrada.versao_backend == versao_backend:
+                self.revalidacoes += 1
+                if self._versao_no_banco() == entrada.config.versao:
+                    entrada.verificado_em = self._relogio()
+                    self.hits += 1
+                    return entrada.config
+
+            self.misses += 1
+            entrada = ConfiguracaoEntrada(
+                config=self._carregar(),
+                versao_backend=versao_backend,
+                verificado_em=self._relogio(),
+            )
+            self._entrada = entrada
+            return entrada.config
+
+    def invalidar(self) -> None:
+        self.invalidacoes += 1
+        self._entrada = None
+        try:
+            get_backend_versao().incrementar(CHAVE_CONFIGURACAO)
+        except Exception as exc:
+            self.erros_backend += 1
+            print(f"AVISO: falha ao incrementar versão da configuração no backend de cache: {exc}")
+
+    def estatisticas(self) -> dict:
+        entrada = self._entrada
+        total = self.hits + self.misses
+        return {
+            "backend": get_backend_versao().nome,
+            "habilitado": settings.CONFIGURACAO_CACHE_ENABLED,
+            "versao": entrada.config.versao if entrada else None,
+            "revalidar_segundos": settings.CONFIGURACAO_CACHE_REVALIDAR_SECONDS,
+            "hits": self.hits,
+            "misses": self.misses,
+            "taxa_acerto": round(self.hits / total, 4) if total else 0.0,
+            "revalidacoes": self.revalidacoes,
+            "invalidacoes": self.invalidacoes,
+            "erros_backend": self.erros_backend,
+        }
+
+
+configuracao_cache = ConfiguracaoCache()
+
+
+def obter_configuracao() -> Configuracao:
+    """Configuração do sistema para leitura (cópia em cache)."""
+    return configuracao_cache.obter()
+
+
+def marcar_configuracao_alterada(session: SASession, config: Configuracao) -> None:
+    """
+    Incrementa a `versao` da linha (no próprio UPDATE, sem corrida entre
+    admins) e agenda a invalidação do cache para depois do commit.
+    """
+    config.versao = Configuracao.versao + 1
+    session.info[_SESSION_INFO_CONFIGURACAO_ALTERADA] = True
+
+
+@event.listens_for(SASession, "after_commit")
+def _invalidar_configuracao_apos_commit(session: SASession) -> None:
+    if session.info.pop(_SESSION_INFO_CONFIGURACAO_ALTERADA, False):
+        configuracao_cache.invalidar()
+
+
+@event.listens_for(SASession, "after_rollback")
+def _descartar_marcacao_configuracao(session: SASession) -> None:
+    session.info.pop(_SESSION_INFO_CONFIGURACAO_ALTERADA, None)
@@ -21,6 +21,7 @@ from typing import Optional
 from fastapi import BackgroundTasks
 from sqlmodel import Session, select
 
+from app.core.concorrencia import executar_bloqueante
 from app.core.config import settings
 from app.db.database import engine
 from app.models.conta_mae_models import (
@@ -488,7 +489,7 @@ def enqueue_invite_job(
         kwargs = {}
         if countdown_seconds and countdown_seconds > 0:
             kwargs["countdown"] = countdown_seconds
-        celery_app.send_task("process_conta_mae_invite_job", args=[str(job_id)], **kwargs)
+        executar_bloqueante(celery_app.send_task, "process_conta_mae_invite_job", args=[str(job_id)], **kwargs)
         return
     if background_tasks is not None:
         if countdown_seconds and countdown_seconds > 0:
@@ -41,7 +41,11 @@ from app.services.conta_mae_invite_service import (
     wait_for_spinner_to_settle,
     write_html_snapshot,
 )
-from app.services.disponibilidade_service import sincronizar_status_produto_por_disponibilidade
+from app.services.disponibilidade_service import (
+    registrar_variacao_disponibilidade,
+    sincronizar_status_produto_por_disponibilidade,
+    slots_livres_conta,
+)
 from app.services.notification_service import send_openai_member_removal_failure_admin_alert
 
 
@@ -465,6 +469,7 @@ def mark_member_removed(
     job.next_retry_at = None
     job.cancelled_at = None
     convite.removido_workspace_em = convite.removido_workspace_em or now
+    slots_livres_antes = slots_livres_conta(conta_mae)
     conta_mae.slots_ocupados = max((conta_mae.slots_ocupados or 0) - 1, 0)
     if conta_mae.data_expiracao is None or conta_mae.data_expiracao >= datetime.date.today():
         conta_mae.is_ativo = conta_mae.slots_ocupados < conta_mae.max_slots
@@ -472,6 +477,7 @@ def mark_member_removed(
     session.add(job)
     session.add(convite)
     session.add(conta_mae)
+    registrar_variacao_disponibilidade(session, conta_mae, slots_livres_antes)
     produto = session.get(Produto, conta_mae.produto_id)
     if produto:
         sincronizar_status_produto_por_disponibilidade(session, produto)
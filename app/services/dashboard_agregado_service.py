@@ -0,0 +1,414 @@
+import datetime
+import threading
+from collections import defaultdict
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import delete, event, func, inspect, literal
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.database import get_engine
+from app.db.perfis import PAPEL_SCHEDULER
+from app.models.dashboard_models import (
+    DashboardAgregadoDelta,
+    UsuarioAgregadoDia,
+    UsuarioAgregadoHora,
+    VendaAgregadaDia,
+    VendaAgregadaHora,
+)
+from app.models.pedido_models import Pedido
+from app.models.usuario_models import Usuario
+
+# Janela mantida em `venda_agregada_hora`/`usuario_agregado_hora`. O dashboard
+# usa no máximo as últimas 48h (24h atuais + 24h anteriores para o delta).
+HORAS_RETENCAO_AGREGADO_HORA = 24 * 7
+
+
+def truncar_hora(momento: datetime.datetime) -> datetime.datetime:
+    return momento.replace(minute=0, second=0, microsecond=0)
+
+
+class _VariacoesAgregados:
+    def __init__(self):
+        self.vendas_hora: dict = defaultdict(lambda: [0, Decimal("0.00")])
+        self.vendas_dia: dict = defaultdict(lambda: [0, Decimal("0.00")])
+        self.usuarios_hora: dict = defaultdict(int)
+        self.usuarios_dia: dict = defaultdict(int)
+
+    def venda(self, criado_em, produto_id, valor_pago, sinal: int) -> None:
+        if criado_em is None or produto_id is None:
+            return
+        self._somar_vendas(criado_em, produto_id, sinal, Decimal(valor_pago or 0) * sinal)
+
+    def usuario(self, criado_em, sinal: int) -> None:
+        if criado_em is None:
+            return
+        self._somar_usuarios(criado_em, sinal)
+
+    def _somar_vendas(self, momento, produto_id, pedidos: int, receita: Decimal) -> None:
+        for chave, destino in (
+            ((truncar_hora(momento), produto_id), self.vendas_hora),
+            ((momento.date(), produto_id), self.vendas_dia),
+        ):
+            destino[chave][0] += pedidos
+            destino[chave][1] += receita
+
+    def _somar_usuarios(self, momento, quantidade: int) -> None:
+        self.usuarios_hora[truncar_hora(momento)] += quantidade
+        self.usuarios_dia[momento.date()] += quantidade
+
+    def registrar(self, session: SASession) -> None:
+        """
+        Grava as variações por hora em `dashboard_agregado_delta` (um INSERT,
+        sem conflito com outras transações). O dia sai da hora na consolidação.
+        """
+        linhas = [
+            {"hora": hora, "produto_id": produto_id, "pedidos": pedidos, "receita": receita, "novos_usuarios": 0}
+            for (hora, produto_id), (pedidos, receita) in self.vendas_hora.items()
+            if pedidos or receita
+        ]
+        linhas.extend(
+            {"hora": hora, "produto_id": None, "pedidos": 0, "receita": Decimal("0.00"), "novos_usuarios": quantidade}
+            for hora, quantidade in self.usuarios_hora.items()
+            if quantidade
+        )
+        if linhas:
+            session.connection().execute(DashboardAgregadoDelta.__table__.insert().values(linhas))
+
+    def aplicar(self, session: SASession) -> None:
+        conexao = session.connection()
+        # Chaves ordenadas: flushes concorrentes travam as linhas na mesma ordem.
+        for modelo, coluna_tempo, variacoes in (
+            (VendaAgregadaHora, "hora", self.vendas_hora),
+            (VendaAgregadaDia, "dia", self.vendas_dia),
+        ):
+            linhas = [
+                {coluna_tempo: momento, "produto_id": produto_id, "pedidos": pedidos, "receita": receita}
+                for (momento, produto_id), (pedidos, receita) in sorted(variacoes.items(), key=lambda item: (item[0][0], str(item[0][1])))
+                if pedidos or receita
+            ]
+            if not linhas:
+                continue
+            tabela = modelo.__table__
+            stmt = pg_insert(tabela).values(linhas)
+            conexao.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[coluna_tempo, "produto_id"],
+                    set_={
+                        "pedidos": tabela.c.pedidos + stmt.excluded.pedidos,
+                        "receita": tabela.c.receita + stmt.excluded.receita,
+                    },
+                )
+            )
+
+        for modelo, coluna_tempo, variacoes in (
+            (UsuarioAgregadoHora, "hora", self.usuarios_hora),
+            (UsuarioAgregadoDia, "dia", self.usuarios_dia),
+        ):
+            linhas = [
+                {coluna_tempo: momento, "novos_usuarios": quantidade}
+                for momento, quantidade in sorted(variacoes.items())
+                if quantidade
+            ]
+            if not linhas:
+                continue
+            tabela = modelo.__table__
+            stmt = pg_insert(tabela).values(linhas)
+            conexao.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=[coluna_tempo],
+                    set_={"novos_usuarios": tabela.c.novos_usuarios + stmt.excluded.novos_usuarios},
+                )
+            )
+
+
+_SESSION_INFO_VARIACOES = "dashboard_agregados_variacoes"
+_ATRIBUTOS_VENDA = ("criado_em", "produto_id", "valor_pago")
+
+
+def _alterou(obj, atributos) -> bool:
+    estado = inspect(obj)
+    return any(estado.attrs[atributo].history.has_changes() for atributo in atributos)
+
+
+@event.listens_for(SASession, "before_flush")
+def _registrar_estado_anterior_agregados(session: SASession, flush_context, instances) -> None:
+    """
+    Antes do flush, desconta dos agregados o estado ainda gravado no banco dos
+    pedidos/usuários que serão removidos ou alterados. O estado é lido do banco
+    porque o objeto pode ter expirado desde o último commit.
+    """
+    pedido_ids = set()
+    usuario_ids = set()
+    for obj in session.deleted:
+        if isinstance(obj, Pedido):
+            pedido_ids.add(obj.id)
+        elif isinstance(obj, Usuario):
+            usuario_ids.add(obj.id)
+    for obj in session.dirty:
+        if isinstance(obj, Pedido) and _alterou(obj, _ATRIBUTOS_VENDA):
+            pedido_ids.add(obj.id)
+        elif isinstance(obj, Usuario) and _alterou(obj, ("criado_em",)):
+            usuario_ids.add(obj.id)
+    if not pedido_ids and not usuario_ids:
+        return
+
+    variacoes = _VariacoesAgregados()
+    conexao = session.connection()
+    if pedido_ids:
+        for criado_em, produto_id, valor_pago in conexao.execute(
+            select(Pedido.criado_em, Pedido.produto_id, Pedido.valor_pago).where(Pedido.id.in_(pedido_ids))
+        ):
+            variacoes.venda(criado_em, produto_id, valor_pago, -1)
+    if usuario_ids:
+        for (criado_em,) in conexao.execute(select(Usuario.criado_em).where(Usuario.id.in_(usuario_ids))):
+            variacoes.usuario(criado_em, -1)
+    session.info[_SESSION_INFO_VARIACOES] = variacoes
+
+
+@event.listens_for(SASession, "after_flush")
+def _manter_agregados_dashboard(session: SASession, flush_context) -> None:
+    """
+    Soma os pedidos/usuários criados ou alterados neste flush e grava as
+    variações (inclusive o que `before_flush` descontou) como deltas, na
+    mesma transação. Atualizar os agregados aqui serializaria as compras da
+    mesma hora e produto na linha do agregado; quem faz isso é o consolidador.
+    """
+    variacoes = session.info.pop(_SESSION_INFO_VARIACOES, None) or _VariacoesAgregados()
+    houve_variacao = bool(variacoes.vendas_hora or variacoes.usuarios_hora)
+
+    for obj in session.new:
+        if isinstance(obj, Pedido):
+            variacoes.venda(obj.criado_em, obj.produto_id, obj.valor_pago, 1)
+            houve_variacao = True
+        elif isinstance(obj, Usuario):
+            variacoes.usuario(obj.criado_em, 1)
+            houve_variacao = True
+
+    for obj in session.dirty:
+        if isinstance(obj, Pedido) and _alterou(obj, _ATRIBUTOS_VENDA):
+            variacoes.venda(obj.criado_em, obj.produto_id, obj.valor_pago, 1)
+            houve_variacao = True
+        elif isinstance(obj, Usuario) and _alterou(obj, ("criado_em",)):
+            variacoes.usuario(obj.criado_em, 1)
+            houve_variacao = True
+
+    if houve_variacao:
+        variacoes.registrar(session)
+
+
+@event.listens_for(SASession, "after_rollback")
+def _descartar_variacoes_agregados(session: SASession) -> None:
+    session.info.pop(_SESSION_INFO_VARIACOES, None)
+
+
+def consolidar_deltas_dashboard(session: Session, *, limite: Optional[int] = None) -> int:
+    """
+    Apaga até `limite` deltas e soma-os nos agregados, na mesma transação.
+    Consolidadores concorrentes pegam deltas diferentes (SKIP LOCKED).
+    Retorna quantos deltas foram consolidados.
+    """
+    limite = limite or settings.DASHBOARD_AGREGADOS_CONSOLIDAR_LOTE
+    ids = (
+        select(DashboardAgregadoDelta.id)
+        .order_by(DashboardAgregadoDelta.id)
+        .limit(limite)
+        .with_for_update(skip_locked=True)
+    )
+    deltas = session.exec(
+        delete(DashboardAgregadoDelta)
+        .where(DashboardAgregadoDelta.id.in_(ids.scalar_subquery()))
+        .returning(
+            DashboardAgregadoDelta.hora,
+            DashboardAgregadoDelta.produto_id,
+            DashboardAgregadoDelta.pedidos,
+            DashboardAgregadoDelta.receita,
+            DashboardAgregadoDelta.novos_usuarios,
+        )
+    ).all()
+
+    variacoes = _VariacoesAgregados()
+    for hora, produto_id, pedidos, receita, novos_usuarios in deltas:
+        if produto_id is not None:
+            variacoes._somar_vendas(hora, produto_id, pedidos, receita)
+        if novos_usuarios:
+            variacoes._somar_usuarios(hora, novos_usuarios)
+    variacoes.aplicar(session)
+    session.commit()
+    return len(deltas)
+
+
+def consolidar_todos_deltas_dashboard(session: Session) -> int:
+    total = 0
+    while True:
+        consolidados = consolidar_deltas_dashboard(session)
+        total += consolidados
+        if consolidados < settings.DASHBOARD_AGREGADOS_CONSOLIDAR_LOTE:
+            return total
+
+
+def start_consolidador(stop_event: threading.Event) -> threading.Thread:
+    intervalo_segundos = max(1, settings.DASHBOARD_AGREGADOS_CONSOLIDAR_SECONDS)
+
+    def runner() -> None:
+        while not stop_event.wait(intervalo_segundos):
+            try:
+                with Session(get_engine(PAPEL_SCHEDULER)) as session:
+                    consolidar_todos_deltas_dashboard(session)
+            except Exception as exc:
+                print(f"DASHBOARD_CONSOLIDADOR_ERROR: {exc}")
+
+    thread = threading.Thread(target=runner, name="dashboard-consolidador", daemon=True)
+    thread.start()
+    return thread
+
+
+def _reconstruir_intervalo(
+    session: Session,
+    inicio: datetime.datetime,
+    fim: datetime.datetime,
+    *,
+    incluir_dia: bool,
+    incluir_hora_desde: Optional[datetime.datetime],
+) -> None:
+    """
+    Reescreve os agregados do intervalo [inicio, fim) a partir de `pedido` e
+    `usuario`, com DELETE + INSERT ... SELECT na transação corrente. Os
+    deltas pendentes do intervalo são descartados: já estão na recontagem.
+    """
+    alvos = []
+    if incluir_dia:
+        session.exec(
+            delete(DashboardAgregadoDelta)
+            .where(DashboardAgregadoDelta.hora >= inicio)
+            .where(DashboardAgregadoDelta.hora < fim)
+        )
+        alvos.append((VendaAgregadaDia, UsuarioAgregadoDia, "dia", func.date, inicio, fim))
+    if incluir_hora_desde is not None:
+        alvos.append(
+            (
+                VendaAgregadaHora,
+                UsuarioAgregadoHora,
+                "hora",
+                lambda coluna: func.date_trunc("hour", coluna),
+                max(inicio, incluir_hora_desde),
+                fim,
+            )
+        )
+
+    for modelo_venda, modelo_usuario, coluna_tempo, truncar, desde, ate in alvos:
+        tabela_venda = modelo_venda.__table__
+        tabela_usuario = modelo_usuario.__table__
+        coluna_venda = tabela_venda.c[coluna_tempo]
+        coluna_usuario = tabela_usuario.c[coluna_tempo]
+        limite_inferior = desde.date() if coluna_tempo == "dia" else desde
+        limite_superior = ate.date() if coluna_tempo == "dia" else ate
+
+        session.exec(
+            delete(tabela_venda)
+            .where(coluna_venda >= limite_inferior)
+            .where(coluna_venda < limite_superior)
+        )
+        momento_pedido = truncar(Pedido.criado_em)
+        session.exec(
+            pg_insert(tabela_venda).from_select(
+                [coluna_tempo, "produto_id", "pedidos", "receita"],
+                select(
+                    momento_pedido,
+                    Pedido.produto_id,
+                    func.count(Pedido.id),
+                    func.coalesce(func.sum(Pedido.valor_pago), literal(Decimal("0.00"))),
+                )
+                .where(Pedido.criado_em >= desde)
+                .where(Pedido.criado_em < ate)
+                .group_by(momento_pedido, Pedido.produto_id),
+            )
+        )
+
+        session.exec(
+            delete(tabela_usuario)
+            .where(coluna_usuario >= limite_inferior)
+            .where(coluna_usuario < limite_superior)
+        )
+        momento_usuario = truncar(Usuario.criado_em)
+        session.exec(
+            pg_insert(tabela_usuario).from_select(
+                [coluna_tempo, "novos_usuarios"],
+                select(momento_usuario, func.count(Usuario.id))
+                .where(Usuario.criado_em >= desde)
+                .where(Usuario.criado_em < ate)
+                .group_by(momento_usuario),
+            )
+        )
+
+
+def compactar_agregados_dashboard(
+    session: Session,
+    *,
+    horas_retencao: int = HORAS_RETENCAO_AGREGADO_HORA,
+) -> int:
+    """
+    Remove as horas fora da janela de retenção e as linhas zeradas
+    (sobras de pedidos removidos). Retorna quantas linhas saíram.
+    """
+    limite_horas = truncar_hora(datetime.datetime.utcnow()) - datetime.timedelta(hours=horas_retencao)
+    removidas = 0
+    for stmt in (
+        delete(VendaAgregadaHora).where(VendaAgregadaHora.hora < limite_horas),
+        delete(UsuarioAgregadoHora).where(UsuarioAgregadoHora.hora < limite_horas),
+        delete(VendaAgregadaHora).where(VendaAgregadaHora.pedidos == 0),
+        delete(VendaAgregadaDia).where(VendaAgregadaDia.pedidos == 0),
+        delete(UsuarioAgregadoHora).where(UsuarioAgregadoHora.novos_usuarios == 0),
+        delete(UsuarioAgregadoDia).where(UsuarioAgregadoDia.novos_usuarios == 0),
+    ):
+        removidas += session.exec(stmt).rowcount or 0
+    return removidas
+
+
+def reconstruir_agregados_dashboard(
+    session: Session,
+    *,
+    dias: Optional[int] = None,
+    horas_retencao: int = HORAS_RETENCAO_AGREGADO_HORA,
+) -> dict:
+    """
+    Backfill + compactação dos agregados. Reconstrói dia a dia (um commit por
+    dia, para não segurar locks) os últimos `dias`, ou todo o histórico quando
+    `dias` é None; as tabelas por hora só dentro da janela de retenção.
+    """
+    agora = datetime.datetime.utcnow()
+    hoje = agora.date()
+    if dias is None:
+        primeiro_pedido = session.exec(select(func.min(Pedido.criado_em))).first()
+        primeiro_usuario = session.exec(select(func.min(Usuario.criado_em))).first()
+        candidatos = [momento.date() for momento in (primeiro_pedido, primeiro_usuario) if momento]
+        primeiro_dia = min(candidatos) if candidatos else hoje
+    else:
+        primeiro_dia = hoje - datetime.timedelta(days=max(dias, 1) - 1)
+
+    limite_horas = truncar_hora(agora) - datetime.timedelta(hours=horas_retencao)
+    dias_reconstruidos = 0
+    dia = primeiro_dia
+    while dia <= hoje:
+        inicio = datetime.datetime.combine(dia, datetime.time.min)
+        fim = inicio + datetime.timedelta(days=1)
+        _reconstruir_intervalo(
+            session,
+            inicio,
+            fim,
+            incluir_dia=True,
+            incluir_hora_desde=limite_horas if fim > limite_horas else None,
+        )
+        session.commit()
+        dias_reconstruidos += 1
+        dia += datetime.timedelta(days=1)
+
+    linhas_compactadas = compactar_agregados_dashboard(session, horas_retencao=horas_retencao)
+    session.commit()
+    return {
+        "dias_reconstruidos": dias_reconstruidos,
+        "linhas_compactadas": linhas_compactadas,
+    }
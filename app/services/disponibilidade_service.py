@@ -1,11 +1,18 @@
 import datetime
-from typing import Optional
+import uuid
+from typing import Optional, Union
 
+from sqlalchemy import func, inspect, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlmodel import Session, select
 
 from app.models.base import TipoEntregaProduto
 from app.models.conta_mae_models import ContaMae
-from app.models.produto_models import EstoqueConta, Produto
+from app.models.produto_models import EstoqueConta, Produto, ProdutoDisponibilidade
+from app.services.catalogo_cache_service import marcar_catalogo_alterado
+
+
+ContaComSlots = Union[EstoqueConta, ContaMae]
 
 
 def inativar_conta_estoque_se_lotada(conta: EstoqueConta) -> bool:
@@ -28,6 +35,82 @@ def inativar_conta_mae_se_lotada(conta: ContaMae) -> bool:
     return False
 
 
+def slots_livres_conta(conta: ContaComSlots, today: Optional[datetime.date] = None) -> int:
+    """
+    Quantos slots desta conta contam como disponíveis para venda.
+    Usa as mesmas regras das buscas de alocação em compras.py.
+    """
+    if not conta.is_ativo:
+        return 0
+    if isinstance(conta, EstoqueConta) and conta.requer_atencao:
+        return 0
+    if isinstance(conta, ContaMae) and conta.data_expiracao:
+        if conta.data_expiracao < (today or datetime.date.today()):
+            return 0
+    return max((conta.max_slots or 0) - (conta.slots_ocupados or 0), 0)
+
+
+def registrar_variacao_disponibilidade(
+    session: Session,
+    conta: ContaComSlots,
+    slots_antes: int,
+    *,
+    removida: bool = False,
+) -> int:
+    """
+    Aplica no contador do produto a diferença de slots livres causada por uma
+    alteração na conta. `slots_antes` deve ser lido com `slots_livres_conta`
+    antes da alteração (0 para contas novas). Se a conta mudou de produto
+    (ainda sem flush), os slots saem do produto antigo e entram no novo.
+    """
+    slots_depois = 0 if removida else slots_livres_conta(conta)
+
+    produto_id_antes = conta.produto_id
+    historico = inspect(conta).attrs.produto_id.history
+    if historico.deleted and historico.deleted[0] is not None:
+        produto_id_antes = historico.deleted[0]
+
+    if produto_id_antes != conta.produto_id:
+        _aplicar_variacao(session, conta, produto_id_antes, -slots_antes, 0)
+        _aplicar_variacao(session, conta, conta.produto_id, slots_depois, slots_depois)
+    else:
+        _aplicar_variacao(session, conta, conta.produto_id, slots_depois - slots_antes, slots_depois)
+    return slots_depois - slots_antes
+
+
+def _aplicar_variacao(
+    session: Session,
+    conta: ContaComSlots,
+    produto_id: uuid.UUID,
+    delta: int,
+    slots_depois: int,
+) -> None:
+    valores: dict = {}
+    if isinstance(conta, ContaMae):
+        if delta:
+            valores["slots_livres_conta_mae"] = ProdutoDisponibilidade.slots_livres_conta_mae + delta
+        if slots_depois > 0 and conta.data_expiracao:
+            valores["menor_expiracao_conta_mae"] = func.least(
+                func.coalesce(ProdutoDisponibilidade.menor_expiracao_conta_mae, conta.data_expiracao),
+                conta.data_expiracao,
+            )
+    elif delta:
+        valores["slots_livres_estoque"] = ProdutoDisponibilidade.slots_livres_estoque + delta
+
+    if not valores:
+        return
+
+    valores["atualizado_em"] = datetime.datetime.utcnow()
+    result = session.exec(
+        update(ProdutoDisponibilidade)
+        .where(ProdutoDisponibilidade.produto_id == produto_id)
+        .values(valores)
+    )
+    if result.rowcount == 0:
+        # Produto ainda sem contador: o recálculo já enxerga a alteração atual.
+        recalcular_disponibilidade_produto(session, produto_id)
+
+
 def inativar_produto_sem_contas_disponiveis(
     session: Session,
     produto: Produto,
@@ -43,6 +126,7 @@ def inativar_produto_sem_contas_disponiveis(
     if not disponivel:
         produto.is_ativo = False
         session.add(produto)
+        marcar_catalogo_alterado(session)
         return True
 
     return False
@@ -62,39 +146,196 @@ def sincronizar_status_produto_por_disponibilidade(
     if disponivel and not produto.is_ativo:
         produto.is_ativo = True
         session.add(produto)
+        marcar_catalogo_alterado(session)
         return True
 
     if not disponivel and produto.is_ativo:
         produto.is_ativo = False
         session.add(produto)
+        marcar_catalogo_alterado(session)
         return True
 
     return False
 
 
 def _produto_tem_disponibilidade(session: Session, produto: Produto) -> bool:
+    if produto.tipo_entrega == TipoEntregaProduto.MANUAL_ADMIN:
+        # Produto manual não depende de estoque/slots para ficar ativo.
+        return True
+
+    contador = session.exec(
+        select(
+            ProdutoDisponibilidade.slots_livres_estoque,
+            ProdutoDisponibilidade.slots_livres_conta_mae,
+            ProdutoDisponibilidade.menor_expiracao_conta_mae,
+        ).where(ProdutoDisponibilidade.produto_id == produto.id)
+    ).first()
+
+    if contador is None:
+        contador = recalcular_disponibilidade_produto(session, produto.id)
+    elif (
+        produto.tipo_entrega == TipoEntregaProduto.SOLICITA_EMAIL
+        and contador.menor_expiracao_conta_mae
+        and contador.menor_expiracao_conta_mae < datetime.date.today()
+    ):
+        # Alguma conta-mãe contada expirou desde o último cálculo.
+        contador = recalcular_disponibilidade_produto(session, produto.id)
+
     if produto.tipo_entrega == TipoEntregaProduto.AUTOMATICA:
-        conta_disponivel_id: Optional[str] = session.exec(
-            select(EstoqueConta.id)
-            .where(EstoqueConta.produto_id == produto.id)
-            .where(EstoqueConta.is_ativo == True)
-            .where(EstoqueConta.requer_atencao == False)
-            .where(EstoqueConta.slots_ocupados < EstoqueConta.max_slots)
-            .limit(1)
-        ).first()
-        return conta_disponivel_id is not None
-
-    if produto.tipo_entrega == TipoEntregaProduto.SOLICITA_EMAIL:
-        today = datetime.date.today()
-        conta_disponivel_id: Optional[str] = session.exec(
-            select(ContaMae.id)
-            .where(ContaMae.produto_id == produto.id)
-            .where(ContaMae.is_ativo == True)
-            .where(ContaMae.slots_ocupados < ContaMae.max_slots)
-            .where((ContaMae.data_expiracao == None) | (ContaMae.data_expiracao >= today))
-            .limit(1)
-        ).first()
-        return conta_disponivel_id is not None
-
-    # Produto manual não depende de estoque/slots para ficar ativo.
-    return True
+        return contador.slots_livres_estoque > 0
+    return contador.slots_livres_conta_mae > 0
+
+
+def _calcular_disponibilidade_real(
+    session: Session,
+    produto_ids: Optional[list[uuid.UUID]] = None,
+) -> dict[uuid.UUID, dict]:
+    """
+    Calcula os contadores a partir das linhas de EstoqueConta/ContaMae.
+    """
+    today = datetime.date.today()
+    slots_livres_estoque = func.sum(EstoqueConta.max_slots - EstoqueConta.slots_ocupados)
+    stmt_estoque = (
+        select(EstoqueConta.produto_id, slots_livres_estoque)
+        .where(EstoqueConta.is_ativo == True)
+        .where(EstoqueConta.requer_atencao == False)
+        .where(EstoqueConta.slots_ocupados < EstoqueConta.max_slots)
+        .group_by(EstoqueConta.produto_id)
+    )
+    slots_livres_conta_mae = func.sum(ContaMae.max_slots - ContaMae.slots_ocupados)
+    stmt_conta_mae = (
+        select(ContaMae.produto_id, slots_livres_conta_mae, func.min(ContaMae.data_expiracao))
+        .where(ContaMae.is_ativo == True)
+        .where(ContaMae.slots_ocupados < ContaMae.max_slots)
+        .where((ContaMae.data_expiracao == None) | (ContaMae.data_expiracao >= today))
+        .group_by(ContaMae.produto_id)
+    )
+    if produto_ids is not None:
+        stmt_estoque = stmt_estoque.where(EstoqueConta.produto_id.in_(produto_ids))
+        stmt_conta_mae = stmt_conta_mae.where(ContaMae.produto_id.in_(produto_ids))
+
+    resultado: dict[uuid.UUID, dict] = {}
+
+    def _linha(produto_id: uuid.UUID) -> dict:
+        return resultado.setdefault(
+            produto_id,
+            {"slots_livres_estoque": 0, "slots_livres_conta_mae": 0, "menor_expiracao_conta_mae": None},
+        )
+
+    for produto_id, slots in session.exec(stmt_estoque).all():
+        _linha(produto_id)["slots_livres_estoque"] = int(slots or 0)
+    for produto_id, slots, menor_expiracao in session.exec(stmt_conta_mae).all():
+        linha = _linha(produto_id)
+        linha["slots_livres_conta_mae"] = int(slots or 0)
+        linha["menor_expiracao_conta_mae"] = menor_expiracao
+    return resultado
+
+
+def _gravar_contador(session: Session, produto_id: uuid.UUID, valores: dict) -> None:
+    stmt = pg_insert(ProdutoDisponibilidade).values(
+        produto_id=produto_id,
+        atualizado_em=datetime.datetime.utcnow(),
+        **valores,
+    )
+    session.exec(
+        stmt.on_conflict_do_update(
+            index_elements=[ProdutoDisponibilidade.produto_id],
+            set_={
+                "slots_livres_estoque": stmt.excluded.slots_livres_estoque,
+                "slots_livres_conta_mae": stmt.excluded.slots_livres_conta_mae,
+                "menor_expiracao_conta_mae": stmt.excluded.menor_expiracao_conta_mae,
+                "atualizado_em": stmt.excluded.atualizado_em,
+            },
+        )
+    )
+
+
+def _travar_contadores(session: Session, produto_ids: Optional[list[uuid.UUID]] = None) -> dict:
+    """
+    Garante que existe linha de contador e a bloqueia, para que ajustes
+    concorrentes esperem o recálculo terminar.
+    """
+    if produto_ids is None:
+        produto_ids = list(session.exec(select(Produto.id)).all())
+    if not produto_ids:
+        return {}
+
+    session.exec(
+        pg_insert(ProdutoDisponibilidade)
+        .values([{"produto_id": produto_id, "atualizado_em": datetime.datetime.utcnow()} for produto_id in produto_ids])
+        .on_conflict_do_nothing(index_elements=[ProdutoDisponibilidade.produto_id])
+    )
+    linhas = session.exec(
+        select(
+            ProdutoDisponibilidade.produto_id,
+            ProdutoDisponibilidade.slots_livres_estoque,
+            ProdutoDisponibilidade.slots_livres_conta_mae,
+        )
+        .where(ProdutoDisponibilidade.produto_id.in_(produto_ids))
+        .order_by(ProdutoDisponibilidade.produto_id)
+        .with_for_update()
+    ).all()
+    return {linha.produto_id: linha for linha in linhas}
+
+
+def recalcular_disponibilidade_produto(session: Session, produto_id: uuid.UUID):
+    """
+    Reconstrói o contador de um produto a partir das linhas de origem.
+    """
+    session.flush()
+    _travar_contadores(session, [produto_id])
+    valores = _calcular_disponibilidade_real(session, [produto_id]).get(produto_id) or {
+        "slots_livres_estoque": 0,
+        "slots_livres_conta_mae": 0,
+        "menor_expiracao_conta_mae": None,
+    }
+    _gravar_contador(session, produto_id, valores)
+    return session.exec(
+        select(
+            ProdutoDisponibilidade.slots_livres_estoque,
+            ProdutoDisponibilidade.slots_livres_conta_mae,
+            ProdutoDisponibilidade.menor_expiracao_conta_mae,
+        ).where(ProdutoDisponibilidade.produto_id == produto_id)
+    ).one()
+
+
+def reconciliar_disponibilidade(session: Session) -> dict:
+    """
+    Reconstrói os contadores de todos os produtos e relata as divergências
+    encontradas entre o valor mantido e o valor real. Não faz commit.
+    """
+    produtos = {produto.id: produto for produto in session.exec(select(Produto)).all()}
+    armazenados = _travar_contadores(session, list(produtos.keys()))
+    reais = _calcular_disponibilidade_real(session)
+
+    divergencias = []
+    for produto_id, produto in produtos.items():
+        real = reais.get(produto_id) or {
+            "slots_livres_estoque": 0,
+            "slots_livres_conta_mae": 0,
+            "menor_expiracao_conta_mae": None,
+        }
+        armazenado = armazenados.get(produto_id)
+        estoque_armazenado = armazenado.slots_livres_estoque if armazenado else 0
+        conta_mae_armazenado = armazenado.slots_livres_conta_mae if armazenado else 0
+        if (
+            estoque_armazenado != real["slots_livres_estoque"]
+            or conta_mae_armazenado != real["slots_livres_conta_mae"]
+        ):
+            divergencias.append(
+                {
+                    "produto_id": produto_id,
+                    "produto_nome": produto.nome,
+                    "slots_livres_estoque_armazenado": estoque_armazenado,
+                    "slots_livres_estoque_real": real["slots_livres_estoque"],
+                    "slots_livres_conta_mae_armazenado": conta_mae_armazenado,
+                    "slots_livres_conta_mae_real": real["slots_livres_conta_mae"],
+                }
+            )
+        _gravar_contador(session, produto_id, real)
+
+    return {
+        "produtos_verificados": len(produtos),
+        "produtos_com_divergencia": len(divergencias),
+        "divergencias": divergencias,
+    }
@@ -0,0 +1,319 @@
+import imaplib
+import re
+import socket
+import threading
+import time
+import uuid
+from typing import Callable, Optional
+
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.database import get_engine
+from app.db.perfis import PAPEL_SCHEDULER
+from app.models.email_monitor_models import EmailMonitorAccount, EmailMonitorSyncRunStatus
+from app.services.email_monitor_service import (
+    build_connection,
+    log_imap_failure,
+    normalize_folder_list,
+    set_folder_idle_active,
+    stringify_imap_exception,
+    sync_account,
+)
+from app.services.security import decrypt_data
+
+# RFC 2177: o servidor pode derrubar um IDLE após 30 minutos sem tráfego;
+# o comando é renovado antes disso (IMAP_IDLE_RENEW_SECONDS).
+EXISTS_PATTERN = re.compile(rb"^\* \d+ EXISTS\b", re.IGNORECASE)
+WAIT_SLICE_SECONDS = 5.0
+UNSUPPORTED_RECHECK_SECONDS = 3600
+LOCK_RETRY_SECONDS = 2.0
+
+
+class IdleNotSupportedError(Exception):
+    pass
+
+
+def supports_idle(connection: imaplib.IMAP4) -> bool:
+    # Alguns servidores (Gmail, por exemplo) só anunciam IDLE após o login.
+    status, data = connection.capability()
+    if status != "OK":
+        return False
+    capabilities = b" ".join(item for item in data or [] if isinstance(item, bytes)).upper().split()
+    return b"IDLE" in capabilities
+
+
+def read_idle_line(connection: imaplib.IMAP4, deadline: float) -> Optional[bytes]:
+    """Lê a próxima linha do servidor ou devolve None se o prazo vencer sem dados."""
+    connection.sock.settimeout(max(0.05, deadline - time.monotonic()))
+    try:
+        line = connection.readline()
+    except socket.timeout:
+        # O file-object do socket fica inutilizável depois de um timeout;
+        # a conexão continua válida e segue com um novo.
+        stale_file = connection.file
+        connection.file = connection.sock.makefile("rb")
+        stale_file.close()
+        return None
+    finally:
+        connection.sock.settimeout(settings.EMAIL_MONITOR_IMAP_TIMEOUT_SECONDS)
+    if not line:
+        raise imaplib.IMAP4.abort("conexao IMAP encerrada pelo servidor durante o IDLE")
+    if line.startswith(b"* BYE"):
+        raise imaplib.IMAP4.abort(line.decode("utf-8", errors="replace").strip())
+    return line
+
+
+def wait_for_new_mail(
+    connection: imaplib.IMAP4,
+    tag: bytes,
+    *,
+    renew_after: float,
+    should_stop: Callable[[], bool],
+) -> bool:
+    """
+    Um ciclo de IDLE na pasta selecionada. Termina (com DONE) ao receber
+    EXISTS, ao chegar a hora de renovar o comando ou ao pedido de parada;
+    devolve True se chegou mensagem nova.
+    """
+    new_mail = False
+    connection.send(tag + b" IDLE\r\n")
+    while True:
+        line = connection.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("conexao IMAP encerrada pelo servidor ao iniciar o IDLE")
+        if line.startswith(b"+"):
+            break
+        if line.startswith(tag + b" "):
+            raise IdleNotSupportedError(line.decode("utf-8", errors="replace").strip())
+        if EXISTS_PATTERN.match(line):
+            new_mail = True
+
+    renew_at = time.monotonic() + renew_after
+    while not new_mail and not should_stop() and time.monotonic() < renew_at:
+        line = read_idle_line(connection, min(renew_at, time.monotonic() + WAIT_SLICE_SECONDS))
+        if line is not None and EXISTS_PATTERN.match(line):
+            new_mail = True
+
+    connection.send(b"DONE\r\n")
+    while True:
+        line = connection.readline()
+        if not line:
+            raise imaplib.IMAP4.abort("conexao IMAP encerrada pelo servidor ao encerrar o IDLE")
+        if line.startswith(tag + b" "):
+            if not line[len(tag) + 1:].upper().startswith(b"OK"):
+                raise imaplib.IMAP4.error(line.decode("utf-8", errors="replace").strip())
+            return new_mail
+        if EXISTS_PATTERN.match(line):
+            new_mail = True
+
+
+def account_signature(account: EmailMonitorAccount) -> tuple:
+    return (account.imap_host, account.imap_port, account.use_ssl, account.imap_username, account.imap_password_encrypted)
+
+
+class FolderIdleWatcher:
+    """
+    Mantém uma conexão em IDLE numa pasta da conta e sincroniza a pasta
+    (pela mesma conexão) a cada EXISTS e a cada renovação do IDLE. Quedas
+    reconectam com backoff exponencial; enquanto isso, e em servidores sem
+    IDLE, a pasta volta para o polling do scheduler.
+    """
+
+    def __init__(self, account_id: uuid.UUID, folder_name: str, signature: tuple, stop_event: threading.Event):
+        self.account_id = account_id
+        self.folder_name = folder_name
+        self.signature = signature
+        self.stop_event = stop_event
+        self.unsupported = False
+        self._cancelled = threading.Event()
+        self._tag_counter = 0
+        self._thread = threading.Thread(
+            target=self._run,
+            name=f"email-monitor-idle-{str(account_id)[:8]}-{folder_name}",
+            daemon=True,
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def cancel(self) -> None:
+        self._cancelled.set()
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def _should_stop(self) -> bool:
+        return self._cancelled.is_set() or self.stop_event.is_set()
+
+    def _wait(self, seconds: float) -> None:
+        deadline = time.monotonic() + seconds
+        while not self._should_stop() and time.monotonic() < deadline:
+            self._cancelled.wait(min(1.0, deadline - time.monotonic()))
+
+    def _next_tag(self) -> bytes:
+        self._tag_counter += 1
+        return f"IDLE{self._tag_counter}".encode()
+
+    def _run(self) -> None:
+        failures = 0
+        while not self._should_stop():
+            connection = None
+            registered = False
+            retry_delay = 0
+            try:
+                connection = self._connect()
+                if connection is None:
+                    return
+                self._sync(connection)
+                set_folder_idle_active(self.account_id, self.folder_name, True)
+                registered = True
+                failures = 0
+                while not self._should_stop():
+                    wait_for_new_mail(
+                        connection,
+                        self._next_tag(),
+                        renew_after=max(60, settings.IMAP_IDLE_RENEW_SECONDS),
+                        should_stop=self._should_stop,
+                    )
+                    if not self._should_stop():
+                        self._sync(connection)
+            except IdleNotSupportedError as exc:
+                self.unsupported = True
+                print(f"EMAIL_MONITOR_IDLE: conta {self.account_id} sem suporte a IDLE, pasta {self.folder_name} segue no polling ({exc}).")
+                return
+            except Exception as exc:
+                failures += 1
+                retry_delay = min(max(5, settings.IMAP_IDLE_BACKOFF_MAX_SECONDS), 5 * 2 ** (failures - 1))
+                print(
+                    f"EMAIL_MONITOR_IDLE_ERROR: conta {self.account_id} pasta {self.folder_name}: "
+                    f"{stringify_imap_exception(exc)} (nova tentativa em {retry_delay}s)"
+                )
+            finally:
+                if registered:
+                    set_folder_idle_active(self.account_id, self.folder_name, False)
+                if connection is not None:
+                    try:
+                        connection.logout()
+                    except Exception:
+                        pass
+            # Durante o backoff a pasta já voltou para o polling do scheduler.
+            self._wait(retry_delay)
+
+    def _connect(self) -> Optional[imaplib.IMAP4]:
+        with Session(get_engine(PAPEL_SCHEDULER)) as session:
+            account = session.get(EmailMonitorAccount, self.account_id)
+            if account is None or not account.is_active:
+                return None
+            host, port, use_ssl, username = account.imap_host, account.imap_port, account.use_ssl, account.imap_username
+            password = decrypt_data(account.imap_password_encrypted)
+        if not password:
+            raise RuntimeError("Não foi possível descriptografar a senha IMAP armazenada.")
+
+        connection = build_connection(host, port, use_ssl)
+        try:
+            connection.login(username, password)
+            if not supports_idle(connection):
+                raise IdleNotSupportedError("CAPABILITY sem IDLE")
+        except Exception as exc:
+            if not isinstance(exc, IdleNotSupportedError):
+                log_imap_failure(
+                    "idle",
+                    imap_host=host,
+                    imap_port=port,
+                    use_ssl=use_ssl,
+                    username=username,
+                    error_message=stringify_imap_exception(exc),
+                )
+            try:
+                connection.logout()
+            except Exception:
+                pass
+            raise
+        return connection
+
+    def _sync(self, connection: imaplib.IMAP4) -> None:
+        # A conta pode estar sincronizando outra pasta (ou uma sincronização
+        # manual); a pasta continua na fila até o lock ficar livre.
+        while not self._should_stop():
+            with Session(get_engine(PAPEL_SCHEDULER)) as session:
+                account = session.get(EmailMonitorAccount, self.account_id)
+                if account is None or not account.is_active:
+                    self.cancel()
+                    return
+                try:
+                    sync_run = sync_account(
+                        session,
+                        account,
+                        trigger_source="idle",
+                        folders=[self.folder_name],
+                        connection=connection,
+                    )
+                except RuntimeError:
+                    sync_run = None
+                else:
+                    status, error_message = sync_run.status, sync_run.error_message
+            if sync_run is None:
+                self._wait(LOCK_RETRY_SECONDS)
+                continue
+            if status == EmailMonitorSyncRunStatus.FAILED:
+                raise RuntimeError(error_message or "Falha na sincronização incremental.")
+            return
+
+
+class IdleSupervisor:
+    """Mantém um FolderIdleWatcher por pasta selecionada das contas ativas."""
+
+    def __init__(self, stop_event: threading.Event):
+        self.stop_event = stop_event
+        self.watchers: dict[tuple[uuid.UUID, str], FolderIdleWatcher] = {}
+        self._unsupported_until: dict[uuid.UUID, float] = {}
+
+    def reconcile(self) -> None:
+        with Session(get_engine(PAPEL_SCHEDULER)) as session:
+            accounts = session.exec(select(EmailMonitorAccount).where(EmailMonitorAccount.is_active == True)).all()
+            desired = {
+                (account.id, folder_name): account_signature(account)
+                for account in accounts
+                for folder_name in normalize_folder_list(account.selected_folders_json)
+            }
+
+        now = time.monotonic()
+        for key, watcher in list(self.watchers.items()):
+            if key not in desired or watcher.signature != desired[key]:
+                watcher.cancel()
+                del self.watchers[key]
+            elif not watcher.is_alive():
+                del self.watchers[key]
+                if watcher.unsupported:
+                    self._unsupported_until[key[0]] = now + UNSUPPORTED_RECHECK_SECONDS
+
+        for key, signature in desired.items():
+            if key in self.watchers or self._unsupported_until.get(key[0], 0) > now:
+                continue
+            watcher = FolderIdleWatcher(key[0], key[1], signature, self.stop_event)
+            self.watchers[key] = watcher
+            watcher.start()
+
+    def shutdown(self) -> None:
+        for watcher in self.watchers.values():
+            watcher.cancel()
+        self.watchers.clear()
+
+
+def start_idle_supervisor(stop_event: threading.Event) -> threading.Thread:
+    interval_seconds = max(5, settings.IMAP_IDLE_SUPERVISOR_INTERVAL_SECONDS)
+    supervisor = IdleSupervisor(stop_event)
+
+    def runner() -> None:
+        while not stop_event.is_set():
+            try:
+                supervisor.reconcile()
+            except Exception as exc:
+                print(f"EMAIL_MONITOR_IDLE_ERROR: {exc}")
+            stop_event.wait(interval_seconds)
+        supervisor.shutdown()
+
+    thread = threading.Thread(target=runner, name="email-monitor-idle", daemon=True)
+    thread.start()
+    return thread
@@ -1,30 +1,39 @@
+import base64
+import binascii
 import datetime
 import email
 import hashlib
 import html
 import imaplib
 import json
+import quopri
 import re
 import socket
 import threading
 import time
 import uuid
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from email import policy
 from email.header import decode_header
 from email.parser import BytesParser
 from email.utils import getaddresses, parsedate_to_datetime
-from fnmatch import fnmatch
+from fnmatch import fnmatch, translate
 from html.parser import HTMLParser
 from pathlib import Path
-from typing import Any, Iterable, Optional
+from typing import Any, Callable, Iterable, Iterator, Optional
 from urllib.parse import quote, urlparse
 
-import requests
-from sqlalchemy import or_
+from sqlalchemy import event, or_
+from sqlalchemy.orm import Session as SASession
 from sqlmodel import Session, select
 
+from app.core.cache import get_backend_versao
 from app.core.config import settings
-from app.db.database import engine
+from app.core.http_client import http_client
+from app.db.database import engine, get_engine
+from app.db.perfis import PAPEL_SCHEDULER
 from app.models import conta_mae_models as _conta_mae_models  # noqa: F401
 from app.models.email_monitor_models import (
     AuditLog,
@@ -78,9 +87,41 @@ _ALLOWED_TAGS = {
     "ul",
 }
 _ALLOWED_ATTRS = {"href", "title", "colspan", "rowspan", "target", "rel"}
+_FETCH_RESPONSE_START = re.compile(rb"^\d+ \(")
+_FETCH_LITERAL_KEY = re.compile(rb"(BODY\[[^\]]*\](?:<\d+>)?|[A-Z0-9.]+) \{\d+\}$", re.IGNORECASE)
+FETCH_PIPELINE_DEPTH = 2
+_IMAP_TOKEN = re.compile(r'\s*(?:(\()|(\))|"((?:[^"\\]|\\.)*)"|(\{\d+\})|([^\s()"]+))')
+_MESSAGE_HEADER_FIELDS = [
+    "From",
+    "To",
+    "Cc",
+    "Reply-To",
+    "Subject",
+    "Date",
+    "Message-ID",
+    "In-Reply-To",
+    "References",
+    "Return-Path",
+]
+_HEADER_FETCH_ITEMS = (
+    "(UID FLAGS INTERNALDATE RFC822.SIZE BODYSTRUCTURE BODY.PEEK[HEADER.FIELDS ("
+    + " ".join(field.upper() for field in _MESSAGE_HEADER_FIELDS)
+    + ")])"
+)
+# Teto de bytes por parte de texto na fase 2: cobre base64 (4/3) de texto
+# UTF-8 com até 3 bytes por caractere.
+BODY_FETCH_BYTES_PER_CHAR = 4
+RULES_CACHE_KEY = "email_monitor_regras"
+# Medido com scripts/benchmark_email_rules.py: o autômato em Python empata
+# com um `in` por palavra por volta de 200 palavras, qualquer que seja o texto.
+AUTOMATON_MIN_WORDS = 200
+_SESSION_INFO_RULES_CHANGED = "email_monitor_regras_alteradas"
 _ALLOWED_SCHEMES = {"http", "https", "mailto"}
 _SYNC_REGISTRY_LOCK = threading.Lock()
 _SYNC_LOCKS: dict[str, threading.Lock] = {}
+# Pastas vigiadas por uma conexão em IMAP IDLE (email_monitor_idle_service);
+# o scheduler deixa de consultá-las enquanto a conexão estiver ativa.
+_IDLE_FOLDERS: dict[tuple[str, str], int] = {}
 MAX_OUTLOOK_OTP_ERROR_LENGTH = 500
 
 
@@ -306,6 +347,10 @@ def extract_message_bodies(message: email.message.Message) -> tuple[Optional[str
             plain_parts.append(content)
         elif content_type == "text/html":
             html_parts.append(content)
+    return combine_message_bodies(plain_parts, html_parts)
+
+
+def combine_message_bodies(plain_parts: list[str], html_parts: list[str]) -> tuple[Optional[str], Optional[str]]:
     plain_text = truncate_text("\n\n".join(plain_parts).strip() or None, settings.EMAIL_MONITOR_MAX_BODY_CHARS)
     html_text = truncate_text("\n".join(html_parts).strip() or None, settings.EMAIL_MONITOR_MAX_BODY_CHARS)
     return plain_text, sanitize_html_content(html_text)
@@ -572,6 +617,22 @@ def get_account_lock(account_id: uuid.UUID) -> threading.Lock:
         return _SYNC_LOCKS[key]
 
 
+def set_folder_idle_active(account_id: uuid.UUID, folder_name: str, active: bool) -> None:
+    key = (str(account_id), folder_name)
+    with _SYNC_REGISTRY_LOCK:
+        count = _IDLE_FOLDERS.get(key, 0) + (1 if active else -1)
+        if count > 0:
+            _IDLE_FOLDERS[key] = count
+        else:
+            _IDLE_FOLDERS.pop(key, None)
+
+
+def get_idle_folders(account_id: uuid.UUID) -> set[str]:
+    account_key = str(account_id)
+    with _SYNC_REGISTRY_LOCK:
+        return {folder_name for key_account, folder_name in _IDLE_FOLDERS if key_account == account_key}
+
+
 def normalize_rule_keywords(keywords: Optional[Iterable[str]]) -> list[str]:
     normalized: list[str] = []
     for keyword in keywords or []:
@@ -620,7 +681,7 @@ def rule_matches_message(rule: EmailMonitorRule, *, folder_name: str, sender: Op
     return ", ".join(reasons)
 
 
-def sorted_rules(rules: list[EmailMonitorRule], account_id: uuid.UUID) -> list[EmailMonitorRule]:
+def sorted_rules(rules: list[EmailMonitorRule], account_id: Optional[uuid.UUID]) -> list[EmailMonitorRule]:
     return sorted(
         rules,
         key=lambda rule: (
@@ -631,8 +692,219 @@ def sorted_rules(rules: list[EmailMonitorRule], account_id: uuid.UUID) -> list[E
     )
 
 
+class KeywordAutomaton:
+    """
+    Aho-Corasick sobre um conjunto de palavras (já em minúsculas): uma
+    passada pelo texto devolve os índices de todas as palavras presentes,
+    inclusive sobrepostas. Abaixo de AUTOMATON_MIN_WORDS palavras, um `in`
+    por palavra (em C) sai mais barato que a passada em Python.
+    """
+
+    __slots__ = ("_words", "_goto", "_fail", "_out")
+
+    def __init__(self, words: list[str]):
+        self._words: Optional[list[str]] = list(words)
+        if len(words) < AUTOMATON_MIN_WORDS:
+            return
+        self._words = None
+        goto: list[dict[str, int]] = [{}]
+        outputs: list[list[int]] = [[]]
+        for index, word in enumerate(words):
+            state = 0
+            for char in word:
+                next_state = goto[state].get(char)
+                if next_state is None:
+                    next_state = len(goto)
+                    goto[state][char] = next_state
+                    goto.append({})
+                    outputs.append([])
+                state = next_state
+            outputs[state].append(index)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0)
+                outputs[next_state].extend(outputs[fail[next_state]])
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [tuple(items) for items in outputs]
+
+    def find(self, text: str) -> set[int]:
+        if self._words is not None:
+            return {index for index, word in enumerate(self._words) if word in text}
+        goto, fail, out = self._goto, self._fail, self._out
+        found: set[int] = set()
+        state = 0
+        for char in text:
+            next_state = goto[state].get(char)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(char)
+            state = next_state or 0
+            if out[state]:
+                found.update(out[state])
+        return found
+
+
+class _FieldPatterns:
+    """
+    Padrões de um campo (remetente, assunto ou pasta) de todas as regras,
+    sem repetição: substrings num autômato só e curingas já compilados.
+    """
+
+    __slots__ = ("_ids", "_words", "_word_index", "_blank", "_globs", "_automaton")
+
+    def __init__(self) -> None:
+        self._ids: dict[str, int] = {}
+        self._words: list[str] = []
+        self._word_index: dict[int, int] = {}
+        # Padrão só de espaços vira substring vazia: casa qualquer valor.
+        self._blank: set[int] = set()
+        self._globs: dict[int, re.Pattern] = {}
+        self._automaton: Optional[KeywordAutomaton] = None
+
+    def add(self, pattern: Optional[str]) -> Optional[int]:
+        if not pattern:
+            return None
+        needle = pattern.strip().lower()
+        if needle not in self._ids:
+            pattern_id = len(self._ids)
+            self._ids[needle] = pattern_id
+            if not needle:
+                self._blank.add(pattern_id)
+            elif "*" in needle or "?" in needle:
+                self._globs[pattern_id] = re.compile(translate(needle))
+            else:
+                self._word_index[pattern_id] = len(self._words)
+                self._words.append(needle)
+        return self._ids[needle]
+
+    def freeze(self) -> None:
+        if self._words:
+            self._automaton = KeywordAutomaton(self._words)
+
+    def matcher(self, value: Optional[str]) -> Callable[[int], bool]:
+        """Avalia o campo de uma mensagem; curingas só quando alguma regra pergunta."""
+        haystack = (value or "").strip().lower()
+        if not haystack:
+            return lambda pattern_id: False
+        found = self._automaton.find(haystack) if self._automaton is not None else set()
+        word_index, blank, globs = self._word_index, self._blank, self._globs
+        glob_results: dict[int, bool] = {}
+
+        def check(pattern_id: int) -> bool:
+            index = word_index.get(pattern_id)
+            if index is not None:
+                return index in found
+            if pattern_id in blank:
+                return True
+            result = glob_results.get(pattern_id)
+            if result is None:
+                result = glob_results[pattern_id] = globs[pattern_id].match(haystack) is not None
+            return result
+
+        return check
+
+
+class CompiledRuleMatcher:
+    """
+    Regras ativas de uma conta prontas para casar mensagens: ordenadas uma
+    vez, com padrões deduplicados, curingas compilados e as palavras-chave
+    de todas as regras num único autômato. Casa exatamente como
+    rule_matches_message aplicado a sorted_rules, regra a regra.
+    """
+
+    def __init__(self, rules: Iterable[EmailMonitorRule]):
+        self.rules: tuple[EmailMonitorRule, ...] = tuple(sorted_rules(list(rules), None))
+        self._sender = _FieldPatterns()
+        self._subject = _FieldPatterns()
+        self._folder = _FieldPatterns()
+        keyword_ids: dict[str, int] = {}
+        compiled = []
+        for rule in self.rules:
+            keywords = tuple(
+                (keyword, keyword_ids.setdefault(keyword.lower(), len(keyword_ids)))
+                for keyword in normalize_rule_keywords(rule.body_keywords_json)
+            )
+            compiled.append(
+                (
+                    rule,
+                    self._sender.add(rule.sender_pattern),
+                    self._subject.add(rule.subject_pattern),
+                    self._folder.add(rule.folder_pattern),
+                    keywords,
+                )
+            )
+        for field in (self._sender, self._subject, self._folder):
+            field.freeze()
+        self._compiled = tuple(compiled)
+        self._keywords = KeywordAutomaton(list(keyword_ids)) if keyword_ids else None
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def _header_candidates(self, *, folder_name: str, sender: Optional[str], subject: Optional[str]) -> Iterator[tuple]:
+        sender_matches = self._sender.matcher(sender)
+        subject_matches = self._subject.matcher(subject)
+        folder_matches = self._folder.matcher(folder_name)
+        for item in self._compiled:
+            _, sender_id, subject_id, folder_id, _ = item
+            if sender_id is not None and not sender_matches(sender_id):
+                continue
+            if subject_id is not None and not subject_matches(subject_id):
+                continue
+            if folder_id is not None and not folder_matches(folder_id):
+                continue
+            yield item
+
+    def may_match(self, *, folder_name: str, sender: Optional[str], subject: Optional[str]) -> bool:
+        return next(self._header_candidates(folder_name=folder_name, sender=sender, subject=subject), None) is not None
+
+    def match(
+        self,
+        *,
+        folder_name: str,
+        sender: Optional[str],
+        subject: Optional[str],
+        body_text: Optional[str],
+    ) -> list[tuple[EmailMonitorRule, str]]:
+        matching_rules: list[tuple[EmailMonitorRule, str]] = []
+        found_keywords: Optional[set[int]] = None
+        for rule, sender_id, subject_id, folder_id, keywords in self._header_candidates(
+            folder_name=folder_name, sender=sender, subject=subject
+        ):
+            reasons: list[str] = []
+            if sender_id is not None:
+                reasons.append("remetente")
+            if subject_id is not None:
+                reasons.append("assunto")
+            if folder_id is not None:
+                reasons.append("pasta")
+            if keywords:
+                if found_keywords is None:
+                    # O corpo só é percorrido se alguma regra com palavras-chave
+                    # passou pelos cabeçalhos, e uma vez só.
+                    found_keywords = self._keywords.find((body_text or "").lower())
+                matched_keywords = [keyword for keyword, keyword_id in keywords if keyword_id in found_keywords]
+                if not matched_keywords:
+                    continue
+                reasons.append(f"palavras-chave ({', '.join(matched_keywords[:3])})")
+            if not reasons:
+                reasons.append("regra global")
+            matching_rules.append((rule, ", ".join(reasons)))
+        return matching_rules
+
+
 def match_rules_for_message(
-    rules: list[EmailMonitorRule],
+    rules: list[EmailMonitorRule] | CompiledRuleMatcher,
     *,
     account_id: uuid.UUID,
     folder_name: str,
@@ -642,20 +914,33 @@ def match_rules_for_message(
     body_text: Optional[str],
     body_html_sanitized: Optional[str] = None,
 ) -> list[tuple[EmailMonitorRule, str]]:
-    matching_rules: list[tuple[EmailMonitorRule, str]] = []
-    sender_blob = " ".join(filter(None, [sender_name, sender_email]))
-    searchable_body = body_text or strip_html_tags(body_html_sanitized or "")
-    for rule in sorted_rules(rules, account_id):
-        reason = rule_matches_message(
-            rule,
-            folder_name=folder_name,
-            sender=sender_blob,
-            subject=subject,
-            body_text=searchable_body,
-        )
-        if reason:
-            matching_rules.append((rule, reason))
-    return matching_rules
+    matcher = rules if isinstance(rules, CompiledRuleMatcher) else CompiledRuleMatcher(rules)
+    return matcher.match(
+        folder_name=folder_name,
+        sender=" ".join(filter(None, [sender_name, sender_email])),
+        subject=subject,
+        body_text=body_text or strip_html_tags(body_html_sanitized or ""),
+    )
+
+
+def message_may_match_rules(
+    rules: list[EmailMonitorRule] | CompiledRuleMatcher,
+    *,
+    folder_name: str,
+    sender_name: Optional[str],
+    sender_email: Optional[str],
+    subject: Optional[str],
+) -> bool:
+    """
+    Pré-filtro só com os cabeçalhos: alguma regra pode casar se remetente,
+    assunto e pasta passam (as palavras-chave do corpo ficam para depois).
+    """
+    matcher = rules if isinstance(rules, CompiledRuleMatcher) else CompiledRuleMatcher(rules)
+    return matcher.may_match(
+        folder_name=folder_name,
+        sender=" ".join(filter(None, [sender_name, sender_email])),
+        subject=subject,
+    )
 
 
 def load_active_rules_for_account(session: Session, account_id: uuid.UUID) -> list[EmailMonitorRule]:
@@ -667,6 +952,78 @@ def load_active_rules_for_account(session: Session, account_id: uuid.UUID) -> li
     ).all()
 
 
+class RuleMatcherCache:
+    """
+    CompiledRuleMatcher por conta, válido enquanto o carimbo de versão das
+    regras não mudar (e dentro do TTL, para alterações feitas fora da API
+    ou em outro processo com o backend local).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: dict[uuid.UUID, tuple[Optional[int], float, CompiledRuleMatcher]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _current_version(self) -> Optional[int]:
+        try:
+            return get_backend_versao().versao_atual(RULES_CACHE_KEY)
+        except Exception as exc:
+            print(f"AVISO: falha ao ler versão das regras do email monitor no backend de cache: {exc}")
+            return None
+
+    def get(self, session: Session, account_id: uuid.UUID) -> CompiledRuleMatcher:
+        version = self._current_version()
+        entry = self._entries.get(account_id)
+        if (
+            entry is not None
+            and version is not None
+            and entry[0] == version
+            and time.monotonic() - entry[1] < settings.EMAIL_MONITOR_RULES_CACHE_TTL_SECONDS
+        ):
+            self.hits += 1
+            return entry[2]
+
+        # As regras vêm numa sessão própria, fechada sem commit: o matcher é
+        # compartilhado entre threads e os commits da sessão de quem chamou
+        # não podem expirar os objetos dele.
+        with Session(session.get_bind()) as rules_session:
+            rules = load_active_rules_for_account(rules_session, account_id)
+        matcher = CompiledRuleMatcher(rules)
+        with self._lock:
+            self.misses += 1
+            if version is not None:
+                self._entries[account_id] = (version, time.monotonic(), matcher)
+        return matcher
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        try:
+            get_backend_versao().incrementar(RULES_CACHE_KEY)
+        except Exception as exc:
+            print(f"AVISO: falha ao incrementar versão das regras do email monitor no backend de cache: {exc}")
+
+
+rule_matcher_cache = RuleMatcherCache()
+
+
+def mark_rules_changed(session: Session) -> None:
+    """Invalida os matchers compilados depois do commit da sessão."""
+    session.info[_SESSION_INFO_RULES_CHANGED] = True
+
+
+@event.listens_for(SASession, "after_commit")
+def _invalidate_rule_matchers_after_commit(session: SASession) -> None:
+    if session.info.pop(_SESSION_INFO_RULES_CHANGED, False):
+        rule_matcher_cache.invalidate()
+
+
+@event.listens_for(SASession, "after_rollback")
+def _discard_rules_changed_mark(session: SASession) -> None:
+    session.info.pop(_SESSION_INFO_RULES_CHANGED, None)
+
+
 def replace_message_matches(
     session: Session,
     message: EmailMonitorMessage,
@@ -730,11 +1087,13 @@ def reclassify_messages_for_accounts(session: Session, account_ids: Optional[set
     accounts = session.exec(account_stmt).all()
     totals = {"accounts": len(accounts), "messages": 0, "changed": 0, "relevant": 0}
     for account in accounts:
-        rules = load_active_rules_for_account(session, account.id)
+        # Compilado na hora (e não pelo cache): quem reclassifica costuma ter
+        # acabado de alterar as regras nesta mesma transação.
+        rule_matcher = CompiledRuleMatcher(load_active_rules_for_account(session, account.id))
         messages = session.exec(select(EmailMonitorMessage).where(EmailMonitorMessage.account_id == account.id)).all()
         for message in messages:
             matching_rules = match_rules_for_message(
-                rules,
+                rule_matcher,
                 account_id=account.id,
                 folder_name=message.folder_name,
                 sender_name=message.sender_name,
@@ -772,17 +1131,96 @@ def get_folder_state(session: Session, account_id: uuid.UUID, folder_name: str)
     return state
 
 
-def extract_fetch_payload(fetch_data: list[Any]) -> tuple[Optional[bytes], str, Optional[datetime.datetime]]:
-    raw_bytes: Optional[bytes] = None
-    response_meta = ""
-    for item in fetch_data:
-        if isinstance(item, tuple):
-            response_meta = item[0].decode("utf-8", errors="replace") if isinstance(item[0], bytes) else str(item[0])
-            raw_bytes = item[1] if isinstance(item[1], bytes) else None
-            break
-    flags_match = re.search(r"FLAGS \((.*?)\)", response_meta)
-    flags_blob = flags_match.group(1) if flags_match else ""
-    internal_date_match = re.search(r'INTERNALDATE "([^"]+)"', response_meta)
+def build_uid_search_criteria(last_seen_uid: Optional[int], message_count: int, batch_size: int) -> Optional[str]:
+    """
+    Critério do UID SEARCH da sincronização incremental: só os UIDs acima
+    do último visto. Na primeira sincronização, só as últimas `batch_size`
+    mensagens (pela numeração de sequência), sem listar a pasta inteira.
+    """
+    if message_count <= 0:
+        return None
+    if last_seen_uid is None:
+        return f"{max(1, message_count - batch_size + 1)}:*" if batch_size > 0 else "ALL"
+    # "n:*" também devolve o maior UID quando não há nada acima de n;
+    # select_incremental_uids descarta o que não for novo.
+    return f"UID {last_seen_uid + 1}:*"
+
+
+def compress_uid_set(uids: Iterable[int]) -> str:
+    ranges: list[str] = []
+    ordered = sorted(set(uids))
+    index = 0
+    while index < len(ordered):
+        start = end = ordered[index]
+        while index + 1 < len(ordered) and ordered[index + 1] == end + 1:
+            index += 1
+            end = ordered[index]
+        ranges.append(str(start) if start == end else f"{start}:{end}")
+        index += 1
+    return ",".join(ranges)
+
+
+def pipelined_uid_fetch(connection: imaplib.IMAP4, uids: list[int], items: str, chunk_size: int) -> Iterator[list[Any]]:
+    """
+    UID FETCH em lotes de `chunk_size` UIDs, com o lote seguinte já enviado
+    enquanto o atual é processado. O imaplib não tem pipelining público,
+    por isso os comandos passam por _command/_command_complete (os mesmos
+    que IMAP4.uid usa). Fechar o gerador antes do fim descarta as
+    respostas pendentes, deixando a conexão pronta para o próximo comando.
+    """
+    chunk_size = max(1, chunk_size)
+    chunks = [uids[index:index + chunk_size] for index in range(0, len(uids), chunk_size)]
+    in_flight: deque = deque()
+    next_chunk = 0
+    try:
+        while next_chunk < len(chunks) and len(in_flight) < FETCH_PIPELINE_DEPTH:
+            in_flight.append(connection._command("UID", "FETCH", compress_uid_set(chunks[next_chunk]), items))
+            next_chunk += 1
+        while in_flight:
+            status, data = connection._command_complete("UID", in_flight.popleft())
+            status, data = connection._untagged_response(status, data, "FETCH")
+            if next_chunk < len(chunks):
+                in_flight.append(connection._command("UID", "FETCH", compress_uid_set(chunks[next_chunk]), items))
+                next_chunk += 1
+            if status != "OK":
+                raise RuntimeError("Falha ao buscar mensagens no servidor IMAP.")
+            yield data
+    finally:
+        while in_flight:
+            try:
+                connection._command_complete("UID", in_flight.popleft())
+            except Exception:
+                pass
+        connection.untagged_responses.pop("FETCH", None)
+
+
+@dataclass(frozen=True)
+class FetchRecord:
+    """Uma mensagem da resposta de um UID FETCH."""
+
+    uid: Optional[int]
+    flags_blob: str
+    internal_date: Optional[datetime.datetime]
+    size: Optional[int]
+    response_meta: str
+    literals: dict[str, bytes]
+
+    def literal(self, prefix: str) -> Optional[bytes]:
+        # O servidor pode ecoar o item com outra grafia (BODY[1]<0>, campos
+        # de cabeçalho em outra ordem); basta o começo da chave.
+        prefix = prefix.upper()
+        for key, value in self.literals.items():
+            if key.startswith(prefix):
+                return value
+        return None
+
+
+def parse_fetch_record(response_meta: bytes, literals: dict[str, bytes]) -> FetchRecord:
+    meta = response_meta.decode("utf-8", errors="replace")
+    uid_match = re.search(r"\bUID (\d+)", meta)
+    size_match = re.search(r"\bRFC822\.SIZE (\d+)", meta)
+    flags_match = re.search(r"FLAGS \((.*?)\)", meta)
+    internal_date_match = re.search(r'INTERNALDATE "([^"]+)"', meta)
     internal_date = None
     if internal_date_match:
         try:
@@ -790,24 +1228,197 @@ def extract_fetch_payload(fetch_data: list[Any]) -> tuple[Optional[bytes], str,
             internal_date = parsed.astimezone(datetime.timezone.utc).replace(tzinfo=None)
         except ValueError:
             internal_date = None
-    return raw_bytes, flags_blob, internal_date
+    return FetchRecord(
+        uid=int(uid_match.group(1)) if uid_match else None,
+        flags_blob=flags_match.group(1) if flags_match else "",
+        internal_date=internal_date,
+        size=int(size_match.group(1)) if size_match else None,
+        response_meta=meta,
+        literals=literals,
+    )
 
 
-def build_message_headers(message: email.message.Message) -> dict[str, Any]:
-    headers_of_interest = [
-        "From",
-        "To",
-        "Cc",
-        "Reply-To",
-        "Subject",
-        "Date",
-        "Message-ID",
-        "In-Reply-To",
-        "References",
-        "Return-Path",
+def iter_fetch_records(fetch_data: list[Any]) -> Iterator[FetchRecord]:
+    """
+    Percorre a resposta de um UID FETCH com várias mensagens, uma por vez.
+    Cada mensagem chega como b"<seq> (..." seguida das partes após cada
+    literal; os itens podem vir em qualquer ordem.
+    """
+    response_meta: Optional[bytes] = None
+    literals: dict[str, bytes] = {}
+    for item in fetch_data:
+        head, literal = (item[0], item[1]) if isinstance(item, tuple) else (item, None)
+        if not isinstance(head, bytes):
+            continue
+        if _FETCH_RESPONSE_START.match(head):
+            if response_meta is not None:
+                yield parse_fetch_record(response_meta, literals)
+            response_meta, literals = b"", {}
+        if response_meta is None:
+            continue
+        response_meta += head
+        if isinstance(literal, bytes):
+            key_match = _FETCH_LITERAL_KEY.search(head)
+            if key_match:
+                literals[key_match.group(1).decode("ascii", errors="replace").upper()] = literal
+    if response_meta is not None:
+        yield parse_fetch_record(response_meta, literals)
+
+
+def parse_bodystructure(response_meta: str) -> Optional[list[Any]]:
+    """
+    Lista aninhada do BODYSTRUCTURE (NIL vira None). Devolve None se o item
+    não veio ou se alguma string chegou como literal (nesse caso o texto
+    ficou fora de response_meta e a estrutura não é confiável).
+    """
+    start = response_meta.upper().find("BODYSTRUCTURE (")
+    if start < 0:
+        return None
+    position = start + len("BODYSTRUCTURE ")
+    stack: list[list[Any]] = []
+    while position < len(response_meta):
+        match = _IMAP_TOKEN.match(response_meta, position)
+        if not match:
+            return None
+        position = match.end()
+        opening, closing, quoted, literal, atom = match.groups()
+        if opening:
+            node: list[Any] = []
+            if stack:
+                stack[-1].append(node)
+            stack.append(node)
+        elif closing:
+            node = stack.pop()
+            if not stack:
+                return node
+        elif literal or not stack:
+            return None
+        elif quoted is not None:
+            stack[-1].append(re.sub(r"\\(.)", r"\1", quoted))
+        else:
+            stack[-1].append(None if atom.upper() == "NIL" else atom)
+    return None
+
+
+def find_text_parts(structure: list[Any], prefix: str = "") -> list[tuple[str, str, str, str]]:
+    """
+    Partes text/plain e text/html (fora anexos) do BODYSTRUCTURE, como
+    (seção, subtipo, charset, codificação). Mensagens encaminhadas
+    (message/rfc822) não são percorridas.
+    """
+    if structure and isinstance(structure[0], list):
+        # Multipart: as partes vêm primeiro, seguidas do subtipo e extensões.
+        parts: list[tuple[str, str, str, str]] = []
+        for number, child in enumerate(structure, start=1):
+            if not isinstance(child, list):
+                break
+            parts.extend(find_text_parts(child, f"{prefix}{number}."))
+        return parts
+
+    if len(structure) < 7:
+        return []
+    section = prefix[:-1] if prefix else "1"
+    maintype = str(structure[0] or "").lower()
+    subtype = str(structure[1] or "").lower()
+    if maintype != "text" or subtype not in {"plain", "html"}:
+        return []
+    disposition = structure[9] if len(structure) > 9 else None
+    if isinstance(disposition, list) and disposition and str(disposition[0] or "").lower() == "attachment":
+        return []
+    params = structure[2] if isinstance(structure[2], list) else []
+    charset = "utf-8"
+    for index in range(0, len(params) - 1, 2):
+        if str(params[index] or "").lower() == "charset" and params[index + 1]:
+            charset = str(params[index + 1])
+    return [(section, subtype, charset, str(structure[5] or "7bit").lower())]
+
+
+def decode_text_part(data: bytes, encoding: str, charset: str) -> str:
+    # A parte pode vir cortada no teto de bytes: o base64 é alinhado em
+    # blocos de 4 e o que sobrar de um caractere multibyte vira U+FFFD.
+    if encoding == "base64":
+        compact = re.sub(rb"[^A-Za-z0-9+/=]", b"", data)
+        try:
+            payload = base64.b64decode(compact[: len(compact) // 4 * 4])
+        except (binascii.Error, ValueError):
+            payload = b""
+    elif encoding == "quoted-printable":
+        payload = quopri.decodestring(data)
+    else:
+        payload = data
+    try:
+        return payload.decode(charset, errors="replace")
+    except LookupError:
+        return payload.decode("utf-8", errors="replace")
+
+
+def fetch_text_bodies(
+    connection: imaplib.IMAP4,
+    records: list[FetchRecord],
+    *,
+    deadline: Optional[float] = None,
+) -> dict[int, tuple[Optional[str], Optional[str]]]:
+    """
+    Segunda fase da busca: baixa só as partes de texto das mensagens, até o
+    limite de caracteres do corpo. Mensagens com as mesmas seções vão no
+    mesmo UID FETCH; as de BODYSTRUCTURE ilegível vêm inteiras (RFC822).
+    Mensagens que ficaram de fora pelo prazo não aparecem no resultado.
+    """
+    bodies: dict[int, tuple[Optional[str], Optional[str]]] = {}
+    text_parts: dict[int, list[tuple[str, str, str, str]]] = {}
+    groups: dict[tuple[str, ...], list[int]] = {}
+    full_fetch_uids: list[int] = []
+    for record in records:
+        structure = parse_bodystructure(record.response_meta)
+        if structure is None:
+            full_fetch_uids.append(record.uid)
+            continue
+        parts = find_text_parts(structure)
+        if not parts:
+            bodies[record.uid] = (None, None)
+            continue
+        text_parts[record.uid] = parts
+        groups.setdefault(tuple(part[0] for part in parts), []).append(record.uid)
+
+    byte_limit = max(1, settings.EMAIL_MONITOR_MAX_BODY_CHARS) * BODY_FETCH_BYTES_PER_CHAR
+    fetch_plan = [
+        ("(UID " + " ".join(f"BODY.PEEK[{section}]<0.{byte_limit}>" for section in sections) + ")", uids)
+        for sections, uids in groups.items()
     ]
+    if full_fetch_uids:
+        fetch_plan.append(("(UID RFC822)", full_fetch_uids))
+
+    for items, uids in fetch_plan:
+        wanted_uids = set(uids)
+        fetches = pipelined_uid_fetch(connection, uids, items, settings.EMAIL_MONITOR_FETCH_CHUNK_SIZE)
+        try:
+            for fetch_data in fetches:
+                for record in iter_fetch_records(fetch_data):
+                    if record.uid not in wanted_uids:
+                        continue
+                    if record.uid not in text_parts:
+                        raw_bytes = record.literal("RFC822")
+                        if raw_bytes is not None:
+                            bodies[record.uid] = extract_message_bodies(BytesParser(policy=policy.default).parsebytes(raw_bytes))
+                        continue
+                    plain_parts: list[str] = []
+                    html_parts: list[str] = []
+                    for section, subtype, charset, encoding in text_parts[record.uid]:
+                        data = record.literal(f"BODY[{section}]")
+                        content = decode_text_part(data, encoding, charset) if data else ""
+                        if content:
+                            (plain_parts if subtype == "plain" else html_parts).append(content)
+                    bodies[record.uid] = combine_message_bodies(plain_parts, html_parts)
+                if deadline is not None and time.monotonic() >= deadline:
+                    return bodies
+        finally:
+            fetches.close()
+    return bodies
+
+
+def build_message_headers(message: email.message.Message) -> dict[str, Any]:
     result: dict[str, Any] = {}
-    for header_name in headers_of_interest:
+    for header_name in _MESSAGE_HEADER_FIELDS:
         value = message.get(header_name)
         if value is not None:
             result[header_name] = decode_mime_header(value)
@@ -905,7 +1516,7 @@ def dispatch_internal_webhook(alert: EmailMonitorAlertEvent, account: EmailMonit
         "matched_rule": rule.name,
     }
     try:
-        response = requests.post(rule.webhook_url, json=payload, timeout=settings.EMAIL_MONITOR_WEBHOOK_TIMEOUT_SECONDS)
+        response = http_client.post(rule.webhook_url, json=payload, timeout=settings.EMAIL_MONITOR_WEBHOOK_TIMEOUT_SECONDS)
         response.raise_for_status()
         alert.webhook_status = EmailMonitorWebhookStatus.SENT
         alert.webhook_error = None
@@ -923,13 +1534,20 @@ def upsert_message(
     flags_blob: str,
     parsed_message: email.message.Message,
     internal_date: Optional[datetime.datetime],
-    rules: list[EmailMonitorRule],
+    rules: list[EmailMonitorRule] | CompiledRuleMatcher,
+    bodies: Optional[tuple[Optional[str], Optional[str]]] = None,
+    raw_size_bytes: Optional[int] = None,
 ) -> tuple[Optional[EmailMonitorMessage], bool, bool]:
+    """
+    Grava a mensagem e aplica as regras. A sincronização passa só os
+    cabeçalhos em `parsed_message`, com os corpos já extraídos em `bodies`
+    (None quando a mensagem não é candidata a nenhuma regra).
+    """
     sender_name, sender_email = parse_email_addresses(parsed_message.get("From"))
     _, recipient_email = parse_email_addresses(parsed_message.get("To"))
     subject = decode_mime_header(parsed_message.get("Subject"))
     sent_at = parse_sent_datetime(parsed_message.get("Date")) or internal_date
-    body_text, body_html_sanitized = extract_message_bodies(parsed_message)
+    body_text, body_html_sanitized = bodies if bodies is not None else extract_message_bodies(parsed_message)
     body_preview = truncate_text(body_text or strip_html_tags(body_html_sanitized or ""), 220)
     message_id = decode_mime_header(parsed_message.get("Message-ID"))
     message_hash = build_message_hash(message_id, sender_email, subject, sent_at, body_preview)
@@ -993,7 +1611,7 @@ def upsert_message(
         body_text=body_text,
         body_html_sanitized=body_html_sanitized,
         body_preview=body_preview,
-        raw_size_bytes=len(parsed_message.as_bytes()),
+        raw_size_bytes=raw_size_bytes if raw_size_bytes is not None else len(parsed_message.as_bytes()),
         body_hash=body_hash,
         is_relevant=is_relevant,
         is_read_remote="\\Seen" in flags_blob,
@@ -1034,16 +1652,33 @@ def upsert_message(
     return message, True, is_relevant
 
 
-def sync_account(session: Session, account: EmailMonitorAccount, *, trigger_source: str = "manual", force: bool = False) -> EmailMonitorSyncRun:
+def sync_account(
+    session: Session,
+    account: EmailMonitorAccount,
+    *,
+    trigger_source: str = "manual",
+    force: bool = False,
+    folders: Optional[list[str]] = None,
+    connection: Optional[imaplib.IMAP4] = None,
+    queued_ms: Optional[int] = None,
+    deadline: Optional[float] = None,
+) -> EmailMonitorSyncRun:
+    """
+    Sincroniza as pastas da conta (ou só `folders`). Com `connection`, usa
+    a conexão já autenticada de quem chamou (o modo IDLE) e não faz login
+    nem logout. Com `deadline` (time.monotonic), para entre mensagens ao
+    vencer o prazo do ciclo; o restante fica para a próxima sincronização.
+    """
     lock = get_account_lock(account.id)
     if not lock.acquire(blocking=False):
         raise RuntimeError("A conta já está em sincronização.")
 
-    sync_run = EmailMonitorSyncRun(account_id=account.id, trigger_source=trigger_source)
+    started = time.monotonic()
+    sync_run = EmailMonitorSyncRun(account_id=account.id, trigger_source=trigger_source, queued_ms=queued_ms)
     session.add(sync_run)
     session.flush()
 
-    connection = None
+    owns_connection = connection is None
     try:
         account.sync_status = EmailMonitorSyncStatus.SYNCING
         account.last_synced_at = utcnow()
@@ -1056,22 +1691,25 @@ def sync_account(session: Session, account: EmailMonitorAccount, *, trigger_sour
         if not password:
             raise RuntimeError("Não foi possível descriptografar a senha IMAP armazenada.")
 
-        connection = build_connection(account.imap_host, account.imap_port, account.use_ssl)
-        connection.login(account.imap_username, password)
+        if owns_connection:
+            connection = build_connection(account.imap_host, account.imap_port, account.use_ssl)
+            connection.login(account.imap_username, password)
 
-        rules = load_active_rules_for_account(session, account.id)
+        rule_matcher = rule_matcher_cache.get(session, account.id)
 
         total_scanned = 0
         total_saved = 0
         total_relevant = 0
         now = utcnow()
 
-        for folder_name in normalize_folder_list(account.selected_folders_json):
+        for folder_name in normalize_folder_list(folders if folders is not None else account.selected_folders_json):
+            if deadline is not None and time.monotonic() >= deadline:
+                break
             folder_state = get_folder_state(session, account.id, folder_name)
             if trigger_source == "scheduler" and not force and folder_state.next_retry_at and folder_state.next_retry_at > now:
                 continue
 
-            status, _ = connection.select(folder_name, readonly=True)
+            status, select_data = connection.select(folder_name, readonly=True)
             if status != "OK":
                 folder_state.last_error_at = now
                 folder_state.last_error_message = f"Nao foi possivel abrir a pasta {folder_name}."
@@ -1079,31 +1717,70 @@ def sync_account(session: Session, account: EmailMonitorAccount, *, trigger_sour
                 session.add(folder_state)
                 continue
 
-            status, data = connection.uid("search", None, "ALL")
-            if status != "OK":
-                raise RuntimeError(f"Falha ao listar mensagens da pasta {folder_name}.")
-
-            all_uids = [int(item) for item in (data[0].split() if data and data[0] else [])]
+            message_count = select_data[0] if select_data and isinstance(select_data[0], bytes) else b""
+            criteria = build_uid_search_criteria(
+                folder_state.last_seen_uid,
+                int(message_count) if message_count.isdigit() else 0,
+                settings.EMAIL_MONITOR_SYNC_BATCH_SIZE,
+            )
+            all_uids: list[int] = []
+            if criteria:
+                status, data = connection.uid("search", None, criteria)
+                if status != "OK":
+                    raise RuntimeError(f"Falha ao listar mensagens da pasta {folder_name}.")
+                all_uids = [int(item) for item in (data[0].split() if data and data[0] else [])]
             batch_uids = select_incremental_uids(all_uids, folder_state.last_seen_uid, settings.EMAIL_MONITOR_SYNC_BATCH_SIZE)
+            wanted_uids = set(batch_uids)
             sync_run.folders_scanned += 1
 
-            for uid in batch_uids:
-                status, fetch_data = connection.uid("fetch", str(uid), "(RFC822 FLAGS INTERNALDATE)")
-                if status != "OK":
-                    continue
-                raw_bytes, flags_blob, internal_date = extract_fetch_payload(fetch_data)
-                if raw_bytes is None:
-                    continue
-                parsed_message = BytesParser(policy=policy.default).parsebytes(raw_bytes)
+            # Fase 1: cabeçalhos, estrutura e tamanho; o pré-filtro das regras
+            # decide quais mensagens precisam do corpo.
+            headers_by_uid: dict[int, tuple[FetchRecord, email.message.Message]] = {}
+            fetches = pipelined_uid_fetch(connection, batch_uids, _HEADER_FETCH_ITEMS, settings.EMAIL_MONITOR_FETCH_CHUNK_SIZE)
+            try:
+                for fetch_data in fetches:
+                    for record in iter_fetch_records(fetch_data):
+                        header_bytes = record.literal("BODY[HEADER.FIELDS")
+                        # Respostas FETCH não solicitadas (mudança de flags) vêm sem os cabeçalhos.
+                        if record.uid not in wanted_uids or header_bytes is None:
+                            continue
+                        headers_by_uid[record.uid] = (record, BytesParser(policy=policy.default).parsebytes(header_bytes, headersonly=True))
+                    if deadline is not None and time.monotonic() >= deadline:
+                        break
+            finally:
+                fetches.close()
+
+            candidates: list[FetchRecord] = []
+            for record, parsed_headers in headers_by_uid.values():
+                sender_name, sender_email = parse_email_addresses(parsed_headers.get("From"))
+                if message_may_match_rules(
+                    rule_matcher,
+                    folder_name=folder_name,
+                    sender_name=sender_name,
+                    sender_email=sender_email,
+                    subject=decode_mime_header(parsed_headers.get("Subject")),
+                ):
+                    candidates.append(record)
+            # Fase 2: só as partes de texto das candidatas.
+            bodies_by_uid = fetch_text_bodies(connection, candidates, deadline=deadline) if candidates else {}
+            candidate_uids = {record.uid for record in candidates}
+
+            for uid in sorted(headers_by_uid):
+                if uid in candidate_uids and uid not in bodies_by_uid:
+                    # Corpo não baixado (prazo do ciclo): fica para a próxima sincronização.
+                    break
+                record, parsed_headers = headers_by_uid[uid]
                 _, saved, relevant = upsert_message(
                     session,
                     account=account,
                     folder_name=folder_name,
                     message_uid=uid,
-                    flags_blob=flags_blob,
-                    parsed_message=parsed_message,
-                    internal_date=internal_date,
-                    rules=rules,
+                    flags_blob=record.flags_blob,
+                    parsed_message=parsed_headers,
+                    internal_date=record.internal_date,
+                    rules=rule_matcher,
+                    bodies=bodies_by_uid.get(uid, (None, None)),
+                    raw_size_bytes=record.size,
                 )
                 total_scanned += 1
                 if saved:
@@ -1111,8 +1788,8 @@ def sync_account(session: Session, account: EmailMonitorAccount, *, trigger_sour
                 if relevant:
                     total_relevant += 1
                 folder_state.last_seen_uid = max(uid, folder_state.last_seen_uid or 0)
-                folder_state.last_seen_internaldate = internal_date or folder_state.last_seen_internaldate
-                folder_state.last_seen_message_id = decode_mime_header(parsed_message.get("Message-ID")) or folder_state.last_seen_message_id
+                folder_state.last_seen_internaldate = record.internal_date or folder_state.last_seen_internaldate
+                folder_state.last_seen_message_id = decode_mime_header(parsed_headers.get("Message-ID")) or folder_state.last_seen_message_id
 
             folder_state.last_synced_at = now
             folder_state.last_success_at = now
@@ -1134,6 +1811,7 @@ def sync_account(session: Session, account: EmailMonitorAccount, *, trigger_sour
         sync_run.messages_saved = total_saved
         sync_run.relevant_messages = total_relevant
         sync_run.finished_at = now
+        sync_run.duration_ms = int((time.monotonic() - started) * 1000)
         session.add(account)
         session.add(sync_run)
         cleanup_old_irrelevant_messages(session, account)
@@ -1158,6 +1836,7 @@ def sync_account(session: Session, account: EmailMonitorAccount, *, trigger_sour
         sync_run.status = EmailMonitorSyncRunStatus.FAILED
         sync_run.error_message = truncate_text(friendly_error, 500)
         sync_run.finished_at = now
+        sync_run.duration_ms = int((time.monotonic() - started) * 1000)
         log_imap_failure(
             f"sync:{trigger_source}",
             imap_host=account.imap_host,
@@ -1171,7 +1850,7 @@ def sync_account(session: Session, account: EmailMonitorAccount, *, trigger_sour
         session.commit()
         return sync_run
     finally:
-        if connection is not None:
+        if owns_connection and connection is not None:
             try:
                 connection.logout()
             except Exception:
@@ -1179,9 +1858,104 @@ def sync_account(session: Session, account: EmailMonitorAccount, *, trigger_sour
         lock.release()
 
 
+def _sync_account_job(
+    account_id: uuid.UUID,
+    folders: Optional[list[str]],
+    *,
+    trigger_source: str,
+    force: bool,
+    cycle_started: float,
+    deadline: float,
+) -> Optional[EmailMonitorSyncRun]:
+    # Cada conta roda em sua própria sessão: o worker não compartilha
+    # objetos nem conexão do pool com as demais contas do ciclo.
+    queued_ms = int((time.monotonic() - cycle_started) * 1000)
+    with Session(get_engine(PAPEL_SCHEDULER)) as session:
+        account = session.get(EmailMonitorAccount, account_id)
+        if account is None:
+            return None
+        try:
+            sync_run = sync_account(
+                session,
+                account,
+                trigger_source=trigger_source,
+                force=force,
+                folders=folders,
+                queued_ms=queued_ms,
+                deadline=deadline,
+            )
+        except RuntimeError:
+            return None
+        session.refresh(sync_run)
+        session.expunge(sync_run)
+        return sync_run
+
+
+def run_host_limited_jobs(
+    pending_by_host: dict[str, deque],
+    run_job: Callable[[Any], Any],
+    *,
+    concurrency: int,
+    max_per_host: int,
+    deadline: float,
+) -> tuple[list[Any], int, int]:
+    """
+    Executa as filas de `pending_by_host` num pool de `concurrency` threads,
+    com no máximo `max_per_host` jobs simultâneos por servidor. Nada começa
+    depois de `deadline` (time.monotonic) e os jobs ainda rodando no prazo
+    seguem em segundo plano. Devolve (resultados não nulos, jobs que não
+    começaram, jobs em andamento no prazo).
+    """
+    concurrency = max(1, concurrency)
+    max_per_host = max(1, max_per_host)
+    running: dict[Future, str] = {}
+    running_by_host = {host: 0 for host in pending_by_host}
+    results: list[Any] = []
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="email-monitor-sync")
+    try:
+        while True:
+            if time.monotonic() < deadline:
+                # Uma conta por servidor a cada volta, para um provedor com
+                # muitas contas não ocupar todos os workers.
+                submitted = True
+                while submitted and len(running) < concurrency:
+                    submitted = False
+                    for host, queue in pending_by_host.items():
+                        if queue and len(running) < concurrency and running_by_host[host] < max_per_host:
+                            running[executor.submit(run_job, queue.popleft())] = host
+                            running_by_host[host] += 1
+                            submitted = True
+            if not running:
+                break
+            done, _ = wait(running, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            if not done:
+                break
+            for future in done:
+                running_by_host[running.pop(future)] -= 1
+                try:
+                    result = future.result()
+                except Exception as exc:
+                    print(f"EMAIL_MONITOR_SCHEDULER_ERROR: {exc}")
+                    continue
+                if result is not None:
+                    results.append(result)
+    finally:
+        executor.shutdown(wait=False)
+    return results, sum(len(queue) for queue in pending_by_host.values()), len(running)
+
+
 def sync_active_accounts(trigger_source: str = "scheduler", force: bool = False) -> list[EmailMonitorSyncRun]:
-    results: list[EmailMonitorSyncRun] = []
-    with Session(engine) as session:
+    """
+    Sincroniza as contas ativas (no scheduler, só as vencidas) em paralelo:
+    até EMAIL_MONITOR_SYNC_CONCURRENCY contas ao mesmo tempo e no máximo
+    EMAIL_MONITOR_SYNC_MAX_PER_HOST por servidor IMAP. Contas que não
+    começarem até o prazo do ciclo ficam para o próximo; as que ainda
+    estiverem rodando no prazo terminam em segundo plano, fora do resultado.
+    """
+    cycle_started = time.monotonic()
+    deadline = cycle_started + max(30, settings.EMAIL_MONITOR_SYNC_CYCLE_DEADLINE_SECONDS)
+    pending_by_host: dict[str, deque] = {}
+    with Session(get_engine(PAPEL_SCHEDULER)) as session:
         accounts = session.exec(select(EmailMonitorAccount).where(EmailMonitorAccount.is_active == True)).all()
         for account in accounts:
             if trigger_source == "scheduler" and not force:
@@ -1191,12 +1965,39 @@ def sync_active_accounts(trigger_source: str = "scheduler", force: bool = False)
                     next_due_at = account.last_success_at + datetime.timedelta(minutes=account.sync_interval_minutes)
                     if next_due_at > utcnow():
                         continue
-            try:
-                sync_run = sync_account(session, account, trigger_source=trigger_source, force=force)
-            except RuntimeError:
-                continue
-            results.append(sync_run)
-            session.expire_all()
+            folders = None
+            idle_folders = get_idle_folders(account.id) if trigger_source == "scheduler" else set()
+            if idle_folders:
+                folders = [folder for folder in normalize_folder_list(account.selected_folders_json) if folder not in idle_folders]
+                if not folders:
+                    continue
+            host = (account.imap_host or "").strip().lower()
+            pending_by_host.setdefault(host, deque()).append((account.id, folders))
+
+    if not pending_by_host:
+        return []
+
+    results, not_started, still_running = run_host_limited_jobs(
+        pending_by_host,
+        lambda job: _sync_account_job(
+            job[0],
+            job[1],
+            trigger_source=trigger_source,
+            force=force,
+            cycle_started=cycle_started,
+            deadline=deadline,
+        ),
+        concurrency=settings.EMAIL_MONITOR_SYNC_CONCURRENCY,
+        max_per_host=settings.EMAIL_MONITOR_SYNC_MAX_PER_HOST,
+        deadline=deadline,
+    )
+    slowest_ms = max((sync_run.duration_ms or 0 for sync_run in results), default=0)
+    print(
+        "EMAIL_MONITOR_SYNC_CYCLE: "
+        f"trigger={trigger_source} contas={len(results)} sem_iniciar={not_started} "
+        f"em_andamento_no_prazo={still_running} duracao={time.monotonic() - cycle_started:.1f}s "
+        f"mais_lenta={slowest_ms / 1000:.1f}s"
+    )
     return results
 
 
@@ -1231,6 +2032,8 @@ def delete_account_permanently(session: Session, account: EmailMonitorAccount) -
 
         for rule in rules:
             session.delete(rule)
+        if rules:
+            mark_rules_changed(session)
 
         session.delete(account)
 
@@ -0,0 +1,280 @@
+import datetime
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session as SASession
+from sqlmodel import Session, select
+
+from app.core.bloom import FiltroBloom
+from app.core.cache import get_backend_versao
+from app.core.concorrencia import executar_bloqueante
+from app.core.config import settings
+from app.db.database import engine
+from app.models.suporte_models import GiftCard
+from app.services.telegram_outbox_service import TokenBucket
+
+
+CHAVE_GIFTCARDS = "giftcards"
+_SESSION_INFO_GIFTCARDS_CRIADOS = "giftcards_criados"
+_SESSION_INFO_GIFTCARDS_REMOVIDOS = "giftcards_removidos"
+# `criado_em` é preenchido antes do commit; a sincronização incremental
+# relê uma janela para trás para não perder cards confirmados com atraso.
+MARGEM_SINCRONIZACAO = datetime.timedelta(minutes=2)
+CAPACIDADE_MINIMA = 10_000
+
+
+def _carregar_codigos(desde: Optional[datetime.datetime] = None) -> Iterable[str]:
+    """
+    Códigos existentes: todos (em páginas por keyset no código) ou só os
+    criados a partir de `desde` (índice em criado_em).
+    """
+    with Session(engine) as session:
+        if desde is not None:
+            yield from session.exec(select(GiftCard.codigo).where(GiftCard.criado_em >= desde)).all()
+            return
+        cursor = ""
+        while True:
+            pagina = session.exec(
+                select(GiftCard.codigo).where(GiftCard.codigo > cursor).order_by(GiftCard.codigo).limit(10_000)
+            ).all()
+            if not pagina:
+                return
+            yield from pagina
+            cursor = pagina[-1]
+
+
+class FiltroCodigosGiftCard:
+    """
+    Filtro de Bloom com os códigos existentes, para recusar códigos
+    inexistentes sem ir ao banco (e sem o SELECT ... FOR UPDATE do resgate).
+
+    Cards criados neste processo entram no filtro após o commit. Os criados
+    em outros processos chegam por sincronização incremental, feita apenas
+    quando um código não está no filtro e (a) o carimbo "giftcards" do
+    backend de versões mudou ou (b) a última sincronização tem mais de
+    GIFTCARD_FILTRO_SINCRONIZAR_SECONDS. Remoções não saem do filtro (só
+    geram falsos positivos, que o banco resolve); o filtro é reconstruído
+    quando elas se acumulam ou quando a capacidade é ultrapassada.
+    """
+
+    def __init__(
+        self,
+        carregar_codigos: Callable[[Optional[datetime.datetime]], Iterable[str]] = _carregar_codigos,
+        relogio=time.monotonic,
+    ):
+        self._carregar_codigos = carregar_codigos
+        self._relogio = relogio
+        self._lock = threading.Lock()
+        self._filtro: Optional[FiltroBloom] = None
+        self._marca_sincronizacao: Optional[datetime.datetime] = None
+        self._sincronizado_em = 0.0
+        self._versao_backend: Optional[int] = None
+        self.remocoes_pendentes = 0
+        self.consultas = 0
+        self.rejeitados = 0
+        self.sincronizacoes = 0
+        self.reconstrucoes = 0
+        self.erros = 0
+
+    def _ler_versao_backend(self) -> Optional[int]:
+        try:
+            return get_backend_versao().versao_atual(CHAVE_GIFTCARDS)
+        except Exception as exc:
+            self.erros += 1
+            print(f"AVISO: falha ao ler versão dos gift cards no backend de cache: {exc}")
+            return None
+
+    def _reconstruir(self) -> None:
+        versao = self._ler_versao_backend()
+        inicio = datetime.datetime.utcnow()
+        codigos = list(self._carregar_codigos(None))
+        filtro = FiltroBloom(
+            max(CAPACIDADE_MINIMA, len(codigos) * 2),
+            settings.GIFTCARD_FILTRO_TAXA_FALSO_POSITIVO,
+        )
+        filtro.adicionar_varios(codigos)
+        self._filtro = filtro
+        self._marca_sincronizacao = inicio
+        self._sincronizado_em = self._relogio()
+        self._versao_backend = versao
+        self.remocoes_pendentes = 0
+        self.reconstrucoes += 1
+        print(f"GIFTCARD_FILTRO: filtro reconstruído com {len(codigos)} código(s) ({filtro.num_bits // 8} bytes).")
+
+    def _sincronizar(self) -> None:
+        limite_remocoes = max(1000, self._filtro.itens // 10)
+        if self._filtro.cheio or self.remocoes_pendentes > limite_remocoes:
+            self._reconstruir()
+            return
+        versao = self._ler_versao_backend()
+        inicio = datetime.datetime.utcnow()
+        self._filtro.adicionar_varios(self._carregar_codigos(self._marca_sincronizacao - MARGEM_SINCRONIZACAO))
+        self._marca_sincronizacao = inicio
+        self._sincronizado_em = self._relogio()
+        self._versao_backend = versao
+        self.sincronizacoes += 1
+
+    def _precisa_sincronizar(self) -> bool:
+        if self._relogio() - self._sincronizado_em >= settings.GIFTCARD_FILTRO_SINCRONIZAR_SECONDS:
+            return True
+        versao = self._ler_versao_backend()
+        return versao is not None and versao != self._versao_backend
+
+    # As cargas abaixo leem o banco pelo psycopg2 segurando o lock: nas rotas
+    # assíncronas vão inteiras para uma thread (ver executar_bloqueante).
+    def _reconstruir_se_vazio(self) -> None:
+        with self._lock:
+            if self._filtro is None:
+                self._reconstruir()
+
+    def _sincronizar_se_preciso(self) -> None:
+        with self._lock:
+            if self._precisa_sincronizar():
+                self._sincronizar()
+
+    def pode_existir(self, codigo: str) -> bool:
+        """
+        False = o código com certeza não existe. True = consulte o banco.
+        Qualquer falha ao montar o filtro libera a consulta (falha aberta).
+        """
+        if not settings.GIFTCARD_FILTRO_ENABLED:
+            return True
+        self.consultas += 1
+        try:
+            if self._filtro is None:
+                executar_bloqueante(self._reconstruir_se_vazio)
+            if codigo in self._filtro:
+                return True
+
+            if self._precisa_sincronizar():
+                executar_bloqueante(self._sincronizar_se_preciso)
+                if codigo in self._filtro:
+                    return True
+        except Exception as exc:
+            self.erros += 1
+            print(f"GIFTCARD_FILTRO_ERROR: {exc}")
+            return True
+
+        self.rejeitados += 1
+        return False
+
+    def registrar_criados(self, codigos: list[str]) -> None:
+        if self._filtro is not None:
+            self._filtro.adicionar_varios(codigos)
+        try:
+            versao = get_backend_versao().incrementar(CHAVE_GIFTCARDS)
+        except Exception as exc:
+            self.erros += 1
+            print(f"AVISO: falha ao incrementar versão dos gift cards no backend de cache: {exc}")
+            return
+        # Se ninguém mais incrementou no meio, o filtro já está em dia com o carimbo.
+        if self._versao_backend is not None and versao == self._versao_backend + 1:
+            self._versao_backend = versao
+
+    def registrar_removidos(self, quantidade: int) -> None:
+        self.remocoes_pendentes += quantidade
+
+    def estatisticas(self) -> dict:
+        filtro = self._filtro
+        return {
+            "habilitado": settings.GIFTCARD_FILTRO_ENABLED,
+            "carregado": filtro is not None,
+            "itens": filtro.itens if filtro else 0,
+            "capacidade": filtro.capacidade if filtro else 0,
+            "tamanho_bytes": (filtro.num_bits + 7) // 8 if filtro else 0,
+            "consultas": self.consultas,
+            "rejeitados": self.rejeitados,
+            "taxa_rejeicao": round(self.rejeitados / self.consultas, 4) if self.consultas else 0.0,
+            "sincronizacoes": self.sincronizacoes,
+            "reconstrucoes": self.reconstrucoes,
+            "remocoes_pendentes": self.remocoes_pendentes,
+            "erros": self.erros,
+        }
+
+
+class LimitadorResgate:
+    """
+    Balde de tokens por telegram_id para as tentativas de resgate. Os
+    baldes ficam em memória (LRU limitado a `max_usuarios`), então o limite
+    vale por processo.
+    """
+
+    def __init__(
+        self,
+        tentativas_por_minuto: float,
+        rajada: int,
+        max_usuarios: int = 50_000,
+        relogio: Callable[[], float] = time.monotonic,
+    ):
+        self.taxa = tentativas_por_minuto / 60
+        self.rajada = rajada
+        self.max_usuarios = max_usuarios
+        self.relogio = relogio
+        self._baldes: "OrderedDict[int, TokenBucket]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.tentativas = 0
+        self.bloqueadas = 0
+
+    def _balde(self, telegram_id: int) -> TokenBucket:
+        with self._lock:
+            balde = self._baldes.get(telegram_id)
+            if balde is None:
+                balde = TokenBucket(self.taxa, capacidade=self.rajada, relogio=self.relogio)
+                self._baldes[telegram_id] = balde
+                if len(self._baldes) > self.max_usuarios:
+                    self._baldes.popitem(last=False)
+            else:
+                self._baldes.move_to_end(telegram_id)
+            return balde
+
+    def permitir(self, telegram_id: int) -> float:
+        """0 se a tentativa pode seguir; senão, segundos até a próxima ser aceita."""
+        balde = self._balde(telegram_id)
+        self.tentativas += 1
+        if balde.consumir():
+            return 0.0
+        self.bloqueadas += 1
+        return max(balde.espera(), 0.001)
+
+    def estatisticas(self) -> dict:
+        return {
+            "tentativas": self.tentativas,
+            "bloqueadas": self.bloqueadas,
+            "taxa_bloqueio": round(self.bloqueadas / self.tentativas, 4) if self.tentativas else 0.0,
+            "usuarios_monitorados": len(self._baldes),
+        }
+
+
+filtro_giftcards = FiltroCodigosGiftCard()
+limitador_resgate = LimitadorResgate(
+    settings.GIFTCARD_RESGATE_TENTATIVAS_POR_MINUTO,
+    settings.GIFTCARD_RESGATE_RAJADA,
+)
+
+
+def marcar_giftcards_criados(session: SASession, codigos: list[str]) -> None:
+    """Agenda a inclusão dos códigos no filtro para depois do commit."""
+    session.info.setdefault(_SESSION_INFO_GIFTCARDS_CRIADOS, []).extend(codigos)
+
+
+def marcar_giftcard_removido(session: SASession) -> None:
+    session.info[_SESSION_INFO_GIFTCARDS_REMOVIDOS] = session.info.get(_SESSION_INFO_GIFTCARDS_REMOVIDOS, 0) + 1
+
+
+@event.listens_for(SASession, "after_commit")
+def _atualizar_filtro_apos_commit(session: SASession) -> None:
+    criados = session.info.pop(_SESSION_INFO_GIFTCARDS_CRIADOS, None)
+    if criados:
+        filtro_giftcards.registrar_criados(criados)
+    removidos = session.info.pop(_SESSION_INFO_GIFTCARDS_REMOVIDOS, 0)
+    if removidos:
+        filtro_giftcards.registrar_removidos(removidos)
+
+
+@event.listens_for(SASession, "after_rollback")
+def _descartar_marcacoes_giftcards(session: SASession) -> None:
+    session.info.pop(_SESSION_INFO_GIFTCARDS_CRIADOS, None)
+    session.info.pop(_SESSION_INFO_GIFTCARDS_REMOVIDOS, None)
@@ -0,0 +1,286 @@
+import csv
+import datetime
+import io
+import secrets
+import threading
+import uuid
+from decimal import Decimal
+from typing import Iterator, Optional
+
+import sqlalchemy as sa
+from fastapi import BackgroundTasks
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.database import engine
+from app.models.base import StatusGiftCardLote
+from app.models.suporte_models import GiftCard, GiftCardLote
+from app.schemas.giftcard_schemas import GiftCardLoteRead
+from app.services.giftcard_protecao_service import marcar_giftcards_criados
+
+# Lote PENDENTE/EM_ANDAMENTO sem progresso há mais que isso = o
+# enfileiramento se perdeu ou o executor morreu.
+LOTE_PARADO_APOS = datetime.timedelta(minutes=10)
+BLOCO_MAXIMO = 50000
+CABECALHO_CSV = ["codigo", "valor", "is_utilizado", "criado_em"]
+
+# Tabela temporária que recebe os candidatos via COPY (psycopg2).
+_candidatos = sa.table("giftcard_candidato", sa.column("id", sa.Uuid()), sa.column("codigo", sa.String()))
+
+
+class GeracaoGiftCardError(Exception):
+    pass
+
+
+def gerar_codigos(quantidade: int) -> list[str]:
+    """
+    Gera `quantidade` códigos no formato XXXXXX-XXXXXX a partir de uma
+    única chamada ao gerador seguro (em vez de duas por código).
+    """
+    bruto = secrets.token_bytes(6 * quantidade).hex().upper()
+    return [f"{bruto[i:i + 6]}-{bruto[i + 6:i + 12]}" for i in range(0, 12 * quantidade, 12)]
+
+
+def _inserir_candidatos_copy(session: Session, candidatos: list[str], colunas_fixas: dict) -> list[str]:
+    """
+    COPY dos candidatos para uma tabela temporária e um único
+    INSERT ... SELECT ... ON CONFLICT (codigo) DO NOTHING RETURNING codigo.
+    """
+    conexao = session.connection()
+    conexao.exec_driver_sql(
+        "CREATE TEMP TABLE IF NOT EXISTS giftcard_candidato (id uuid, codigo varchar) ON COMMIT DROP"
+    )
+    conexao.exec_driver_sql("TRUNCATE giftcard_candidato")
+    dados = io.StringIO("".join(f"{uuid.uuid4()}\t{codigo}\n" for codigo in candidatos))
+    with conexao.connection.driver_connection.cursor() as cursor:
+        cursor.copy_expert("COPY giftcard_candidato (id, codigo) FROM STDIN", dados)
+
+    tabela = GiftCard.__table__
+    origem = sa.select(
+        _candidatos.c.id,
+        _candidatos.c.codigo,
+        *(sa.literal(valor, tabela.c[coluna].type) for coluna, valor in colunas_fixas.items()),
+    )
+    return session.exec(
+        pg_insert(GiftCard)
+        .from_select(["id", "codigo", *colunas_fixas], origem)
+        .on_conflict_do_nothing(index_elements=["codigo"])
+        .returning(GiftCard.codigo)
+    ).scalars().all()
+
+
+def _inserir_candidatos_executemany(session: Session, candidatos: list[str], colunas_fixas: dict) -> list[str]:
+    linhas = [{"id": uuid.uuid4(), "codigo": codigo, **colunas_fixas} for codigo in candidatos]
+    return session.execute(
+        pg_insert(GiftCard)
+        .on_conflict_do_nothing(index_elements=["codigo"])
+        .returning(GiftCard.codigo),
+        linhas,
+    ).scalars().all()
+
+
+def inserir_codigos_unicos(
+    session: Session,
+    quantidade: int,
+    valor: Decimal,
+    criado_por_admin_id: uuid.UUID,
+    *,
+    lote_id: Optional[uuid.UUID] = None,
+) -> tuple[list[str], int]:
+    """
+    Insere `quantidade` gift cards com códigos aleatórios. A unicidade é
+    resolvida pelo banco num único comando por rodada (ON CONFLICT (codigo)
+    DO NOTHING RETURNING codigo): só os códigos que colidiram são gerados
+    de novo. Com psycopg2 os candidatos entram via COPY. Não faz commit.
+    Retorna (códigos inseridos, colisões).
+    """
+    colunas_fixas = {
+        "valor": valor,
+        "is_utilizado": False,
+        "criado_em": datetime.datetime.utcnow(),
+        "criado_por_admin_id": criado_por_admin_id,
+        "lote_id": lote_id,
+    }
+    usar_copy = session.connection().dialect.driver == "psycopg2"
+    inserir = _inserir_candidatos_copy if usar_copy else _inserir_candidatos_executemany
+
+    inseridos: list[str] = []
+    colisoes = 0
+    for _ in range(settings.GIFTCARD_LOTE_MAX_RODADAS_COLISAO):
+        faltam = quantidade - len(inseridos)
+        if faltam <= 0:
+            break
+        candidatos = list(dict.fromkeys(gerar_codigos(faltam)))
+        novos = inserir(session, candidatos, colunas_fixas)
+        colisoes += faltam - len(novos)
+        inseridos.extend(novos)
+
+    if len(inseridos) < quantidade:
+        raise GeracaoGiftCardError(
+            f"Não foi possível gerar {quantidade} códigos únicos "
+            f"após {settings.GIFTCARD_LOTE_MAX_RODADAS_COLISAO} rodadas."
+        )
+    marcar_giftcards_criados(session, inseridos)
+    return inseridos, colisoes
+
+
+# --- Lotes ---
+
+def lote_parado(lote: GiftCardLote) -> bool:
+    return (
+        lote.status in (StatusGiftCardLote.PENDENTE, StatusGiftCardLote.EM_ANDAMENTO)
+        and datetime.datetime.utcnow() - lote.atualizado_em > LOTE_PARADO_APOS
+    )
+
+
+def montar_lote_read(lote: GiftCardLote) -> GiftCardLoteRead:
+    progresso = 100.0
+    if lote.quantidade_solicitada:
+        progresso = lote.quantidade_gerada * 100 / lote.quantidade_solicitada
+    vazao = None
+    if lote.iniciado_em and lote.quantidade_gerada:
+        fim = lote.concluido_em or lote.atualizado_em
+        segundos = (fim - lote.iniciado_em).total_seconds()
+        if segundos > 0:
+            vazao = round(lote.quantidade_gerada / segundos, 1)
+    return GiftCardLoteRead(
+        id=lote.id,
+        valor=lote.valor,
+        quantidade_solicitada=lote.quantidade_solicitada,
+        quantidade_gerada=lote.quantidade_gerada,
+        colisoes=lote.colisoes,
+        status=lote.status,
+        erro=lote.erro,
+        progresso_percentual=round(progresso, 1),
+        codigos_por_segundo=vazao,
+        criado_em=lote.criado_em,
+        iniciado_em=lote.iniciado_em,
+        atualizado_em=lote.atualizado_em,
+        concluido_em=lote.concluido_em,
+    )
+
+
+def executar_lote_giftcards(lote_id: uuid.UUID) -> Optional[GiftCardLote]:
+    """
+    Gera os códigos que faltam no lote, um bloco por transação (códigos +
+    progresso no mesmo commit). Um lote interrompido continua de onde parou.
+    """
+    with Session(engine) as session:
+        lote = session.exec(
+            select(GiftCardLote)
+            .where(GiftCardLote.id == lote_id)
+            .where(GiftCardLote.status == StatusGiftCardLote.PENDENTE)
+            .with_for_update(skip_locked=True)
+        ).first()
+        if not lote:
+            print(f"GIFTCARD_LOTE: lote {lote_id} não está pendente (ou já está em execução).")
+            return None
+
+        agora = datetime.datetime.utcnow()
+        lote.status = StatusGiftCardLote.EM_ANDAMENTO
+        lote.iniciado_em = lote.iniciado_em or agora
+        lote.atualizado_em = agora
+        lote.erro = None
+        session.add(lote)
+        session.commit()
+
+        bloco = max(1, min(settings.GIFTCARD_LOTE_BLOCO, BLOCO_MAXIMO))
+        try:
+            while lote.quantidade_gerada < lote.quantidade_solicitada:
+                quantidade = min(bloco, lote.quantidade_solicitada - lote.quantidade_gerada)
+                codigos, colisoes = inserir_codigos_unicos(
+                    session, quantidade, lote.valor, lote.criado_por_admin_id, lote_id=lote.id
+                )
+                lote.quantidade_gerada += len(codigos)
+                lote.colisoes += colisoes
+                lote.atualizado_em = datetime.datetime.utcnow()
+                session.add(lote)
+                session.commit()
+                print(
+                    f"GIFTCARD_LOTE: {lote.id} {lote.quantidade_gerada}/{lote.quantidade_solicitada} "
+                    f"(colisões={lote.colisoes})"
+                )
+        except Exception as exc:
+            session.rollback()
+            print(f"GIFTCARD_LOTE_ERROR: lote {lote_id}: {exc}")
+            lote = session.get(GiftCardLote, lote_id)
+            lote.status = StatusGiftCardLote.FALHOU
+            lote.erro = str(exc)[:500]
+            lote.atualizado_em = datetime.datetime.utcnow()
+            session.add(lote)
+            session.commit()
+            session.refresh(lote)
+            return lote
+
+        lote.status = StatusGiftCardLote.CONCLUIDO
+        lote.concluido_em = datetime.datetime.utcnow()
+        lote.atualizado_em = lote.concluido_em
+        session.add(lote)
+        session.commit()
+        session.refresh(lote)
+        return lote
+
+
+def _executar_lote_task(lote_id: str) -> None:
+    try:
+        executar_lote_giftcards(uuid.UUID(lote_id))
+    except Exception as exc:
+        print(f"GIFTCARD_LOTE_ERROR: {exc}")
+
+
+def enqueue_lote_giftcards(
+    lote_id: uuid.UUID,
+    *,
+    background_tasks: Optional[BackgroundTasks] = None,
+) -> None:
+    if settings.CELERY_BROKER_URL:
+        from app.worker.celery_app import celery_app
+
+        celery_app.send_task("gerar_lote_giftcards", args=[str(lote_id)])
+        return
+    if background_tasks is not None:
+        background_tasks.add_task(_executar_lote_task, str(lote_id))
+        return
+
+    threading.Thread(
+        target=_executar_lote_task,
+        args=(str(lote_id),),
+        daemon=True,
+        name=f"giftcard-lote-{lote_id}",
+    ).start()
+
+
+def exportar_csv_lote(lote_id: uuid.UUID, tamanho_pagina: int = 5000) -> Iterator[str]:
+    """
+    CSV dos códigos do lote, em páginas por keyset no código, para ser
+    enviado via StreamingResponse sem montar o arquivo em memória.
+    """
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer)
+    escritor.writerow(CABECALHO_CSV)
+
+    cursor = ""
+    with Session(engine) as session:
+        while True:
+            pagina = session.exec(
+                select(GiftCard.codigo, GiftCard.valor, GiftCard.is_utilizado, GiftCard.criado_em)
+                .where(GiftCard.lote_id == lote_id)
+                .where(GiftCard.codigo > cursor)
+                .order_by(GiftCard.codigo)
+                .limit(tamanho_pagina)
+            ).all()
+            if not pagina:
+                break
+            cursor = pagina[-1].codigo
+            escritor.writerows(
+                (linha.codigo, f"{linha.valor:.2f}", linha.is_utilizado, linha.criado_em.isoformat())
+                for linha in pagina
+            )
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+
+    restante = buffer.getvalue()
+    if restante:
+        yield restante
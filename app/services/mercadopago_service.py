@@ -0,0 +1,34 @@
+import mercadopago
+from mercadopago.http.http_client import HttpClient
+
+from app.core.config import settings
+from app.core.http_client import http_client
+
+
+class MercadoPagoHttpClient(HttpClient):
+    """
+    Transporte do SDK do Mercado Pago sobre o cliente HTTP compartilhado.
+    O `HttpClient` padrão do SDK abre um `requests.Session` novo (e um novo
+    handshake TLS) a cada chamada; aqui as conexões são reaproveitadas e as
+    retentativas/disjuntor seguem a política do `http_client`. POSTs só são
+    repetidos quando levam X-Idempotency-Key.
+    """
+
+    def request(self, method, url, maxretries=None, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs.pop("timeout", None)
+        api_result = http_client.request(method, url, upstream="mercadopago", **kwargs)
+        response = {"status": api_result.status_code, "response": None}
+
+        if api_result.status_code != 204 and api_result.content:
+            try:
+                response["response"] = api_result.json()
+            except ValueError as e:
+                print(f"Failed to parse JSON: {str(e)}")
+                response["response"] = None
+
+        return response
+
+
+# SDK compartilhado pela API e pelos processadores de pagamento.
+sdk = mercadopago.SDK(settings.MERCADOPAGO_ACCESS_TOKEN, http_client=MercadoPagoHttpClient())
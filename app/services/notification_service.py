@@ -1,10 +1,5 @@
-import requests
-
 from app.core.config import settings
-
-# Usamos o token da API para montar a URL de envio
-BOT_TOKEN = settings.TELEGRAM_BOT_TOKEN
-TELEGRAM_API_URL = f"https://api.telegram.org/bot{BOT_TOKEN}/sendMessage"
+from app.services.telegram_outbox_service import enfileirar_notificacao_telegram
 
 def escape_markdown_v2(text: str) -> str:
     """
@@ -22,33 +17,22 @@ def send_telegram_message(
     reply_markup: dict | None = None,
 ):
     """
-    Envia uma mensagem direta para um usuário do Telegram via HTTP.
+    Enfileira uma mensagem direta para um usuário do Telegram.
     
     Usamos MarkdownV2 para consistência com o bot (ex: `*bold*`, `_italic_`, `` `code` ``).
+    O envio de fato é feito pelo despachante do outbox (`telegram_outbox_service`),
+    que respeita os limites da API e faz as retentativas; aqui só gravamos e retornamos.
     """
-    payload = {
-        "chat_id": telegram_id,
-        "text": message_text,
-        "parse_mode": parse_mode
-    }
-    if reply_markup:
-        payload["reply_markup"] = reply_markup
-    
-    # Usamos 'requests' que já está nas dependências da API
     try:
-        response = requests.post(TELEGRAM_API_URL, json=payload, timeout=5)
-        response.raise_for_status() # Lança erro se for 4xx or 5xx
-        
-        if response.json().get("ok") is True:
-            print(f"Notificação enviada com sucesso para {telegram_id}.")
-        else:
-            print(f"Erro da API Telegram ao enviar para {telegram_id}: {response.text}")
-            
-    except requests.exceptions.RequestException as e:
-        # Se a API do Telegram estiver fora ou o token for inválido
-        print(f"ERRO CRÍTICO ao enviar notificação para {telegram_id}: {e}")
+        enfileirar_notificacao_telegram(
+            telegram_id,
+            message_text,
+            parse_mode=parse_mode,
+            reply_markup=reply_markup,
+        )
+        print(f"Notificação enfileirada para {telegram_id}.")
     except Exception as e_geral:
-        print(f"Erro inesperado no notification_service: {e_geral}")
+        print(f"Erro inesperado no notification_service ao enfileirar para {telegram_id}: {e_geral}")
 
 
 def send_openai_invite_sent_message(
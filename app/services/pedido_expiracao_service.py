@@ -1,49 +1,288 @@
 import datetime
 import uuid
-from typing import Optional, Tuple
+from dataclasses import dataclass
+from typing import Any, Iterable, Optional, Tuple
 
+from sqlalchemy import case, event, func, inspect, literal, or_, true, update
+from sqlalchemy.orm import Session as SASession, aliased
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 from sqlmodel import Session, select
 
 from app.models.conta_mae_models import ContaMae, ContaMaeConvite
+from app.models.pedido_models import Pedido
 from app.models.produto_models import EstoqueConta
 
 
+ORIGEM_CONTA_MAE = "CONTA_MAE"
+ORIGEM_ESTOQUE = "ESTOQUE"
+
+
+@dataclass(frozen=True)
+class ExpiracaoPedidoSQL:
+    """
+    Expressões SQL da data de expiração efetiva de um pedido, para compor
+    consultas em lote. Use `aplicar` num SELECT que já parte de `Pedido`
+    e depois filtre/ordene por `data_expiracao`/`origem_expiracao`.
+    """
+
+    conta_mae: Any
+    estoque_conta: Any
+    convite: Any
+    data_expiracao: Any
+    origem_expiracao: Any
+
+    def aplicar(self, stmt):
+        return (
+            stmt.outerjoin_from(Pedido, self.convite, true())
+            .outerjoin_from(Pedido, self.conta_mae, self.conta_mae.id == Pedido.conta_mae_id)
+            .outerjoin_from(Pedido, self.estoque_conta, self.estoque_conta.id == Pedido.estoque_conta_id)
+        )
+
+
+def expiracao_pedido_sql() -> ExpiracaoPedidoSQL:
+    """
+    Mesma prioridade de `resolver_data_expiracao_pedido`, em um COALESCE:
+    1) Conta-mãe vinculada ao convite do pedido/email.
+    2) Conta-mãe do próprio pedido.
+    3) Conta de estoque do pedido.
+    """
+    conta_mae_convite = aliased(ContaMae)
+    convite = (
+        select(conta_mae_convite.data_expiracao.label("data_expiracao"))
+        .select_from(ContaMaeConvite)
+        .join(conta_mae_convite, conta_mae_convite.id == ContaMaeConvite.conta_mae_id)
+        .where(ContaMaeConvite.pedido_id == Pedido.id)
+        .where(
+            or_(
+                Pedido.email_cliente == None,
+                Pedido.email_cliente == "",
+                ContaMaeConvite.email_cliente == Pedido.email_cliente,
+            )
+        )
+        .order_by(ContaMaeConvite.criado_em)
+        .limit(1)
+        .lateral("convite_expiracao")
+    )
+    conta_mae = aliased(ContaMae, name="conta_mae_pedido")
+    estoque_conta = aliased(EstoqueConta, name="estoque_conta_pedido")
+
+    data_expiracao_conta_mae = func.coalesce(convite.c.data_expiracao, conta_mae.data_expiracao)
+    data_expiracao = func.coalesce(data_expiracao_conta_mae, estoque_conta.data_expiracao)
+    origem_expiracao = case(
+        (data_expiracao_conta_mae != None, literal(ORIGEM_CONTA_MAE)),
+        (estoque_conta.data_expiracao != None, literal(ORIGEM_ESTOQUE)),
+        else_=None,
+    )
+    return ExpiracaoPedidoSQL(
+        conta_mae=conta_mae,
+        estoque_conta=estoque_conta,
+        convite=convite,
+        data_expiracao=data_expiracao.label("data_expiracao"),
+        origem_expiracao=origem_expiracao.label("origem_expiracao"),
+    )
+
+
+def resolver_datas_expiracao_pedidos(
+    session: Session,
+    pedido_ids: Iterable[uuid.UUID],
+) -> dict[uuid.UUID, Tuple[Optional[datetime.date], Optional[str]]]:
+    """
+    Resolve a data de expiração efetiva de vários pedidos numa única consulta.
+    """
+    pedido_ids = list(dict.fromkeys(pedido_ids))
+    if not pedido_ids:
+        return {}
+
+    expiracao = expiracao_pedido_sql()
+    stmt = expiracao.aplicar(
+        select(Pedido.id, expiracao.data_expiracao, expiracao.origem_expiracao)
+    ).where(Pedido.id.in_(pedido_ids))
+    return {
+        pedido_id: (data_expiracao, origem_expiracao)
+        for pedido_id, data_expiracao, origem_expiracao in session.exec(stmt).all()
+    }
+
+
 def resolver_data_expiracao_pedido(
     *,
     session: Session,
     pedido_id: uuid.UUID,
-    email_cliente: Optional[str],
-    estoque_conta_id: Optional[uuid.UUID],
-    conta_mae_id: Optional[uuid.UUID],
 ) -> Tuple[Optional[datetime.date], Optional[str]]:
     """
-    Resolve a data de expiração efetiva de um pedido.
+    Resolve a data de expiração efetiva de um pedido, passo a passo (é a
+    referência de `expiracao_pedido_sql`; para vários pedidos use
+    `resolver_datas_expiracao_pedidos`).
     Prioridade:
     1) Conta-mãe vinculada ao convite do pedido/email.
     2) Conta-mãe do próprio pedido.
     3) Conta de estoque do pedido.
     """
-    data_expiracao: Optional[datetime.date] = None
-    origem_expiracao: Optional[str] = None
+    pedido = session.get(Pedido, pedido_id)
+    if not pedido:
+        return None, None
 
     stmt_convite = select(ContaMaeConvite).where(ContaMaeConvite.pedido_id == pedido_id)
-    if email_cliente:
-        stmt_convite = stmt_convite.where(ContaMaeConvite.email_cliente == email_cliente)
-
-    convite = session.exec(stmt_convite.limit(1)).first()
+    if pedido.email_cliente:
+        stmt_convite = stmt_convite.where(ContaMaeConvite.email_cliente == pedido.email_cliente)
+    convite = session.exec(stmt_convite.order_by(ContaMaeConvite.criado_em).limit(1)).first()
     if convite:
         conta_mae = session.get(ContaMae, convite.conta_mae_id)
         if conta_mae and conta_mae.data_expiracao:
-            return conta_mae.data_expiracao, "CONTA_MAE"
+            return conta_mae.data_expiracao, ORIGEM_CONTA_MAE
 
-    if conta_mae_id:
-        conta_mae = session.get(ContaMae, conta_mae_id)
+    if pedido.conta_mae_id:
+        conta_mae = session.get(ContaMae, pedido.conta_mae_id)
         if conta_mae and conta_mae.data_expiracao:
-            return conta_mae.data_expiracao, "CONTA_MAE"
+            return conta_mae.data_expiracao, ORIGEM_CONTA_MAE
 
-    if estoque_conta_id:
-        conta_estoque = session.get(EstoqueConta, estoque_conta_id)
+    if pedido.estoque_conta_id:
+        conta_estoque = session.get(EstoqueConta, pedido.estoque_conta_id)
         if conta_estoque and conta_estoque.data_expiracao:
-            return conta_estoque.data_expiracao, "ESTOQUE"
+            return conta_estoque.data_expiracao, ORIGEM_ESTOQUE
+
+    return None, None
+
+
+# --- Expiração materializada em `Pedido.data_expiracao_efetiva` ---
+
+def recalcular_expiracao_efetiva(session: SASession, filtro) -> int:
+    """
+    Recalcula `data_expiracao_efetiva`/`origem_expiracao` dos pedidos que
+    satisfazem `filtro` num único UPDATE ... FROM, gravando só o que mudou.
+    Os pedidos já carregados na sessão recebem os novos valores.
+    """
+    expiracao = expiracao_pedido_sql()
+    calculo = (
+        expiracao.aplicar(
+            select(Pedido.id.label("pedido_id"), expiracao.data_expiracao, expiracao.origem_expiracao)
+        )
+        .where(filtro)
+        .subquery("expiracao_calculada")
+    )
+    pedido = Pedido.__table__
+    stmt = (
+        update(pedido)
+        .where(pedido.c.id == calculo.c.pedido_id)
+        .where(
+            or_(
+                pedido.c.data_expiracao_efetiva.is_distinct_from(calculo.c.data_expiracao),
+                pedido.c.origem_expiracao.is_distinct_from(calculo.c.origem_expiracao),
+            )
+        )
+        .values(
+            data_expiracao_efetiva=calculo.c.data_expiracao,
+            origem_expiracao=calculo.c.origem_expiracao,
+        )
+        .returning(pedido.c.id, pedido.c.data_expiracao_efetiva, pedido.c.origem_expiracao)
+    )
+    linhas = session.connection().execute(stmt).all()
+
+    # No after_flush os pedidos recém-inseridos ainda não estão no identity map.
+    novos = {obj.id: obj for obj in session.new if isinstance(obj, Pedido)}
+    for pedido_id, data_expiracao, origem_expiracao in linhas:
+        instancia = session.identity_map.get(identity_key(Pedido, pedido_id)) or novos.get(pedido_id)
+        if instancia is not None:
+            set_committed_value(instancia, "data_expiracao_efetiva", data_expiracao)
+            set_committed_value(instancia, "origem_expiracao", origem_expiracao)
+    return len(linhas)
+
+
+def _valores_alterados(obj, atributo: str) -> set:
+    historico = inspect(obj).attrs[atributo].history
+    if not historico.has_changes():
+        return set()
+    return {valor for valor in (*historico.added, *historico.deleted) if valor is not None}
+
+
+@event.listens_for(SASession, "after_flush")
+def _manter_expiracao_efetiva(session: SASession, flush_context) -> None:
+    """
+    Detecta, no flush, tudo que muda a expiração efetiva de um pedido
+    (vínculos do pedido, convites, `data_expiracao` das contas) e recalcula
+    apenas os pedidos afetados, na mesma transação.
+    """
+    pedido_ids: set = set()
+    conta_mae_ids: set = set()
+    estoque_conta_ids: set = set()
+
+    for obj in session.new:
+        if isinstance(obj, Pedido):
+            pedido_ids.add(obj.id)
+        elif isinstance(obj, ContaMaeConvite) and obj.pedido_id:
+            pedido_ids.add(obj.pedido_id)
+
+    for obj in session.dirty:
+        if isinstance(obj, Pedido):
+            if any(
+                inspect(obj).attrs[atributo].history.has_changes()
+                for atributo in ("conta_mae_id", "estoque_conta_id", "email_cliente")
+            ):
+                pedido_ids.add(obj.id)
+        elif isinstance(obj, ContaMaeConvite):
+            if any(
+                inspect(obj).attrs[atributo].history.has_changes()
+                for atributo in ("conta_mae_id", "email_cliente", "criado_em")
+            ):
+                pedido_ids.add(obj.pedido_id)
+            pedido_ids |= _valores_alterados(obj, "pedido_id")
+        elif isinstance(obj, ContaMae):
+            if inspect(obj).attrs["data_expiracao"].history.has_changes():
+                conta_mae_ids.add(obj.id)
+        elif isinstance(obj, EstoqueConta):
+            if inspect(obj).attrs["data_expiracao"].history.has_changes():
+                estoque_conta_ids.add(obj.id)
+
+    for obj in session.deleted:
+        if isinstance(obj, ContaMaeConvite) and obj.pedido_id:
+            pedido_ids.add(obj.pedido_id)
+
+    pedido_ids.discard(None)
+    filtros = []
+    if pedido_ids:
+        filtros.append(Pedido.id.in_(pedido_ids))
+    if conta_mae_ids:
+        filtros.append(Pedido.conta_mae_id.in_(conta_mae_ids))
+        filtros.append(
+            Pedido.id.in_(
+                select(ContaMaeConvite.pedido_id)
+                .where(ContaMaeConvite.conta_mae_id.in_(conta_mae_ids))
+                .where(ContaMaeConvite.pedido_id != None)
+            )
+        )
+    if estoque_conta_ids:
+        filtros.append(Pedido.estoque_conta_id.in_(estoque_conta_ids))
+    if filtros:
+        recalcular_expiracao_efetiva(session, or_(*filtros))
+
+
+def recalcular_expiracao_pedidos_em_lotes(
+    session: Session,
+    *,
+    tamanho_lote: int = 1000,
+) -> dict:
+    """
+    Backfill/reparo da expiração materializada. Percorre os pedidos por
+    keyset no id e confirma cada lote separadamente, mantendo as transações
+    (e os locks de linha) curtos.
+    """
+    ultimo_id: Optional[uuid.UUID] = None
+    processados = 0
+    atualizados = 0
+    lotes = 0
+
+    while True:
+        stmt = select(Pedido.id).order_by(Pedido.id).limit(tamanho_lote)
+        if ultimo_id is not None:
+            stmt = stmt.where(Pedido.id > ultimo_id)
+        ids = session.exec(stmt).all()
+        if not ids:
+            break
+
+        atualizados += recalcular_expiracao_efetiva(session, Pedido.id.in_(ids))
+        session.commit()
+        processados += len(ids)
+        lotes += 1
+        ultimo_id = ids[-1]
 
-    return data_expiracao, origem_expiracao
+    return {"processados": processados, "atualizados": atualizados, "lotes": lotes}
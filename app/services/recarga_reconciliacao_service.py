@@ -0,0 +1,252 @@
+import datetime
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence
+
+from sqlalchemy import tuple_, update
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.database import get_engine
+from app.db.perfis import PAPEL_SCHEDULER
+from app.models.base import TipoStatusPagamento
+from app.models.configuracao_models import TipoGatilhoAfiliado
+from app.models.usuario_models import RecargaSaldo
+from app.services.affiliate_service import processar_gatilho_afiliado
+from app.services.recarga_webhook_service import confirmar_recarga_aprovada, consultar_status_pagamento_mp
+
+# Status finais do Mercado Pago -> o que fazer com a recarga pendente.
+# Qualquer outro status (ou nenhuma resposta) deixa a recarga como está.
+STATUS_GATEWAY_RECUSADOS = ("rejected",)
+# O PIX não pago é cancelado pelo gateway quando vence.
+STATUS_GATEWAY_EXPIRADOS = ("cancelled",)
+STATUS_GATEWAY_ESTORNADOS = ("refunded", "charged_back")
+STATUS_GATEWAY_FINAIS_NAO_APROVADOS = STATUS_GATEWAY_RECUSADOS + STATUS_GATEWAY_EXPIRADOS + STATUS_GATEWAY_ESTORNADOS
+
+# Relatório da última execução neste processo (exibido no admin).
+ultima_reconciliacao: Optional[dict] = None
+
+
+# --- Clientes do gateway ---
+
+class ClienteGatewayPagamentos(ABC):
+    """
+    Consulta o status de vários pagamentos de uma vez. Ids que não puderam
+    ser consultados ficam de fora do dicionário retornado.
+    """
+
+    @abstractmethod
+    def consultar_status(self, gateway_ids: Sequence[str]) -> dict[str, str]:
+        ...
+
+
+class ClienteMercadoPago(ClienteGatewayPagamentos):
+    def __init__(self, concorrencia: int = settings.RECARGA_RECONCILIACAO_CONCORRENCIA):
+        self.concorrencia = concorrencia
+
+    def _consultar(self, gateway_id: str) -> Optional[str]:
+        try:
+            return consultar_status_pagamento_mp(gateway_id)
+        except Exception as exc:
+            print(f"RECONCILIACAO: falha ao consultar o payment_id {gateway_id}: {exc}")
+            return None
+
+    def consultar_status(self, gateway_ids: Sequence[str]) -> dict[str, str]:
+        if not gateway_ids:
+            return {}
+        with ThreadPoolExecutor(
+            max_workers=min(self.concorrencia, len(gateway_ids)),
+            thread_name_prefix="reconciliacao-mp",
+        ) as executor:
+            status = list(executor.map(self._consultar, gateway_ids))
+        return {
+            gateway_id: status_gateway
+            for gateway_id, status_gateway in zip(gateway_ids, status)
+            if status_gateway is not None
+        }
+
+
+class ClienteGatewayStub(ClienteGatewayPagamentos):
+    """
+    Cliente local (testes/desenvolvimento): responde a partir de um
+    dicionário e usa `padrao` para os ids não cadastrados.
+    """
+
+    def __init__(self, status_por_id: Optional[dict[str, str]] = None, padrao: Optional[str] = "pending"):
+        self.status_por_id = dict(status_por_id or {})
+        self.padrao = padrao
+        self.consultas: list[list[str]] = []
+
+    def consultar_status(self, gateway_ids: Sequence[str]) -> dict[str, str]:
+        self.consultas.append(list(gateway_ids))
+        resultado = {}
+        for gateway_id in gateway_ids:
+            status_gateway = self.status_por_id.get(gateway_id, self.padrao)
+            if status_gateway is not None:
+                resultado[gateway_id] = status_gateway
+        return resultado
+
+
+def obter_cliente_gateway() -> ClienteGatewayPagamentos:
+    if settings.RECARGA_RECONCILIACAO_GATEWAY == "stub":
+        return ClienteGatewayStub()
+    return ClienteMercadoPago()
+
+
+# --- Reconciliação ---
+
+def _atualizar_status(session: Session, ids: list, status_pagamento: TipoStatusPagamento) -> int:
+    if not ids:
+        return 0
+    resultado = session.exec(
+        update(RecargaSaldo)
+        .where(RecargaSaldo.id.in_(ids))
+        .where(RecargaSaldo.status_pagamento == TipoStatusPagamento.PENDENTE)
+        .values(status_pagamento=status_pagamento)
+    )
+    return resultado.rowcount or 0
+
+
+def reconciliar_recargas_pendentes(
+    session: Session,
+    *,
+    cliente: Optional[ClienteGatewayPagamentos] = None,
+    tamanho_lote: Optional[int] = None,
+) -> dict:
+    """
+    Percorre as recargas PENDENTES por keyset em (criado_em, id) e consulta
+    o gateway em lotes, fora de qualquer transação. Só então trava as
+    linhas com resposta definitiva (FOR UPDATE SKIP LOCKED, conferindo de
+    novo que seguem PENDENTES) e aplica o lote numa transação: aprovadas
+    são creditadas, recusadas/canceladas viram FALHOU e estornadas viram
+    ESTORNADO. Recargas sem resposta do gateway, ainda pendentes nele ou
+    travadas por outro processo (ex.: o webhook) ficam para a próxima execução.
+    """
+    global ultima_reconciliacao
+
+    cliente = cliente or obter_cliente_gateway()
+    tamanho_lote = tamanho_lote or settings.RECARGA_RECONCILIACAO_LOTE
+    inicio = time.monotonic()
+    iniciado_em = datetime.datetime.utcnow()
+    relatorio = {
+        "lotes": 0,
+        "verificadas": 0,
+        "aprovadas": 0,
+        "expiradas": 0,
+        "recusadas": 0,
+        "estornadas": 0,
+        "erros_gateway": 0,
+        "tempo_gateway_segundos": 0.0,
+    }
+    cursor = None
+
+    while True:
+        stmt = (
+            select(RecargaSaldo.id, RecargaSaldo.gateway_id, RecargaSaldo.criado_em)
+            .where(RecargaSaldo.status_pagamento == TipoStatusPagamento.PENDENTE)
+            .order_by(RecargaSaldo.criado_em, RecargaSaldo.id)
+            .limit(tamanho_lote)
+        )
+        if cursor is not None:
+            stmt = stmt.where(tuple_(RecargaSaldo.criado_em, RecargaSaldo.id) > cursor)
+        lote = session.exec(stmt).all()
+        # Nenhuma transação aberta enquanto o gateway responde.
+        session.commit()
+        if not lote:
+            break
+        cursor = (lote[-1].criado_em, lote[-1].id)
+
+        gateway_ids = [linha.gateway_id for linha in lote if linha.gateway_id]
+        inicio_gateway = time.monotonic()
+        status_por_id = cliente.consultar_status(gateway_ids)
+        relatorio["tempo_gateway_segundos"] += time.monotonic() - inicio_gateway
+        relatorio["erros_gateway"] += len(gateway_ids) - len(status_por_id)
+
+        decisoes: dict = {}
+        for linha in lote:
+            status_gateway = status_por_id.get(linha.gateway_id) if linha.gateway_id else None
+            if status_gateway == "approved" or status_gateway in STATUS_GATEWAY_FINAIS_NAO_APROVADOS:
+                decisoes[linha.id] = (linha.gateway_id, status_gateway)
+
+        travadas = set()
+        if decisoes:
+            travadas = set(
+                session.exec(
+                    select(RecargaSaldo.id)
+                    .where(RecargaSaldo.id.in_(list(decisoes)))
+                    .where(RecargaSaldo.status_pagamento == TipoStatusPagamento.PENDENTE)
+                    .with_for_update(skip_locked=True)
+                ).all()
+            )
+
+        aprovadas: list[str] = []
+        recusadas: list = []
+        estornadas: list = []
+        expiradas: list = []
+        for recarga_id in travadas:
+            gateway_id, status_gateway = decisoes[recarga_id]
+            if status_gateway == "approved":
+                aprovadas.append(gateway_id)
+            elif status_gateway in STATUS_GATEWAY_RECUSADOS:
+                recusadas.append(recarga_id)
+            elif status_gateway in STATUS_GATEWAY_EXPIRADOS:
+                expiradas.append(recarga_id)
+            else:
+                estornadas.append(recarga_id)
+
+        creditadas = []
+        for gateway_id in aprovadas:
+            resultado, usuario, recarga = confirmar_recarga_aprovada(session, gateway_id)
+            if usuario is not None:
+                creditadas.append((usuario, recarga.valor_solicitado))
+        relatorio["recusadas"] += _atualizar_status(session, recusadas, TipoStatusPagamento.FALHOU)
+        relatorio["estornadas"] += _atualizar_status(session, estornadas, TipoStatusPagamento.ESTORNADO)
+        relatorio["expiradas"] += _atualizar_status(session, expiradas, TipoStatusPagamento.FALHOU)
+        session.commit()
+
+        relatorio["lotes"] += 1
+        relatorio["verificadas"] += len(lote)
+        relatorio["aprovadas"] += len(creditadas)
+        for usuario, valor in creditadas:
+            # O crédito já foi confirmado: uma falha no afiliado não pode parar o lote.
+            try:
+                processar_gatilho_afiliado(
+                    db=session,
+                    usuario_indicado=usuario,
+                    valor_evento=valor,
+                    gatilho=TipoGatilhoAfiliado.primeira_recarga,
+                )
+            except Exception as exc:
+                session.rollback()
+                print(f"RECONCILIACAO_ERROR: gatilho de afiliado do usuário {usuario.id}: {exc}")
+
+    relatorio["tempo_gateway_segundos"] = round(relatorio["tempo_gateway_segundos"], 3)
+    relatorio["duracao_segundos"] = round(time.monotonic() - inicio, 3)
+    relatorio["iniciado_em"] = iniciado_em
+    ultima_reconciliacao = relatorio
+    print(
+        "RECONCILIACAO: "
+        f"verificadas={relatorio['verificadas']} aprovadas={relatorio['aprovadas']} "
+        f"expiradas={relatorio['expiradas']} recusadas={relatorio['recusadas']} "
+        f"estornadas={relatorio['estornadas']} erros_gateway={relatorio['erros_gateway']} "
+        f"duracao={relatorio['duracao_segundos']}s gateway={relatorio['tempo_gateway_segundos']}s"
+    )
+    return relatorio
+
+
+def start_scheduler(stop_event: threading.Event) -> threading.Thread:
+    intervalo_segundos = max(30, settings.RECARGA_RECONCILIACAO_INTERVALO_SECONDS)
+
+    def runner() -> None:
+        while not stop_event.wait(intervalo_segundos):
+            try:
+                with Session(get_engine(PAPEL_SCHEDULER)) as session:
+                    reconciliar_recargas_pendentes(session)
+            except Exception as exc:
+                print(f"RECONCILIACAO_ERROR: {exc}")
+
+    thread = threading.Thread(target=runner, name="recarga-reconciliacao", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,374 @@
+import datetime
+import random
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import Optional
+
+from sqlalchemy import case, delete, func, literal, true, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.db.database import engine, get_engine
+from app.db.perfis import PAPEL_SCHEDULER
+from app.models.base import StatusWebhookEvento, TipoMovimentacaoCarteira, TipoStatusPagamento
+from app.models.configuracao_models import TipoGatilhoAfiliado
+from app.models.usuario_models import RecargaSaldo, Usuario
+from app.models.webhook_models import WebhookEventoPagamento
+from app.services.affiliate_service import processar_gatilho_afiliado
+from app.services.carteira_service import creditar
+from app.services.mercadopago_service import sdk
+from app.services.notification_service import escape_markdown_v2
+from app.services.telegram_outbox_service import enfileirar_notificacao_telegram
+from app.services.usuario_contadores_service import registrar_recarga_paga
+
+GATEWAY_MERCADOPAGO = "MERCADOPAGO"
+# Status do Mercado Pago que não mudam mais: reentregas deles são só duplicatas.
+STATUS_GATEWAY_FINAIS = ("approved", "rejected", "cancelled", "refunded", "charged_back")
+
+# Tempo que um evento reivindicado fica reservado para o processador.
+# Se o processo morrer no meio, ele volta para a fila depois disso.
+LEASE_SEGUNDOS = 120
+BACKOFF_BASE_SEGUNDOS = 5.0
+BACKOFF_MAXIMO_SEGUNDOS = 600.0
+INTERVALO_OCIOSO_SEGUNDOS = 2.0
+
+# Acorda o processador deste processo assim que um evento chega.
+_novos_eventos = threading.Event()
+
+
+class ErroConsultaGateway(Exception):
+    pass
+
+
+# --- Ingestão (chamada pelo webhook) ---
+
+def registrar_evento_webhook(
+    payment_id: str,
+    acao: str,
+    payload: dict,
+    gateway: str = GATEWAY_MERCADOPAGO,
+) -> None:
+    """
+    Grava o evento bruto num único INSERT ... ON CONFLICT e retorna.
+    Reentregas só incrementam `recebimentos`; se o pagamento ainda não
+    estava num status final, o evento volta para a fila para nova consulta.
+    """
+    tabela = WebhookEventoPagamento.__table__
+    agora = datetime.datetime.utcnow()
+    stmt = pg_insert(tabela).values(
+        id=uuid.uuid4(),
+        gateway=gateway,
+        payment_id=payment_id,
+        acao=acao,
+        payload=payload,
+        status=StatusWebhookEvento.PENDENTE,
+        tentativas=0,
+        recebimentos=1,
+        proxima_tentativa_em=agora,
+        recebido_em=agora,
+        ultimo_recebimento_em=agora,
+    )
+    rearmar = (tabela.c.status != StatusWebhookEvento.PENDENTE) & func.coalesce(
+        tabela.c.status_gateway.notin_(STATUS_GATEWAY_FINAIS), true()
+    )
+    stmt = stmt.on_conflict_do_update(
+        constraint="uq_webhook_evento_pagamento",
+        set_={
+            "recebimentos": tabela.c.recebimentos + 1,
+            "ultimo_recebimento_em": agora,
+            "status": case(
+                (rearmar, literal(StatusWebhookEvento.PENDENTE, type_=tabela.c.status.type)),
+                else_=tabela.c.status,
+            ),
+            "tentativas": case((rearmar, 0), else_=tabela.c.tentativas),
+            "proxima_tentativa_em": case((rearmar, agora), else_=tabela.c.proxima_tentativa_em),
+        },
+    )
+    with Session(engine) as session:
+        session.exec(stmt)
+        session.commit()
+    _novos_eventos.set()
+
+
+# --- Processamento ---
+
+def consultar_status_pagamento_mp(payment_id: str) -> str:
+    payment_info = sdk.payment().get(payment_id)
+    if payment_info["status"] != 200:
+        raise ErroConsultaGateway(
+            f"Mercado Pago respondeu {payment_info['status']} para o payment_id {payment_id}"
+        )
+    return payment_info["response"]["status"]
+
+
+def confirmar_recarga_aprovada(session: Session, gateway_id: str) -> tuple[str, Optional[Usuario], Optional[RecargaSaldo]]:
+    """
+    Marca a recarga como paga e credita valor + bônus, na transação do
+    chamador. A notificação entra no outbox na mesma transação.
+    Retorna (resultado, usuario, recarga); usuario/recarga só vêm quando houve crédito.
+    """
+    recarga = session.exec(
+        select(RecargaSaldo)
+        .where(RecargaSaldo.gateway_id == gateway_id)
+        .with_for_update()
+    ).first()
+
+    if not recarga:
+        print(f"Erro: Pagamento {gateway_id} aprovado, mas não encontrado no nosso banco.")
+        return "recarga_nao_encontrada", None, None
+
+    if recarga.status_pagamento == TipoStatusPagamento.PAGO:
+        print(f"Aviso: Recarga {recarga.id} já estava paga.")
+        return "ja_pago", None, None
+
+    usuario = session.get(Usuario, recarga.usuario_id)
+    if not usuario:
+        print(f"ERRO CRÍTICO: Usuário {recarga.usuario_id} não encontrado para creditar o saldo.")
+        return "usuario_nao_encontrado", None, None
+
+    recarga.status_pagamento = TipoStatusPagamento.PAGO
+    recarga.pago_em = datetime.datetime.utcnow()
+    session.add(recarga)
+    registrar_recarga_paga(session, usuario.id, recarga.pago_em)
+
+    # Calcula o valor a ser creditado (incluindo bônus, se houver)
+    valor_creditado = recarga.valor_solicitado
+    valor_bonus = Decimal("0.0")
+    if recarga.bonus_cashback_percent:
+        bonus_pc = Decimal(recarga.bonus_cashback_percent)
+        valor_bonus = (valor_creditado * (bonus_pc / 100)).quantize(Decimal("0.01"))
+        print(f"CASHBACK: Creditando bônus de R$ {valor_bonus} ({bonus_pc}%)")
+
+    # Credita o valor + bônus (UPDATE atômico + livro-razão)
+    novo_saldo = creditar(
+        session,
+        usuario.id,
+        valor_creditado,
+        TipoMovimentacaoCarteira.RECARGA,
+        referencia_id=recarga.id,
+        descricao=f"Recarga PIX {gateway_id}",
+    )
+    if valor_bonus > 0:
+        novo_saldo = creditar(
+            session,
+            usuario.id,
+            valor_bonus,
+            TipoMovimentacaoCarteira.BONUS_CASHBACK,
+            referencia_id=recarga.id,
+            descricao=f"Bônus de cashback ({recarga.bonus_cashback_percent}%)",
+        )
+
+    valor_f = escape_markdown_v2(f"{valor_creditado:.2f}")
+    saldo_f = escape_markdown_v2(f"{novo_saldo:.2f}")
+    mensagem = (
+        f"✅ *Pagamento Aprovado*\n\n"
+        f"O seu PIX no valor de *R$ {valor_f}* foi confirmado\\!\n\n"
+    )
+    if valor_bonus > 0:
+        bonus_f = escape_markdown_v2(f"{valor_bonus:.2f}")
+        mensagem += f"🎉 *Bônus de Indicação:* + R$ {bonus_f}\n"
+    mensagem += f"O seu novo saldo é: *R$ {saldo_f}*"
+    enfileirar_notificacao_telegram(usuario.telegram_id, mensagem, session=session)
+
+    print(f"SUCESSO: Saldo de {valor_creditado} creditado ao usuário {usuario.id}")
+    return "pagamento_creditado_sucesso", usuario, recarga
+
+
+def calcular_backoff(tentativas: int) -> float:
+    teto = min(BACKOFF_MAXIMO_SEGUNDOS, BACKOFF_BASE_SEGUNDOS * (2 ** max(tentativas - 1, 0)))
+    return random.uniform(teto / 2, teto)
+
+
+def _registrar_falha(evento_id: uuid.UUID, erro: str) -> None:
+    with Session(get_engine(PAPEL_SCHEDULER)) as session:
+        evento = session.get(WebhookEventoPagamento, evento_id, with_for_update=True)
+        if not evento or evento.status != StatusWebhookEvento.PENDENTE:
+            return
+        evento.tentativas += 1
+        evento.ultimo_erro = erro[:2000]
+        if evento.tentativas >= settings.WEBHOOK_MP_MAX_TENTATIVAS:
+            evento.status = StatusWebhookEvento.FALHOU
+            print(f"WEBHOOK_MP: evento {evento_id} desistiu após {evento.tentativas} tentativas: {erro}")
+        else:
+            evento.proxima_tentativa_em = datetime.datetime.utcnow() + datetime.timedelta(
+                seconds=calcular_backoff(evento.tentativas)
+            )
+        session.add(evento)
+        session.commit()
+
+
+def processar_evento_webhook(evento_id: uuid.UUID) -> Optional[str]:
+    """
+    Consulta o pagamento no gateway e, se aprovado, credita a recarga.
+    O crédito e a baixa do evento são confirmados juntos; o gatilho de
+    afiliado roda depois, em transação própria, como antes.
+    """
+    try:
+        with Session(get_engine(PAPEL_SCHEDULER)) as session:
+            evento = session.get(WebhookEventoPagamento, evento_id)
+            if not evento or evento.status != StatusWebhookEvento.PENDENTE:
+                return None
+            payment_id = evento.payment_id
+            session.rollback()
+
+            print(f"WEBHOOK_MP: A processar atualização para o payment_id: {payment_id}")
+            status_gateway = consultar_status_pagamento_mp(payment_id)
+
+            usuario = recarga = None
+            if status_gateway == "approved":
+                resultado, usuario, recarga = confirmar_recarga_aprovada(session, payment_id)
+            else:
+                print(f"Pagamento {payment_id} não está 'approved'. Status: {status_gateway}")
+                resultado = f"pagamento_{status_gateway}"
+
+            evento = session.get(WebhookEventoPagamento, evento_id, with_for_update=True)
+            evento.status = StatusWebhookEvento.PROCESSADO
+            evento.status_gateway = status_gateway[:30]
+            evento.resultado = resultado[:60]
+            evento.tentativas += 1
+            evento.ultimo_erro = None
+            evento.processado_em = datetime.datetime.utcnow()
+            session.add(evento)
+            session.commit()
+
+            if usuario is not None and recarga is not None:
+                processar_gatilho_afiliado(
+                    db=session,
+                    usuario_indicado=usuario,
+                    valor_evento=recarga.valor_solicitado,
+                    gatilho=TipoGatilhoAfiliado.primeira_recarga,
+                )
+            return resultado
+    except Exception as exc:
+        print(f"WEBHOOK_MP_ERROR: falha ao processar evento {evento_id}: {exc}")
+        _registrar_falha(evento_id, str(exc))
+        return None
+
+
+def _reivindicar_eventos(limite: int) -> list[uuid.UUID]:
+    agora = datetime.datetime.utcnow()
+    with Session(get_engine(PAPEL_SCHEDULER)) as session:
+        ids = list(
+            session.exec(
+                select(WebhookEventoPagamento.id)
+                .where(WebhookEventoPagamento.status == StatusWebhookEvento.PENDENTE)
+                .where(WebhookEventoPagamento.proxima_tentativa_em <= agora)
+                .order_by(WebhookEventoPagamento.proxima_tentativa_em)
+                .limit(limite)
+                .with_for_update(skip_locked=True)
+            ).all()
+        )
+        if ids:
+            session.exec(
+                update(WebhookEventoPagamento)
+                .where(WebhookEventoPagamento.id.in_(ids))
+                .values(proxima_tentativa_em=agora + datetime.timedelta(seconds=LEASE_SEGUNDOS))
+            )
+        session.commit()
+    return ids
+
+
+def processar_fila_webhooks(
+    *,
+    limite: Optional[int] = None,
+    concorrencia: Optional[int] = None,
+) -> dict:
+    """
+    Reivindica um lote de eventos prontos e processa com até `concorrencia`
+    consultas simultâneas ao gateway.
+    """
+    ids = _reivindicar_eventos(limite or settings.WEBHOOK_MP_LOTE)
+    if not ids:
+        return {"reivindicados": 0, "processados": 0, "falhas": 0}
+
+    with ThreadPoolExecutor(
+        max_workers=min(concorrencia or settings.WEBHOOK_MP_CONCORRENCIA, len(ids)),
+        thread_name_prefix="webhook-mp",
+    ) as executor:
+        resultados = list(executor.map(processar_evento_webhook, ids))
+
+    processados = sum(1 for resultado in resultados if resultado is not None)
+    return {"reivindicados": len(ids), "processados": processados, "falhas": len(ids) - processados}
+
+
+def executar_processador(parar: threading.Event) -> None:
+    print("WEBHOOK_MP: processador de eventos iniciado.")
+    while not parar.is_set():
+        try:
+            reivindicados = processar_fila_webhooks()["reivindicados"]
+        except Exception as exc:
+            print(f"WEBHOOK_MP_ERROR: {exc}")
+            reivindicados = 0
+        if not reivindicados:
+            _novos_eventos.wait(INTERVALO_OCIOSO_SEGUNDOS)
+            _novos_eventos.clear()
+
+
+def start_processador(stop_event: threading.Event) -> threading.Thread:
+    thread = threading.Thread(
+        target=executar_processador,
+        args=(stop_event,),
+        name="webhook-mp-processor",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+# --- Observabilidade ---
+
+def status_fila_webhooks(session: Session) -> dict:
+    agora = datetime.datetime.utcnow()
+    pendente = WebhookEventoPagamento.status == StatusWebhookEvento.PENDENTE
+    uma_hora_atras = agora - datetime.timedelta(hours=1)
+    pendentes, prontos, mais_antigo, falhas, processados_ultima_hora, reentregas = session.exec(
+        select(
+            func.count().filter(pendente),
+            func.count().filter(pendente, WebhookEventoPagamento.proxima_tentativa_em <= agora),
+            func.min(WebhookEventoPagamento.recebido_em).filter(pendente),
+            func.count().filter(WebhookEventoPagamento.status == StatusWebhookEvento.FALHOU),
+            func.count().filter(WebhookEventoPagamento.processado_em >= uma_hora_atras),
+            func.coalesce(
+                func.sum(WebhookEventoPagamento.recebimentos - 1).filter(
+                    WebhookEventoPagamento.ultimo_recebimento_em >= uma_hora_atras
+                ),
+                0,
+            ),
+        )
+    ).one()
+    return {
+        "pendentes": pendentes,
+        "prontos": prontos,
+        "falhas": falhas,
+        "processados_ultima_hora": processados_ultima_hora,
+        "reentregas_ultima_hora": int(reentregas),
+        "mais_antigo_pendente_em": mais_antigo,
+        "atraso_segundos": round((agora - mais_antigo).total_seconds(), 1) if mais_antigo else 0.0,
+    }
+
+
+def reprocessar_evento(session: Session, evento: WebhookEventoPagamento) -> WebhookEventoPagamento:
+    evento.status = StatusWebhookEvento.PENDENTE
+    evento.tentativas = 0
+    evento.proxima_tentativa_em = datetime.datetime.utcnow()
+    session.add(evento)
+    session.commit()
+    session.refresh(evento)
+    _novos_eventos.set()
+    return evento
+
+
+def limpar_eventos_antigos(session: Session, dias: int = 30) -> int:
+    """
+    Remove os eventos já processados há mais de `dias`.
+    """
+    limite = datetime.datetime.utcnow() - datetime.timedelta(days=dias)
+    resultado = session.exec(
+        delete(WebhookEventoPagamento)
+        .where(WebhookEventoPagamento.status == StatusWebhookEvento.PROCESSADO)
+        .where(WebhookEventoPagamento.processado_em < limite)
+    )
+    return resultado.rowcount or 0
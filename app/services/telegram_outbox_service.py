@@ -0,0 +1,408 @@
+import datetime
+import heapq
+import random
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import requests
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from app.core.config import settings
+from app.core.http_client import CircuitoAbertoError, ClienteHttp, http_client
+from app.db.database import engine, get_engine
+from app.db.perfis import PAPEL_SCHEDULER
+from app.models.base import StatusNotificacaoTelegram
+from app.models.notificacao_models import NotificacaoTelegram
+from app.services import security
+
+TELEGRAM_API_URL = f"https://api.telegram.org/bot{settings.TELEGRAM_BOT_TOKEN}/sendMessage"
+
+# Tempo que uma mensagem reivindicada fica "reservada" para o despachante.
+# Se o processo morrer no meio do envio, ela volta para a fila depois disso.
+LEASE_SEGUNDOS = 120
+# Acima disso a mensagem volta para o banco em vez de esperar no lote.
+MAX_ESPERA_EM_MEMORIA_SEGUNDOS = 5.0
+BACKOFF_BASE_SEGUNDOS = 2.0
+BACKOFF_MAXIMO_SEGUNDOS = 900.0
+INTERVALO_OCIOSO_SEGUNDOS = 1.0
+MAX_BALDES_CHAT = 10000
+
+# Acorda o despachante deste processo assim que algo é enfileirado.
+_novas_notificacoes = threading.Event()
+
+
+def enfileirar_notificacao_telegram(
+    chat_id: int,
+    texto: str,
+    *,
+    parse_mode: Optional[str] = "MarkdownV2",
+    reply_markup: Optional[dict] = None,
+    session: Optional[Session] = None,
+) -> uuid.UUID:
+    """
+    Grava a mensagem no outbox e retorna imediatamente.
+    Com `session`, a mensagem entra na transação do chamador e só é enviada
+    se ela for confirmada; sem, é gravada e confirmada numa sessão própria.
+    """
+    notificacao = NotificacaoTelegram(
+        chat_id=chat_id,
+        texto_criptografado=security.encrypt_data(texto),
+        parse_mode=parse_mode,
+        reply_markup=reply_markup,
+    )
+    notificacao_id = notificacao.id
+    if session is not None:
+        session.add(notificacao)
+    else:
+        with Session(engine) as session_outbox:
+            session_outbox.add(notificacao)
+            session_outbox.commit()
+    _novas_notificacoes.set()
+    return notificacao_id
+
+
+class TokenBucket:
+    """
+    Balde de tokens: `taxa` tokens por segundo, até `capacidade` acumulados.
+    `bloquear` zera o balde por um período (ex.: `retry_after` de um 429).
+    Seguro para uso entre threads (o despachante e os broadcasts dividem o global).
+    """
+
+    def __init__(self, taxa: float, capacidade: Optional[float] = None, relogio: Callable[[], float] = time.monotonic):
+        self.taxa = taxa
+        self.capacidade = capacidade if capacidade is not None else max(taxa, 1.0)
+        self.relogio = relogio
+        self.tokens = self.capacidade
+        self.atualizado_em = relogio()
+        self.bloqueado_ate = 0.0
+        self._lock = threading.Lock()
+
+    def _repor(self) -> float:
+        agora = self.relogio()
+        if agora > self.atualizado_em:
+            self.tokens = min(self.capacidade, self.tokens + (agora - self.atualizado_em) * self.taxa)
+            self.atualizado_em = agora
+        return agora
+
+    def _espera(self) -> float:
+        agora = self._repor()
+        if agora < self.bloqueado_ate:
+            return self.bloqueado_ate - agora
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.taxa
+
+    def espera(self) -> float:
+        """Segundos até haver um token disponível (0 se já houver)."""
+        with self._lock:
+            return self._espera()
+
+    def consumir(self) -> bool:
+        with self._lock:
+            if self._espera() > 0:
+                return False
+            self.tokens -= 1
+            return True
+
+    def aguardar(self) -> None:
+        """Bloqueia a thread até conseguir um token."""
+        while not self.consumir():
+            time.sleep(max(self.espera(), 0.001))
+
+    def bloquear(self, segundos: float) -> None:
+        with self._lock:
+            agora = self._repor()
+            self.tokens = 0.0
+            self.atualizado_em = agora
+            self.bloqueado_ate = max(self.bloqueado_ate, agora + segundos)
+
+
+# Limite global do bot no processo, dividido entre o outbox e os broadcasts.
+balde_global_telegram = TokenBucket(settings.TELEGRAM_RATE_GLOBAL_POR_SEGUNDO)
+
+
+@dataclass
+class ResultadoEnvio:
+    enviada: bool
+    permanente: bool = False
+    retry_after: Optional[float] = None
+    erro: Optional[str] = None
+
+
+def classificar_resposta_telegram(response: requests.Response) -> ResultadoEnvio:
+    try:
+        corpo = response.json()
+    except ValueError:
+        corpo = {}
+
+    if response.status_code == 200 and corpo.get("ok") is True:
+        return ResultadoEnvio(enviada=True)
+
+    descricao = corpo.get("description") or response.text[:500]
+    erro = f"HTTP {response.status_code}: {descricao}"
+    if response.status_code == 429:
+        retry_after = (corpo.get("parameters") or {}).get("retry_after") or response.headers.get("Retry-After")
+        try:
+            retry_after = float(retry_after)
+        except (TypeError, ValueError):
+            retry_after = 1.0
+        return ResultadoEnvio(enviada=False, retry_after=retry_after, erro=erro)
+    if response.status_code >= 500:
+        return ResultadoEnvio(enviada=False, erro=erro)
+    # 400 (mensagem inválida), 403 (bot bloqueado), etc.: não adianta repetir.
+    return ResultadoEnvio(enviada=False, permanente=True, erro=erro)
+
+
+def calcular_backoff(tentativas: int) -> float:
+    teto = min(BACKOFF_MAXIMO_SEGUNDOS, BACKOFF_BASE_SEGUNDOS * (2 ** max(tentativas - 1, 0)))
+    return random.uniform(teto / 2, teto)
+
+
+class DespachanteTelegram:
+    """
+    Esvazia o outbox respeitando um balde global e um balde por chat_id,
+    com conexões HTTP reaproveitadas (keep-alive) entre os envios.
+    """
+
+    def __init__(
+        self,
+        *,
+        balde_global: TokenBucket,
+        taxa_por_chat: float,
+        tamanho_lote: int,
+        max_tentativas: int,
+        timeout: float,
+        http: Optional[ClienteHttp] = None,
+    ):
+        self.balde_global = balde_global
+        self.taxa_por_chat = taxa_por_chat
+        self.baldes_chat: OrderedDict[int, TokenBucket] = OrderedDict()
+        self.tamanho_lote = tamanho_lote
+        self.max_tentativas = max_tentativas
+        self.timeout = timeout
+        self.http = http or http_client
+        self.enviadas = 0
+        self.falhas = 0
+        self.reagendadas = 0
+        self.limitadas = 0
+
+    @classmethod
+    def from_settings(cls) -> "DespachanteTelegram":
+        return cls(
+            balde_global=balde_global_telegram,
+            taxa_por_chat=settings.TELEGRAM_RATE_POR_CHAT_POR_SEGUNDO,
+            tamanho_lote=settings.TELEGRAM_OUTBOX_LOTE,
+            max_tentativas=settings.TELEGRAM_OUTBOX_MAX_TENTATIVAS,
+            timeout=settings.TELEGRAM_HTTP_TIMEOUT_SECONDS,
+        )
+
+    def _balde_chat(self, chat_id: int) -> TokenBucket:
+        balde = self.baldes_chat.get(chat_id)
+        if balde is None:
+            balde = TokenBucket(self.taxa_por_chat, capacidade=1.0)
+            self.baldes_chat[chat_id] = balde
+            if len(self.baldes_chat) > MAX_BALDES_CHAT:
+                self.baldes_chat.popitem(last=False)
+        else:
+            self.baldes_chat.move_to_end(chat_id)
+        return balde
+
+    def _reivindicar_lote(self) -> list[dict]:
+        agora = datetime.datetime.utcnow()
+        with Session(get_engine(PAPEL_SCHEDULER)) as session:
+            notificacoes = session.exec(
+                select(NotificacaoTelegram)
+                .where(NotificacaoTelegram.status == StatusNotificacaoTelegram.PENDENTE)
+                .where(NotificacaoTelegram.proxima_tentativa_em <= agora)
+                .order_by(NotificacaoTelegram.proxima_tentativa_em, NotificacaoTelegram.criado_em)
+                .limit(self.tamanho_lote)
+                .with_for_update(skip_locked=True)
+            ).all()
+            lote = []
+            for notificacao in notificacoes:
+                notificacao.proxima_tentativa_em = agora + datetime.timedelta(seconds=LEASE_SEGUNDOS)
+                session.add(notificacao)
+                lote.append(
+                    {
+                        "id": notificacao.id,
+                        "chat_id": notificacao.chat_id,
+                        "texto_criptografado": notificacao.texto_criptografado,
+                        "parse_mode": notificacao.parse_mode,
+                        "reply_markup": notificacao.reply_markup,
+                        "tentativas": notificacao.tentativas,
+                    }
+                )
+            session.commit()
+        return lote
+
+    def _atualizar(self, notificacao_id: uuid.UUID, **valores) -> None:
+        with Session(get_engine(PAPEL_SCHEDULER)) as session:
+            notificacao = session.get(NotificacaoTelegram, notificacao_id)
+            if not notificacao:
+                return
+            for campo, valor in valores.items():
+                setattr(notificacao, campo, valor)
+            session.add(notificacao)
+            session.commit()
+
+    def _enviar(self, item: dict) -> ResultadoEnvio:
+        texto = security.decrypt_data(item["texto_criptografado"])
+        if texto is None:
+            return ResultadoEnvio(enviada=False, permanente=True, erro="Falha ao descriptografar o texto.")
+        payload = {"chat_id": item["chat_id"], "text": texto}
+        if item["parse_mode"]:
+            payload["parse_mode"] = item["parse_mode"]
+        if item["reply_markup"]:
+            payload["reply_markup"] = item["reply_markup"]
+        try:
+            response = self.http.post(TELEGRAM_API_URL, json=payload, timeout=self.timeout)
+        except (requests.exceptions.RequestException, CircuitoAbertoError) as exc:
+            return ResultadoEnvio(enviada=False, erro=f"{type(exc).__name__}: {exc}")
+        return classificar_resposta_telegram(response)
+
+    def processar_lote(self, parar: Optional[threading.Event] = None) -> int:
+        """
+        Envia um lote do outbox. Cada chat mantém a ordem de criação das suas
+        mensagens e espera em memória pelo próprio token; bloqueios longos
+        (429) devolvem o restante do chat para a fila no banco.
+        Retorna quantas mensagens foram reivindicadas.
+        """
+        lote = self._reivindicar_lote()
+        por_chat: dict[int, deque] = {}
+        for item in lote:
+            por_chat.setdefault(item["chat_id"], deque()).append(item)
+        fila = [(0.0, ordem, chat_id) for ordem, chat_id in enumerate(por_chat)]
+        heapq.heapify(fila)
+
+        while fila:
+            liberado_em, ordem, chat_id = heapq.heappop(fila)
+            pendentes = por_chat[chat_id]
+            if parar is not None and parar.is_set():
+                # Devolve o restante para a fila sem contar tentativa.
+                self._devolver(pendentes, datetime.datetime.utcnow())
+                continue
+
+            restante = liberado_em - time.monotonic()
+            if restante > 0:
+                time.sleep(restante)
+
+            balde_chat = self._balde_chat(chat_id)
+            espera_chat = balde_chat.espera()
+            if espera_chat > MAX_ESPERA_EM_MEMORIA_SEGUNDOS:
+                self.reagendadas += len(pendentes)
+                self._devolver(
+                    pendentes,
+                    datetime.datetime.utcnow() + datetime.timedelta(seconds=espera_chat),
+                )
+                continue
+            if espera_chat > 0:
+                heapq.heappush(fila, (time.monotonic() + espera_chat, ordem, chat_id))
+                continue
+
+            self.balde_global.aguardar()
+            balde_chat.consumir()
+
+            item = pendentes.popleft()
+            resultado = self._enviar(item)
+            self._registrar_resultado(item, resultado, balde_chat)
+            if pendentes:
+                heapq.heappush(fila, (time.monotonic() + balde_chat.espera(), ordem, chat_id))
+        return len(lote)
+
+    def _devolver(self, pendentes: deque, quando: datetime.datetime) -> None:
+        while pendentes:
+            self._atualizar(pendentes.popleft()["id"], proxima_tentativa_em=quando)
+
+    def _registrar_resultado(self, item: dict, resultado: ResultadoEnvio, balde_chat: TokenBucket) -> None:
+        agora = datetime.datetime.utcnow()
+        if resultado.enviada:
+            self.enviadas += 1
+            self._atualizar(
+                item["id"],
+                status=StatusNotificacaoTelegram.ENVIADA,
+                tentativas=item["tentativas"] + 1,
+                enviado_em=agora,
+                ultimo_erro=None,
+            )
+            return
+
+        if resultado.retry_after is not None:
+            # 429: o Telegram diz quando tentar de novo; não conta como falha.
+            self.limitadas += 1
+            balde_chat.bloquear(resultado.retry_after)
+            print(f"TELEGRAM_OUTBOX: 429 para {item['chat_id']}, retry_after={resultado.retry_after}s.")
+            self._atualizar(
+                item["id"],
+                proxima_tentativa_em=agora + datetime.timedelta(seconds=resultado.retry_after),
+                ultimo_erro=resultado.erro,
+            )
+            return
+
+        tentativas = item["tentativas"] + 1
+        if resultado.permanente or tentativas >= self.max_tentativas:
+            self.falhas += 1
+            print(f"TELEGRAM_OUTBOX: envio para {item['chat_id']} falhou definitivamente: {resultado.erro}")
+            self._atualizar(
+                item["id"],
+                status=StatusNotificacaoTelegram.FALHOU,
+                tentativas=tentativas,
+                ultimo_erro=resultado.erro,
+            )
+            return
+
+        self._atualizar(
+            item["id"],
+            tentativas=tentativas,
+            proxima_tentativa_em=agora + datetime.timedelta(seconds=calcular_backoff(tentativas)),
+            ultimo_erro=resultado.erro,
+        )
+
+    def executar(self, parar: threading.Event) -> None:
+        while not parar.is_set():
+            try:
+                processadas = self.processar_lote(parar)
+            except Exception as exc:
+                print(f"TELEGRAM_OUTBOX_ERROR: {exc}")
+                processadas = 0
+            if not processadas:
+                _novas_notificacoes.wait(INTERVALO_OCIOSO_SEGUNDOS)
+                _novas_notificacoes.clear()
+
+
+def start_dispatcher(stop_event: threading.Event) -> threading.Thread:
+    despachante = DespachanteTelegram.from_settings()
+    thread = threading.Thread(
+        target=despachante.executar,
+        args=(stop_event,),
+        name="telegram-outbox-dispatcher",
+        daemon=True,
+    )
+    thread.start()
+    return thread
+
+
+def limpar_notificacoes_antigas(session: Session, dias: int = 7) -> int:
+    """
+    Remove do outbox as mensagens já finalizadas (enviadas ou falhas) há mais de `dias`.
+    """
+    limite = datetime.datetime.utcnow() - datetime.timedelta(days=dias)
+    resultado = session.exec(
+        delete(NotificacaoTelegram)
+        .where(NotificacaoTelegram.status != StatusNotificacaoTelegram.PENDENTE)
+        .where(NotificacaoTelegram.criado_em < limite)
+    )
+    return resultado.rowcount or 0
+
+
+if __name__ == "__main__":
+    parar = threading.Event()
+    print("TELEGRAM_OUTBOX: despachante dedicado iniciado.")
+    try:
+        DespachanteTelegram.from_settings().executar(parar)
+    except KeyboardInterrupt:
+        parar.set()
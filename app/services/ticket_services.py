@@ -7,7 +7,8 @@ from sqlmodel import Session, select
 
 from app.db.database import engine # Importamos o 'engine' do banco
 from app.services import security # Para descriptografar a nova senha
-from app.models.base import TipoStatusTicket, TipoResolucaoTicket
+from app.models.base import TipoStatusTicket, TipoResolucaoTicket, TipoMovimentacaoCarteira
+from app.services.carteira_service import creditar
 from app.models.usuario_models import Usuario
 from app.models.pedido_models import Pedido
 from app.models.produto_models import Produto, EstoqueConta
@@ -16,6 +17,8 @@ from app.services.notification_service import send_telegram_message, escape_mark
 from app.services.disponibilidade_service import (
     inativar_conta_estoque_se_lotada,
     inativar_produto_sem_contas_disponiveis,
+    registrar_variacao_disponibilidade,
+    slots_livres_conta,
 )
 
 # --- Funções Auxiliares (Exatamente como eram antes) ---
@@ -31,13 +34,19 @@ def handle_reembolso_carteira(session: Session, ticket: TicketSuporte):
     if not pedido or not usuario:
         raise Exception(f"Pedido ({ticket.pedido_id}) ou Usuário ({ticket.usuario_id}) não encontrado.")
 
-    usuario.saldo_carteira += pedido.valor_pago
+    creditar(
+        session,
+        usuario.id,
+        pedido.valor_pago,
+        TipoMovimentacaoCarteira.REEMBOLSO,
+        referencia_id=pedido.id,
+        descricao=f"Reembolso do ticket {ticket.id}",
+    )
 
     ticket.status = TipoStatusTicket.RESOLVIDO
     ticket.resolucao = TipoResolucaoTicket.REEMBOLSO_CARTEIRA
     ticket.atualizado_em = datetime.datetime.utcnow()
 
-    session.add(usuario)
     session.add(ticket)
 
     try:
@@ -99,9 +108,11 @@ def handle_trocar_conta(session: Session, ticket: TicketSuporte):
         return
 
     # 3. Caso de Sucesso
+    slots_livres_antes = slots_livres_conta(nova_conta)
     nova_conta.slots_ocupados += 1
     inativar_conta_estoque_se_lotada(nova_conta)
     session.add(nova_conta)
+    registrar_variacao_disponibilidade(session, nova_conta, slots_livres_antes)
     inativar_produto_sem_contas_disponiveis(session, produto)
 
     pedido.estoque_conta_id = nova_conta.id
@@ -0,0 +1,116 @@
+import datetime
+import uuid
+from typing import Optional
+
+from sqlalchemy import func, or_, select, update
+from sqlalchemy.orm import attributes
+from sqlalchemy.orm.util import identity_key
+from sqlmodel import Session
+
+from app.models.base import TipoStatusPagamento
+from app.models.pedido_models import Pedido
+from app.models.usuario_models import RecargaSaldo, Usuario
+
+
+_usuario = Usuario.__table__
+
+
+def _incrementar(
+    session: Session,
+    usuario_id: uuid.UUID,
+    coluna_total: str,
+    coluna_primeira_em: str,
+    quantidade: int,
+    quando: datetime.datetime,
+) -> Optional[int]:
+    """
+    Soma `quantidade` ao contador e grava o primeiro evento (se ainda vazio)
+    num único UPDATE ... RETURNING. Retorna o novo total.
+    """
+    total = _usuario.c[coluna_total]
+    primeira_em = _usuario.c[coluna_primeira_em]
+    linha = session.exec(
+        update(_usuario)
+        .where(_usuario.c.id == usuario_id)
+        .values({total: total + quantidade, primeira_em: func.coalesce(primeira_em, quando)})
+        .returning(total, primeira_em)
+    ).first()
+    if linha is None:
+        return None
+
+    usuario = session.identity_map.get(identity_key(Usuario, usuario_id))
+    if usuario is not None:
+        attributes.set_committed_value(usuario, coluna_total, linha[0])
+        attributes.set_committed_value(usuario, coluna_primeira_em, linha[1])
+    return linha[0]
+
+
+def registrar_recarga_paga(session: Session, usuario_id: uuid.UUID, quando: Optional[datetime.datetime] = None) -> Optional[int]:
+    """Conta uma recarga paga para o usuário. Não faz commit."""
+    return _incrementar(
+        session, usuario_id, "total_recargas_pagas", "primeira_recarga_paga_em", 1,
+        quando or datetime.datetime.utcnow(),
+    )
+
+
+def registrar_pedidos(
+    session: Session,
+    usuario_id: uuid.UUID,
+    quantidade: int = 1,
+    quando: Optional[datetime.datetime] = None,
+) -> Optional[int]:
+    """Conta `quantidade` pedidos novos para o usuário. Não faz commit."""
+    return _incrementar(
+        session, usuario_id, "total_pedidos", "primeiro_pedido_em", quantidade,
+        quando or datetime.datetime.utcnow(),
+    )
+
+
+def recalcular_contadores_usuarios(session: Session) -> dict:
+    """
+    Backfill: recalcula os contadores de todos os usuários a partir de
+    recargas pagas e pedidos existentes, num UPDATE único que só toca as
+    linhas divergentes. Não faz commit.
+    """
+    recargas_pagas = (
+        select(RecargaSaldo)
+        .where(RecargaSaldo.usuario_id == _usuario.c.id)
+        .where(RecargaSaldo.status_pagamento == TipoStatusPagamento.PAGO)
+    )
+    pedidos = select(Pedido).where(Pedido.usuario_id == _usuario.c.id)
+
+    total_recargas = recargas_pagas.with_only_columns(func.count()).scalar_subquery()
+    primeira_recarga = recargas_pagas.with_only_columns(
+        func.min(func.coalesce(RecargaSaldo.pago_em, RecargaSaldo.criado_em))
+    ).scalar_subquery()
+    total_pedidos = pedidos.with_only_columns(func.count()).scalar_subquery()
+    primeiro_pedido = pedidos.with_only_columns(func.min(Pedido.criado_em)).scalar_subquery()
+
+    resultado = session.exec(
+        update(_usuario)
+        .values(
+            total_recargas_pagas=total_recargas,
+            primeira_recarga_paga_em=primeira_recarga,
+            total_pedidos=total_pedidos,
+            primeiro_pedido_em=primeiro_pedido,
+        )
+        .where(
+            or_(
+                _usuario.c.total_recargas_pagas != total_recargas,
+                _usuario.c.primeira_recarga_paga_em.is_distinct_from(primeira_recarga),
+                _usuario.c.total_pedidos != total_pedidos,
+                _usuario.c.primeiro_pedido_em.is_distinct_from(primeiro_pedido),
+            )
+        )
+        .execution_options(synchronize_session=False)
+    )
+    # Instâncias já carregadas nesta sessão passam a ler do banco.
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, Usuario):
+            session.expire(obj, ["total_recargas_pagas", "primeira_recarga_paga_em", "total_pedidos", "primeiro_pedido_em"])
+
+    usuarios_verificados = session.exec(select(func.count(Usuario.id))).scalar_one()
+    return {
+        "usuarios_verificados": usuarios_verificados,
+        "usuarios_atualizados": resultado.rowcount or 0,
+    }
@@ -1,3 +1,11 @@
+import os
+import sys
+
+# Processos iniciados pelo CLI do Celery usam o perfil de banco "worker"
+# (timeouts maiores, pool menor), a menos que DB_PAPEL tenha sido definido.
+if os.path.basename(sys.argv[0]).startswith("celery"):
+    os.environ.setdefault("DB_PAPEL", "worker")
+
 from celery import Celery
 from app.core.config import settings
 
@@ -10,11 +10,21 @@ from app.services.notification_service import send_telegram_message, escape_mark
 from app.services.conta_mae_invite_service import process_invite_job
 from app.services.conta_mae_member_removal_service import process_member_removal_job
 from app.services.email_monitor_service import process_email_monitor_outlook_otp_fetch
+from app.services.compra_idempotencia_service import limpar_chaves_expiradas
+from app.services.pedido_expiracao_service import recalcular_expiracao_pedidos_em_lotes
+from app.services.dashboard_agregado_service import consolidar_todos_deltas_dashboard, reconstruir_agregados_dashboard
+from app.services.telegram_outbox_service import limpar_notificacoes_antigas
+from app.services.broadcast_service import executar_broadcast
+from app.services.recarga_webhook_service import limpar_eventos_antigos, processar_fila_webhooks
+from app.services.recarga_reconciliacao_service import reconciliar_recargas_pendentes
+from app.services.usuario_contadores_service import recalcular_contadores_usuarios
+from app.services.giftcard_service import executar_lote_giftcards
 from app.services.openai_account_creation_service import (
     process_openai_account_creation_job,
     process_openai_account_creation_outlook_fetch,
 )
-from app.models.base import TipoStatusTicket, TipoResolucaoTicket
+from app.models.base import TipoStatusTicket, TipoResolucaoTicket, TipoMovimentacaoCarteira
+from app.services.carteira_service import creditar, reconstruir_saldos
 from app.models.usuario_models import Usuario
 from app.models.pedido_models import Pedido
 from app.models.produto_models import Produto, EstoqueConta
@@ -22,6 +32,9 @@ from app.models.suporte_models import TicketSuporte
 from app.services.disponibilidade_service import (
     inativar_conta_estoque_se_lotada,
     inativar_produto_sem_contas_disponiveis,
+    reconciliar_disponibilidade,
+    registrar_variacao_disponibilidade,
+    slots_livres_conta,
 )
 
 # --- Funções Auxiliares (Tarefas Reais) ---
@@ -38,14 +51,20 @@ def handle_reembolso_carteira(session: Session, ticket: TicketSuporte):
         raise Exception(f"Pedido ({ticket.pedido_id}) ou Usuário ({ticket.usuario_id}) não encontrado.")
         
     # Adiciona o saldo de volta à carteira
-    usuario.saldo_carteira += pedido.valor_pago
+    creditar(
+        session,
+        usuario.id,
+        pedido.valor_pago,
+        TipoMovimentacaoCarteira.REEMBOLSO,
+        referencia_id=pedido.id,
+        descricao=f"Reembolso do ticket {ticket.id}",
+    )
     
     # Atualiza o ticket
     ticket.status = TipoStatusTicket.RESOLVIDO
     ticket.resolucao = TipoResolucaoTicket.REEMBOLSO_CARTEIRA
     ticket.atualizado_em = datetime.datetime.utcnow()
     
-    session.add(usuario)
     session.add(ticket)
     
     # TODO: Enviar notificação ao usuário sobre o reembolso
@@ -91,9 +110,11 @@ def handle_trocar_conta(session: Session, ticket: TicketSuporte):
 
     # 3. Caso de Sucesso: Encontrámos uma nova conta
     # a. Alocar o slot na nova conta
+    slots_livres_antes = slots_livres_conta(nova_conta)
     nova_conta.slots_ocupados += 1
     inativar_conta_estoque_se_lotada(nova_conta)
     session.add(nova_conta)
+    registrar_variacao_disponibilidade(session, nova_conta, slots_livres_antes)
     inativar_produto_sem_contas_disponiveis(session, produto)
     
     # b. Reatribuir o pedido original à nova conta
@@ -322,3 +343,291 @@ def process_email_monitor_outlook_otp_fetch_job_task(account_id: str):
         raise
     finally:
         print("=" * 50)
+
+
+@celery_app.task(name="reconciliar_disponibilidade_produtos")
+def reconciliar_disponibilidade_produtos_task():
+    """
+    Recalcula os contadores de disponibilidade por produto e relata divergências.
+    """
+    print("=" * 50)
+    print("CELERY WORKER: Tarefa 'reconciliar_disponibilidade_produtos' INICIADA!")
+    try:
+        with Session(engine) as session:
+            resultado = reconciliar_disponibilidade(session)
+            session.commit()
+        for divergencia in resultado["divergencias"]:
+            print(
+                f"  -> Divergência em {divergencia['produto_nome']} ({divergencia['produto_id']}): "
+                f"estoque {divergencia['slots_livres_estoque_armazenado']} -> {divergencia['slots_livres_estoque_real']}, "
+                f"conta-mãe {divergencia['slots_livres_conta_mae_armazenado']} -> {divergencia['slots_livres_conta_mae_real']}"
+            )
+        print(
+            "CELERY WORKER: Reconciliação concluída. "
+            f"verificados={resultado['produtos_verificados']} divergentes={resultado['produtos_com_divergencia']}"
+        )
+        return {
+            "produtos_verificados": resultado["produtos_verificados"],
+            "produtos_com_divergencia": resultado["produtos_com_divergencia"],
+        }
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'reconciliar_disponibilidade_produtos': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="limpar_chaves_idempotencia_compra")
+def limpar_chaves_idempotencia_compra_task(dias: int = 7):
+    """
+    Remove chaves Idempotency-Key de compras mais antigas que `dias`.
+    """
+    print("=" * 50)
+    print("CELERY WORKER: Tarefa 'limpar_chaves_idempotencia_compra' INICIADA!")
+    try:
+        with Session(engine) as session:
+            removidas = limpar_chaves_expiradas(session, dias=dias)
+            session.commit()
+        print(f"CELERY WORKER: {removidas} chave(s) de idempotência removida(s).")
+        return {"removidas": removidas}
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'limpar_chaves_idempotencia_compra': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="reconstruir_saldos_carteira")
+def reconstruir_saldos_carteira_task(corrigir: bool = True):
+    """
+    Recalcula os saldos das carteiras a partir do livro-razão.
+    """
+    print("=" * 50)
+    print("CELERY WORKER: Tarefa 'reconstruir_saldos_carteira' INICIADA!")
+    try:
+        with Session(engine) as session:
+            resultado = reconstruir_saldos(session, corrigir=corrigir)
+            if corrigir:
+                session.commit()
+        for divergencia in resultado["divergencias"]:
+            print(
+                f"  -> Usuário {divergencia['usuario_id']}: saldo {divergencia['saldo_armazenado']} "
+                f"!= livro-razão {divergencia['saldo_razao']}"
+            )
+        print(
+            "CELERY WORKER: Reconstrução de saldos concluída. "
+            f"verificados={resultado['usuarios_verificados']} divergentes={resultado['usuarios_com_divergencia']}"
+        )
+        return {
+            "usuarios_verificados": resultado["usuarios_verificados"],
+            "usuarios_com_divergencia": resultado["usuarios_com_divergencia"],
+        }
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'reconstruir_saldos_carteira': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="recalcular_expiracao_pedidos")
+def recalcular_expiracao_pedidos_task(tamanho_lote: int = 1000):
+    """
+    Backfill/reparo da expiração efetiva materializada nos pedidos.
+    """
+    print("=" * 50)
+    print("CELERY WORKER: Tarefa 'recalcular_expiracao_pedidos' INICIADA!")
+    try:
+        with Session(engine) as session:
+            resultado = recalcular_expiracao_pedidos_em_lotes(session, tamanho_lote=tamanho_lote)
+        print(
+            "CELERY WORKER: Expiração efetiva recalculada. "
+            f"processados={resultado['processados']} atualizados={resultado['atualizados']} "
+            f"lotes={resultado['lotes']}"
+        )
+        return resultado
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'recalcular_expiracao_pedidos': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="consolidar_agregados_dashboard")
+def consolidar_agregados_dashboard_task():
+    """
+    Soma nos agregados do dashboard as variações gravadas pelas compras
+    (para quando o consolidador da API está desligado).
+    """
+    try:
+        with Session(engine) as session:
+            consolidados = consolidar_todos_deltas_dashboard(session)
+        return {"deltas_consolidados": consolidados}
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'consolidar_agregados_dashboard': {exc}")
+        raise
+
+
+@celery_app.task(name="reconstruir_agregados_dashboard")
+def reconstruir_agregados_dashboard_task(dias: Optional[int] = None):
+    """
+    Backfill e compactação dos agregados de vendas/usuários do dashboard.
+    """
+    print("=" * 50)
+    print("CELERY WORKER: Tarefa 'reconstruir_agregados_dashboard' INICIADA!")
+    try:
+        with Session(engine) as session:
+            resultado = reconstruir_agregados_dashboard(session, dias=dias)
+        print(
+            "CELERY WORKER: Agregados do dashboard reconstruídos. "
+            f"dias={resultado['dias_reconstruidos']} compactadas={resultado['linhas_compactadas']}"
+        )
+        return resultado
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'reconstruir_agregados_dashboard': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="limpar_notificacoes_telegram")
+def limpar_notificacoes_telegram_task(dias: int = 7):
+    """
+    Remove do outbox do Telegram as mensagens finalizadas há mais de `dias`.
+    """
+    print("=" * 50)
+    print("CELERY WORKER: Tarefa 'limpar_notificacoes_telegram' INICIADA!")
+    try:
+        with Session(engine) as session:
+            removidas = limpar_notificacoes_antigas(session, dias=dias)
+            session.commit()
+        print(f"CELERY WORKER: {removidas} notificação(ões) antiga(s) removida(s) do outbox.")
+        return {"removidas": removidas}
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'limpar_notificacoes_telegram': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="executar_broadcast")
+def executar_broadcast_task(broadcast_id: str):
+    """
+    Envia (ou retoma) um broadcast para os destinatários pendentes.
+    """
+    print("=" * 50)
+    print(f"CELERY WORKER: Tarefa 'executar_broadcast' INICIADA para {broadcast_id}!")
+    try:
+        return executar_broadcast(uuid.UUID(broadcast_id))
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'executar_broadcast': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="processar_webhooks_mercadopago")
+def processar_webhooks_mercadopago_task():
+    """
+    Processa um lote da fila de eventos do webhook do Mercado Pago
+    (para quando o processador em thread está desligado na API).
+    """
+    print("=" * 50)
+    print("CELERY WORKER: Tarefa 'processar_webhooks_mercadopago' INICIADA!")
+    try:
+        resultado = processar_fila_webhooks()
+        print(
+            "CELERY WORKER: Eventos do webhook processados. "
+            f"reivindicados={resultado['reivindicados']} processados={resultado['processados']} "
+            f"falhas={resultado['falhas']}"
+        )
+        return resultado
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'processar_webhooks_mercadopago': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="limpar_eventos_webhook")
+def limpar_eventos_webhook_task(dias: int = 30):
+    """
+    Remove os eventos de webhook já processados há mais de `dias`.
+    """
+    print("=" * 50)
+    print("CELERY WORKER: Tarefa 'limpar_eventos_webhook' INICIADA!")
+    try:
+        with Session(engine) as session:
+            removidos = limpar_eventos_antigos(session, dias=dias)
+            session.commit()
+        print(f"CELERY WORKER: {removidos} evento(s) de webhook antigo(s) removido(s).")
+        return {"removidos": removidos}
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'limpar_eventos_webhook': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="reconciliar_recargas_pendentes")
+def reconciliar_recargas_pendentes_task():
+    """
+    Reconcilia as recargas pendentes com o gateway de pagamento.
+    """
+    print("=" * 50)
+    print("CELERY WORKER: Tarefa 'reconciliar_recargas_pendentes' INICIADA!")
+    try:
+        with Session(engine) as session:
+            relatorio = reconciliar_recargas_pendentes(session)
+        return {**relatorio, "iniciado_em": relatorio["iniciado_em"].isoformat()}
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'reconciliar_recargas_pendentes': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="recalcular_contadores_usuarios")
+def recalcular_contadores_usuarios_task():
+    """
+    Backfill dos contadores de recargas/pedidos por usuário.
+    """
+    print("=" * 50)
+    print("CELERY WORKER: Tarefa 'recalcular_contadores_usuarios' INICIADA!")
+    try:
+        with Session(engine) as session:
+            resultado = recalcular_contadores_usuarios(session)
+            session.commit()
+        print(
+            "CELERY WORKER: Contadores recalculados. "
+            f"verificados={resultado['usuarios_verificados']} atualizados={resultado['usuarios_atualizados']}"
+        )
+        return resultado
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'recalcular_contadores_usuarios': {exc}")
+        raise
+    finally:
+        print("=" * 50)
+
+
+@celery_app.task(name="gerar_lote_giftcards")
+def gerar_lote_giftcards_task(lote_id: str):
+    """
+    Gera (ou continua gerando) os códigos de um lote de gift cards.
+    """
+    print("=" * 50)
+    print(f"CELERY WORKER: Tarefa 'gerar_lote_giftcards' INICIADA para o lote {lote_id}!")
+    try:
+        lote = executar_lote_giftcards(uuid.UUID(lote_id))
+        if lote is None:
+            return {"lote_id": lote_id, "status": "ignorado"}
+        return {
+            "lote_id": lote_id,
+            "status": lote.status.value,
+            "gerados": lote.quantidade_gerada,
+            "colisoes": lote.colisoes,
+        }
+    except Exception as exc:
+        print(f"ERRO CRITICO na tarefa 'gerar_lote_giftcards': {exc}")
+        raise
+    finally:
+        print("=" * 50)
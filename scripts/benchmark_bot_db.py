@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Compara as rotas quentes do bot nos modos DB_MODO_BOT="sync" e "async".
+
+Sobe a API com uvicorn uma vez por modo (mesmo banco da DATABASE_URL) e
+dispara requisições concorrentes contra o perfil do usuário, o status de
+uma recarga e o catálogo, relatando vazão e latências.
+
+    python scripts/benchmark_bot_db.py --telegram-id 123 --recarga-id <uuid>
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import httpx
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+
+def _percentil(valores: list[float], p: float) -> float:
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p))]
+
+
+async def _aguardar_api(base_url: str, timeout: float = 30.0) -> None:
+    limite = time.monotonic() + timeout
+    async with httpx.AsyncClient() as cliente:
+        while time.monotonic() < limite:
+            try:
+                await cliente.get(f"{base_url}/docs")
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("A API não subiu a tempo.")
+
+
+async def _disparar(base_url: str, caminhos: list[str], api_key: str, total: int, concorrencia: int) -> dict:
+    latencias: list[float] = []
+    erros = 0
+    fila = iter(range(total))
+
+    async with httpx.AsyncClient(
+        base_url=base_url,
+        headers={"X-API-Key": api_key},
+        limits=httpx.Limits(max_connections=concorrencia),
+        timeout=60,
+    ) as cliente:
+        async def trabalhador():
+            nonlocal erros
+            for indice in fila:
+                inicio = time.perf_counter()
+                try:
+                    resposta = await cliente.get(caminhos[indice % len(caminhos)])
+                    falhou = resposta.status_code >= 400
+                except httpx.HTTPError:
+                    falhou = True
+                latencias.append(time.perf_counter() - inicio)
+                erros += falhou
+
+        inicio = time.perf_counter()
+        await asyncio.gather(*(trabalhador() for _ in range(concorrencia)))
+        duracao = time.perf_counter() - inicio
+
+    return {
+        "requisicoes": total,
+        "erros": erros,
+        "req_por_segundo": round(total / duracao, 1),
+        "p50_ms": round(statistics.median(latencias) * 1000, 1),
+        "p95_ms": round(_percentil(latencias, 0.95) * 1000, 1),
+        "p99_ms": round(_percentil(latencias, 0.99) * 1000, 1),
+    }
+
+
+def _medir_modo(modo: str, args, caminhos: list[str]) -> list[dict]:
+    env = dict(os.environ, DB_MODO_BOT=modo, IMAP_SYNC_WORKER_ENABLED="false")
+    processo = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "app.main:app",
+            "--port", str(args.porta), "--log-level", "warning", "--no-access-log",
+        ],
+        cwd=RAIZ,
+        env=env,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    base_url = f"http://127.0.0.1:{args.porta}/api/v1"
+    try:
+        asyncio.run(_aguardar_api(f"http://127.0.0.1:{args.porta}"))
+        # Aquecimento: pools de conexão, caches e compilação das queries.
+        asyncio.run(_disparar(base_url, caminhos, args.api_key, args.concorrencias[0], args.concorrencias[0]))
+        resultados = []
+        for concorrencia in args.concorrencias:
+            resultado = asyncio.run(_disparar(base_url, caminhos, args.api_key, args.requisicoes, concorrencia))
+            resultados.append({"modo": modo, "concorrencia": concorrencia, **resultado})
+        return resultados
+    finally:
+        processo.terminate()
+        try:
+            processo.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            processo.kill()
+            processo.wait()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--telegram-id", type=int, required=True, help="Usuário existente (rota de perfil).")
+    parser.add_argument("--recarga-id", help="Recarga existente (rota de status).")
+    parser.add_argument("--api-key", default=os.environ.get("BOT_API_KEY", ""))
+    parser.add_argument("--requisicoes", type=int, default=2000)
+    parser.add_argument("--concorrencias", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--modos", nargs="+", default=["sync", "async"], choices=["sync", "async"])
+    args = parser.parse_args()
+
+    caminhos = [f"/usuarios/perfil?telegram_id={args.telegram_id}", "/produtos/"]
+    if args.recarga_id:
+        caminhos.append(f"/recargas/{args.recarga_id}")
+
+    resultados = []
+    for modo in args.modos:
+        resultados.extend(_medir_modo(modo, args, caminhos))
+
+    colunas = ["modo", "concorrencia", "requisicoes", "erros", "req_por_segundo", "p50_ms", "p95_ms", "p99_ms"]
+    print(" | ".join(colunas))
+    for resultado in resultados:
+        print(" | ".join(str(resultado[coluna]) for coluna in colunas))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Compara o casamento das regras do email monitor: o caminho regra a regra
+(sorted_rules + rule_matches_message a cada mensagem) e o CompiledRuleMatcher
+(compilado uma vez por conta).
+
+Gera regras e mensagens sintéticas em memória, sem banco nem IMAP, confere
+que os dois caminhos devolvem as mesmas regras e motivos e relata o tempo
+por mensagem de cada um.
+
+    python scripts/benchmark_email_rules.py --regras 200 2000 5000 --mensagens 2000
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+from app.models.email_monitor_models import EmailMonitorRule  # noqa: E402
+from app.services.email_monitor_service import (  # noqa: E402
+    CompiledRuleMatcher,
+    rule_matches_message,
+    sorted_rules,
+)
+
+PASTAS = ["INBOX", "Financeiro", "Suporte", "Spam", "Notificacoes"]
+
+
+def _gerar_vocabulario(aleatorio: random.Random, tamanho: int) -> list[str]:
+    silabas = ["ba", "ce", "di", "fo", "gu", "la", "me", "ni", "po", "ru", "sa", "te", "vi", "xo", "za", "ção"]
+    palavras = set()
+    while len(palavras) < tamanho:
+        palavras.add("".join(aleatorio.choice(silabas) for _ in range(aleatorio.randint(2, 4))))
+    return sorted(palavras)
+
+
+def _gerar_regras(aleatorio: random.Random, quantidade: int, vocabulario: list[str], palavras_por_regra: int) -> list[EmailMonitorRule]:
+    regras = []
+    for indice in range(quantidade):
+        dominio = f"loja{aleatorio.randrange(quantidade // 2 + 1)}.com"
+        sorteio = aleatorio.random()
+        remetente = f"*@{dominio}" if sorteio < 0.4 else (dominio if sorteio < 0.7 else None)
+        assunto = aleatorio.choice(vocabulario) if aleatorio.random() < 0.4 else None
+        pasta = aleatorio.choice(PASTAS) if aleatorio.random() < 0.2 else None
+        palavras = aleatorio.sample(vocabulario, aleatorio.randint(0, palavras_por_regra))
+        regras.append(
+            EmailMonitorRule(
+                name=f"regra-{indice}",
+                sender_pattern=remetente,
+                subject_pattern=assunto,
+                folder_pattern=pasta,
+                body_keywords_json=palavras,
+                priority=aleatorio.randint(1, 200),
+            )
+        )
+    return regras
+
+
+def _gerar_mensagens(aleatorio: random.Random, quantidade: int, quantidade_regras: int, vocabulario: list[str], tamanho_corpo: int) -> list[dict]:
+    mensagens = []
+    for _ in range(quantidade):
+        dominio = f"loja{aleatorio.randrange(quantidade_regras // 2 + 1)}.com"
+        corpo: list[str] = []
+        comprimento = 0
+        while comprimento < tamanho_corpo:
+            palavra = aleatorio.choice(vocabulario) if aleatorio.random() < 0.05 else "lorem"
+            corpo.append(palavra)
+            comprimento += len(palavra) + 1
+        mensagens.append(
+            {
+                "folder_name": aleatorio.choice(PASTAS),
+                "sender": f"Atendimento contato@{dominio}",
+                "subject": " ".join(aleatorio.sample(vocabulario, 4)).capitalize(),
+                "body_text": " ".join(corpo),
+            }
+        )
+    return mensagens
+
+
+def _regra_a_regra(regras: list[EmailMonitorRule], mensagem: dict) -> list:
+    resultado = []
+    for regra in sorted_rules(regras, None):
+        motivo = rule_matches_message(regra, **mensagem)
+        if motivo:
+            resultado.append((regra, motivo))
+    return resultado
+
+
+def _medir(funcao, mensagens: list[dict]) -> tuple[list, list[float]]:
+    resultados, tempos = [], []
+    for mensagem in mensagens:
+        inicio = time.perf_counter()
+        resultados.append(funcao(mensagem))
+        tempos.append(time.perf_counter() - inicio)
+    return resultados, tempos
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--regras", type=int, nargs="+", default=[10, 200, 2000, 5000])
+    parser.add_argument("--mensagens", type=int, default=1000)
+    parser.add_argument("--palavras-por-regra", type=int, default=3)
+    parser.add_argument("--tamanho-corpo", type=int, default=4000, help="Caracteres do corpo de cada mensagem.")
+    parser.add_argument("--vocabulario", type=int, default=5000)
+    parser.add_argument("--semente", type=int, default=42)
+    args = parser.parse_args()
+
+    aleatorio = random.Random(args.semente)
+    vocabulario = _gerar_vocabulario(aleatorio, args.vocabulario)
+
+    colunas = ["regras", "mensagens", "compilar_ms", "regra_a_regra_ms", "compilado_ms", "ganho", "casamentos"]
+    print(" | ".join(colunas))
+    for quantidade in args.regras:
+        regras = _gerar_regras(aleatorio, quantidade, vocabulario, args.palavras_por_regra)
+        mensagens = _gerar_mensagens(aleatorio, args.mensagens, quantidade, vocabulario, args.tamanho_corpo)
+
+        inicio = time.perf_counter()
+        matcher = CompiledRuleMatcher(regras)
+        compilar = time.perf_counter() - inicio
+
+        esperado, tempos_antigos = _medir(lambda mensagem: _regra_a_regra(regras, mensagem), mensagens)
+        obtido, tempos_novos = _medir(lambda mensagem: matcher.match(**mensagem), mensagens)
+        if obtido != esperado:
+            raise SystemExit(f"Resultados diferentes com {quantidade} regras.")
+
+        antigo, novo = statistics.mean(tempos_antigos), statistics.mean(tempos_novos)
+        linha = {
+            "regras": quantidade,
+            "mensagens": len(mensagens),
+            "compilar_ms": round(compilar * 1000, 1),
+            "regra_a_regra_ms": round(antigo * 1000, 3),
+            "compilado_ms": round(novo * 1000, 3),
+            "ganho": f"{antigo / novo:.1f}x" if novo else "-",
+            "casamentos": sum(len(item) for item in obtido),
+        }
+        print(" | ".join(str(linha[coluna]) for coluna in colunas))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+import os
+import unittest
+
+from sqlalchemy import create_engine, text
+from sqlmodel import Session, SQLModel
+
+import app.main  # noqa: F401  (registra todos os modelos no metadata)
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+_engine = None
+
+
+def engine_teste():
+    global _engine
+    if _engine is None:
+        _engine = create_engine(TEST_DATABASE_URL)
+        SQLModel.metadata.create_all(_engine)
+    return _engine
+
+
+@unittest.skipUnless(TEST_DATABASE_URL, "defina TEST_DATABASE_URL (um banco local descartável) para rodar")
+class BancoTestCase(unittest.TestCase):
+    """
+    Testes contra um PostgreSQL de verdade. O schema vem do metadata dos
+    modelos e todas as tabelas são esvaziadas antes de cada teste: use um
+    banco só para isso.
+    """
+
+    def setUp(self):
+        self.engine = engine_teste()
+        tabelas = ", ".join(f'"{tabela.name}"' for tabela in SQLModel.metadata.sorted_tables)
+        with self.engine.begin() as conexao:
+            conexao.execute(text(f"TRUNCATE {tabelas} RESTART IDENTITY CASCADE"))
+
+    def sessao(self) -> Session:
+        session = Session(self.engine)
+        self.addCleanup(session.close)
+        return session
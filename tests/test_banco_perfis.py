@@ -0,0 +1,76 @@
+import unittest
+from unittest import mock
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.pool import QueuePool
+
+from app.core.config import settings
+from app.db.monitoramento import MonitorEngine
+from app.db.perfis import PAPEL_API, PAPEL_WORKER, argumentos_engine, montar_perfil
+
+
+class PerfilBancoTestCase(unittest.TestCase):
+    def test_overrides_apply_only_to_the_process_role(self):
+        with mock.patch.multiple(settings, DB_PAPEL=PAPEL_API, DB_STATEMENT_TIMEOUT_MS=1234, DB_POOL_SIZE=3):
+            api = montar_perfil()
+            worker = montar_perfil(PAPEL_WORKER)
+
+        self.assertEqual((api.statement_timeout_ms, api.pool_size), (1234, 3))
+        self.assertEqual(worker.statement_timeout_ms, 300_000)
+        self.assertEqual(worker.application_name, f"{settings.DB_APPLICATION_NAME}-worker")
+
+    def test_engine_arguments_carry_timeouts_and_application_name(self):
+        argumentos = argumentos_engine(montar_perfil(PAPEL_WORKER))
+
+        self.assertIn("-c statement_timeout=300000", argumentos["connect_args"]["options"])
+        self.assertIn("-c lock_timeout=30000", argumentos["connect_args"]["options"])
+        self.assertTrue(argumentos["connect_args"]["application_name"].endswith("-worker"))
+
+    def test_unknown_role_is_rejected(self):
+        with self.assertRaises(ValueError):
+            montar_perfil("batch")
+
+
+class MonitorEngineTestCase(unittest.TestCase):
+    def _engine_monitorada(self, limite_ms, sorteios):
+        engine = create_engine("sqlite://", poolclass=QueuePool, pool_size=2, max_overflow=1)
+        monitor = MonitorEngine("teste", limite_ms, amostragem=0.5, sortear=lambda: next(sorteios))
+        monitor.instrumentar(engine)
+        return engine, monitor
+
+    def test_slow_queries_are_counted_and_sampled(self):
+        engine, monitor = self._engine_monitorada(0, iter([0.1, 0.9, 0.2]))
+        with engine.connect() as conexao:
+            for _ in range(3):
+                conexao.execute(text("SELECT 1"))
+
+        consultas = monitor.estatisticas()["consultas"]
+        self.assertEqual((consultas["total"], consultas["lentas"], consultas["lentas_registradas"]), (3, 3, 2))
+
+    def test_pool_saturation_tracks_peak_usage(self):
+        engine, monitor = self._engine_monitorada(10_000, iter([]))
+        with engine.connect(), engine.connect(), engine.connect():
+            durante = monitor.estatisticas()["pool"]
+        depois = monitor.estatisticas()["pool"]
+
+        self.assertEqual((durante["em_uso"], durante["capacidade"], durante["saturacao"]), (3, 3, 1.0))
+        self.assertEqual((depois["em_uso"], depois["pico_em_uso"], depois["saturacao_pico"]), (0, 3, 1.0))
+
+    def test_open_connections_drop_when_closed_or_invalidated(self):
+        engine, monitor = self._engine_monitorada(10_000, iter([]))
+        with engine.connect(), engine.connect(), engine.connect():
+            self.assertEqual(monitor.estatisticas()["pool"]["conexoes_abertas"], 3)
+        # A conexão excedente (overflow) é fechada no checkin.
+        self.assertEqual(monitor.estatisticas()["pool"]["conexoes_abertas"], 2)
+
+        with engine.connect() as conexao:
+            conexao.invalidate()
+        with engine.connect() as conexao:
+            conexao.connection.detach()
+        pool = monitor.estatisticas()["pool"]
+
+        self.assertEqual((pool["conexoes_abertas"], pool["invalidacoes"]), (0, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
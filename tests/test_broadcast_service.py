@@ -0,0 +1,113 @@
+import asyncio
+import datetime
+import unittest
+import uuid
+
+import httpx
+from sqlalchemy import update
+
+from app.models.base import StatusBroadcast
+from app.models.broadcast_models import Broadcast
+from app.models.usuario_models import Usuario
+from app.services.broadcast_service import ExecutorBroadcast, montar_broadcast_read
+from app.services.telegram_outbox_service import ResultadoEnvio, TokenBucket
+from banco_teste import BancoTestCase
+
+
+class MontarBroadcastReadTestCase(unittest.TestCase):
+    def test_progress_and_throughput(self):
+        broadcast = Broadcast(
+            mensagem="oi",
+            filtro={},
+            status=StatusBroadcast.EM_ANDAMENTO,
+            total_destinatarios=1000,
+            enviados=380,
+            falhas=20,
+            tempo_execucao_segundos=20.0,
+            atualizado_em=datetime.datetime.utcnow(),
+        )
+
+        leitura = montar_broadcast_read(broadcast)
+
+        self.assertEqual(leitura.pendentes, 600)
+        self.assertEqual(leitura.progresso_percentual, 40.0)
+        self.assertEqual(leitura.mensagens_por_segundo, 20.0)
+        self.assertEqual(leitura.segundos_restantes_estimados, 30.0)
+
+
+class EnvioBroadcastTestCase(unittest.TestCase):
+    def _enviar(self, respostas):
+        chamadas = []
+
+        def handler(request):
+            chamadas.append(request)
+            return respostas[min(len(chamadas), len(respostas)) - 1]
+
+        executor = ExecutorBroadcast(uuid.uuid4(), balde=TokenBucket(1000.0), max_tentativas=2)
+
+        async def rodar():
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+                return await executor._enviar(client, {"chat_id": 1, "text": "oi"})
+
+        return asyncio.run(rodar()), len(chamadas)
+
+    def test_blocked_user_fails_without_retry(self):
+        resultado, chamadas = self._enviar([httpx.Response(403, json={"ok": False, "description": "blocked"})])
+
+        self.assertFalse(resultado.enviada)
+        self.assertTrue(resultado.permanente)
+        self.assertEqual(chamadas, 1)
+
+    def test_rate_limit_is_retried_without_counting_attempt(self):
+        resultado, chamadas = self._enviar([
+            httpx.Response(429, json={"ok": False, "parameters": {"retry_after": 0.01}}),
+            httpx.Response(429, json={"ok": False, "parameters": {"retry_after": 0.01}}),
+            httpx.Response(200, json={"ok": True}),
+        ])
+
+        self.assertTrue(resultado.enviada)
+        self.assertEqual(chamadas, 3)
+
+
+class ExecucaoBroadcastTestCase(BancoTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.sessao() as session:
+            for telegram_id in (1, 2, 3):
+                session.add(Usuario(telegram_id=telegram_id, nome_completo=f"Cliente {telegram_id}"))
+            broadcast = Broadcast(mensagem="oi", filtro={})
+            session.add(broadcast)
+            session.commit()
+            self.broadcast_id = broadcast.id
+
+    def test_executor_stops_after_another_one_takes_over(self):
+        antigo = ExecutorBroadcast(self.broadcast_id, tamanho_pagina=1)
+        novo = ExecutorBroadcast(self.broadcast_id, tamanho_pagina=1)
+        sessao_antiga = self.sessao()
+        self.assertIsNotNone(antigo._reivindicar(sessao_antiga))
+        self.assertEqual(antigo._proxima_pagina(sessao_antiga, None), [1])
+
+        # Retomada com o batimento expirado, enquanto o antigo ainda envia a página.
+        with self.sessao() as session:
+            session.exec(
+                update(Broadcast)
+                .where(Broadcast.id == self.broadcast_id)
+                .values(status=StatusBroadcast.PENDENTE, execucao_id=None)
+            )
+            session.commit()
+            self.assertIsNotNone(novo._reivindicar(session))
+
+        enviados, falhas, dono = antigo._registrar_pagina(sessao_antiga, [(1, ResultadoEnvio(enviada=True))], 0.5)
+
+        self.assertEqual((enviados, falhas, dono), (1, 0, False))
+        self.assertIsNone(antigo._proxima_pagina(sessao_antiga, 1))
+        self.assertFalse(antigo._concluir(sessao_antiga))
+        with self.sessao() as session:
+            self.assertEqual(novo._proxima_pagina(session, None), [2])
+            broadcast = session.get(Broadcast, self.broadcast_id)
+            self.assertEqual((broadcast.status, broadcast.enviados), (StatusBroadcast.EM_ANDAMENTO, 1))
+            self.assertEqual(broadcast.execucao_id, novo.execucao_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,103 @@
+import unittest
+from decimal import Decimal
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.models.base import TipoMovimentacaoCarteira
+from app.models.usuario_models import MovimentacaoCarteira, Usuario
+from app.services.carteira_service import (
+    SaldoInsuficienteError,
+    creditar,
+    debitar,
+    definir_saldo,
+    reconstruir_saldos,
+)
+from banco_teste import BancoTestCase
+
+
+class CarteiraTestCase(BancoTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.sessao() as session:
+            usuario = Usuario(telegram_id=444, nome_completo="Cliente")
+            session.add(usuario)
+            session.commit()
+            self.usuario_id = usuario.id
+
+    def _movimentacoes(self) -> list[tuple]:
+        with self.sessao() as session:
+            return [
+                (movimentacao.tipo, movimentacao.valor, movimentacao.saldo_resultante)
+                for movimentacao in session.exec(
+                    select(MovimentacaoCarteira).order_by(MovimentacaoCarteira.criado_em)
+                ).all()
+            ]
+
+    def _saldo(self) -> Decimal:
+        with self.sessao() as session:
+            return session.get(Usuario, self.usuario_id).saldo_carteira
+
+    def test_each_movement_writes_one_ledger_row(self):
+        with self.sessao() as session:
+            self.assertEqual(creditar(session, self.usuario_id, Decimal("50"), TipoMovimentacaoCarteira.RECARGA), Decimal("50.00"))
+            self.assertEqual(debitar(session, self.usuario_id, Decimal("19.90"), TipoMovimentacaoCarteira.COMPRA), Decimal("30.10"))
+            self.assertEqual(
+                definir_saldo(session, self.usuario_id, Decimal("100"), TipoMovimentacaoCarteira.AJUSTE_ADMIN),
+                (Decimal("30.10"), Decimal("100.00")),
+            )
+            session.commit()
+
+        self.assertEqual(
+            self._movimentacoes(),
+            [
+                (TipoMovimentacaoCarteira.RECARGA, Decimal("50.00"), Decimal("50.00")),
+                (TipoMovimentacaoCarteira.COMPRA, Decimal("-19.90"), Decimal("30.10")),
+                (TipoMovimentacaoCarteira.AJUSTE_ADMIN, Decimal("69.90"), Decimal("100.00")),
+            ],
+        )
+        self.assertEqual(self._saldo(), Decimal("100.00"))
+
+    def test_insufficient_debit_raises_and_writes_nothing(self):
+        with self.sessao() as session:
+            creditar(session, self.usuario_id, Decimal("10"), TipoMovimentacaoCarteira.RECARGA)
+            session.commit()
+
+            with self.assertRaises(SaldoInsuficienteError) as contexto:
+                debitar(session, self.usuario_id, Decimal("10.01"), TipoMovimentacaoCarteira.COMPRA)
+            session.commit()
+
+        self.assertEqual((contexto.exception.saldo_atual, contexto.exception.valor), (Decimal("10.00"), Decimal("10.01")))
+        self.assertEqual(len(self._movimentacoes()), 1)
+        self.assertEqual(self._saldo(), Decimal("10.00"))
+
+    def test_setting_the_same_balance_writes_nothing(self):
+        with self.sessao() as session:
+            self.assertEqual(
+                definir_saldo(session, self.usuario_id, Decimal("0"), TipoMovimentacaoCarteira.AJUSTE_ADMIN),
+                (Decimal("0.00"), Decimal("0.00")),
+            )
+            session.commit()
+
+        self.assertEqual(self._movimentacoes(), [])
+
+    def test_rebuild_matches_ledger_sum(self):
+        with self.sessao() as session:
+            creditar(session, self.usuario_id, Decimal("40"), TipoMovimentacaoCarteira.RECARGA)
+            debitar(session, self.usuario_id, Decimal("15"), TipoMovimentacaoCarteira.COMPRA)
+            # Saldo alterado por fora do livro-razão.
+            session.exec(update(Usuario).where(Usuario.id == self.usuario_id).values(saldo_carteira=Decimal("99.00")))
+            session.commit()
+
+            relatorio = reconstruir_saldos(session)
+            session.commit()
+
+            self.assertEqual(relatorio["usuarios_com_divergencia"], 1)
+            self.assertEqual(relatorio["divergencias"][0]["saldo_armazenado"], Decimal("99.00"))
+            self.assertEqual(relatorio["divergencias"][0]["saldo_razao"], Decimal("25.00"))
+            self.assertEqual(self._saldo(), Decimal("25.00"))
+            self.assertEqual(reconstruir_saldos(session, corrigir=False)["usuarios_com_divergencia"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
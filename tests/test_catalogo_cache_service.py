@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+
+from decimal import Decimal
+
+from app.services.catalogo_cache_service import CatalogoCache, PrecoMinimoCache
+
+
+class CatalogoCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.cache = CatalogoCache()
+        self.cargas = 0
+
+    def _carregar(self):
+        self.cargas += 1
+        return [{"nome": "Netflix", "preco": "19.90"}]
+
+    def test_second_read_is_served_from_cache(self):
+        primeira = self.cache.obter(self._carregar)
+        segunda = self.cache.obter(self._carregar)
+
+        self.assertEqual(self.cargas, 1)
+        self.assertEqual(primeira.etag, segunda.etag)
+        self.assertEqual((self.cache.hits, self.cache.misses), (1, 1))
+
+    def test_invalidation_forces_reload_with_same_etag_for_same_content(self):
+        primeira = self.cache.obter(self._carregar)
+        self.cache.invalidar()
+        segunda = self.cache.obter(self._carregar)
+
+        self.assertEqual(self.cargas, 2)
+        self.assertEqual(primeira.etag, segunda.etag)
+        self.assertEqual(self.cache.invalidacoes, 1)
+
+    def test_async_read_shares_entry_with_sync_read(self):
+        async def carregar_async():
+            return self._carregar()
+
+        primeira = asyncio.run(self.cache.obter_async(carregar_async))
+        segunda = self.cache.obter(self._carregar)
+        terceira = asyncio.run(self.cache.obter_async(carregar_async))
+
+        self.assertEqual(self.cargas, 1)
+        self.assertEqual({primeira.etag, segunda.etag, terceira.etag}, {primeira.etag})
+        self.assertEqual((self.cache.hits, self.cache.misses), (2, 1))
+
+
+class PrecoMinimoCacheTestCase(unittest.TestCase):
+    def test_catalog_invalidation_also_invalidates_min_price(self):
+        cache = PrecoMinimoCache()
+        precos = iter([Decimal("9.90"), Decimal("4.90")])
+
+        self.assertEqual(cache.obter(lambda: next(precos)), Decimal("9.90"))
+        self.assertEqual(cache.obter(lambda: next(precos)), Decimal("9.90"))
+        CatalogoCache().invalidar()
+        self.assertEqual(cache.obter(lambda: next(precos)), Decimal("4.90"))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
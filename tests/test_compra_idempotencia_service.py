@@ -0,0 +1,92 @@
+import datetime
+import unittest
+from decimal import Decimal
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlmodel import select
+
+from app.api.v1.endpoints.pedidos import delete_admin_pedido
+from app.models.base import TipoEntregaProduto
+from app.models.pedido_models import CompraIdempotencia, Pedido
+from app.models.produto_models import Produto
+from app.models.usuario_models import Usuario
+from app.schemas.compra_schemas import CompraCreateRequest, CompraCreateResponse
+from app.services.compra_idempotencia_service import reservar_chave_idempotencia, salvar_resposta_idempotencia
+from banco_teste import BancoTestCase
+
+
+class CompraIdempotenciaTestCase(BancoTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.sessao() as session:
+            usuario = Usuario(telegram_id=111, nome_completo="Cliente", saldo_carteira=Decimal("50.00"))
+            produto = Produto(nome="Streaming", preco=Decimal("10.00"))
+            session.add(usuario)
+            session.add(produto)
+            session.commit()
+            self.usuario_id, self.produto_id = usuario.id, produto.id
+        self.compra = CompraCreateRequest(telegram_id=111, produto_id=self.produto_id)
+
+    def _comprar(self, chave: str) -> CompraCreateResponse:
+        """Simula a compra: reserva a chave, cria o pedido e guarda a resposta na mesma transação."""
+        with self.sessao() as session:
+            self.assertIsNone(reservar_chave_idempotencia(session, chave, self.compra))
+            pedido = Pedido(valor_pago=Decimal("10.00"), usuario_id=self.usuario_id, produto_id=self.produto_id)
+            session.add(pedido)
+            session.flush()
+            resposta = CompraCreateResponse(
+                pedido_id=pedido.id,
+                data_compra=datetime.datetime(2026, 1, 1, 12, 0),
+                valor_pago=Decimal("10.00"),
+                novo_saldo=Decimal("40.00"),
+                produto_nome="Streaming",
+                login="conta@example.com",
+                senha="segredo",
+                tipo_entrega=TipoEntregaProduto.AUTOMATICA,
+                mensagem_entrega="Aproveite!",
+            )
+            salvar_resposta_idempotencia(session, chave, resposta)
+            session.commit()
+            return resposta
+
+    def test_replay_returns_stored_response(self):
+        resposta = self._comprar("chave-1")
+
+        with self.sessao() as session:
+            repetida = reservar_chave_idempotencia(session, " chave-1 ", self.compra)
+            pedidos = session.exec(select(func.count()).select_from(Pedido)).one()
+
+        self.assertEqual(repetida, resposta)
+        self.assertEqual(pedidos, 1)
+
+    def test_same_key_with_different_body_is_rejected(self):
+        self._comprar("chave-1")
+        outra_compra = CompraCreateRequest(telegram_id=111, produto_id=self.produto_id, email_cliente="x@example.com")
+
+        with self.sessao() as session, self.assertRaises(HTTPException) as contexto:
+            reservar_chave_idempotencia(session, "chave-1", outra_compra)
+
+        self.assertEqual(contexto.exception.status_code, 409)
+
+    def test_deleting_order_keeps_key_without_the_order(self):
+        resposta = self._comprar("chave-1")
+
+        with self.sessao() as session:
+            delete_admin_pedido(session=session, pedido_id=resposta.pedido_id)
+
+        with self.sessao() as session:
+            registro = session.get(CompraIdempotencia, "chave-1")
+            self.assertIsNone(session.get(Pedido, resposta.pedido_id))
+            self.assertIsNotNone(registro)
+            self.assertIsNone(registro.pedido_id)
+
+    def test_invalid_key_is_rejected(self):
+        with self.sessao() as session, self.assertRaises(HTTPException) as contexto:
+            reservar_chave_idempotencia(session, "  ", self.compra)
+
+        self.assertEqual(contexto.exception.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,109 @@
+import datetime
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from fastapi import BackgroundTasks, HTTPException
+from sqlmodel import select
+
+from app.api.v1.endpoints import compras
+from app.models.base import InviteProviderProduto, TipoEntregaProduto
+from app.models.conta_mae_models import ContaMae, ContaMaeConvite, ContaMaeInviteJob
+from app.models.pedido_models import Pedido
+from app.models.produto_models import Produto
+from app.models.usuario_models import MovimentacaoCarteira, Usuario
+from app.schemas.compra_schemas import CompraLoteCreateRequest
+from banco_teste import BancoTestCase
+
+
+@mock.patch.object(compras, "enqueue_invite_job")
+class CompraLoteTestCase(BancoTestCase):
+    def setUp(self):
+        super().setUp()
+        hoje = datetime.date.today()
+        with self.sessao() as session:
+            usuario = Usuario(telegram_id=333, nome_completo="Cliente", saldo_carteira=Decimal("100.00"))
+            produto = Produto(
+                nome="ChatGPT Team",
+                preco=Decimal("10.00"),
+                tipo_entrega=TipoEntregaProduto.SOLICITA_EMAIL,
+                invite_provider=InviteProviderProduto.OPENAI,
+            )
+            session.add(usuario)
+            session.add(produto)
+            session.flush()
+            # A busca ordena pela expiração mais distante: a conta "longa" é preenchida primeiro.
+            longa = ContaMae(
+                login="longa@example.com", senha="x", max_slots=3, slots_ocupados=1,
+                data_expiracao=hoje + datetime.timedelta(days=30), produto_id=produto.id,
+            )
+            curta = ContaMae(
+                login="curta@example.com", senha="x", max_slots=2, slots_ocupados=0,
+                data_expiracao=hoje + datetime.timedelta(days=10), produto_id=produto.id,
+            )
+            session.add(longa)
+            session.add(curta)
+            session.commit()
+            self.usuario_id, self.produto_id = usuario.id, produto.id
+            self.longa_id, self.curta_id = longa.id, curta.id
+
+    def _comprar(self, quantidade: int):
+        compra = CompraLoteCreateRequest(
+            telegram_id=333,
+            produto_id=self.produto_id,
+            quantidade=quantidade,
+            emails_cliente=[f" cliente{indice}@example.com " for indice in range(quantidade)],
+        )
+        with self.sessao() as session:
+            return compras.create_compra_lote_com_saldo(
+                background_tasks=BackgroundTasks(), session=session, compra_in=compra
+            )
+
+    def test_units_fill_each_parent_account_in_order(self, enqueue):
+        resposta = self._comprar(3)
+
+        with self.sessao() as session:
+            self.assertEqual(session.get(ContaMae, self.longa_id).slots_ocupados, 3)
+            self.assertEqual(session.get(ContaMae, self.curta_id).slots_ocupados, 1)
+            pedidos = {pedido.id: pedido for pedido in session.exec(select(Pedido)).all()}
+            convites = session.exec(select(ContaMaeConvite)).all()
+            jobs = session.exec(select(ContaMaeInviteJob)).all()
+
+        self.assertEqual(set(pedidos), {item.pedido_id for item in resposta.itens})
+        self.assertEqual(
+            sorted(pedido.conta_mae_id == self.longa_id for pedido in pedidos.values()), [False, True, True]
+        )
+        self.assertEqual(len(convites), 3)
+        self.assertEqual(
+            {(job.convite_id, job.pedido_id, job.email_cliente) for job in jobs},
+            {(convite.id, convite.pedido_id, convite.email_cliente) for convite in convites},
+        )
+        self.assertEqual(enqueue.call_count, 3)
+
+    def test_batch_is_debited_once(self, enqueue):
+        resposta = self._comprar(3)
+
+        with self.sessao() as session:
+            movimentacoes = session.exec(select(MovimentacaoCarteira)).all()
+            saldo = session.get(Usuario, self.usuario_id).saldo_carteira
+
+        self.assertEqual([movimentacao.valor for movimentacao in movimentacoes], [Decimal("-30.00")])
+        self.assertEqual((resposta.novo_saldo, saldo), (Decimal("70.00"), Decimal("70.00")))
+
+    def test_not_enough_slots_changes_nothing(self, enqueue):
+        with self.assertRaises(HTTPException) as contexto:
+            self._comprar(5)
+
+        self.assertEqual(contexto.exception.status_code, 404)
+        with self.sessao() as session:
+            self.assertEqual(session.get(Usuario, self.usuario_id).saldo_carteira, Decimal("100.00"))
+            self.assertEqual(session.get(ContaMae, self.longa_id).slots_ocupados, 1)
+            self.assertEqual(session.get(ContaMae, self.curta_id).slots_ocupados, 0)
+            self.assertEqual(session.exec(select(MovimentacaoCarteira)).all(), [])
+            self.assertEqual(session.exec(select(Pedido)).all(), [])
+            self.assertEqual(session.exec(select(ContaMaeConvite)).all(), [])
+        enqueue.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,40 @@
+import asyncio
+import threading
+import time
+import unittest
+
+from sqlalchemy.util.concurrency import greenlet_spawn
+
+from app.core.concorrencia import executar_bloqueante
+
+
+class ExecutarBloqueanteTestCase(unittest.TestCase):
+    def test_outside_greenlet_runs_in_the_calling_thread(self):
+        self.assertEqual(executar_bloqueante(threading.get_ident), threading.get_ident())
+
+    def test_inside_greenlet_runs_in_another_thread_without_blocking_the_loop(self):
+        async def cenario():
+            marcas = []
+
+            async def tique():
+                for _ in range(6):
+                    marcas.append(time.monotonic())
+                    await asyncio.sleep(0.02)
+
+            def rota_sincrona():
+                executar_bloqueante(time.sleep, 0.15)
+                return executar_bloqueante(threading.get_ident)
+
+            tarefa = asyncio.create_task(tique())
+            thread_da_chamada = await greenlet_spawn(rota_sincrona)
+            await tarefa
+            return thread_da_chamada, marcas
+
+        thread_da_chamada, marcas = asyncio.run(cenario())
+
+        self.assertNotEqual(thread_da_chamada, threading.get_ident())
+        self.assertLess(max(b - a for a, b in zip(marcas, marcas[1:])), 0.12)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import unittest
+
+from app.core.config import settings
+from app.models.configuracao_models import Configuracao
+from app.services.configuracao_cache_service import ConfiguracaoCache
+
+
+class ConfiguracaoCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        self.agora = 1000.0
+        self.versao_banco = 1
+        self.cargas = 0
+        self.cache = ConfiguracaoCache(
+            carregar=self._carregar,
+            versao_no_banco=lambda: self.versao_banco,
+            relogio=lambda: self.agora,
+        )
+
+    def _carregar(self):
+        self.cargas += 1
+        return Configuracao(versao=self.versao_banco, modo_manutencao=self.versao_banco > 1)
+
+    def test_reads_inside_window_do_not_touch_database(self):
+        self.cache.obter()
+        self.cache.obter()
+
+        self.assertEqual(self.cargas, 1)
+        self.assertEqual(self.cache.revalidacoes, 0)
+
+    def test_unchanged_version_is_revalidated_without_reload(self):
+        self.cache.obter()
+        self.agora += settings.CONFIGURACAO_CACHE_REVALIDAR_SECONDS
+
+        self.cache.obter()
+
+        self.assertEqual(self.cargas, 1)
+        self.assertEqual(self.cache.revalidacoes, 1)
+
+    def test_change_from_other_process_is_seen_after_window(self):
+        self.assertFalse(self.cache.obter().modo_manutencao)
+        self.versao_banco = 2
+
+        self.assertFalse(self.cache.obter().modo_manutencao)
+        self.agora += settings.CONFIGURACAO_CACHE_REVALIDAR_SECONDS
+
+        self.assertTrue(self.cache.obter().modo_manutencao)
+        self.assertEqual(self.cargas, 2)
+
+    def test_invalidation_reloads_immediately(self):
+        self.cache.obter()
+        self.versao_banco = 2
+        self.cache.invalidar()
+
+        self.assertTrue(self.cache.obter().modo_manutencao)
+
+
+if __name__ == "__main__":
+    unittest.main()
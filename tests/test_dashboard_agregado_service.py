@@ -0,0 +1,102 @@
+import datetime
+import unittest
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import text
+from sqlmodel import select
+
+from app.models.dashboard_models import DashboardAgregadoDelta, UsuarioAgregadoDia, VendaAgregadaDia, VendaAgregadaHora
+from app.models.pedido_models import Pedido
+from app.models.produto_models import Produto
+from app.models.usuario_models import Usuario
+from app.services.dashboard_agregado_service import _VariacoesAgregados, consolidar_deltas_dashboard, truncar_hora
+from banco_teste import BancoTestCase
+
+
+class VariacoesAgregadosTestCase(unittest.TestCase):
+    def test_sales_are_bucketed_by_hour_and_day_per_product(self):
+        produto_id = uuid.uuid4()
+        variacoes = _VariacoesAgregados()
+        variacoes.venda(datetime.datetime(2026, 1, 5, 10, 15), produto_id, Decimal("10.00"), 1)
+        variacoes.venda(datetime.datetime(2026, 1, 5, 10, 59), produto_id, Decimal("5.50"), 1)
+        variacoes.venda(datetime.datetime(2026, 1, 5, 11, 1), produto_id, Decimal("2.00"), 1)
+
+        self.assertEqual(
+            variacoes.vendas_hora[(datetime.datetime(2026, 1, 5, 10), produto_id)],
+            [2, Decimal("15.50")],
+        )
+        self.assertEqual(
+            variacoes.vendas_dia[(datetime.date(2026, 1, 5), produto_id)],
+            [3, Decimal("17.50")],
+        )
+
+    def test_removal_cancels_previous_contribution(self):
+        produto_id = uuid.uuid4()
+        criado_em = datetime.datetime(2026, 1, 5, 23, 30)
+        variacoes = _VariacoesAgregados()
+        variacoes.venda(criado_em, produto_id, Decimal("10.00"), 1)
+        variacoes.venda(criado_em, produto_id, Decimal("10.00"), -1)
+        variacoes.usuario(criado_em, 1)
+
+        self.assertEqual(variacoes.vendas_dia[(criado_em.date(), produto_id)], [0, Decimal("0.00")])
+        self.assertEqual(variacoes.usuarios_hora[truncar_hora(criado_em)], 1)
+
+
+class DeltasAgregadosTestCase(BancoTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.sessao() as session:
+            usuario = Usuario(telegram_id=555, nome_completo="Cliente")
+            produto = Produto(nome="Streaming", preco=Decimal("10.00"))
+            session.add(usuario)
+            session.add(produto)
+            session.commit()
+            self.usuario_id, self.produto_id = usuario.id, produto.id
+        with self.sessao() as session:
+            consolidar_deltas_dashboard(session)
+
+    def _pedido(self, session, valor="10.00") -> Pedido:
+        pedido = Pedido(valor_pago=Decimal(valor), usuario_id=self.usuario_id, produto_id=self.produto_id)
+        session.add(pedido)
+        return pedido
+
+    def test_checkout_only_writes_deltas_until_consolidation(self):
+        with self.sessao() as session:
+            pedido = self._pedido(session)
+            session.commit()
+            hora = truncar_hora(pedido.criado_em)
+
+            self.assertIsNone(session.get(VendaAgregadaHora, (hora, self.produto_id)))
+            self.assertEqual(consolidar_deltas_dashboard(session), 1)
+            self.assertEqual(session.exec(select(DashboardAgregadoDelta)).all(), [])
+            dia = session.get(VendaAgregadaDia, (hora.date(), self.produto_id))
+            self.assertEqual((dia.pedidos, dia.receita), (1, Decimal("10.00")))
+            self.assertEqual(session.get(UsuarioAgregadoDia, hora.date()).novos_usuarios, 1)
+
+            session.delete(pedido)
+            session.commit()
+            consolidar_deltas_dashboard(session)
+            session.expire_all()
+            hora_agregada = session.get(VendaAgregadaHora, (hora, self.produto_id))
+            self.assertEqual((hora_agregada.pedidos, hora_agregada.receita), (0, Decimal("0.00")))
+
+    def test_concurrent_checkouts_do_not_wait_for_each_other(self):
+        primeira = self.sessao()
+        self._pedido(primeira)
+        primeira.flush()
+
+        with self.sessao() as segunda:
+            segunda.exec(text("SET LOCAL lock_timeout = '1s'"))
+            self._pedido(segunda, "5.00")
+            segunda.commit()
+        primeira.commit()
+
+        with self.sessao() as session:
+            consolidar_deltas_dashboard(session)
+            dia = session.exec(select(VendaAgregadaDia)).one()
+        self.assertEqual((dia.pedidos, dia.receita), (2, Decimal("15.00")))
+
+
+if __name__ == "__main__":
+    unittest.main()
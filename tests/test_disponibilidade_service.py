@@ -0,0 +1,152 @@
+import datetime
+import unittest
+import uuid
+from decimal import Decimal
+
+from sqlalchemy import update
+
+from app.models.conta_mae_models import ContaMae
+from app.models.produto_models import EstoqueConta, Produto, ProdutoDisponibilidade
+from app.services.disponibilidade_service import (
+    reconciliar_disponibilidade,
+    registrar_variacao_disponibilidade,
+    slots_livres_conta,
+)
+from banco_teste import BancoTestCase
+
+
+class SlotsLivresContaTestCase(unittest.TestCase):
+    def test_estoque_conta_counts_remaining_slots(self):
+        conta = EstoqueConta(produto_id=uuid.uuid4(), login="a", senha="x", max_slots=3, slots_ocupados=1)
+
+        self.assertEqual(slots_livres_conta(conta), 2)
+
+    def test_estoque_conta_requiring_attention_has_no_slots(self):
+        conta = EstoqueConta(
+            produto_id=uuid.uuid4(),
+            login="a",
+            senha="x",
+            max_slots=3,
+            slots_ocupados=1,
+            requer_atencao=True,
+        )
+
+        self.assertEqual(slots_livres_conta(conta), 0)
+
+    def test_inactive_conta_has_no_slots(self):
+        conta = EstoqueConta(produto_id=uuid.uuid4(), login="a", senha="x", max_slots=3, is_ativo=False)
+
+        self.assertEqual(slots_livres_conta(conta), 0)
+
+    def test_expired_conta_mae_has_no_slots(self):
+        today = datetime.date(2026, 5, 10)
+        conta = ContaMae(
+            produto_id=uuid.uuid4(),
+            login="mae@example.com",
+            max_slots=5,
+            slots_ocupados=2,
+            data_expiracao=datetime.date(2026, 5, 9),
+        )
+
+        self.assertEqual(slots_livres_conta(conta, today=today), 0)
+        self.assertEqual(slots_livres_conta(conta, today=datetime.date(2026, 5, 9)), 3)
+
+
+class ContadorDisponibilidadeTestCase(BancoTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.sessao() as session:
+            origem = Produto(nome="Streaming", preco=Decimal("10.00"))
+            destino = Produto(nome="Streaming 4K", preco=Decimal("15.00"))
+            session.add(origem)
+            session.add(destino)
+            session.commit()
+            self.origem_id, self.destino_id = origem.id, destino.id
+
+    def _contador(self, produto_id: uuid.UUID) -> tuple:
+        with self.sessao() as session:
+            contador = session.get(ProdutoDisponibilidade, produto_id)
+            return (contador.slots_livres_estoque, contador.slots_livres_conta_mae) if contador else None
+
+    def _criar_estoque(self, session, **campos) -> EstoqueConta:
+        conta = EstoqueConta(produto_id=self.origem_id, login="a", senha="x", **campos)
+        session.add(conta)
+        registrar_variacao_disponibilidade(session, conta, 0)
+        session.commit()
+        return conta
+
+    def test_new_and_occupied_accounts_move_the_counter(self):
+        with self.sessao() as session:
+            conta = self._criar_estoque(session, max_slots=3)
+            self._criar_estoque(session, max_slots=2)
+            self.assertEqual(self._contador(self.origem_id), (5, 0))
+
+            slots_livres_antes = slots_livres_conta(conta)
+            conta.slots_ocupados = 2
+            registrar_variacao_disponibilidade(session, conta, slots_livres_antes)
+            session.commit()
+            self.assertEqual(self._contador(self.origem_id), (3, 0))
+
+            slots_livres_antes = slots_livres_conta(conta)
+            session.delete(conta)
+            registrar_variacao_disponibilidade(session, conta, slots_livres_antes, removida=True)
+            session.commit()
+
+        self.assertEqual(self._contador(self.origem_id), (2, 0))
+
+    def test_moving_an_account_to_another_product_moves_its_slots(self):
+        with self.sessao() as session:
+            conta = self._criar_estoque(session, max_slots=3, slots_ocupados=1)
+            self._criar_estoque(session, max_slots=1)
+            self.assertEqual(self._contador(self.destino_id), None)
+
+            slots_livres_antes = slots_livres_conta(conta)
+            conta.produto_id = self.destino_id
+            conta.slots_ocupados = 0
+            registrar_variacao_disponibilidade(session, conta, slots_livres_antes)
+            session.commit()
+            self.assertEqual((self._contador(self.origem_id), self._contador(self.destino_id)), ((1, 0), (3, 0)))
+
+            slots_livres_antes = slots_livres_conta(conta)
+            conta.produto_id = self.origem_id
+            registrar_variacao_disponibilidade(session, conta, slots_livres_antes)
+            session.commit()
+
+        self.assertEqual((self._contador(self.origem_id), self._contador(self.destino_id)), ((4, 0), (0, 0)))
+        with self.sessao() as session:
+            self.assertEqual(reconciliar_disponibilidade(session)["produtos_com_divergencia"], 0)
+
+    def test_reconcile_reports_and_fixes_drifted_counters(self):
+        with self.sessao() as session:
+            self._criar_estoque(session, max_slots=3)
+            mae = ContaMae(
+                produto_id=self.destino_id, login="mae@example.com", senha="x", max_slots=5, slots_ocupados=1,
+                data_expiracao=datetime.date.today() + datetime.timedelta(days=30),
+            )
+            session.add(mae)
+            registrar_variacao_disponibilidade(session, mae, 0)
+            # Contador alterado por fora dos ajustes incrementais.
+            session.exec(
+                update(ProdutoDisponibilidade)
+                .where(ProdutoDisponibilidade.produto_id == self.origem_id)
+                .values(slots_livres_estoque=9)
+            )
+            session.commit()
+
+            relatorio = reconciliar_disponibilidade(session)
+            session.commit()
+
+            self.assertEqual(relatorio["produtos_verificados"], 2)
+            self.assertEqual(relatorio["produtos_com_divergencia"], 1)
+            divergencia = relatorio["divergencias"][0]
+            self.assertEqual(divergencia["produto_id"], self.origem_id)
+            self.assertEqual(
+                (divergencia["slots_livres_estoque_armazenado"], divergencia["slots_livres_estoque_real"]), (9, 3)
+            )
+            self.assertEqual(reconciliar_disponibilidade(session)["produtos_com_divergencia"], 0)
+
+        self.assertEqual((self._contador(self.origem_id), self._contador(self.destino_id)), ((3, 0), (0, 4)))
+
+
+if __name__ == "__main__":
+    unittest.main()
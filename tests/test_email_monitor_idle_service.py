@@ -0,0 +1,85 @@
+import socket
+import threading
+import unittest
+import uuid
+
+from app.services.email_monitor_idle_service import IdleNotSupportedError, wait_for_new_mail
+from app.services.email_monitor_service import get_idle_folders, set_folder_idle_active
+
+
+class SocketConnection:
+    """O mínimo de imaplib.IMAP4 que o IDLE usa, sobre um socketpair."""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.file = sock.makefile("rb")
+
+    def readline(self) -> bytes:
+        return self.file.readline()
+
+    def send(self, data: bytes) -> None:
+        self.sock.sendall(data)
+
+
+class EmailMonitorIdleTestCase(unittest.TestCase):
+    def setUp(self):
+        client, self.server = socket.socketpair()
+        self.connection = SocketConnection(client)
+        self.server_file = self.server.makefile("rb")
+        self.addCleanup(client.close)
+        self.addCleanup(self.server.close)
+
+    def _answer_done(self, tag: bytes) -> threading.Thread:
+        def server():
+            while True:
+                line = self.server_file.readline()
+                if not line or line == b"DONE\r\n":
+                    break
+            self.server.sendall(tag + b" OK IDLE terminated\r\n")
+
+        thread = threading.Thread(target=server, daemon=True)
+        thread.start()
+        return thread
+
+    def test_exists_ends_idle_with_done(self):
+        self.server.sendall(b"+ idling\r\n* 1 RECENT\r\n* 42 EXISTS\r\n")
+        server = self._answer_done(b"IDLE1")
+
+        new_mail = wait_for_new_mail(self.connection, b"IDLE1", renew_after=30, should_stop=lambda: False)
+
+        server.join(timeout=2)
+        self.assertTrue(new_mail)
+
+    def test_renewal_without_mail_keeps_connection_usable(self):
+        self.server.sendall(b"+ idling\r\n")
+        server = self._answer_done(b"IDLE1")
+
+        new_mail = wait_for_new_mail(self.connection, b"IDLE1", renew_after=0.2, should_stop=lambda: False)
+        server.join(timeout=2)
+        self.server.sendall(b"+ idling\r\n* 7 EXISTS\r\n")
+        server = self._answer_done(b"IDLE2")
+        second = wait_for_new_mail(self.connection, b"IDLE2", renew_after=30, should_stop=lambda: False)
+
+        server.join(timeout=2)
+        self.assertFalse(new_mail)
+        self.assertTrue(second)
+
+    def test_rejected_idle_command_means_no_idle_support(self):
+        self.server.sendall(b"IDLE1 BAD unknown command\r\n")
+
+        with self.assertRaises(IdleNotSupportedError):
+            wait_for_new_mail(self.connection, b"IDLE1", renew_after=30, should_stop=lambda: False)
+
+    def test_idle_registry_counts_overlapping_watchers(self):
+        account_id = uuid.uuid4()
+        set_folder_idle_active(account_id, "INBOX", True)
+        set_folder_idle_active(account_id, "INBOX", True)
+        set_folder_idle_active(account_id, "INBOX", False)
+        self.assertEqual(get_idle_folders(account_id), {"INBOX"})
+
+        set_folder_idle_active(account_id, "INBOX", False)
+        self.assertEqual(get_idle_folders(account_id), set())
+
+
+if __name__ == "__main__":
+    unittest.main()
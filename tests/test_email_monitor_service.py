@@ -1,13 +1,29 @@
+import threading
+import time
 import unittest
+from collections import deque
+from unittest import mock
 
 from app.models.email_monitor_models import EmailMonitorRule
+from app.services import email_monitor_service
 from app.services.email_monitor_service import (
+    CompiledRuleMatcher,
+    KeywordAutomaton,
     build_message_hash,
+    build_uid_search_criteria,
+    compress_uid_set,
+    decode_text_part,
     describe_imap_error,
+    find_text_parts,
+    iter_fetch_records,
     match_rules_for_message,
+    message_may_match_rules,
     normalize_folder_list,
+    parse_bodystructure,
     rule_matches_message,
+    run_host_limited_jobs,
     select_incremental_uids,
+    sorted_rules,
 )
 
 
@@ -56,11 +72,120 @@ class EmailMonitorServiceTestCase(unittest.TestCase):
         self.assertEqual(len(matches), 1)
         self.assertEqual(matches[0][0].name, 'ChatGPT OTP')
 
+    def test_keyword_automaton_finds_overlapping_words(self):
+        words = ['he', 'she', 'his', 'hers', 'código', 'digo']
+        with mock.patch.object(email_monitor_service, 'AUTOMATON_MIN_WORDS', 0):
+            automaton = KeywordAutomaton(words)
+
+        self.assertEqual(automaton.find('ushers'), {0, 1, 3})
+        self.assertEqual(automaton.find('seu código'), {4, 5})
+        self.assertEqual(automaton.find(''), set())
+
+    def test_compiled_matcher_agrees_with_rule_by_rule_matching(self):
+        rules = [
+            EmailMonitorRule(name='Global', priority=50),
+            EmailMonitorRule(name='Stripe', sender_pattern='*@STRIPE.com', subject_pattern='invoice', priority=10),
+            EmailMonitorRule(name='OTP', sender_pattern='openai', body_keywords_json=['Código', 'code', 'CODE'], priority=10),
+            EmailMonitorRule(name='Financeiro', folder_pattern='fin*', body_keywords_json=['boleto'], priority=5),
+            EmailMonitorRule(name='Assunto', subject_pattern='Pedido ?23', priority=1),
+        ]
+        messages = [
+            dict(folder_name='INBOX', sender='Stripe billing@stripe.com', subject='Your invoice', body_text='paid'),
+            dict(folder_name='INBOX', sender='noreply@openai.com', subject='Acesso', body_text='Seu CÓDIGO: 123'),
+            dict(folder_name='Financeiro', sender=None, subject='pedido 123', body_text='segue o boleto'),
+            dict(folder_name='Financeiro', sender='x@y.z', subject=None, body_text=None),
+        ]
+        for automaton_min_words in (0, 200):
+            with mock.patch.object(email_monitor_service, 'AUTOMATON_MIN_WORDS', automaton_min_words):
+                matcher = CompiledRuleMatcher(rules)
+                for message in messages:
+                    expected = []
+                    for rule in sorted_rules(rules, None):
+                        reason = rule_matches_message(rule, **message)
+                        if reason:
+                            expected.append((rule, reason))
+                    self.assertEqual(matcher.match(**message), expected)
+
+        self.assertEqual(
+            [(rule.name, reason) for rule, reason in CompiledRuleMatcher(rules).match(**messages[1])],
+            [('OTP', 'remetente, palavras-chave (Código)'), ('Global', 'regra global')],
+        )
+
     def test_incremental_uid_selection_respects_last_seen_and_batch_limit(self):
         all_uids = [10, 11, 12, 13, 14, 15]
         selected = select_incremental_uids(all_uids, last_seen_uid=12, batch_size=2)
         self.assertEqual(selected, [14, 15])
 
+    def test_uid_search_criteria_only_asks_for_new_messages(self):
+        self.assertEqual(build_uid_search_criteria(1500, message_count=90000, batch_size=100), 'UID 1501:*')
+        self.assertEqual(build_uid_search_criteria(None, message_count=90000, batch_size=100), '89901:*')
+        self.assertEqual(build_uid_search_criteria(None, message_count=40, batch_size=100), '1:*')
+        self.assertIsNone(build_uid_search_criteria(10, message_count=0, batch_size=100))
+
+    def test_compress_uid_set_collapses_consecutive_runs(self):
+        self.assertEqual(compress_uid_set([20, 14, 15, 16, 18, 19, 30]), '14:16,18:20,30')
+
+    def test_fetch_records_split_messages_and_items_after_literals(self):
+        fetch_data = [
+            (b'1 (UID 14 FLAGS (\\Seen) INTERNALDATE "01-Jan-2024 10:00:00 +0000" RFC822 {5}', b'AAAAA'),
+            b')',
+            (b'2 (UID 15 RFC822 {3}', b'BBB'),
+            b' FLAGS (\\Flagged))',
+            b'3 (UID 9 FLAGS (\\Seen))',
+        ]
+
+        records = list(iter_fetch_records(fetch_data))
+
+        self.assertEqual([(record.uid, record.literals) for record in records], [
+            (14, {'RFC822': b'AAAAA'}),
+            (15, {'RFC822': b'BBB'}),
+            (9, {}),
+        ])
+        self.assertIn('\\Seen', records[0].flags_blob)
+        self.assertEqual(records[0].internal_date.hour, 10)
+        self.assertIn('\\Flagged', records[1].flags_blob)
+
+    def test_bodystructure_lists_text_parts_and_skips_attachments(self):
+        meta = (
+            '1 (UID 7 RFC822.SIZE 904211 BODYSTRUCTURE ((("text" "plain" ("charset" "iso-8859-1") NIL NIL '
+            '"quoted-printable" 120 4 NIL NIL NIL NIL)("text" "html" ("charset" "utf-8") NIL NIL "base64" 300 5 '
+            'NIL NIL NIL NIL) "alternative" ("boundary" "b1") NIL NIL NIL)("text" "plain" ("name" "log.txt") NIL '
+            'NIL "base64" 900000 100 NIL ("attachment" ("filename" "log.txt")) NIL NIL) "mixed" ("boundary" '
+            '"b0") NIL NIL NIL) BODY[HEADER.FIELDS (FROM SUBJECT)] {40}'
+        )
+
+        parts = find_text_parts(parse_bodystructure(meta))
+
+        self.assertEqual(parts, [
+            ('1.1', 'plain', 'iso-8859-1', 'quoted-printable'),
+            ('1.2', 'html', 'utf-8', 'base64'),
+        ])
+        single = parse_bodystructure('1 (UID 8 BODYSTRUCTURE ("TEXT" "PLAIN" NIL NIL NIL "7BIT" 10 1 NIL NIL NIL NIL))')
+        self.assertEqual(find_text_parts(single), [('1', 'plain', 'utf-8', '7bit')])
+        self.assertIsNone(parse_bodystructure('1 (UID 9 BODYSTRUCTURE ("text" "plain" ("name" {5}'))
+
+    def test_decode_text_part_handles_transfer_encoding_cut_at_byte_limit(self):
+        self.assertEqual(decode_text_part(b'Ol=E1 mundo=\r\n!', 'quoted-printable', 'iso-8859-1'), 'Olá mundo!')
+        # Base64 cortado no meio de um bloco: só os blocos completos.
+        self.assertEqual(decode_text_part(b'Y8OzZGlnbzogMTIz\r\nND', 'base64', 'utf-8'), 'código: 123')
+        self.assertEqual(decode_text_part(b'abc', '7bit', 'x-unknown'), 'abc')
+
+    def test_header_prefilter_ignores_body_keywords(self):
+        rules = [
+            EmailMonitorRule(name='OTP', sender_pattern='*@openai.com', body_keywords_json=['código']),
+            EmailMonitorRule(name='Financeiro', subject_pattern='fatura', folder_pattern='Financeiro'),
+        ]
+
+        def may_match(sender_email, subject, folder_name='INBOX'):
+            return message_may_match_rules(
+                rules, folder_name=folder_name, sender_name=None, sender_email=sender_email, subject=subject
+            )
+
+        self.assertTrue(may_match('noreply@openai.com', 'Seu acesso'))
+        self.assertTrue(may_match('cobranca@loja.com', 'Sua fatura chegou', folder_name='Financeiro'))
+        self.assertFalse(may_match('cobranca@loja.com', 'Sua fatura chegou'))
+        self.assertFalse(message_may_match_rules([], folder_name='INBOX', sender_name=None, sender_email='a@b.c', subject='x'))
+
     def test_message_hash_prefers_message_id_when_available(self):
         first = build_message_hash('<abc@example.com>', 'a@example.com', 'x', None, 'preview 1')
         second = build_message_hash('<abc@example.com>', 'b@example.com', 'y', None, 'preview 2')
@@ -81,5 +206,46 @@ class EmailMonitorServiceTestCase(unittest.TestCase):
         self.assertIn('senha de app', error)
 
 
+    def test_host_limited_jobs_cap_each_host_and_run_hosts_in_parallel(self):
+        lock = threading.Lock()
+        running = {'gmail': 0, 'outlook': 0}
+        peak = {'gmail': 0, 'outlook': 0}
+
+        def run_job(job):
+            host, index = job
+            with lock:
+                running[host] += 1
+                peak[host] = max(peak[host], running[host])
+            time.sleep(0.05)
+            with lock:
+                running[host] -= 1
+            return index
+
+        pending = {
+            'gmail': deque(('gmail', index) for index in range(6)),
+            'outlook': deque(('outlook', index) for index in range(2)),
+        }
+        started = time.monotonic()
+        results, not_started, still_running = run_host_limited_jobs(
+            pending, run_job, concurrency=4, max_per_host=2, deadline=started + 10
+        )
+
+        self.assertEqual(len(results), 8)
+        self.assertEqual((not_started, still_running), (0, 0))
+        self.assertEqual(peak, {'gmail': 2, 'outlook': 2})
+        self.assertLess(time.monotonic() - started, 0.35)
+
+    def test_host_limited_jobs_stop_starting_jobs_at_deadline(self):
+        release = threading.Event()
+        self.addCleanup(release.set)
+        pending = {'imap.lento': deque(range(3))}
+
+        results, not_started, still_running = run_host_limited_jobs(
+            pending, lambda job: release.wait(5), concurrency=4, max_per_host=1, deadline=time.monotonic() + 0.1
+        )
+
+        self.assertEqual((results, not_started, still_running), ([], 2, 1))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,63 @@
+import unittest
+
+from app.core.bloom import FiltroBloom
+from app.services.giftcard_protecao_service import FiltroCodigosGiftCard, LimitadorResgate
+from app.services.giftcard_service import gerar_codigos
+
+
+class FiltroBloomTestCase(unittest.TestCase):
+    def test_no_false_negatives_and_low_false_positive_rate(self):
+        codigos = gerar_codigos(5000)
+        filtro = FiltroBloom(10_000, 0.001)
+        filtro.adicionar_varios(codigos)
+
+        self.assertTrue(all(codigo in filtro for codigo in codigos))
+        falsos = sum(f"ZZ{i}" in filtro for i in range(20_000))
+        self.assertLess(falsos, 40)
+
+
+class FiltroCodigosGiftCardTestCase(unittest.TestCase):
+    def setUp(self):
+        self.agora = 0.0
+        self.banco = ["AAA111-BBB222"]
+        self.cargas = []
+        self.filtro = FiltroCodigosGiftCard(carregar_codigos=self._carregar, relogio=lambda: self.agora)
+
+    def _carregar(self, desde):
+        self.cargas.append(desde)
+        return list(self.banco)
+
+    def test_unknown_code_is_rejected_without_reloading_inside_window(self):
+        self.assertTrue(self.filtro.pode_existir("AAA111-BBB222"))
+        self.assertFalse(self.filtro.pode_existir("NAO-EXISTE"))
+        self.assertFalse(self.filtro.pode_existir("OUTRO"))
+
+        self.assertEqual(len(self.cargas), 1)
+        self.assertEqual(self.filtro.rejeitados, 2)
+
+    def test_code_created_elsewhere_is_found_after_sync_window(self):
+        self.filtro.pode_existir("AAA111-BBB222")
+        self.banco.append("CCC333-DDD444")
+        self.agora += 3600
+
+        self.assertTrue(self.filtro.pode_existir("CCC333-DDD444"))
+        self.assertEqual(self.filtro.sincronizacoes, 1)
+
+
+class LimitadorResgateTestCase(unittest.TestCase):
+    def test_blocks_after_burst_and_refills_per_user(self):
+        agora = [0.0]
+        limitador = LimitadorResgate(tentativas_por_minuto=6, rajada=2, relogio=lambda: agora[0])
+
+        self.assertEqual(limitador.permitir(1), 0.0)
+        self.assertEqual(limitador.permitir(1), 0.0)
+        self.assertGreater(limitador.permitir(1), 0.0)
+        self.assertEqual(limitador.permitir(2), 0.0)
+
+        agora[0] += 10
+        self.assertEqual(limitador.permitir(1), 0.0)
+        self.assertEqual((limitador.tentativas, limitador.bloqueadas), (5, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
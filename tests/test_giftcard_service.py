@@ -0,0 +1,207 @@
+import csv
+import datetime
+import io
+import re
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from fastapi import BackgroundTasks, HTTPException
+from sqlmodel import select
+
+from app.api.v1.endpoints import giftcards
+from app.core.config import settings
+from app.models.base import StatusGiftCardLote
+from app.models.suporte_models import GiftCard, GiftCardLote
+from app.models.usuario_models import Usuario
+from app.services import giftcard_service
+from app.services.giftcard_service import (
+    GeracaoGiftCardError,
+    executar_lote_giftcards,
+    exportar_csv_lote,
+    gerar_codigos,
+    inserir_codigos_unicos,
+)
+from banco_teste import BancoTestCase
+
+
+class GerarCodigosTestCase(unittest.TestCase):
+    def test_generates_requested_amount_in_expected_format(self):
+        codigos = gerar_codigos(1000)
+
+        self.assertEqual(len(codigos), 1000)
+        self.assertTrue(all(re.fullmatch(r"[0-9A-F]{6}-[0-9A-F]{6}", codigo) for codigo in codigos))
+        self.assertGreater(len(set(codigos)), 990)
+
+
+class InserirCodigosUnicosTestCase(BancoTestCase):
+    EXISTENTE = "AAAAAA-AAAAAA"
+
+    def setUp(self):
+        super().setUp()
+        with self.sessao() as session:
+            admin = Usuario(telegram_id=1, nome_completo="Admin", is_admin=True)
+            session.add(admin)
+            session.flush()
+            session.add(GiftCard(codigo=self.EXISTENTE, valor=Decimal("5.00"), criado_por_admin_id=admin.id))
+            session.commit()
+            self.admin_id = admin.id
+
+    def _inserir_com_colisao(self):
+        """Primeira rodada: um código já existente e um repetido no próprio bloco."""
+        pedidos = []
+
+        def gerar(quantidade):
+            pedidos.append(quantidade)
+            if len(pedidos) == 1:
+                return [self.EXISTENTE, "BBBBBB-BBBBBB", "BBBBBB-BBBBBB", "CCCCCC-CCCCCC"]
+            return gerar_codigos(quantidade)
+
+        with self.sessao() as session, mock.patch.object(giftcard_service, "gerar_codigos", side_effect=gerar):
+            inseridos, colisoes = inserir_codigos_unicos(session, 4, Decimal("10.00"), self.admin_id)
+            session.commit()
+        return pedidos, inseridos, colisoes
+
+    def _codigos_no_banco(self) -> set[str]:
+        with self.sessao() as session:
+            return set(session.exec(select(GiftCard.codigo).where(GiftCard.valor == Decimal("10.00"))).all())
+
+    def test_only_colliding_codes_are_generated_again_with_copy(self):
+        with mock.patch.object(
+            giftcard_service, "_inserir_candidatos_copy", wraps=giftcard_service._inserir_candidatos_copy
+        ) as copy:
+            pedidos, inseridos, colisoes = self._inserir_com_colisao()
+
+        self.assertEqual(copy.call_count, 2)
+        self.assertEqual(pedidos, [4, 2])
+        self.assertEqual(colisoes, 2)
+        self.assertEqual(len(inseridos), 4)
+        self.assertIn("BBBBBB-BBBBBB", inseridos)
+        self.assertIn("CCCCCC-CCCCCC", inseridos)
+        self.assertNotIn(self.EXISTENTE, inseridos)
+        self.assertEqual(self._codigos_no_banco(), set(inseridos))
+
+    def test_executemany_path_behaves_the_same(self):
+        dialeto = self.engine.dialect
+        with mock.patch.object(dialeto, "driver", "asyncpg"), mock.patch.object(
+            giftcard_service, "_inserir_candidatos_copy"
+        ) as copy:
+            pedidos, inseridos, colisoes = self._inserir_com_colisao()
+
+        copy.assert_not_called()
+        self.assertEqual((pedidos, colisoes, len(inseridos)), ([4, 2], 2, 4))
+        self.assertEqual(self._codigos_no_banco(), set(inseridos))
+
+    @mock.patch.object(settings, "GIFTCARD_LOTE_MAX_RODADAS_COLISAO", 2)
+    def test_gives_up_after_max_rounds_of_collisions(self):
+        with self.sessao() as session, mock.patch.object(
+            giftcard_service, "gerar_codigos", return_value=[self.EXISTENTE]
+        ), self.assertRaises(GeracaoGiftCardError):
+            inserir_codigos_unicos(session, 1, Decimal("10.00"), self.admin_id)
+
+
+@mock.patch.object(settings, "GIFTCARD_LOTE_BLOCO", 4)
+@mock.patch.object(giftcards, "enqueue_lote_giftcards")
+class LoteGiftCardsTestCase(BancoTestCase):
+    def setUp(self):
+        super().setUp()
+        # O executor e a exportação abrem a própria sessão.
+        patcher = mock.patch.object(giftcard_service, "engine", self.engine)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        with self.sessao() as session:
+            admin = Usuario(telegram_id=1, nome_completo="Admin", is_admin=True)
+            session.add(admin)
+            session.flush()
+            lote = GiftCardLote(valor=Decimal("25.00"), quantidade_solicitada=10, criado_por_admin_id=admin.id)
+            session.add(lote)
+            session.commit()
+            self.lote_id = lote.id
+
+    def _lote(self) -> GiftCardLote:
+        with self.sessao() as session:
+            return session.get(GiftCardLote, self.lote_id)
+
+    def _retomar(self):
+        with self.sessao() as session:
+            return giftcards.retomar_lote_gift_cards(
+                session=session, background_tasks=BackgroundTasks(), lote_id=self.lote_id
+            )
+
+    def test_multi_block_batch_is_generated_and_exported_by_keyset(self, enqueue):
+        with mock.patch.object(
+            giftcard_service, "inserir_codigos_unicos", wraps=giftcard_service.inserir_codigos_unicos
+        ) as inserir:
+            lote = executar_lote_giftcards(self.lote_id)
+
+        self.assertEqual([chamada.args[1] for chamada in inserir.call_args_list], [4, 4, 2])
+        self.assertEqual((lote.status, lote.quantidade_gerada), (StatusGiftCardLote.CONCLUIDO, 10))
+        self.assertIsNotNone(lote.concluido_em)
+
+        paginas = list(exportar_csv_lote(self.lote_id, tamanho_pagina=3))
+        linhas = list(csv.reader(io.StringIO("".join(paginas))))
+        with self.sessao() as session:
+            codigos = sorted(session.exec(select(GiftCard.codigo).where(GiftCard.lote_id == self.lote_id)).all())
+
+        self.assertEqual(len(paginas), 4)
+        self.assertEqual(linhas[0], giftcard_service.CABECALHO_CSV)
+        self.assertEqual([linha[0] for linha in linhas[1:]], codigos)
+        self.assertEqual(len(codigos), 10)
+        self.assertTrue(all(linha[1:3] == ["25.00", "False"] for linha in linhas[1:]))
+
+    def test_failed_batch_keeps_its_progress_and_resumes(self, enqueue):
+        original = giftcard_service.inserir_codigos_unicos
+        chamadas = []
+
+        def falhar_no_segundo_bloco(*args, **kwargs):
+            chamadas.append(args[1])
+            if len(chamadas) == 2:
+                raise GeracaoGiftCardError("sem códigos")
+            return original(*args, **kwargs)
+
+        with mock.patch.object(giftcard_service, "inserir_codigos_unicos", side_effect=falhar_no_segundo_bloco):
+            lote = executar_lote_giftcards(self.lote_id)
+
+        self.assertEqual((lote.status, lote.quantidade_gerada, lote.erro), (StatusGiftCardLote.FALHOU, 4, "sem códigos"))
+        iniciado_em = lote.iniciado_em
+
+        self.assertEqual(self._retomar().status, StatusGiftCardLote.PENDENTE)
+        enqueue.assert_called_once()
+        with mock.patch.object(
+            giftcard_service, "inserir_codigos_unicos", wraps=original
+        ) as inserir:
+            lote = executar_lote_giftcards(self.lote_id)
+
+        self.assertEqual([chamada.args[1] for chamada in inserir.call_args_list], [4, 2])
+        self.assertEqual((lote.status, lote.quantidade_gerada, lote.iniciado_em), (StatusGiftCardLote.CONCLUIDO, 10, iniciado_em))
+        with self.sessao() as session:
+            self.assertEqual(len(session.exec(select(GiftCard.id).where(GiftCard.lote_id == self.lote_id)).all()), 10)
+
+    def test_pending_batch_lost_by_the_queue_can_be_resumed(self, enqueue):
+        with self.assertRaises(HTTPException) as contexto:
+            self._retomar()
+        self.assertEqual(contexto.exception.status_code, 400)
+
+        with self.sessao() as session:
+            lote = session.get(GiftCardLote, self.lote_id)
+            lote.atualizado_em = datetime.datetime.utcnow() - giftcard_service.LOTE_PARADO_APOS - datetime.timedelta(minutes=1)
+            session.add(lote)
+            session.commit()
+
+        self.assertEqual(self._retomar().status, StatusGiftCardLote.PENDENTE)
+        enqueue.assert_called_once()
+        self.assertEqual(executar_lote_giftcards(self.lote_id).status, StatusGiftCardLote.CONCLUIDO)
+
+    def test_running_batch_is_not_executed_twice(self, enqueue):
+        with self.sessao() as session:
+            lote = session.get(GiftCardLote, self.lote_id)
+            lote.status = StatusGiftCardLote.EM_ANDAMENTO
+            session.add(lote)
+            session.commit()
+
+        self.assertIsNone(executar_lote_giftcards(self.lote_id))
+        self.assertEqual(self._lote().quantidade_gerada, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
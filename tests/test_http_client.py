@@ -0,0 +1,155 @@
+import asyncio
+import unittest
+import uuid
+from unittest import mock
+
+import httpx
+
+from app.core import http_client
+from app.core.config import settings
+from app.core.http_client import CircuitoAbertoError, ClienteHttpAsync, Disjuntor
+
+
+class _RelogioFalso:
+    def __init__(self):
+        self.agora = 0.0
+
+    def __call__(self):
+        return self.agora
+
+
+class DisjuntorTestCase(unittest.TestCase):
+    def test_opens_after_consecutive_failures_and_rejects(self):
+        relogio = _RelogioFalso()
+        disjuntor = Disjuntor("mp", limite_falhas=2, segundos_reset=30, relogio=relogio)
+
+        disjuntor.permitir()
+        disjuntor.registrar_falha()
+        disjuntor.permitir()
+        disjuntor.registrar_falha()
+
+        self.assertEqual(disjuntor.estado, Disjuntor.ABERTO)
+        with self.assertRaises(CircuitoAbertoError):
+            disjuntor.permitir()
+
+    def test_half_open_lets_one_probe_through(self):
+        relogio = _RelogioFalso()
+        disjuntor = Disjuntor("mp", limite_falhas=1, segundos_reset=30, relogio=relogio)
+        disjuntor.registrar_falha()
+
+        relogio.agora = 31.0
+        disjuntor.permitir()
+        with self.assertRaises(CircuitoAbertoError):
+            disjuntor.permitir()
+
+        disjuntor.registrar_sucesso()
+        self.assertEqual(disjuntor.estado, Disjuntor.FECHADO)
+        disjuntor.permitir()
+
+    def test_failed_probe_reopens(self):
+        relogio = _RelogioFalso()
+        disjuntor = Disjuntor("mp", limite_falhas=3, segundos_reset=30, relogio=relogio)
+        for _ in range(3):
+            disjuntor.registrar_falha()
+
+        relogio.agora = 31.0
+        disjuntor.permitir()
+        disjuntor.registrar_falha()
+
+        self.assertEqual(disjuntor.estado, Disjuntor.ABERTO)
+        with self.assertRaises(CircuitoAbertoError):
+            disjuntor.permitir()
+
+
+@mock.patch.object(settings, "HTTP_MAX_TENTATIVAS", 3)
+@mock.patch.object(settings, "HTTP_CIRCUITO_LIMITE_FALHAS", 5)
+@mock.patch.object(http_client.asyncio, "sleep", new_callable=mock.AsyncMock)
+class ClienteHttpAsyncTestCase(unittest.TestCase):
+    def setUp(self):
+        # Cada teste usa um upstream novo: disjuntores e métricas são globais.
+        self.upstream = f"teste-{uuid.uuid4()}"
+        self.chamadas: list[httpx.Request] = []
+
+    def _chamar(self, respostas, method="GET", **kwargs):
+        """Faz a chamada por um MockTransport que devolve (ou levanta) `respostas` em ordem."""
+        respostas = iter(respostas)
+
+        def transporte(request: httpx.Request) -> httpx.Response:
+            self.chamadas.append(request)
+            resposta = next(respostas)
+            if isinstance(resposta, Exception):
+                raise resposta
+            return resposta
+
+        async def cenario():
+            async with ClienteHttpAsync(transport=httpx.MockTransport(transporte)) as cliente:
+                return await cliente.request(method, "https://api.example.com/v1", upstream=self.upstream, **kwargs)
+
+        return asyncio.run(cenario())
+
+    def _metricas(self) -> dict:
+        return next(item for item in http_client.metricas_upstreams() if item["upstream"] == self.upstream)
+
+    def test_5xx_and_timeouts_are_retried_up_to_the_limit(self, sleep):
+        with self.assertRaises(httpx.ReadTimeout):
+            self._chamar([httpx.Response(503), httpx.ReadTimeout("lento"), httpx.ReadTimeout("lento")])
+
+        self.assertEqual(len(self.chamadas), 3)
+        self.assertEqual(sleep.await_count, 2)
+        self.assertEqual((self._metricas()["chamadas"], self._metricas()["retentativas"]), (3, 2))
+
+    def test_success_after_retry_returns_the_response(self, sleep):
+        resposta = self._chamar([httpx.Response(502), httpx.Response(200, json={"ok": True})])
+
+        self.assertEqual((resposta.status_code, len(self.chamadas)), (200, 2))
+
+    def test_client_errors_are_not_retried(self, sleep):
+        resposta = self._chamar([httpx.Response(400)])
+
+        self.assertEqual((resposta.status_code, len(self.chamadas)), (400, 1))
+        sleep.assert_not_awaited()
+
+    def test_retry_after_sets_the_wait(self, sleep):
+        self._chamar([httpx.Response(429, headers={"Retry-After": "2"}), httpx.Response(200)])
+
+        sleep.assert_awaited_once_with(2.0)
+
+    def test_retry_after_is_capped(self, sleep):
+        self._chamar([httpx.Response(503, headers={"Retry-After": "600"}), httpx.Response(200)])
+
+        sleep.assert_awaited_once_with(settings.HTTP_BACKOFF_MAX_SECONDS)
+
+    def test_post_without_idempotency_key_is_not_retried(self, sleep):
+        resposta = self._chamar([httpx.Response(503), httpx.Response(200)], method="POST", json={})
+
+        self.assertEqual((resposta.status_code, len(self.chamadas)), (503, 1))
+        sleep.assert_not_awaited()
+
+    def test_post_with_idempotency_key_is_retried(self, sleep):
+        resposta = self._chamar(
+            [httpx.Response(503), httpx.Response(201)],
+            method="POST",
+            json={},
+            headers={"X-Idempotency-Key": "pedido-1"},
+        )
+
+        self.assertEqual((resposta.status_code, len(self.chamadas)), (201, 2))
+        self.assertEqual(self.chamadas[1].headers["X-Idempotency-Key"], "pedido-1")
+
+    def test_repeated_failures_open_the_circuit(self, sleep):
+        # 5 falhas seguidas: duas chamadas de 3 tentativas, a segunda abre o circuito no meio.
+        with self.assertRaises(CircuitoAbertoError):
+            for _ in range(2):
+                self._chamar([httpx.Response(503)] * 3)
+        self.assertEqual(len(self.chamadas), 5)
+
+        with self.assertRaises(CircuitoAbertoError):
+            self._chamar([httpx.Response(200)])
+
+        self.assertEqual(len(self.chamadas), 5)
+        metricas = self._metricas()
+        self.assertEqual((metricas["estado_circuito"], metricas["rejeitadas_circuito"]), (Disjuntor.ABERTO, 2))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,263 @@
+import datetime
+import unittest
+from decimal import Decimal
+
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.models.conta_mae_models import ContaMae, ContaMaeConvite
+from app.models.pedido_models import Pedido
+from app.models.produto_models import EstoqueConta, Produto
+from app.models.usuario_models import Usuario
+from app.services.pedido_expiracao_service import (
+    ORIGEM_CONTA_MAE,
+    ORIGEM_ESTOQUE,
+    recalcular_expiracao_efetiva,
+    recalcular_expiracao_pedidos_em_lotes,
+    resolver_data_expiracao_pedido,
+    resolver_datas_expiracao_pedidos,
+)
+from banco_teste import BancoTestCase
+
+DATA_CONVITE = datetime.date(2026, 12, 1)
+DATA_CONTA_MAE = datetime.date(2026, 11, 15)
+DATA_ESTOQUE = datetime.date(2026, 11, 1)
+
+
+class ExpiracaoPedidoTestCase(BancoTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.sessao() as session:
+            usuario = Usuario(telegram_id=666, nome_completo="Cliente")
+            produto = Produto(nome="Streaming", preco=Decimal("10.00"))
+            session.add(usuario)
+            session.add(produto)
+            session.flush()
+            self.usuario_id, self.produto_id = usuario.id, produto.id
+
+            contas_mae = {
+                "convite": ContaMae(login="convite@example.com", senha="x", data_expiracao=DATA_CONVITE, produto_id=produto.id),
+                "pedido": ContaMae(login="pedido@example.com", senha="x", data_expiracao=DATA_CONTA_MAE, produto_id=produto.id),
+                "sem-data": ContaMae(login="sem-data@example.com", senha="x", produto_id=produto.id),
+            }
+            estoques = {
+                "estoque": EstoqueConta(login="e", senha="x", data_expiracao=DATA_ESTOQUE, produto_id=produto.id),
+                "sem-data": EstoqueConta(login="s", senha="x", produto_id=produto.id),
+            }
+            for conta in (*contas_mae.values(), *estoques.values()):
+                session.add(conta)
+            session.commit()
+            self.conta_mae_ids = {nome: conta.id for nome, conta in contas_mae.items()}
+            self.estoque_ids = {nome: conta.id for nome, conta in estoques.items()}
+
+    def _pedido(self, session, *, conta_mae=None, estoque=None, email=None, convite=None, email_convite=None) -> Pedido:
+        pedido = Pedido(
+            valor_pago=Decimal("10.00"),
+            usuario_id=self.usuario_id,
+            produto_id=self.produto_id,
+            email_cliente=email,
+            conta_mae_id=self.conta_mae_ids[conta_mae] if conta_mae else None,
+            estoque_conta_id=self.estoque_ids[estoque] if estoque else None,
+        )
+        session.add(pedido)
+        session.flush()
+        if convite:
+            session.add(
+                ContaMaeConvite(
+                    conta_mae_id=self.conta_mae_ids[convite],
+                    pedido_id=pedido.id,
+                    email_cliente=email_convite or email or "cliente@example.com",
+                )
+            )
+        return pedido
+
+
+class ResolverExpiracaoTestCase(ExpiracaoPedidoTestCase):
+    CASOS = {
+        "convite": (
+            dict(conta_mae="pedido", convite="convite", email="cliente@example.com"),
+            (DATA_CONVITE, ORIGEM_CONTA_MAE),
+        ),
+        "convite-sem-email-no-pedido": (dict(conta_mae="pedido", convite="convite", email=""), (DATA_CONVITE, ORIGEM_CONTA_MAE)),
+        "convite-de-outro-email": (
+            dict(conta_mae="pedido", convite="convite", email="cliente@example.com", email_convite="outro@example.com"),
+            (DATA_CONTA_MAE, ORIGEM_CONTA_MAE),
+        ),
+        "convite-em-conta-sem-data": (dict(conta_mae="pedido", convite="sem-data"), (DATA_CONTA_MAE, ORIGEM_CONTA_MAE)),
+        "conta-mae-do-pedido": (dict(conta_mae="pedido", estoque="estoque"), (DATA_CONTA_MAE, ORIGEM_CONTA_MAE)),
+        "conta-mae-sem-data": (dict(conta_mae="sem-data", estoque="estoque"), (DATA_ESTOQUE, ORIGEM_ESTOQUE)),
+        "estoque-do-pedido": (dict(estoque="estoque"), (DATA_ESTOQUE, ORIGEM_ESTOQUE)),
+        "estoque-sem-data": (dict(estoque="sem-data"), (None, None)),
+        "nenhuma": (dict(), (None, None)),
+    }
+
+    def test_bulk_resolver_matches_per_order_resolver(self):
+        with self.sessao() as session:
+            pedidos = {nome: self._pedido(session, **campos).id for nome, (campos, _) in self.CASOS.items()}
+            session.commit()
+
+            em_lote = resolver_datas_expiracao_pedidos(session, [*pedidos.values(), *pedidos.values()])
+
+            self.assertEqual(set(em_lote), set(pedidos.values()))
+            for nome, pedido_id in pedidos.items():
+                with self.subTest(nome):
+                    esperado = self.CASOS[nome][1]
+                    self.assertEqual(resolver_data_expiracao_pedido(session=session, pedido_id=pedido_id), esperado)
+                    self.assertEqual(em_lote[pedido_id], esperado)
+
+    def test_first_invite_wins(self):
+        with self.sessao() as session:
+            pedido = self._pedido(session, convite="pedido", email="")
+            session.add(
+                ContaMaeConvite(
+                    conta_mae_id=self.conta_mae_ids["convite"],
+                    pedido_id=pedido.id,
+                    email_cliente="segundo@example.com",
+                    criado_em=datetime.datetime.utcnow() + datetime.timedelta(minutes=1),
+                )
+            )
+            session.commit()
+
+            esperado = (DATA_CONTA_MAE, ORIGEM_CONTA_MAE)
+            self.assertEqual(resolver_data_expiracao_pedido(session=session, pedido_id=pedido.id), esperado)
+            self.assertEqual(resolver_datas_expiracao_pedidos(session, [pedido.id])[pedido.id], esperado)
+
+    def test_empty_input(self):
+        with self.sessao() as session:
+            self.assertEqual(resolver_datas_expiracao_pedidos(session, []), {})
+
+
+class ExpiracaoMaterializadaTestCase(ExpiracaoPedidoTestCase):
+    def _materializada(self, pedido_id) -> tuple:
+        with self.sessao() as session:
+            pedido = session.get(Pedido, pedido_id)
+            return pedido.data_expiracao_efetiva, pedido.origem_expiracao
+
+    def test_new_order_and_invite_are_materialized_on_flush(self):
+        with self.sessao() as session:
+            pedido = self._pedido(session, estoque="estoque")
+            pedido_id = pedido.id
+            self.assertEqual((pedido.data_expiracao_efetiva, pedido.origem_expiracao), (DATA_ESTOQUE, ORIGEM_ESTOQUE))
+            session.add(ContaMaeConvite(conta_mae_id=self.conta_mae_ids["convite"], pedido_id=pedido_id, email_cliente="c@example.com"))
+            session.commit()
+
+        self.assertEqual(self._materializada(pedido_id), (DATA_CONVITE, ORIGEM_CONTA_MAE))
+
+    def test_parent_account_expiry_propagates_to_its_orders(self):
+        nova_data = datetime.date(2027, 3, 1)
+        with self.sessao() as session:
+            pelo_pedido = self._pedido(session, conta_mae="pedido")
+            pelo_convite = self._pedido(session, convite="pedido", estoque="estoque")
+            outro = self._pedido(session, conta_mae="convite")
+            session.commit()
+            ids = pelo_pedido.id, pelo_convite.id, outro.id
+            self.assertEqual(pelo_convite.data_expiracao_efetiva, DATA_CONTA_MAE)
+
+            conta = session.get(ContaMae, self.conta_mae_ids["pedido"])
+            conta.data_expiracao = nova_data
+            session.add(conta)
+            session.flush()
+            # Pedidos já carregados na sessão recebem o valor sem novo SELECT.
+            self.assertEqual(pelo_pedido.data_expiracao_efetiva, nova_data)
+            session.commit()
+
+            conta.data_expiracao = None
+            session.add(conta)
+            session.commit()
+
+        self.assertEqual(
+            [self._materializada(pedido_id) for pedido_id in ids],
+            [(None, None), (DATA_ESTOQUE, ORIGEM_ESTOQUE), (DATA_CONVITE, ORIGEM_CONTA_MAE)],
+        )
+
+    def test_invite_changes_propagate_to_the_order(self):
+        with self.sessao() as session:
+            pedido_id = self._pedido(session, conta_mae="pedido", convite="convite").id
+            session.commit()
+            self.assertEqual(self._materializada(pedido_id), (DATA_CONVITE, ORIGEM_CONTA_MAE))
+
+            convite = session.exec(select(ContaMaeConvite).where(ContaMaeConvite.pedido_id == pedido_id)).one()
+            convite.conta_mae_id = self.conta_mae_ids["sem-data"]
+            session.add(convite)
+            session.commit()
+            self.assertEqual(self._materializada(pedido_id), (DATA_CONTA_MAE, ORIGEM_CONTA_MAE))
+
+            convite.conta_mae_id = self.conta_mae_ids["convite"]
+            session.add(convite)
+            session.commit()
+            self.assertEqual(self._materializada(pedido_id), (DATA_CONVITE, ORIGEM_CONTA_MAE))
+            session.delete(convite)
+            session.commit()
+
+        self.assertEqual(self._materializada(pedido_id), (DATA_CONTA_MAE, ORIGEM_CONTA_MAE))
+
+    def test_order_links_and_stock_expiry_propagate(self):
+        nova_data = datetime.date(2027, 1, 10)
+        with self.sessao() as session:
+            pedido = self._pedido(session)
+            pedido_id = pedido.id
+            session.commit()
+            self.assertEqual(self._materializada(pedido_id), (None, None))
+
+            pedido.estoque_conta_id = self.estoque_ids["sem-data"]
+            session.add(pedido)
+            session.commit()
+            self.assertEqual(self._materializada(pedido_id), (None, None))
+
+            pedido.conta_mae_id = self.conta_mae_ids["pedido"]
+            session.add(pedido)
+            session.commit()
+            self.assertEqual(self._materializada(pedido_id), (DATA_CONTA_MAE, ORIGEM_CONTA_MAE))
+
+            pedido.conta_mae_id = None
+            session.add(pedido)
+
+            estoque = session.get(EstoqueConta, self.estoque_ids["sem-data"])
+            estoque.data_expiracao = nova_data
+            session.add(estoque)
+            session.commit()
+
+        self.assertEqual(self._materializada(pedido_id), (nova_data, ORIGEM_ESTOQUE))
+
+    def test_recalculation_only_writes_changed_rows(self):
+        with self.sessao() as session:
+            pedidos = [self._pedido(session, estoque="estoque").id for _ in range(3)]
+            session.commit()
+
+            self.assertEqual(recalcular_expiracao_efetiva(session, Pedido.id.in_(pedidos)), 0)
+            session.exec(update(Pedido).where(Pedido.id == pedidos[0]).values(data_expiracao_efetiva=None))
+            self.assertEqual(recalcular_expiracao_efetiva(session, Pedido.id.in_(pedidos)), 1)
+            session.commit()
+
+        self.assertEqual(self._materializada(pedidos[0]), (DATA_ESTOQUE, ORIGEM_ESTOQUE))
+
+    def test_backfill_matches_the_resolver(self):
+        casos = ResolverExpiracaoTestCase.CASOS
+        with self.sessao() as session:
+            pedidos = [self._pedido(session, **campos).id for campos, _ in casos.values()]
+            session.commit()
+            # Coluna fora de sincronia (ex.: pedidos anteriores à migração).
+            session.exec(
+                update(Pedido)
+                .where(Pedido.id.in_(pedidos[:4]))
+                .values(data_expiracao_efetiva=datetime.date(2000, 1, 1), origem_expiracao="X")
+            )
+            session.commit()
+
+            relatorio = recalcular_expiracao_pedidos_em_lotes(session, tamanho_lote=2)
+            esperado = resolver_datas_expiracao_pedidos(session, pedidos)
+            materializado = {
+                pedido_id: (data, origem)
+                for pedido_id, data, origem in session.exec(
+                    select(Pedido.id, Pedido.data_expiracao_efetiva, Pedido.origem_expiracao)
+                ).all()
+            }
+
+        self.assertEqual(relatorio, {"processados": len(casos), "atualizados": 4, "lotes": (len(casos) + 1) // 2})
+        self.assertEqual(materializado, esperado)
+        with self.sessao() as session:
+            self.assertEqual(recalcular_expiracao_pedidos_em_lotes(session, tamanho_lote=2)["atualizados"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,136 @@
+import datetime
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from sqlalchemy import func
+from sqlmodel import select
+
+from app.models.base import TipoStatusPagamento
+from app.models.usuario_models import MovimentacaoCarteira, RecargaSaldo, Usuario
+from app.services import recarga_reconciliacao_service
+from app.services.recarga_reconciliacao_service import (
+    ClienteGatewayPagamentos,
+    ClienteGatewayStub,
+    ClienteMercadoPago,
+    reconciliar_recargas_pendentes,
+)
+from banco_teste import BancoTestCase
+
+
+class ClienteGatewayPagamentosTestCase(unittest.TestCase):
+    def test_client_without_lookup_fails_when_built(self):
+        class ClienteIncompleto(ClienteGatewayPagamentos):
+            pass
+
+        with self.assertRaises(TypeError):
+            ClienteIncompleto()
+
+
+class ClienteGatewayStubTestCase(unittest.TestCase):
+    def test_unknown_ids_use_default_and_none_means_lookup_failed(self):
+        cliente = ClienteGatewayStub({"A": "approved", "B": None}, padrao="pending")
+
+        self.assertEqual(cliente.consultar_status(["A", "B", "C"]), {"A": "approved", "C": "pending"})
+        self.assertEqual(cliente.consultas, [["A", "B", "C"]])
+
+
+class ClienteMercadoPagoTestCase(unittest.TestCase):
+    def test_failed_lookups_are_left_out(self):
+        def consultar(gateway_id):
+            if gateway_id == "2":
+                raise RuntimeError("timeout")
+            return "approved"
+
+        with mock.patch.object(recarga_reconciliacao_service, "consultar_status_pagamento_mp", side_effect=consultar):
+            status = ClienteMercadoPago(concorrencia=2).consultar_status(["1", "2", "3"])
+
+        self.assertEqual(status, {"1": "approved", "3": "approved"})
+
+
+@mock.patch.object(recarga_reconciliacao_service, "processar_gatilho_afiliado")
+class ReconciliarRecargasTestCase(BancoTestCase):
+    STATUS = {
+        "aprovada": "approved",
+        "recusada": "rejected",
+        "cancelada": "cancelled",
+        "estornada": "refunded",
+        "sem-resposta": None,
+        "pendente": "pending",
+    }
+
+    def setUp(self):
+        super().setUp()
+        antiga = datetime.datetime.utcnow() - datetime.timedelta(hours=3)
+        with self.sessao() as session:
+            usuario = Usuario(telegram_id=222, nome_completo="Cliente")
+            session.add(usuario)
+            session.flush()
+            self.usuario_id = usuario.id
+            for gateway_id in self.STATUS:
+                session.add(
+                    RecargaSaldo(
+                        valor_solicitado=Decimal("10.00"),
+                        gateway="mercadopago",
+                        gateway_id=gateway_id,
+                        usuario_id=usuario.id,
+                        criado_em=antiga,
+                    )
+                )
+            session.commit()
+
+    def _status(self) -> dict:
+        with self.sessao() as session:
+            return dict(session.exec(select(RecargaSaldo.gateway_id, RecargaSaldo.status_pagamento)).all())
+
+    def _reconciliar(self) -> dict:
+        with self.sessao() as session:
+            return reconciliar_recargas_pendentes(session, cliente=ClienteGatewayStub(self.STATUS), tamanho_lote=2)
+
+    def test_applies_only_final_answers_and_credits_once(self, gatilho):
+        primeiro = self._reconciliar()
+        segundo = self._reconciliar()
+
+        self.assertEqual(
+            self._status(),
+            {
+                "aprovada": TipoStatusPagamento.PAGO,
+                "recusada": TipoStatusPagamento.FALHOU,
+                "cancelada": TipoStatusPagamento.FALHOU,
+                "estornada": TipoStatusPagamento.ESTORNADO,
+                "sem-resposta": TipoStatusPagamento.PENDENTE,
+                "pendente": TipoStatusPagamento.PENDENTE,
+            },
+        )
+        self.assertEqual(
+            {chave: primeiro[chave] for chave in ("aprovadas", "recusadas", "expiradas", "estornadas", "erros_gateway")},
+            {"aprovadas": 1, "recusadas": 1, "expiradas": 1, "estornadas": 1, "erros_gateway": 1},
+        )
+        self.assertEqual((segundo["aprovadas"], segundo["verificadas"]), (0, 2))
+        with self.sessao() as session:
+            self.assertEqual(session.get(Usuario, self.usuario_id).saldo_carteira, Decimal("10.00"))
+            self.assertEqual(session.exec(select(func.count()).select_from(MovimentacaoCarteira)).one(), 1)
+        gatilho.assert_called_once()
+
+    def test_row_locked_by_another_transaction_is_skipped(self, gatilho):
+        with self.sessao() as outra:
+            outra.exec(select(RecargaSaldo).where(RecargaSaldo.gateway_id == "aprovada").with_for_update()).one()
+            relatorio = self._reconciliar()
+
+        self.assertEqual(relatorio["aprovadas"], 0)
+        self.assertEqual(self._status()["aprovada"], TipoStatusPagamento.PENDENTE)
+        gatilho.assert_not_called()
+
+    def test_affiliate_failure_does_not_stop_the_run(self, gatilho):
+        gatilho.side_effect = RuntimeError("falhou")
+        self.STATUS = {**self.STATUS, "recusada": "approved"}
+
+        relatorio = self._reconciliar()
+
+        self.assertEqual(relatorio["aprovadas"], 2)
+        self.assertEqual(gatilho.call_count, 2)
+        self.assertEqual(self._status()["recusada"], TipoStatusPagamento.PAGO)
+
+
+if __name__ == "__main__":
+    unittest.main()
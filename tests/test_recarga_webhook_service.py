@@ -0,0 +1,273 @@
+import datetime
+import threading
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from sqlalchemy import func
+from sqlmodel import select
+
+from app.core.config import settings
+from app.models.base import StatusWebhookEvento, TipoMovimentacaoCarteira, TipoStatusPagamento
+from app.models.usuario_models import MovimentacaoCarteira, RecargaSaldo, Usuario
+from app.models.webhook_models import WebhookEventoPagamento
+from app.services import recarga_reconciliacao_service, recarga_webhook_service
+from app.services.recarga_reconciliacao_service import ClienteGatewayStub, reconciliar_recargas_pendentes
+from app.services.recarga_webhook_service import (
+    LEASE_SEGUNDOS,
+    _registrar_falha,
+    _reivindicar_eventos,
+    calcular_backoff,
+    confirmar_recarga_aprovada,
+    processar_evento_webhook,
+    registrar_evento_webhook,
+)
+from banco_teste import BancoTestCase
+
+
+class CalcularBackoffTestCase(unittest.TestCase):
+    def test_doubles_per_attempt_with_jitter_and_cap(self):
+        for tentativas, teto in ((1, 5.0), (2, 10.0), (4, 40.0), (20, 600.0)):
+            espera = calcular_backoff(tentativas)
+            self.assertGreaterEqual(espera, teto / 2)
+            self.assertLessEqual(espera, teto)
+
+
+class WebhookTestCase(BancoTestCase):
+    def setUp(self):
+        super().setUp()
+        # A ingestão e o processador abrem as próprias sessões.
+        for alvo, valor in (("engine", self.engine), ("get_engine", lambda papel: self.engine)):
+            patcher = mock.patch.object(recarga_webhook_service, alvo, valor)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        with self.sessao() as session:
+            usuario = Usuario(telegram_id=555, nome_completo="Cliente")
+            session.add(usuario)
+            session.flush()
+            session.add(
+                RecargaSaldo(
+                    valor_solicitado=Decimal("20.00"),
+                    gateway="mercadopago",
+                    gateway_id="pix-1",
+                    bonus_cashback_percent=10,
+                    usuario_id=usuario.id,
+                )
+            )
+            session.commit()
+            self.usuario_id = usuario.id
+
+    def _eventos(self) -> list[WebhookEventoPagamento]:
+        with self.sessao() as session:
+            return list(session.exec(select(WebhookEventoPagamento).order_by(WebhookEventoPagamento.payment_id)).all())
+
+    def _alterar_evento(self, payment_id: str, **valores) -> None:
+        with self.sessao() as session:
+            evento = session.exec(
+                select(WebhookEventoPagamento).where(WebhookEventoPagamento.payment_id == payment_id)
+            ).one()
+            for campo, valor in valores.items():
+                setattr(evento, campo, valor)
+            session.add(evento)
+            session.commit()
+
+    def _carteira(self) -> tuple:
+        with self.sessao() as session:
+            usuario = session.get(Usuario, self.usuario_id)
+            movimentacoes = session.exec(
+                select(MovimentacaoCarteira.tipo, MovimentacaoCarteira.valor).order_by(MovimentacaoCarteira.criado_em)
+            ).all()
+            return usuario.saldo_carteira, usuario.total_recargas_pagas, [tuple(linha) for linha in movimentacoes]
+
+
+class RegistrarEventoTestCase(WebhookTestCase):
+    def test_redelivery_only_counts_receipts(self):
+        registrar_evento_webhook("pix-1", "payment.updated", {"id": "pix-1"})
+        registrar_evento_webhook("pix-1", "payment.updated", {"id": "pix-1"})
+        registrar_evento_webhook("pix-1", "payment.created", {"id": "pix-1"})
+
+        eventos = self._eventos()
+        self.assertEqual(sorted((evento.acao, evento.recebimentos) for evento in eventos), [("payment.created", 1), ("payment.updated", 2)])
+        self.assertTrue(all(evento.status == StatusWebhookEvento.PENDENTE for evento in eventos))
+
+    def test_redelivery_rearms_only_non_final_statuses(self):
+        futuro = datetime.datetime.utcnow() + datetime.timedelta(hours=1)
+        casos = {
+            "pendente-no-gateway": (StatusWebhookEvento.PROCESSADO, "pending", StatusWebhookEvento.PENDENTE),
+            "falhou-sem-resposta": (StatusWebhookEvento.FALHOU, None, StatusWebhookEvento.PENDENTE),
+            "aprovado": (StatusWebhookEvento.PROCESSADO, "approved", StatusWebhookEvento.PROCESSADO),
+            "estornado": (StatusWebhookEvento.PROCESSADO, "refunded", StatusWebhookEvento.PROCESSADO),
+        }
+        for payment_id, (status, status_gateway, _) in casos.items():
+            registrar_evento_webhook(payment_id, "payment.updated", {})
+            self._alterar_evento(
+                payment_id, status=status, status_gateway=status_gateway, tentativas=3, proxima_tentativa_em=futuro
+            )
+            registrar_evento_webhook(payment_id, "payment.updated", {})
+
+        for evento in self._eventos():
+            esperado = casos[evento.payment_id][2]
+            with self.subTest(evento.payment_id):
+                self.assertEqual(evento.status, esperado)
+                self.assertEqual(evento.recebimentos, 2)
+                rearmado = esperado == StatusWebhookEvento.PENDENTE
+                self.assertEqual(evento.tentativas, 0 if rearmado else 3)
+                self.assertEqual(evento.proxima_tentativa_em < futuro, rearmado)
+
+    def test_redelivery_keeps_the_backoff_of_a_pending_event(self):
+        futuro = datetime.datetime.utcnow() + datetime.timedelta(minutes=5)
+        registrar_evento_webhook("pix-1", "payment.updated", {})
+        self._alterar_evento("pix-1", tentativas=2, proxima_tentativa_em=futuro)
+
+        registrar_evento_webhook("pix-1", "payment.updated", {})
+
+        evento = self._eventos()[0]
+        self.assertEqual((evento.tentativas, evento.proxima_tentativa_em, evento.recebimentos), (2, futuro, 2))
+
+
+@mock.patch.object(recarga_reconciliacao_service, "processar_gatilho_afiliado")
+@mock.patch.object(recarga_webhook_service, "processar_gatilho_afiliado")
+@mock.patch.object(recarga_webhook_service, "consultar_status_pagamento_mp", return_value="approved")
+class ConfirmarRecargaTestCase(WebhookTestCase):
+    CREDITOS = [
+        (TipoMovimentacaoCarteira.RECARGA, Decimal("20.00")),
+        (TipoMovimentacaoCarteira.BONUS_CASHBACK, Decimal("2.00")),
+    ]
+
+    def test_same_payment_twice_credits_once(self, consultar, gatilho, gatilho_reconciliacao):
+        with self.sessao() as session:
+            resultado, usuario, recarga = confirmar_recarga_aprovada(session, "pix-1")
+            session.commit()
+            self.assertEqual(resultado, "pagamento_creditado_sucesso")
+            self.assertEqual(recarga.status_pagamento, TipoStatusPagamento.PAGO)
+
+            self.assertEqual(confirmar_recarga_aprovada(session, "pix-1"), ("ja_pago", None, None))
+            self.assertEqual(confirmar_recarga_aprovada(session, "outro"), ("recarga_nao_encontrada", None, None))
+            session.commit()
+
+        self.assertEqual(self._carteira(), (Decimal("22.00"), 1, self.CREDITOS))
+
+    def test_concurrent_confirmations_wait_for_the_row_lock(self, consultar, gatilho, gatilho_reconciliacao):
+        resultados = []
+        with self.sessao() as primeira:
+            resultados.append(confirmar_recarga_aprovada(primeira, "pix-1")[0])
+
+            def segunda():
+                with self.sessao() as session:
+                    resultados.append(confirmar_recarga_aprovada(session, "pix-1")[0])
+                    session.commit()
+
+            concorrente = threading.Thread(target=segunda)
+            concorrente.start()
+            concorrente.join(0.3)
+            self.assertTrue(concorrente.is_alive())  # parada no FOR UPDATE
+            primeira.commit()
+            concorrente.join(5)
+
+        self.assertEqual(resultados, ["pagamento_creditado_sucesso", "ja_pago"])
+        self.assertEqual(self._carteira(), (Decimal("22.00"), 1, self.CREDITOS))
+
+    def test_webhook_and_reconciliation_credit_once(self, consultar, gatilho, gatilho_reconciliacao):
+        registrar_evento_webhook("pix-1", "payment.updated", {})
+        registrar_evento_webhook("pix-1", "payment.created", {})
+        primeiro, segundo = (evento.id for evento in self._eventos())
+
+        self.assertEqual(processar_evento_webhook(primeiro), "pagamento_creditado_sucesso")
+        self.assertEqual(processar_evento_webhook(segundo), "ja_pago")
+        self.assertIsNone(processar_evento_webhook(primeiro))
+        with self.sessao() as session:
+            relatorio = reconciliar_recargas_pendentes(session, cliente=ClienteGatewayStub(padrao="approved"))
+
+        self.assertEqual(relatorio["aprovadas"], 0)
+        self.assertEqual(self._carteira(), (Decimal("22.00"), 1, self.CREDITOS))
+        gatilho.assert_called_once()
+        gatilho_reconciliacao.assert_not_called()
+        self.assertTrue(all(evento.status == StatusWebhookEvento.PROCESSADO for evento in self._eventos()))
+
+    def test_webhook_after_reconciliation_is_a_duplicate(self, consultar, gatilho, gatilho_reconciliacao):
+        with self.sessao() as session:
+            relatorio = reconciliar_recargas_pendentes(session, cliente=ClienteGatewayStub(padrao="approved"))
+        registrar_evento_webhook("pix-1", "payment.updated", {})
+
+        self.assertEqual(relatorio["aprovadas"], 1)
+        self.assertEqual(processar_evento_webhook(self._eventos()[0].id), "ja_pago")
+        self.assertEqual(self._carteira(), (Decimal("22.00"), 1, self.CREDITOS))
+        gatilho.assert_not_called()
+        gatilho_reconciliacao.assert_called_once()
+
+
+class ReivindicarEventosTestCase(WebhookTestCase):
+    def setUp(self):
+        super().setUp()
+        for payment_id in ("a", "b", "c", "futuro"):
+            registrar_evento_webhook(payment_id, "payment.updated", {})
+        self._alterar_evento("futuro", proxima_tentativa_em=datetime.datetime.utcnow() + datetime.timedelta(hours=1))
+        self.ids = {evento.payment_id: evento.id for evento in self._eventos()}
+
+    def test_claimed_events_are_leased(self):
+        inicio = datetime.datetime.utcnow()
+        reivindicados = _reivindicar_eventos(10)
+
+        self.assertEqual(set(reivindicados), {self.ids["a"], self.ids["b"], self.ids["c"]})
+        for evento in self._eventos():
+            if evento.id in reivindicados:
+                self.assertGreaterEqual(evento.proxima_tentativa_em, inicio + datetime.timedelta(seconds=LEASE_SEGUNDOS))
+                self.assertEqual(evento.status, StatusWebhookEvento.PENDENTE)
+        self.assertEqual(_reivindicar_eventos(10), [])
+
+    def test_expired_lease_returns_to_the_queue(self):
+        _reivindicar_eventos(10)
+        self._alterar_evento("b", proxima_tentativa_em=datetime.datetime.utcnow() - datetime.timedelta(seconds=1))
+
+        self.assertEqual(_reivindicar_eventos(10), [self.ids["b"]])
+
+    def test_limit_and_locked_rows_are_skipped(self):
+        with self.sessao() as outra:
+            outra.exec(
+                select(WebhookEventoPagamento).where(WebhookEventoPagamento.id == self.ids["a"]).with_for_update()
+            ).one()
+            self.assertEqual(len(_reivindicar_eventos(1)), 1)
+            self.assertEqual(len(_reivindicar_eventos(10)), 1)
+            self.assertEqual(_reivindicar_eventos(10), [])
+            outra.rollback()
+
+        self.assertEqual(_reivindicar_eventos(10), [self.ids["a"]])
+
+
+@mock.patch.object(settings, "WEBHOOK_MP_MAX_TENTATIVAS", 3)
+class RegistrarFalhaTestCase(WebhookTestCase):
+    def setUp(self):
+        super().setUp()
+        registrar_evento_webhook("pix-1", "payment.updated", {})
+        self.evento_id = self._eventos()[0].id
+
+    def test_failures_back_off_and_give_up_at_the_limit(self):
+        for tentativas, teto in ((1, 5.0), (2, 10.0)):
+            inicio = datetime.datetime.utcnow()
+            _registrar_falha(self.evento_id, "timeout")
+            evento = self._eventos()[0]
+            self.assertEqual((evento.status, evento.tentativas, evento.ultimo_erro), (StatusWebhookEvento.PENDENTE, tentativas, "timeout"))
+            espera = (evento.proxima_tentativa_em - inicio).total_seconds()
+            self.assertGreaterEqual(espera, teto / 2 - 0.5)
+            self.assertLessEqual(espera, teto + 0.5)
+
+        _registrar_falha(self.evento_id, "timeout")
+        self.assertEqual((self._eventos()[0].status, self._eventos()[0].tentativas), (StatusWebhookEvento.FALHOU, 3))
+
+        _registrar_falha(self.evento_id, "timeout")
+        self.assertEqual(self._eventos()[0].tentativas, 3)
+
+    def test_gateway_error_goes_through_the_backoff(self):
+        with mock.patch.object(
+            recarga_webhook_service, "consultar_status_pagamento_mp", side_effect=RuntimeError("gateway fora")
+        ):
+            self.assertIsNone(processar_evento_webhook(self.evento_id))
+
+        evento = self._eventos()[0]
+        self.assertEqual((evento.status, evento.tentativas, evento.ultimo_erro), (StatusWebhookEvento.PENDENTE, 1, "gateway fora"))
+        self.assertGreater(evento.proxima_tentativa_em, datetime.datetime.utcnow())
+        self.assertEqual(self._carteira()[0], Decimal("0.00"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import unittest
+from unittest import mock
+
+from sqlalchemy import exc, text
+from sqlalchemy.engine import make_url
+
+from app.core.config import settings
+from app.db import database
+from app.db.replica import GuardaReplica
+
+REPLICA_URL = os.environ.get("TEST_DATABASE_REPLICA_URL")
+
+
+class GuardaReplicaTestCase(unittest.TestCase):
+    def setUp(self):
+        self.agora = 1000.0
+        self.lag = 0.0
+        self.medicoes = 0
+
+    def _medir(self):
+        self.medicoes += 1
+        if isinstance(self.lag, Exception):
+            raise self.lag
+        return self.lag
+
+    def _guarda(self):
+        return GuardaReplica(self._medir, lag_maximo=10, verificar_a_cada=5, relogio=lambda: self.agora)
+
+    def test_lag_is_measured_once_per_window(self):
+        guarda = self._guarda()
+
+        self.assertTrue(guarda.usar_replica())
+        self.assertTrue(guarda.usar_replica())
+        self.assertEqual(self.medicoes, 1)
+
+    def test_lagging_replica_falls_back_to_primary_until_it_catches_up(self):
+        guarda = self._guarda()
+        self.lag = 30.0
+        self.assertFalse(guarda.usar_replica())
+
+        self.lag = 2.0
+        self.agora += 1
+        self.assertFalse(guarda.usar_replica())
+        self.agora += 5
+        self.assertTrue(guarda.usar_replica())
+        self.assertEqual((guarda.leituras_replica, guarda.leituras_primario), (1, 2))
+
+    def test_measurement_error_or_unknown_lag_uses_primary(self):
+        guarda = self._guarda()
+        self.lag = ConnectionError("réplica fora do ar")
+        self.assertFalse(guarda.usar_replica())
+        self.assertEqual(guarda.erros, 1)
+
+        self.lag = None
+        self.agora += 5
+        self.assertFalse(guarda.usar_replica())
+
+
+class RotasLeituraTestCase(unittest.TestCase):
+    def test_admin_read_routes_use_read_session_and_writes_stay_on_primary(self):
+        from app.api.v1.api import api_router
+
+        def usa_sessao_leitura(rota):
+            pendentes = [rota.dependant]
+            while pendentes:
+                dependencia = pendentes.pop()
+                if dependencia.call is database.get_read_session:
+                    return True
+                pendentes.extend(dependencia.dependencies)
+            return False
+
+        rotas = {(rota.path, tuple(sorted(rota.methods))): rota for rota in api_router.routes if hasattr(rota, "dependant")}
+        for caminho in (
+            "/admin/dashboard/overview",
+            "/admin/dashboard/analitico",
+            "/admin/pedidos/",
+            "/admin/usuarios/",
+            "/admin/email-monitor/messages",
+            "/admin/email-monitor/audit",
+        ):
+            self.assertTrue(usa_sessao_leitura(rotas[(caminho, ("GET",))]), caminho)
+        self.assertFalse(usa_sessao_leitura(rotas[("/admin/dashboard/agregados/reconstruir", ("POST",))]))
+        self.assertFalse(usa_sessao_leitura(rotas[("/compras/", ("POST",))]))
+
+
+@unittest.skipUnless(REPLICA_URL, "defina TEST_DATABASE_REPLICA_URL (um segundo banco local) para rodar")
+class ReplicaLocalTestCase(unittest.TestCase):
+    """Usa um segundo banco local no papel de réplica."""
+
+    def setUp(self):
+        database._engines.pop(f"{settings.DB_PAPEL}-replica", None)
+        patches = [
+            mock.patch.object(settings, "DATABASE_REPLICA_URL", REPLICA_URL),
+            mock.patch.object(
+                database,
+                "guarda_replica",
+                GuardaReplica(database._medir_lag_replica, lag_maximo=10, verificar_a_cada=0),
+            ),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(lambda: database._engines.pop(f"{settings.DB_PAPEL}-replica", None))
+
+    def _banco_da_sessao_de_leitura(self):
+        sessoes = database.get_read_session()
+        session = next(sessoes)
+        self.addCleanup(sessoes.close)
+        return session, session.exec(text("SELECT current_database()")).scalar_one()
+
+    def test_reads_go_to_replica_connections_which_reject_writes(self):
+        session, banco = self._banco_da_sessao_de_leitura()
+
+        self.assertEqual(banco, make_url(REPLICA_URL).database)
+        with self.assertRaises(exc.InternalError):
+            session.exec(text("CREATE TEMP TABLE escrita_na_replica (id int)"))
+
+    def test_lag_above_limit_falls_back_to_primary(self):
+        database.guarda_replica.lag_maximo = -1
+
+        _, banco = self._banco_da_sessao_de_leitura()
+
+        self.assertEqual(banco, make_url(settings.DATABASE_URL).database)
+        self.assertEqual(database.guarda_replica.leituras_primario, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import json
+import unittest
+
+from app.services.telegram_outbox_service import TokenBucket, classificar_resposta_telegram
+
+
+class _RelogioFalso:
+    def __init__(self):
+        self.agora = 100.0
+
+    def __call__(self):
+        return self.agora
+
+
+class _RespostaFalsa:
+    def __init__(self, status_code, corpo, headers=None):
+        self.status_code = status_code
+        self._corpo = corpo
+        self.headers = headers or {}
+        self.text = json.dumps(corpo)
+
+    def json(self):
+        return self._corpo
+
+
+class TokenBucketTestCase(unittest.TestCase):
+    def test_burst_up_to_capacity_then_waits_for_refill(self):
+        relogio = _RelogioFalso()
+        balde = TokenBucket(2.0, capacidade=2.0, relogio=relogio)
+
+        self.assertTrue(balde.consumir())
+        self.assertTrue(balde.consumir())
+        self.assertFalse(balde.consumir())
+        self.assertAlmostEqual(balde.espera(), 0.5)
+
+        relogio.agora += 0.5
+        self.assertTrue(balde.consumir())
+
+    def test_block_holds_tokens_until_retry_after(self):
+        relogio = _RelogioFalso()
+        balde = TokenBucket(1.0, capacidade=1.0, relogio=relogio)
+        balde.bloquear(3)
+
+        self.assertAlmostEqual(balde.espera(), 3.0)
+        relogio.agora += 3
+        self.assertTrue(balde.consumir())
+
+
+class ClassificarRespostaTelegramTestCase(unittest.TestCase):
+    def test_429_uses_retry_after_from_body(self):
+        resultado = classificar_resposta_telegram(
+            _RespostaFalsa(429, {"ok": False, "description": "Too Many Requests", "parameters": {"retry_after": 7}})
+        )
+        self.assertFalse(resultado.enviada)
+        self.assertFalse(resultado.permanente)
+        self.assertEqual(resultado.retry_after, 7.0)
+
+    def test_server_error_is_retryable_and_client_error_is_permanent(self):
+        self.assertFalse(classificar_resposta_telegram(_RespostaFalsa(502, {"ok": False})).permanente)
+        self.assertTrue(
+            classificar_resposta_telegram(_RespostaFalsa(403, {"ok": False, "description": "blocked"})).permanente
+        )
+
+    def test_ok_response_is_sent(self):
+        self.assertTrue(classificar_resposta_telegram(_RespostaFalsa(200, {"ok": True})).enviada)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import datetime
+import unittest
+from decimal import Decimal
+from unittest import mock
+
+from fastapi import BackgroundTasks
+from sqlalchemy import update
+from sqlmodel import select
+
+from app.api.v1.endpoints import compras
+from app.models.base import InviteProviderProduto, TipoEntregaProduto, TipoStatusPagamento
+from app.models.conta_mae_models import ContaMae
+from app.models.pedido_models import Pedido
+from app.models.produto_models import Produto
+from app.models.usuario_models import RecargaSaldo, Usuario
+from app.schemas.compra_schemas import CompraLoteCreateRequest
+from app.services.recarga_webhook_service import confirmar_recarga_aprovada
+from app.services.usuario_contadores_service import recalcular_contadores_usuarios, registrar_pedidos
+from banco_teste import BancoTestCase
+
+
+class ContadoresUsuarioTestCase(BancoTestCase):
+    def setUp(self):
+        super().setUp()
+        with self.sessao() as session:
+            usuario = Usuario(telegram_id=777, nome_completo="Cliente")
+            produto = Produto(
+                nome="ChatGPT Team",
+                preco=Decimal("10.00"),
+                tipo_entrega=TipoEntregaProduto.SOLICITA_EMAIL,
+                invite_provider=InviteProviderProduto.OPENAI,
+            )
+            session.add(usuario)
+            session.add(produto)
+            session.flush()
+            session.add(
+                ContaMae(
+                    login="mae@example.com", senha="x", max_slots=10, produto_id=produto.id,
+                    data_expiracao=datetime.date.today() + datetime.timedelta(days=30),
+                )
+            )
+            for gateway_id in ("pix-1", "pix-2"):
+                session.add(
+                    RecargaSaldo(
+                        valor_solicitado=Decimal("50.00"), gateway="mercadopago", gateway_id=gateway_id, usuario_id=usuario.id
+                    )
+                )
+            session.commit()
+            self.usuario_id, self.produto_id = usuario.id, produto.id
+
+    def _contadores(self, usuario_id=None) -> tuple:
+        with self.sessao() as session:
+            usuario = session.get(Usuario, usuario_id or self.usuario_id)
+            return (
+                usuario.total_recargas_pagas,
+                usuario.primeira_recarga_paga_em,
+                usuario.total_pedidos,
+                usuario.primeiro_pedido_em,
+            )
+
+    def _pagar(self, gateway_id: str) -> datetime.datetime:
+        with self.sessao() as session:
+            confirmar_recarga_aprovada(session, gateway_id)
+            session.commit()
+            return session.exec(select(RecargaSaldo.pago_em).where(RecargaSaldo.gateway_id == gateway_id)).one()
+
+    @mock.patch.object(compras, "enqueue_invite_job")
+    def _comprar_lote(self, quantidade: int, enqueue) -> list:
+        compra = CompraLoteCreateRequest(
+            telegram_id=777,
+            produto_id=self.produto_id,
+            quantidade=quantidade,
+            emails_cliente=[f"cliente{indice}@example.com" for indice in range(quantidade)],
+        )
+        with self.sessao() as session:
+            return compras.create_compra_lote_com_saldo(
+                background_tasks=BackgroundTasks(), session=session, compra_in=compra
+            ).itens
+
+    def test_paid_recharges_keep_the_first_payment(self):
+        primeira = self._pagar("pix-1")
+        self.assertEqual(self._contadores()[:2], (1, primeira))
+
+        self._pagar("pix-2")
+        self._pagar("pix-2")
+
+        self.assertEqual(self._contadores(), (2, primeira, 0, None))
+
+    def test_batch_purchase_counts_every_order(self):
+        self._pagar("pix-1")
+        self.assertEqual(len(self._comprar_lote(3)), 3)
+        with self.sessao() as session:
+            primeiro_pedido = session.exec(select(Pedido.criado_em).order_by(Pedido.criado_em)).first()
+        self.assertEqual(self._contadores()[2:], (3, primeiro_pedido))
+
+        self._comprar_lote(2)
+
+        self.assertEqual(self._contadores()[2:], (5, primeiro_pedido))
+
+    def test_loaded_instance_sees_the_new_counters(self):
+        quando = datetime.datetime(2026, 1, 1, 12, 0)
+        with self.sessao() as session:
+            usuario = session.get(Usuario, self.usuario_id)
+            self.assertEqual(registrar_pedidos(session, self.usuario_id, 4, quando), 4)
+            self.assertEqual((usuario.total_pedidos, usuario.primeiro_pedido_em), (4, quando))
+            self.assertEqual(registrar_pedidos(session, self.usuario_id, 1, quando + datetime.timedelta(days=1)), 5)
+            self.assertEqual((usuario.total_pedidos, usuario.primeiro_pedido_em), (5, quando))
+
+    def test_backfill_repairs_only_drifted_rows(self):
+        primeira_recarga = self._pagar("pix-1")
+        self._comprar_lote(2)
+        with self.sessao() as session:
+            sem_historico = Usuario(telegram_id=888, nome_completo="Sem histórico")
+            desatualizado = Usuario(telegram_id=999, nome_completo="Anterior aos contadores")
+            session.add(sem_historico)
+            session.add(desatualizado)
+            session.flush()
+            antiga = datetime.datetime(2025, 6, 1, 8, 0)
+            # Recarga paga sem pago_em (anterior à coluna): conta pela criação.
+            session.add(
+                RecargaSaldo(
+                    valor_solicitado=Decimal("5.00"), gateway="mercadopago", gateway_id="pix-antigo",
+                    status_pagamento=TipoStatusPagamento.PAGO, criado_em=antiga, usuario_id=desatualizado.id,
+                )
+            )
+            session.add(
+                RecargaSaldo(
+                    valor_solicitado=Decimal("5.00"), gateway="mercadopago", gateway_id="pix-falhou",
+                    status_pagamento=TipoStatusPagamento.FALHOU, usuario_id=desatualizado.id,
+                )
+            )
+            session.add(Pedido(valor_pago=Decimal("10.00"), usuario_id=desatualizado.id, produto_id=self.produto_id, criado_em=antiga))
+            session.commit()
+            # Linha criada antes dos contadores: tudo zerado.
+            session.exec(
+                update(Usuario)
+                .where(Usuario.id == desatualizado.id)
+                .values(total_recargas_pagas=0, primeira_recarga_paga_em=None, total_pedidos=0, primeiro_pedido_em=None)
+            )
+            session.commit()
+            ids = sem_historico.id, desatualizado.id
+        corretos = self._contadores()
+
+        with self.sessao() as session:
+            carregado = session.get(Usuario, ids[1])
+            relatorio = recalcular_contadores_usuarios(session)
+            self.assertEqual(carregado.total_pedidos, 1)
+            session.commit()
+
+        self.assertEqual(relatorio, {"usuarios_verificados": 3, "usuarios_atualizados": 1})
+        self.assertEqual(self._contadores(), corretos)
+        self.assertEqual(corretos[:3], (1, primeira_recarga, 2))
+        self.assertEqual(self._contadores(ids[0]), (0, None, 0, None))
+        self.assertEqual(self._contadores(ids[1]), (1, antiga, 1, antiga))
+        with self.sessao() as session:
+            self.assertEqual(recalcular_contadores_usuarios(session)["usuarios_atualizados"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()